@@ -2,11 +2,18 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from config import config
 from models import db
+from utils.database import configure_database
+from utils.responses import configure_responses
+from utils.versions import configure_versions
+from utils.events import configure_events
+from utils.sync import configure_sync
+from utils.assets import configure_assets
+from utils.scheduler import configure_scheduler
 from datetime import datetime
 import os
 
 # Import routes
-from routes import products, lots, inventory, production_orders, customers, shipments, traceability, alerts, movements, receptions, returns, locations
+from routes import products, lots, inventory, production_orders, customers, shipments, traceability, alerts, movements, receptions, returns, locations, search, events, sync, reconciliation, jobs, archive, exports, reports
 
 
 def create_app(config_name='default'):
@@ -18,6 +25,13 @@ def create_app(config_name='default'):
     
     # Initialize extensions
     db.init_app(app)
+    configure_database(app)
+    configure_responses(app)
+    configure_versions(app)
+    configure_events(app)
+    configure_sync(app)
+    configure_assets(app)
+    configure_scheduler(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
     # Register blueprints
@@ -33,12 +47,23 @@ def create_app(config_name='default'):
     app.register_blueprint(receptions.bp)
     app.register_blueprint(returns.bp)
     app.register_blueprint(locations.bp)
+    app.register_blueprint(search.bp)
+    app.register_blueprint(events.bp)
+    app.register_blueprint(sync.bp)
+    app.register_blueprint(reconciliation.bp)
+    app.register_blueprint(jobs.bp)
+    app.register_blueprint(archive.bp)
+    app.register_blueprint(exports.bp)
+    app.register_blueprint(reports.bp)
     
     # Root route - serve HTML interface
     @app.route('/')
     def index():
-        from flask import render_template
-        return render_template('index.html')
+        from flask import render_template, make_response
+        # Small and always revalidated: it names the current asset bundles
+        response = make_response(render_template('index.html'))
+        response.cache_control.no_cache = True
+        return response
     
     # API info route
     @app.route('/api')
@@ -54,7 +79,15 @@ def create_app(config_name='default'):
                 'clientes': '/api/customers',
                 'envios': '/api/shipments',
                 'trazabilidad': '/api/traceability',
-                'alertas': '/api/alerts'
+                'alertas': '/api/alerts',
+                'busqueda': '/api/search',
+                'eventos': '/api/events',
+                'sincronizacion': '/api/sync/<coleccion>?since=<cursor>',
+                'conciliacion': '/api/reconciliation',
+                'tareas': '/api/jobs',
+                'archivo': '/api/archive',
+                'exportaciones': '/api/exports/<inventory|movements|shipments|recall/<lote>>?format=csv|xlsx',
+                'informes': '/api/reports/<aging|forecast>'
             }
         })
     
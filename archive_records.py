@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Move old orders, depleted lots and their history to the archive tables
+
+The scheduler runs it every week (job archive). Traceability still finds
+the archived records. See utils/archive.py.
+
+Usage:
+    python archive_records.py
+    python archive_records.py --days 1095 --dry-run
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from utils.archive import archive, plan
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Archiva órdenes cerradas, lotes agotados y movimientos antiguos')
+    parser.add_argument('--days', type=int,
+                        help='Archivar lo que no ha cambiado en estos días (por defecto, ARCHIVE_AFTER_DAYS)')
+    parser.add_argument('--batch-size', type=int, help='Lotes por transacción (por defecto, ARCHIVE_BATCH_SIZE)')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar lo que se archivaría')
+    parser.add_argument('--config', default='development', help='Configuración de la aplicación')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_app(args.config)
+    with app.app_context():
+        days = args.days or app.config['ARCHIVE_AFTER_DAYS']
+        batch_size = args.batch_size or app.config['ARCHIVE_BATCH_SIZE']
+        started = time.perf_counter()
+        if args.dry_run:
+            orders, batches = plan(datetime.utcnow() - timedelta(days=days), batch_size)
+            lots = sum(len(batch[0]) for batch in batches)
+            print(f'Se archivarían {len(orders)} orden(es) y {lots} lote(s) en {len(batches)} lote(s) de trabajo')
+            return 0
+        run = archive(days, batch_size)
+        print(f'Archivados {run.orders} orden(es), {run.lots} lote(s), {run.movements} movimiento(s), '
+              f'{run.shipments} envío(s) y {run.returns} devolución(es) en {time.perf_counter() - started:.1f} s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
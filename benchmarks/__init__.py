@@ -0,0 +1,16 @@
+"""
+Endpoint benchmarks and load tests
+
+Measures latency percentiles (p50/p95/p99) and throughput of the hot API
+endpoints against an existing database, either in-process with the Flask
+test client or over HTTP against a multi-worker gunicorn server.
+
+Usage:
+    python -m benchmarks list
+    python -m benchmarks run --output results.json
+    python -m benchmarks run --mode http --workers 4 --concurrency 8 --output results.json
+    python -m benchmarks compare baseline.json results.json --threshold 0.2
+
+Write scenarios modify the database: run them against a copy of a dataset
+built with generate_dataset.py, never against production data.
+"""
@@ -0,0 +1,161 @@
+"""
+Command line entry point: python -m benchmarks {list,run,payload,compare}
+"""
+import argparse
+import json
+import os
+import sys
+
+# Write scenarios must not generate or email reception documents
+os.environ.setdefault('RECEPTION_DOCUMENTS', 'false')
+
+from benchmarks.compare import compare_results, format_comparison, load_results
+from benchmarks.payload import format_payloads, measure_payloads
+from benchmarks.runner import (GunicornServer, HttpClient, InProcessClient, describe_environment,
+                               run_mixed, run_scenario)
+from benchmarks.scenarios import SCENARIOS, discover_fixtures, select_scenarios
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+def command_list(args):
+    for scenario in SCENARIOS:
+        print(f'{scenario.name:<20} {scenario.kind:<6} {scenario.method:<5} {scenario.path:<50} '
+              f'{scenario.description}')
+    return 0
+
+
+def command_run(args):
+    from app import create_app
+
+    scenarios = select_scenarios(split_list(args.scenarios), split_list(args.kinds))
+    app = create_app(args.config)
+    with app.app_context():
+        fixtures = discover_fixtures()
+
+    meta = describe_environment(app, args.mode, config=args.config, iterations=args.iterations,
+                                concurrency=args.concurrency, mixed=args.mixed,
+                                accept_encoding=args.accept_encoding,
+                                workers=args.workers if args.mode == 'http' else None,
+                                fixtures=fixtures)
+    results = {'meta': meta, 'scenarios': {}}
+
+    def report(name, summary):
+        print(f"  - {name}: p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms "
+              f"{summary['throughput_rps']} req/s"
+              + (f" ({summary['errors']} errores)" if summary['errors'] else ''))
+
+    def run_all(make_client):
+        if args.mixed:
+            print(f'  mezcla de {len(scenarios)} escenarios...', flush=True)
+            results['scenarios'] = run_mixed(make_client, scenarios, fixtures, args.iterations,
+                                             concurrency=args.concurrency, warmup=args.warmup)
+            for name, summary in results['scenarios'].items():
+                report(name, summary)
+            return
+        for scenario in scenarios:
+            summary = run_scenario(make_client, scenario, fixtures, args.iterations,
+                                   concurrency=args.concurrency, warmup=args.warmup)
+            results['scenarios'][scenario.name] = summary
+            report(scenario.name, summary)
+
+    print(f'Benchmark {args.mode} ({meta["database"]})')
+    if args.mode == 'inprocess':
+        run_all(lambda: InProcessClient(app, accept_encoding=args.accept_encoding))
+    elif args.url:
+        run_all(lambda: HttpClient(args.url, accept_encoding=args.accept_encoding))
+    else:
+        with GunicornServer(workers=args.workers, config=args.config) as server:
+            run_all(lambda: HttpClient(server.base_url, accept_encoding=args.accept_encoding))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'✓ Resultados guardados en {args.output}')
+
+    if args.baseline:
+        return report_comparison(load_results(args.baseline), results, args.threshold)
+    return 0
+
+
+def report_comparison(baseline, current, threshold):
+    for key in ('mode', 'concurrency', 'workers', 'database', 'mixed', 'accept_encoding'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"Aviso: '{key}' difiere ({baseline['meta'].get(key)} → {current['meta'].get(key)})")
+    rows = compare_results(baseline, current, threshold=threshold)
+    print(format_comparison(rows))
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print(f'✗ {len(regressions)} regresiones (umbral {threshold:.0%})')
+        return 1
+    print('✓ Sin regresiones')
+    return 0
+
+
+def command_payload(args):
+    from app import create_app
+
+    scenarios = select_scenarios(split_list(args.scenarios), ['read'])
+    app = create_app(args.config)
+    with app.app_context():
+        fixtures = discover_fixtures()
+
+    print(f"Tamaño y codificación de respuestas ({app.config['SQLALCHEMY_DATABASE_URI']})")
+    results = measure_payloads(app, InProcessClient(app), scenarios, fixtures, repeat=args.repeat)
+    print(format_payloads(results))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': describe_environment(app, 'payload', config=args.config), 'payloads': results},
+                      f, indent=2, ensure_ascii=False)
+        print(f'✓ Resultados guardados en {args.output}')
+    return 0
+
+
+def command_compare(args):
+    return report_comparison(load_results(args.baseline), load_results(args.current), args.threshold)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks de endpoints')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help='Listar escenarios')
+
+    run = subparsers.add_parser('run', help='Ejecutar escenarios')
+    run.add_argument('--mode', choices=['inprocess', 'http'], default='inprocess')
+    run.add_argument('--config', default='production', help='Configuración de la aplicación')
+    run.add_argument('--scenarios', help='Escenarios separados por comas (por defecto, todos)')
+    run.add_argument('--kinds', help='Filtrar por tipo: read, write')
+    run.add_argument('--iterations', type=int, default=20, help='Peticiones medidas por escenario')
+    run.add_argument('--warmup', type=int, default=1, help='Peticiones de calentamiento no medidas')
+    run.add_argument('--concurrency', type=int, default=1, help='Clientes concurrentes')
+    run.add_argument('--mixed', action='store_true',
+                     help='Ejecutar los escenarios intercalados y a la vez (lecturas junto a escrituras)')
+    run.add_argument('--accept-encoding', help='Cabecera Accept-Encoding de las peticiones medidas (p. ej. gzip, br)')
+    run.add_argument('--workers', type=int, default=4, help='Workers de gunicorn (modo http)')
+    run.add_argument('--url', help='Servidor ya arrancado (modo http, no lanza gunicorn)')
+    run.add_argument('--output', help='Fichero JSON de resultados')
+    run.add_argument('--baseline', help='Comparar con un resultado previo')
+    run.add_argument('--threshold', type=float, default=0.2, help='Empeoramiento relativo tolerado')
+
+    payload = subparsers.add_parser('payload', help='Tiempo de serialización JSON y bytes transferidos')
+    payload.add_argument('--config', default='production', help='Configuración de la aplicación')
+    payload.add_argument('--scenarios', help='Escenarios de lectura separados por comas (por defecto, todos)')
+    payload.add_argument('--repeat', type=int, default=5, help='Repeticiones de cada medida (se usa la mediana)')
+    payload.add_argument('--output', help='Fichero JSON de resultados')
+
+    compare = subparsers.add_parser('compare', help='Comparar resultados con una línea base')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.2, help='Empeoramiento relativo tolerado')
+
+    args = parser.parse_args(argv)
+    commands = {'list': command_list, 'run': command_run, 'payload': command_payload, 'compare': command_compare}
+    return commands[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
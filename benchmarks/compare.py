@@ -0,0 +1,53 @@
+"""
+Regression detection against a stored baseline
+"""
+import json
+
+# Latency metrics compared between runs (higher is worse)
+LATENCY_METRICS = ['p50_ms', 'p95_ms', 'p99_ms']
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """Compare two result documents scenario by scenario
+
+    A latency metric regresses when it is more than `threshold` (relative)
+    and `min_delta_ms` (absolute) slower than the baseline; throughput
+    regresses when it drops by more than `threshold`. Returns a list of
+    rows (scenario, metric, baseline, current, change, regression).
+    """
+    rows = []
+    for name, base in baseline['scenarios'].items():
+        result = current['scenarios'].get(name)
+        if result is None:
+            continue
+
+        for metric in LATENCY_METRICS:
+            before, after = base.get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            regression = change > threshold and after - before > min_delta_ms
+            rows.append((name, metric, before, after, change, regression))
+
+        before, after = base.get('throughput_rps'), result.get('throughput_rps')
+        if before and after is not None:
+            change = (after - before) / before
+            rows.append((name, 'throughput_rps', before, after, change, change < -threshold))
+
+        if result.get('errors') and not base.get('errors'):
+            rows.append((name, 'errors', base.get('errors', 0), result['errors'], 0.0, True))
+
+    return rows
+
+
+def format_comparison(rows):
+    lines = [f'{"escenario":<20} {"métrica":<15} {"base":>12} {"actual":>12} {"cambio":>9}']
+    for name, metric, before, after, change, regression in rows:
+        flag = '  REGRESIÓN' if regression else ''
+        lines.append(f'{name:<20} {metric:<15} {before:>12} {after:>12} {change:>+8.1%}{flag}')
+    return '\n'.join(lines)
@@ -0,0 +1,77 @@
+"""
+Payload benchmark: JSON encoding time and bytes on the wire per endpoint
+
+For each read scenario the response body is fetched once, decoded, and then
+encoded again with the standard library encoder (what jsonify used) and with
+orjson, and compressed with gzip and brotli. Only encoding and compression
+are timed; building the dicts from the models is the same for both.
+"""
+import json
+import statistics
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from utils import responses
+from utils.responses import OrjsonProvider, compress
+
+
+def timed(function, repeat):
+    """Result of the last call and median duration in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - started)
+    return result, round(statistics.median(durations) * 1000, 3)
+
+
+def measure_payload(app, client, path, repeat=5):
+    status, body = client.send('GET', path, accept_encoding='identity')
+    if status >= 400:
+        return {'error': f'{status}: {body[:200]!r}'}
+    obj = json.loads(body)
+
+    standard, orjson_provider = DefaultJSONProvider(app), OrjsonProvider(app)
+    stdlib_bytes, stdlib_ms = timed(lambda: standard.dumps(obj, separators=(',', ':')).encode(), repeat)
+    orjson_bytes, orjson_ms = timed(lambda: orjson_provider.dump_bytes(obj), repeat)
+
+    result = {
+        'json_bytes': len(stdlib_bytes),
+        'stdlib_ms': stdlib_ms,
+        'orjson_bytes': len(orjson_bytes),
+        'orjson_ms': orjson_ms,
+    }
+    encodings = ['gzip', 'br'] if responses.brotli is not None else ['gzip']
+    for encoding in encodings:
+        compressed, compress_ms = timed(lambda: compress(orjson_bytes, encoding), repeat)
+        result[f'{encoding}_bytes'] = len(compressed)
+        result[f'{encoding}_ms'] = compress_ms
+    return result
+
+
+def measure_payloads(app, client, scenarios, fixtures, repeat=5):
+    """Payload measurements for the GET scenarios, keyed by scenario name"""
+    results = {}
+    for scenario in scenarios:
+        if scenario.method != 'GET':
+            continue
+        _, path, _ = scenario.prepare(client, fixtures)
+        results[scenario.name] = measure_payload(app, client, path, repeat)
+    return results
+
+
+def format_payloads(results):
+    def size(value):
+        return f'{value / 1024:,.0f} KB' if value is not None else '-'
+
+    lines = [f"{'escenario':<20} {'JSON':>10} {'stdlib':>10} {'orjson':>10} {'gzip':>10} {'brotli':>10}"]
+    for name, result in results.items():
+        if 'error' in result:
+            lines.append(f"{name:<20} {result['error']}")
+            continue
+        lines.append(
+            f"{name:<20} {size(result['json_bytes']):>10} {result['stdlib_ms']:>8}ms {result['orjson_ms']:>8}ms "
+            f"{size(result['gzip_bytes']):>10} {size(result.get('br_bytes')):>10}"
+        )
+    return '\n'.join(lines)
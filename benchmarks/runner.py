@@ -0,0 +1,263 @@
+"""
+Benchmark execution: clients, gunicorn server management and statistics
+"""
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class InProcessClient:
+    """Requests through the Flask test client, without network or server overhead
+
+    With `accept_encoding` the measured requests ask for a compressed
+    response, and the reported size is the compressed body.
+    """
+
+    def __init__(self, app, accept_encoding=None):
+        self.client = app.test_client()
+        self.accept_encoding = accept_encoding
+
+    def send(self, method, path, payload=None, accept_encoding=None):
+        encoding = accept_encoding or self.accept_encoding or 'identity'
+        response = self.client.open(path, method=method, json=payload, headers={'Accept-Encoding': encoding})
+        return response.status_code, response.get_data()
+
+    def request(self, method, path, payload=None):
+        # Setup requests read the body, so they never ask for compression
+        status, body = self.send(method, path, payload, accept_encoding='identity')
+        if status >= 400:
+            raise BenchmarkError(f'{method} {path} -> {status}: {body[:200]!r}')
+        return json.loads(body)
+
+
+class HttpClient:
+    """Requests over HTTP to a running server"""
+
+    def __init__(self, base_url, timeout=300, accept_encoding=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.accept_encoding = accept_encoding
+
+    def send(self, method, path, payload=None, accept_encoding=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        request.add_header('Accept-Encoding', accept_encoding or self.accept_encoding or 'identity')
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def request(self, method, path, payload=None):
+        status, body = self.send(method, path, payload, accept_encoding='identity')
+        if status >= 400:
+            raise BenchmarkError(f'{method} {path} -> {status}: {body[:200]!r}')
+        return json.loads(body)
+
+
+class GunicornServer:
+    """Run the application under gunicorn with several workers for the duration of a with block"""
+
+    def __init__(self, workers=4, port=None, config='production'):
+        self.workers = workers
+        self.port = port or self.free_port()
+        self.config = config
+        self.process = None
+
+    @staticmethod
+    def free_port():
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def __enter__(self):
+        env = dict(os.environ, FLASK_ENV=self.config, SEED_DEMO_DATA='false', RECEPTION_DOCUMENTS='false')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'wsgi:app',
+             '--workers', str(self.workers),
+             '--bind', f'127.0.0.1:{self.port}',
+             '--timeout', '600',
+             '--log-level', 'warning'],
+            cwd=BASE_DIR, env=env
+        )
+        self.wait_until_ready()
+        return self
+
+    def wait_until_ready(self, timeout=60):
+        deadline = time.time() + timeout
+        client = HttpClient(self.base_url, timeout=5)
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise BenchmarkError(f'gunicorn terminó con código {self.process.returncode}')
+            try:
+                if client.send('GET', '/api')[0] == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise BenchmarkError('gunicorn no respondió a tiempo')
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def percentile(values, fraction):
+    """Percentile with linear interpolation between closest ranks"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies, errors, sizes, elapsed):
+    latencies_ms = [latency * 1000 for latency in latencies]
+    count = len(latencies_ms)
+    return {
+        'requests': count,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies_ms, 0.50), 3) if count else None,
+        'p95_ms': round(percentile(latencies_ms, 0.95), 3) if count else None,
+        'p99_ms': round(percentile(latencies_ms, 0.99), 3) if count else None,
+        'mean_ms': round(sum(latencies_ms) / count, 3) if count else None,
+        'max_ms': round(max(latencies_ms), 3) if count else None,
+        'throughput_rps': round(count / elapsed, 3) if elapsed else None,
+        'response_bytes': round(sum(sizes) / len(sizes)) if sizes else None,
+    }
+
+
+def run_scenario(make_client, scenario, fixtures, iterations, concurrency=1, warmup=1):
+    """Run a scenario and return its latency and throughput summary
+
+    Each thread gets its own client. Throughput is measured over the wall time
+    of the run, which includes the unmeasured setup of write scenarios.
+    """
+    client = make_client()
+    for _ in range(warmup):
+        method, path, payload = scenario.prepare(client, fixtures)
+        client.send(method, path, payload)
+
+    def worker(count):
+        client = make_client()
+        latencies, sizes, errors = [], [], []
+        for _ in range(count):
+            method, path, payload = scenario.prepare(client, fixtures)
+            started = time.perf_counter()
+            status, body = client.send(method, path, payload)
+            elapsed = time.perf_counter() - started
+            if status >= 400:
+                errors.append(f'{status}: {body[:200]!r}')
+                continue
+            latencies.append(elapsed)
+            sizes.append(len(body))
+        return latencies, sizes, errors
+
+    shares = [iterations // concurrency + (1 if i < iterations % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, [share for share in shares if share]))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for result in results for latency in result[0]]
+    sizes = [size for result in results for size in result[1]]
+    errors = [error for result in results for error in result[2]]
+    summary = summarize(latencies, len(errors), sizes, elapsed)
+    if errors:
+        summary['first_error'] = errors[0]
+    return summary
+
+
+def run_mixed(make_client, scenarios, fixtures, iterations, concurrency=1, warmup=1):
+    """Run several scenarios interleaved across concurrent clients
+
+    Each thread cycles through the scenarios starting at a different offset,
+    so reads and writes overlap in time. Returns one summary per scenario;
+    throughput is relative to the wall time of the whole mixed run.
+    """
+    client = make_client()
+    for scenario in scenarios:
+        for _ in range(warmup):
+            method, path, payload = scenario.prepare(client, fixtures)
+            client.send(method, path, payload)
+
+    def worker(offset, count):
+        client = make_client()
+        results = {scenario.name: ([], [], []) for scenario in scenarios}
+        for i in range(count):
+            scenario = scenarios[(offset + i) % len(scenarios)]
+            latencies, sizes, errors = results[scenario.name]
+            method, path, payload = scenario.prepare(client, fixtures)
+            started = time.perf_counter()
+            status, body = client.send(method, path, payload)
+            elapsed = time.perf_counter() - started
+            if status >= 400:
+                errors.append(f'{status}: {body[:200]!r}')
+                continue
+            latencies.append(elapsed)
+            sizes.append(len(body))
+        return results
+
+    total = iterations * len(scenarios)
+    shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, range(concurrency), shares))
+    elapsed = time.perf_counter() - started
+
+    summaries = {}
+    for scenario in scenarios:
+        latencies = [latency for result in results for latency in result[scenario.name][0]]
+        sizes = [size for result in results for size in result[scenario.name][1]]
+        errors = [error for result in results for error in result[scenario.name][2]]
+        summary = summarize(latencies, len(errors), sizes, elapsed)
+        if errors:
+            summary['first_error'] = errors[0]
+        summaries[scenario.name] = summary
+    return summaries
+
+
+def describe_environment(app, mode, **options):
+    """Metadata stored with the results so runs can be compared meaningfully"""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if '@' in uri:
+        scheme, rest = uri.split('://', 1)
+        uri = f'{scheme}://***@{rest.split("@", 1)[1]}'
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return dict({
+        'mode': mode,
+        'database': uri,
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+    }, **options)
@@ -0,0 +1,157 @@
+"""
+Benchmark scenarios: the requests to measure and how to prepare them
+"""
+import uuid
+from datetime import date
+
+from sqlalchemy import func
+
+from models import (db, Product, ProductType, Lot, Customer, Location, LotLocation, Shipment)
+
+
+class Scenario:
+    """A measured request
+
+    `prepare(client, fixtures)` is called before each measured request and
+    returns the (method, path, payload) to time. Setup requests issued inside
+    prepare (for example creating the order to close) are not measured.
+    """
+
+    def __init__(self, name, method, path, prepare=None, kind='read', description=''):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.prepare_request = prepare
+        self.kind = kind
+        self.description = description
+
+    def prepare(self, client, fixtures):
+        if self.prepare_request:
+            return self.prepare_request(client, fixtures)
+        return self.method, self.path.format(**fixtures), None
+
+
+def discover_fixtures():
+    """Pick representative ids from the database (must run inside an app context)"""
+    lib = Location.query.filter_by(code='LIB').first()
+    if not lib:
+        raise RuntimeError('Ubicación LIB no encontrada: genere un dataset con generate_dataset.py')
+
+    def lot_with_most_stock(product_types):
+        return db.session.query(LotLocation.lot_id).join(Lot).join(Product).filter(
+            LotLocation.location_id == lib.id,
+            Product.type.in_(product_types),
+            Lot.blocked == False,
+            db.or_(Lot.expiration_date.is_(None), Lot.expiration_date >= date.today())
+        ).order_by(LotLocation.quantity.desc()).limit(1).scalar()
+
+    material_lot_id = lot_with_most_stock([ProductType.RAW_MATERIAL, ProductType.PACKAGING])
+    finished_lot_id = lot_with_most_stock([ProductType.FINISHED_PRODUCT])
+    customer_id = db.session.query(Shipment.customer_id).group_by(Shipment.customer_id).order_by(
+        func.count(Shipment.id).desc()).limit(1).scalar() or db.session.query(func.min(Customer.id)).scalar()
+
+    material_lot = db.session.get(Lot, material_lot_id) if material_lot_id else None
+    finished_product = Product.query.filter_by(type=ProductType.FINISHED_PRODUCT).first()
+    raw_product = Product.query.filter_by(type=ProductType.RAW_MATERIAL).first()
+
+    return {
+        'material_lot_id': material_lot_id,
+        'material_unit': material_lot.unit if material_lot else None,
+        'finished_lot_id': finished_lot_id,
+        'customer_id': customer_id,
+        'raw_product_id': raw_product.id if raw_product else None,
+        'finished_product_id': finished_product.id if finished_product else None,
+    }
+
+
+def unique_suffix():
+    return uuid.uuid4().hex[:10].upper()
+
+
+def prepare_reception(client, fixtures):
+    return 'POST', '/api/receptions', {
+        'product_id': fixtures['raw_product_id'],
+        'reception_date': date.today().isoformat(),
+        'quantity': 10,
+        'unit': 'kg',
+        'lot_number': f'BENCH-{unique_suffix()}',
+        'supplier': 'Benchmark'
+    }
+
+
+def prepare_shipment(client, fixtures):
+    return 'POST', '/api/shipments', {
+        'customer_id': fixtures['customer_id'],
+        'shipment_number': f'BENCH-{unique_suffix()}',
+        'shipment_date': date.today().isoformat(),
+        'details': [{'lot_id': fixtures['finished_lot_id'], 'quantity': 1}]
+    }
+
+
+def prepare_production_close(client, fixtures):
+    """Create a draft order with one material (not measured) and time its closing"""
+    suffix = unique_suffix()
+    order = client.request('POST', '/api/production-orders', {
+        'order_number': f'BENCH-{suffix}',
+        'production_date': date.today().isoformat(),
+        'base_product_name': 'Benchmark',
+        'base_lot_number': f'BENCH-{suffix}',
+        'finished_products': [{
+            'finished_product_id': fixtures['finished_product_id'],
+            'lot_number': f'BENCH-{suffix}',
+            'target_quantity': 10
+        }]
+    })
+    client.request('POST', f'/api/production-orders/{order["id"]}/materials', {
+        'lot_id': fixtures['material_lot_id'],
+        'quantity_consumed': 0.001,
+        'unit': fixtures['material_unit']
+    })
+    return 'POST', f'/api/production-orders/{order["id"]}/close', {
+        'finished_products': [{
+            'finished_product_id': order['finished_products'][0]['id'],
+            'produced_quantity': 10
+        }]
+    }
+
+
+SCENARIOS = [
+    Scenario('inventory', 'GET', '/api/inventory', description='Inventario disponible'),
+    Scenario('lots', 'GET', '/api/lots', description='Todos los lotes'),
+    Scenario('movements', 'GET', '/api/movements', description='Libro de movimientos completo'),
+    Scenario('production_orders', 'GET', '/api/production-orders', description='Órdenes con materiales'),
+    Scenario('inventory_included', 'GET', '/api/inventory?include=products,locations',
+             description='Inventario con productos y ubicaciones una sola vez'),
+    Scenario('lots_included', 'GET', '/api/lots?include=products', description='Lotes con productos una sola vez'),
+    Scenario('production_orders_included', 'GET', '/api/production-orders?include=products,lots',
+             description='Órdenes con lotes y productos una sola vez'),
+    Scenario('trace_forward', 'GET', '/api/traceability/lot/{finished_lot_id}',
+             description='Trazabilidad directa de un lote acabado'),
+    Scenario('trace_reverse', 'GET', '/api/traceability/lot/{material_lot_id}/reverse',
+             description='Trazabilidad inversa de una materia prima'),
+    Scenario('trace_customer', 'GET', '/api/traceability/customer/{customer_id}',
+             description='Lotes recibidos por el cliente con más envíos'),
+    Scenario('alerts_generate', 'POST', '/api/alerts/generate', kind='write',
+             description='Regeneración de alertas'),
+    Scenario('reception', 'POST', '/api/receptions', prepare=prepare_reception, kind='write',
+             description='Alta de recepción'),
+    Scenario('shipment', 'POST', '/api/shipments', prepare=prepare_shipment, kind='write',
+             description='Envío de una unidad desde LIB'),
+    Scenario('production_close', 'POST', '/api/production-orders/<id>/close', prepare=prepare_production_close,
+             kind='write', description='Cierre de una orden con un material'),
+]
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+def select_scenarios(names=None, kinds=None):
+    """Scenarios filtered by comma-separated names and/or kinds ('read', 'write')"""
+    selected = SCENARIOS
+    if names:
+        unknown = set(names) - set(SCENARIOS_BY_NAME)
+        if unknown:
+            raise ValueError(f'Escenarios desconocidos: {", ".join(sorted(unknown))}')
+        selected = [SCENARIOS_BY_NAME[name] for name in names]
+    if kinds:
+        selected = [scenario for scenario in selected if scenario.kind in kinds]
+    return selected
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Build the minified, content-hashed static bundles served under /assets/
+
+Run it after changing anything in static/js or static/css; index.html links
+the new bundles from the next page load. See utils/assets.py.
+
+Usage:
+    python build_assets.py
+    python build_assets.py --output /srv/almacen/dist
+"""
+import argparse
+import os
+import sys
+
+from utils.assets import BUNDLES, DIST_DIR, STATIC_DIR, build
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Genera los paquetes estáticos minificados')
+    parser.add_argument('--output', default=os.environ.get('ASSETS_DIR') or DIST_DIR,
+                        help='Directorio de salida (por defecto, static/dist)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    manifest = build(args.output)
+    for name, filename in manifest.items():
+        source = sum(os.path.getsize(os.path.join(STATIC_DIR, path)) for path in BUNDLES[name])
+        sizes = [f'{os.path.getsize(os.path.join(args.output, filename)) / 1024:.0f} KB']
+        for suffix in ('.gz', '.br'):
+            path = os.path.join(args.output, filename + suffix)
+            if os.path.exists(path):
+                sizes.append(f'{suffix[1:]} {os.path.getsize(path) / 1024:.0f} KB')
+        print(f'{filename}: {source / 1024:.0f} KB -> {", ".join(sizes)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
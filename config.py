@@ -1,10 +1,45 @@
 import os
 
+
+def database_url(variable='DATABASE_URL', default='sqlite:///gestion_almacen.db'):
+    """Database URL from the environment"""
+    url = os.environ.get(variable) or default
+    # Hosting platforms still hand out postgres:// URLs, which SQLAlchemy 2 rejects
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url):
+    """SQLAlchemy engine options for the given database URL
+
+    For PostgreSQL every gunicorn worker owns one pool, so the server sees up
+    to workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections. SQLite keeps
+    the Flask-SQLAlchemy defaults.
+    """
+    if not url.startswith('postgresql'):
+        return {}
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    lock_timeout = int(os.environ.get('DB_LOCK_TIMEOUT_MS', 10000))
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+        'connect_args': {
+            'application_name': 'gestion_almacen',
+            'options': f'-c statement_timeout={statement_timeout} -c lock_timeout={lock_timeout}',
+        },
+    }
+
+
 class Config:
     """Base configuration"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///gestion_almacen.db'
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     
     # CORS settings for development
     CORS_ORIGINS = ['http://localhost:5000', 'http://127.0.0.1:5000']
@@ -15,6 +50,61 @@ class Config:
     # Alert thresholds
     EXPIRING_SOON_DAYS = 90  # Alert if expiring within 3 months
 
+    # Consumption forecast and suggested reorder points; see utils/forecast.py
+    FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', 180))
+    FORECAST_SMOOTHING = float(os.environ.get('FORECAST_SMOOTHING', 0.1))  # Weight of the latest day
+    FORECAST_LEAD_TIME_DAYS = int(os.environ.get('FORECAST_LEAD_TIME_DAYS', 14))
+    FORECAST_SAFETY_FACTOR = float(os.environ.get('FORECAST_SAFETY_FACTOR', 1.65))  # About 95% service level
+    # Low stock alerts against the suggested reorder point instead of min_stock
+    # (products without consumption history keep their min_stock)
+    LOW_STOCK_FORECAST = os.environ.get('LOW_STOCK_FORECAST', 'false').lower() == 'true'
+    
+    # Generate (and email) the reception form for every reception
+    RECEPTION_DOCUMENTS = os.environ.get('RECEPTION_DOCUMENTS', 'true').lower() == 'true'
+
+    # PRAGMAs applied to every SQLite connection (empty: driver defaults)
+    SQLITE_PRAGMAS = {}
+
+    # JSON responses serialized with orjson instead of the standard library encoder
+    FAST_JSON = os.environ.get('FAST_JSON', 'true').lower() == 'true'
+
+    # gzip/brotli compression of responses larger than COMPRESS_MIN_SIZE bytes
+    COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+
+    # Per-table change counters: ETag and 304 Not Modified on reference and stock lists
+    TABLE_VERSIONS = os.environ.get('TABLE_VERSIONS', 'true').lower() == 'true'
+
+    # Live updates (/api/events): outbox polled by one thread per worker
+    EVENTS = os.environ.get('EVENTS', 'true').lower() == 'true'
+    EVENTS_POLLER = True
+    EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 0.5))
+    EVENTS_STREAM_SECONDS = int(os.environ.get('EVENTS_STREAM_SECONDS', 300))
+    # Streams open at once per worker; each holds a thread, so keep it below gunicorn's --threads
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 4))
+    EVENTS_HEARTBEAT_SECONDS = 15
+    EVENTS_RETENTION_SECONDS = int(os.environ.get('EVENTS_RETENTION_SECONDS', 3600))
+
+    # Delta sync (/api/sync/<collection>): rows per page and overlap between requests
+    SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 5000))
+    SYNC_LOOKBACK_SECONDS = int(os.environ.get('SYNC_LOOKBACK_SECONDS', 60))
+
+    # Minified, content-hashed bundles from build_assets.py (source files when not built)
+    ASSETS_BUNDLED = os.environ.get('ASSETS_BUNDLED', 'true').lower() == 'true'
+    ASSETS_DIR = os.environ.get('ASSETS_DIR')  # Default: static/dist
+
+    # Background jobs (utils/jobs.py) run by one worker at a time; see utils/scheduler.py
+    SCHEDULER = os.environ.get('SCHEDULER', 'true').lower() == 'true'
+    SCHEDULER_INTERVAL = int(os.environ.get('SCHEDULER_INTERVAL', 30))
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 300))
+    SCHEDULER_SCHEDULES = {}  # job name -> crontab expression (None: only on demand)
+    SCHEDULER_HISTORY_DAYS = int(os.environ.get('SCHEDULER_HISTORY_DAYS', 90))
+    GENERATED_DOCS_RETENTION_DAYS = int(os.environ.get('GENERATED_DOCS_RETENTION_DAYS', 30))
+
+    # Old orders, depleted lots and their history move to archive tables; see utils/archive.py
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 730))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -29,10 +119,33 @@ class ProductionConfig(Config):
     # Allow all origins for demo purposes
     CORS_ORIGINS = ['*']
 
+    # Several gunicorn workers share the SQLite file: WAL lets readers run
+    # alongside the single writer, and writers queue on busy_timeout instead
+    # of failing with "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000)),
+        'cache_size': -64000,  # 64 MB page cache per connection
+        'mmap_size': 268435456,  # 256 MB memory-mapped I/O
+        'temp_store': 'MEMORY',
+    }
+
+
+class TestingConfig(Config):
+    """Testing configuration (in-memory database unless TEST_DATABASE_URL is set)"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = database_url('TEST_DATABASE_URL', 'sqlite://')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    RECEPTION_DOCUMENTS = False
+    EVENTS_POLLER = False  # Tests dispatch the outbox explicitly
+    SCHEDULER = False  # Tests run scheduler ticks explicitly
+
 
 # Configuration dictionary
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
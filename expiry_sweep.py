@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""
+Move the stock of expired lots from LIB to NC
+
+The scheduler runs the sweep every night (job expiry_sweep). Without
+options this sweeps the lots expired or changed since the previous sweep.
+With --all it sweeps every expired lot. See utils/expiry.py.
+
+Usage:
+    python expiry_sweep.py
+    python expiry_sweep.py --all
+"""
+import argparse
+import sys
+import time
+from datetime import date
+
+from app import create_app
+from models import db
+from utils.expiry import sweep
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Pasa a No Conforme el stock caducado que queda en Liberado')
+    parser.add_argument('--all', action='store_true',
+                        help='Revisar todos los lotes caducados, no solo los cambiados desde el último barrido')
+    parser.add_argument('--date', type=date.fromisoformat,
+                        help='Lotes caducados antes de este día YYYY-MM-DD (por defecto, hoy)')
+    parser.add_argument('--config', default='development', help='Configuración de la aplicación')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_app(args.config)
+    with app.app_context():
+        started = time.perf_counter()
+        record = sweep(today=args.date, full=args.all)
+        if record is None:
+            print('Faltan las ubicaciones LIB o NC')
+            return 1
+        db.session.commit()
+        print(f'{record.lots} lote(s) caducados pasados a No Conforme en {time.perf_counter() - started:.1f} s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,611 @@
+#!/usr/bin/env python
+"""
+Synthetic dataset generator for load and performance testing
+
+Builds a consistent warehouse history at configurable scale using bulk
+inserts: products, customers, reception lots, production orders with their
+materials (BOM), finished lots, shipments, returns and location transfers.
+
+The output is deterministic for a given --seed and --today, and keeps the
+stock invariants of the application:
+
+    Lot.current_quantity == sum of non-transfer StockMovement.quantity
+                         == sum of LotLocation.quantity
+
+Movements of a lot are dated between its reception and --today, and the
+balance of every lot, replayed in movement date order, never goes negative.
+
+Usage:
+    python generate_dataset.py --scale small
+    python generate_dataset.py --scale large --seed 7 --reset
+    python generate_dataset.py --lots 50000 --movements 1000000 --reset
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+
+from models import (db, Product, ProductType, Lot, Customer, Location, LotLocation, StockMovement,
+                    MovementType, ProductionOrder, ProductionOrderStatus, ProductionOrderFinishedProduct,
+                    ProductionOrderMaterial, Shipment, ShipmentDetail, Return, ReturnDetail)
+from seed_demo import LOCATIONS
+from utils.database import reset_sequences
+
+
+# Predefined scales. Any value can be overridden from the command line.
+# `lots` counts reception lots plus finished lots; `movements` is the target
+# total, reached with adjustments and transfers once the business flows are done.
+SCALES = {
+    'small': dict(products=50, customers=20, lots=1000, orders=250, shipments=400, returns=40,
+                  movements=10000),
+    'medium': dict(products=500, customers=200, lots=20000, orders=5000, shipments=8000, returns=800,
+                   movements=500000),
+    'large': dict(products=5000, customers=2000, lots=200000, orders=50000, shipments=60000, returns=5000,
+                  movements=5000000),
+}
+
+# Rows per bulk insert
+CHUNK_SIZE = 20000
+
+# Share of production orders still open (they reserve materials but have not consumed them)
+OPEN_ORDER_RATIO = 0.1
+
+RETURN_REASONS = ['customer_return', 'market_recall', 'quality_issue']
+
+
+class DatasetError(Exception):
+    pass
+
+
+class DatasetGenerator:
+    """Generate a synthetic dataset into the current database
+
+    Quantities are tracked in memory while rows are streamed to the database
+    in chunks; lot totals and the location breakdown are written at the end.
+    """
+
+    def __init__(self, seed, today, products, customers, lots, orders, shipments, returns, movements):
+        self.rng = random.Random(seed)
+        self.today = today
+        self.start = today - timedelta(days=3 * 365)
+        self.sizes = dict(products=products, customers=customers, lots=lots, orders=orders,
+                          shipments=shipments, returns=returns, movements=movements)
+
+        self.buffers = {}
+        self.counts = {}
+        self.movement_id = 0
+
+        # In-memory stock state, indexed by lot id
+        self.lot_quantity = {}
+        self.lot_stock = {}  # lot_id -> {location_id: quantity}
+        self.lot_received = {}  # lot_id -> reception (or production) date
+        self.lot_floor = {}  # lot_id -> moment of its latest inflow; outflows are dated after it
+        self.material_lots = []
+        self.finished_lots = []
+        self.shipped = []  # (customer_id, lot_id, quantity, day)
+
+    # ---------- buffered bulk inserts ----------
+
+    def add(self, model, row):
+        table = model.__table__
+        buffer = self.buffers.setdefault(table.name, (table, []))[1]
+        buffer.append(row)
+        if len(buffer) >= CHUNK_SIZE:
+            self.flush(table.name)
+
+    def flush(self, table_name=None):
+        names = [table_name] if table_name else list(self.buffers)
+        for name in names:
+            table, rows = self.buffers[name]
+            if rows:
+                db.session.execute(table.insert(), rows)
+                self.counts[name] = self.counts.get(name, 0) + len(rows)
+                rows.clear()
+
+    # ---------- helpers ----------
+
+    def random_date(self, start=None, end=None):
+        start = start or self.start
+        end = end or self.today
+        return start + timedelta(days=self.rng.randint(0, max((end - start).days, 0)))
+
+    def random_datetime(self, day):
+        return datetime.combine(day, datetime.min.time()) + timedelta(seconds=self.rng.randint(0, 86399))
+
+    def outflow_date(self, *lot_ids):
+        """Random day on which stock can leave all of `lot_ids`
+
+        Stock that leaves a lot was counted with every inflow generated so
+        far, so the day is not earlier than the latest of them: replayed in
+        date order, the balance never goes negative.
+        """
+        return self.random_date(start=max(self.lot_floor[lot_id] for lot_id in lot_ids).date())
+
+    def move(self, lot_id, movement_type, quantity, day, from_location=None, to_location=None,
+             reference_id=None, reference_type=None, notes=None):
+        """Record a stock movement and apply it to the in-memory stock
+
+        Outflows are moved after the latest inflow of the lot when both fall
+        on the same day; see outflow_date().
+        """
+        quantity = round(quantity, 3)
+        moment = self.random_datetime(day)
+        if movement_type != MovementType.TRANSFER:
+            if quantity < 0:
+                moment = max(moment, self.lot_floor[lot_id])
+            else:
+                self.lot_floor[lot_id] = max(moment, self.lot_floor[lot_id])
+        self.movement_id += 1
+        self.add(StockMovement, {
+            'id': self.movement_id,
+            'lot_id': lot_id,
+            'movement_type': movement_type,
+            'quantity': quantity,
+            'movement_date': moment,
+            'reference_id': reference_id,
+            'reference_type': reference_type,
+            'notes': notes,
+            'from_location_id': from_location,
+            'to_location_id': to_location,
+        })
+
+        stock = self.lot_stock[lot_id]
+        if movement_type == MovementType.TRANSFER:
+            stock[from_location] = round(stock[from_location] - quantity, 3)
+            stock[to_location] = round(stock.get(to_location, 0) + quantity, 3)
+            return
+
+        self.lot_quantity[lot_id] = round(self.lot_quantity[lot_id] + quantity, 3)
+        location = to_location if quantity >= 0 else from_location
+        stock[location] = round(stock.get(location, 0) + quantity, 3)
+
+    def new_lot(self, lot_id, product, lot_number, manufacturing_date, expiration_date, quantity, unit,
+                blocked=False):
+        self.add(Lot, {
+            'id': lot_id,
+            'product_id': product['id'],
+            'lot_number': lot_number,
+            'manufacturing_date': manufacturing_date,
+            'expiration_date': expiration_date,
+            'initial_quantity': quantity,
+            'current_quantity': 0,  # Final value written by write_stock()
+            'unit': unit,
+            'blocked': blocked,
+            'created_at': self.random_datetime(manufacturing_date),
+        })
+        self.lot_quantity[lot_id] = 0
+        self.lot_stock[lot_id] = {}
+        self.lot_received[lot_id] = manufacturing_date
+        self.lot_floor[lot_id] = datetime.combine(manufacturing_date, datetime.min.time())
+
+    # ---------- generation steps ----------
+
+    def generate(self):
+        steps = [
+            ('locations', self.create_locations),
+            ('products and customers', self.create_master_data),
+            ('receptions', self.create_receptions),
+            ('production orders', self.create_production_orders),
+            ('shipments', self.create_shipments),
+            ('returns', self.create_returns),
+            ('adjustments and transfers', self.create_filler_movements),
+            ('lot totals and locations', self.write_stock),
+        ]
+        for label, step in steps:
+            started = time.time()
+            step()
+            self.flush()
+            print(f"  - {label}: {time.time() - started:.1f}s")
+        reset_sequences()
+        db.session.commit()
+        return self.counts
+
+    def create_locations(self):
+        self.locations = {}
+        for location_id, (code, name, is_available) in enumerate(LOCATIONS, start=1):
+            self.add(Location, {'id': location_id, 'code': code, 'name': name,
+                                'is_available': is_available, 'active': True})
+            self.locations[code] = location_id
+
+    def create_master_data(self):
+        rng = self.rng
+        self.products = {ProductType.RAW_MATERIAL: [], ProductType.PACKAGING: [],
+                         ProductType.FINISHED_PRODUCT: []}
+        n = self.sizes['products']
+        for product_id in range(1, n + 1):
+            roll = rng.random()
+            if roll < 0.5:
+                product_type, prefix = ProductType.RAW_MATERIAL, 'MP'
+                storage_unit, consumption_unit = rng.choice([('kg', 'kg'), ('l', 'kg'), ('kg', 'g')])
+                density = round(rng.uniform(0.8, 1.4), 3) if storage_unit == 'l' else None
+            elif roll < 0.8:
+                product_type, prefix = ProductType.PACKAGING, 'ENV'
+                storage_unit, consumption_unit, density = 'ud', 'ud', None
+            else:
+                product_type, prefix = ProductType.FINISHED_PRODUCT, 'PA'
+                storage_unit, consumption_unit, density = 'ud', 'ud', None
+
+            product = {
+                'id': product_id,
+                'code': f'{prefix}-{product_id:05d}',
+                'name': f'{product_type.value.replace("_", " ").capitalize()} {product_id}',
+                'type': product_type,
+                'description': None,
+                'min_stock': rng.choice([None, 10.0, 50.0, 100.0, 500.0]),
+                'storage_unit': storage_unit,
+                'consumption_unit': consumption_unit,
+                'density': density,
+                'active': True,
+                'created_at': datetime.combine(self.start, datetime.min.time()),
+            }
+            self.add(Product, product)
+            self.products[product_type].append(product)
+
+        # Make sure every type exists, even at tiny scales
+        for product_type, products in self.products.items():
+            if not products:
+                raise DatasetError(f'No hay productos de tipo {product_type.value}; aumente --products')
+
+        for customer_id in range(1, self.sizes['customers'] + 1):
+            self.add(Customer, {
+                'id': customer_id,
+                'code': f'CLI-{customer_id:05d}',
+                'name': f'Cliente {customer_id}',
+                'email': f'cliente{customer_id}@example.com',
+                'phone': None,
+                'address': None,
+                'active': True,
+                'created_at': datetime.combine(self.start, datetime.min.time()),
+            })
+
+    def create_receptions(self):
+        rng = self.rng
+        rec, lib, nc = self.locations['REC'], self.locations['LIB'], self.locations['NC']
+        closed_orders = self.sizes['orders'] - int(self.sizes['orders'] * OPEN_ORDER_RATIO)
+        n = max(self.sizes['lots'] - closed_orders, 1)
+        materials = self.products[ProductType.RAW_MATERIAL] + self.products[ProductType.PACKAGING]
+
+        for lot_id in range(1, n + 1):
+            product = rng.choice(materials)
+            day = self.random_date()
+            quantity = float(rng.choice([25, 50, 100, 200, 500, 1000, 2000]))
+            expiration = None
+            if product['type'] == ProductType.RAW_MATERIAL:
+                expiration = day + timedelta(days=rng.randint(180, 1460))
+
+            self.new_lot(lot_id, product, f'L{lot_id:07d}', day, expiration, quantity, product['storage_unit'])
+            self.move(lot_id, MovementType.ENTRY, quantity, day, to_location=rec,
+                      notes=f'Recepción - Proveedor: Proveedor {rng.randint(1, 50)}')
+
+            # Most receptions are released; a few are rejected or still pending
+            roll = rng.random()
+            if roll < 0.9:
+                self.move(lot_id, MovementType.TRANSFER, quantity, day, from_location=rec, to_location=lib)
+            elif roll < 0.95:
+                self.move(lot_id, MovementType.TRANSFER, quantity, day, from_location=rec, to_location=nc)
+            self.material_lots.append((lot_id, product))
+
+        self.next_lot_id = n + 1
+
+    def pick_material_lots(self, count):
+        """Pick distinct material lots with stock in LIB"""
+        lib = self.locations['LIB']
+        picked = {}
+        for _ in range(count * 4):
+            lot_id, product = self.rng.choice(self.material_lots)
+            if lot_id not in picked and self.lot_stock[lot_id].get(lib, 0) > 1:
+                picked[lot_id] = product
+                if len(picked) == count:
+                    break
+        return picked
+
+    def create_production_orders(self):
+        rng = self.rng
+        lib, fab = self.locations['LIB'], self.locations['FAB']
+        finished_products = self.products[ProductType.FINISHED_PRODUCT]
+        n = self.sizes['orders']
+        open_orders = set(rng.sample(range(1, n + 1), int(n * OPEN_ORDER_RATIO)))
+        fp_id = material_id = 0
+
+        for order_id in range(1, n + 1):
+            is_open = order_id in open_orders
+            materials = self.pick_material_lots(rng.randint(3, 8))
+            if is_open:
+                day = self.today - timedelta(days=rng.randint(0, 30))
+            else:
+                # Materials are consumed on the production date, after they were received
+                day = self.outflow_date(*materials) if materials else self.random_date()
+            product = rng.choice(finished_products)
+            lot_number = f'PF{order_id:07d}'
+            expiration = day + timedelta(days=rng.randint(365, 1095))
+            status = (rng.choice([ProductionOrderStatus.DRAFT, ProductionOrderStatus.IN_PROGRESS])
+                      if is_open else ProductionOrderStatus.CLOSED)
+
+            self.add(ProductionOrder, {
+                'id': order_id,
+                'order_number': f'OF-{order_id:07d}',
+                'base_product_name': product['name'],
+                'base_lot_number': lot_number,
+                'finished_product_id': None,
+                'finished_lot_number': None,
+                'target_quantity': None,
+                'produced_quantity': None,
+                'unit': None,
+                'production_date': day,
+                'expiration_date': expiration,
+                'status': status,
+                'notes': None,
+                'created_at': self.random_datetime(day),
+                'closed_at': None if is_open else self.random_datetime(day),
+            })
+
+            target = float(rng.choice([100, 250, 500, 1000]))
+            finished_lot_id = None
+            if not is_open:
+                finished_lot_id = self.next_lot_id
+                self.next_lot_id += 1
+                self.new_lot(finished_lot_id, product, lot_number, day, expiration, target, 'ud')
+
+            fp_id += 1
+            self.add(ProductionOrderFinishedProduct, {
+                'id': fp_id,
+                'production_order_id': order_id,
+                'finished_product_id': product['id'],
+                'lot_number': lot_number,
+                'target_quantity': target,
+                'produced_quantity': None if is_open else target,
+                'unit': 'ud',
+                'expiration_date': expiration,
+                'lot_id': finished_lot_id,
+                'created_at': self.random_datetime(day),
+            })
+
+            # Bill of materials
+            for lot_id, material in materials.items():
+                available = self.lot_stock[lot_id][lib]
+                consumed = round(available * rng.uniform(0.02, 0.1), 3)
+                material_id += 1
+                self.add(ProductionOrderMaterial, {
+                    'id': material_id,
+                    'production_order_id': order_id,
+                    'lot_id': lot_id,
+                    'quantity_consumed': consumed,
+                    'unit': material['storage_unit'],
+                    'original_quantity': consumed,
+                    'original_unit': material['storage_unit'],
+                    'related_finished_product_id': None,
+                })
+                if not is_open:
+                    self.move(lot_id, MovementType.PRODUCTION, -consumed, day, from_location=lib,
+                              reference_id=order_id, reference_type='production_order',
+                              notes=f'Consumo en orden OF-{order_id:07d}')
+
+            if finished_lot_id:
+                self.move(finished_lot_id, MovementType.PRODUCTION, target, day, to_location=fab,
+                          reference_id=order_id, reference_type='production_order',
+                          notes=f'Producción de orden OF-{order_id:07d}')
+                if rng.random() < 0.95:
+                    self.move(finished_lot_id, MovementType.TRANSFER, target, day,
+                              from_location=fab, to_location=lib)
+                self.finished_lots.append(finished_lot_id)
+
+    def create_shipments(self):
+        rng = self.rng
+        lib = self.locations['LIB']
+        if not self.finished_lots:
+            return
+        detail_id = 0
+
+        for shipment_id in range(1, self.sizes['shipments'] + 1):
+            customer_id = rng.randint(1, self.sizes['customers'])
+            details = []
+            for _ in range(rng.randint(1, 3) * 3):
+                lot_id = rng.choice(self.finished_lots)
+                if lot_id not in details and self.lot_stock[lot_id].get(lib, 0) >= 1:
+                    details.append(lot_id)
+                if len(details) == 3:
+                    break
+            if not details:
+                continue
+
+            day = self.outflow_date(*details)
+            number = f'ENV-{shipment_id:07d}'
+            self.add(Shipment, {
+                'id': shipment_id,
+                'customer_id': customer_id,
+                'shipment_date': day,
+                'shipment_number': number,
+                'notes': None,
+                'created_at': self.random_datetime(day),
+            })
+            for lot_id in details:
+                quantity = float(max(1, int(self.lot_stock[lot_id][lib] * rng.uniform(0.05, 0.3))))
+                detail_id += 1
+                self.add(ShipmentDetail, {
+                    'id': detail_id,
+                    'shipment_id': shipment_id,
+                    'lot_id': lot_id,
+                    'quantity': quantity,
+                    'unit': 'ud',
+                })
+                self.move(lot_id, MovementType.SHIPMENT, -quantity, day, from_location=lib,
+                          reference_id=shipment_id, reference_type='shipment',
+                          notes=f'Envío {number} a cliente Cliente {customer_id}')
+                self.shipped.append((customer_id, lot_id, quantity, day))
+
+    def create_returns(self):
+        rng = self.rng
+        dev = self.locations['DEV']
+        if not self.shipped:
+            return
+
+        for return_id in range(1, self.sizes['returns'] + 1):
+            customer_id, lot_id, shipped, shipped_on = rng.choice(self.shipped)
+            day = self.random_date(start=shipped_on)
+            number = f'DEV-{return_id:07d}'
+            quantity = float(max(1, int(shipped * rng.uniform(0.1, 0.5))))
+            self.add(Return, {
+                'id': return_id,
+                'customer_id': customer_id,
+                'return_date': day,
+                'return_number': number,
+                'reason': rng.choice(RETURN_REASONS),
+                'notes': None,
+                'created_at': self.random_datetime(day),
+            })
+            self.add(ReturnDetail, {
+                'id': return_id,
+                'return_id': return_id,
+                'lot_id': lot_id,
+                'quantity': quantity,
+                'unit': 'ud',
+            })
+            self.move(lot_id, MovementType.RETURN, quantity, day, to_location=dev,
+                      reference_id=return_id, reference_type='return',
+                      notes=f'Devolución {number} de Cliente {customer_id}')
+
+    def create_filler_movements(self):
+        """Inventory adjustments and location transfers up to the target movement count"""
+        rng = self.rng
+        lib, nc = self.locations['LIB'], self.locations['NC']
+        lot_ids = list(self.lot_stock)
+
+        while self.movement_id < self.sizes['movements']:
+            lot_id = rng.choice(lot_ids)
+            stock = self.lot_stock[lot_id]
+            in_lib = stock.get(lib, 0)
+            day = self.random_date(start=self.lot_received[lot_id])
+
+            if rng.random() < 0.6:
+                # Cycle count adjustment in LIB, never below zero
+                delta = round(in_lib * rng.uniform(-0.02, 0.02), 3) or 1.0
+                if delta < 0:
+                    self.move(lot_id, MovementType.ADJUSTMENT, delta, self.outflow_date(lot_id), from_location=lib,
+                              notes='Ajuste de inventario')
+                else:
+                    self.move(lot_id, MovementType.ADJUSTMENT, delta, day, to_location=lib,
+                              notes='Ajuste de inventario')
+            elif in_lib > 1:
+                quantity = round(in_lib * rng.uniform(0.01, 0.1), 3)
+                self.move(lot_id, MovementType.TRANSFER, quantity, day, from_location=lib, to_location=nc,
+                          notes='Transferencia de Liberado a No Conforme')
+            elif stock.get(nc, 0) > 0:
+                self.move(lot_id, MovementType.TRANSFER, stock[nc], day, from_location=nc, to_location=lib,
+                          notes='Transferencia de No Conforme a Liberado')
+            else:
+                self.move(lot_id, MovementType.ADJUSTMENT, 1.0, day, to_location=lib,
+                          notes='Ajuste de inventario')
+
+    def write_stock(self):
+        """Write final lot quantities and the location breakdown"""
+        lot_table = Lot.__table__
+        updates = [{'lot_id': lot_id, 'quantity': quantity} for lot_id, quantity in self.lot_quantity.items()]
+        statement = lot_table.update().where(lot_table.c.id == db.bindparam('lot_id')).values(
+            current_quantity=db.bindparam('quantity'))
+        for i in range(0, len(updates), CHUNK_SIZE):
+            db.session.execute(statement, updates[i:i + CHUNK_SIZE])
+
+        lot_location_id = 0
+        for lot_id, stock in self.lot_stock.items():
+            for location_id, quantity in stock.items():
+                if quantity > 0 or location_id == self.locations['LIB']:
+                    lot_location_id += 1
+                    self.add(LotLocation, {'id': lot_location_id, 'lot_id': lot_id,
+                                           'location_id': location_id, 'quantity': quantity})
+
+
+def verify_dataset(tolerance=1e-6):
+    """Check the stock invariants with aggregate queries. Returns the number of inconsistent lots.
+
+    Besides the totals, the balance of each lot replayed in movement date
+    order must never go negative.
+    """
+    balance = func.sum(StockMovement.quantity).over(
+        partition_by=StockMovement.lot_id, order_by=(StockMovement.movement_date, StockMovement.id))
+    history = db.session.query(
+        StockMovement.lot_id, balance.label('balance')
+    ).filter(StockMovement.movement_type != MovementType.TRANSFER).subquery()
+    negative = db.session.query(history.c.lot_id).filter(history.c.balance < -tolerance).distinct()
+    movements = db.session.query(
+        StockMovement.lot_id, func.sum(StockMovement.quantity).label('quantity')
+    ).filter(StockMovement.movement_type != MovementType.TRANSFER).group_by(StockMovement.lot_id).subquery()
+    locations = db.session.query(
+        LotLocation.lot_id, func.sum(LotLocation.quantity).label('quantity')
+    ).group_by(LotLocation.lot_id).subquery()
+
+    return db.session.query(func.count(Lot.id)).outerjoin(
+        movements, movements.c.lot_id == Lot.id
+    ).outerjoin(
+        locations, locations.c.lot_id == Lot.id
+    ).filter(db.or_(
+        func.abs(Lot.current_quantity - func.coalesce(movements.c.quantity, 0)) > tolerance,
+        func.abs(Lot.current_quantity - func.coalesce(locations.c.quantity, 0)) > tolerance,
+        Lot.id.in_(negative)
+    )).scalar()
+
+
+def tune_sqlite_for_bulk_load():
+    """Trade durability for speed while loading (SQLite only)"""
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(db.text('PRAGMA synchronous = OFF'))
+        db.session.execute(db.text('PRAGMA cache_size = -200000'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Genera un conjunto de datos sintético a escala')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Escala predefinida')
+    for name in SCALES['small']:
+        parser.add_argument(f'--{name}', type=int, help=f'Número de {name} (sobrescribe la escala)')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla para datos reproducibles')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help='Fecha de referencia YYYY-MM-DD (por defecto, hoy)')
+    parser.add_argument('--reset', action='store_true', help='Borrar todas las tablas antes de generar')
+    parser.add_argument('--config', default='development', help='Configuración de la aplicación')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = dict(SCALES[args.scale])
+    sizes.update({name: getattr(args, name) for name in sizes if getattr(args, name) is not None})
+
+    from app import create_app
+    app = create_app(args.config)
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+
+        if Product.query.first() is not None:
+            print("Error: la base de datos no está vacía. Use --reset para regenerarla.")
+            return 1
+
+        print(f"Generating dataset (seed={args.seed}, today={args.today.isoformat()}): "
+              + ', '.join(f'{k}={v}' for k, v in sizes.items()))
+        started = time.time()
+        tune_sqlite_for_bulk_load()
+        try:
+            counts = DatasetGenerator(args.seed, args.today, **sizes).generate()
+        except DatasetError as e:
+            db.session.rollback()
+            print(f"Error: {e}")
+            return 1
+
+        print(f"✓ Dataset generated in {time.time() - started:.1f}s")
+        for table_name, count in sorted(counts.items()):
+            print(f"  - {table_name}: {count}")
+
+        inconsistent = verify_dataset()
+        if inconsistent:
+            print(f"✗ {inconsistent} lots break the stock invariants")
+            return 1
+        print("✓ Stock invariants verified")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
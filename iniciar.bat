@@ -6,4 +6,5 @@ echo Presione Ctrl+C para detener el servidor
 echo.
 
 call venv\Scripts\activate.bat
+python build_assets.py
 python app.py
@@ -6,4 +6,5 @@ echo "Presione Ctrl+C para detener el servidor"
 echo ""
 
 source venv/bin/activate
+python build_assets.py
 python app.py
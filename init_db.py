@@ -6,6 +6,8 @@ Creates tables and optionally populates with sample data
 from app import create_app
 from models import (db, Product, ProductType, Lot, Customer, ProductionOrder, 
                     ProductionOrderStatus, ProductionOrderMaterial)
+from migrations.runner import MigrationRunner, schema_version
+from migrations.steps import MIGRATIONS
 from datetime import date, timedelta
 import sys
 
@@ -112,11 +114,16 @@ def main():
         if len(sys.argv) > 1 and sys.argv[1] == '--reset':
             print("¡ADVERTENCIA! Eliminando todas las tablas existentes...")
             db.drop_all()
+            schema_version.drop(db.engine, checkfirst=True)
         
         # Create all tables
         db.create_all()
         print("✓ Tablas creadas correctamente")
         
+        # Record the schema version and create the default locations
+        MigrationRunner(db.engine, MIGRATIONS, log=lambda message: None).upgrade()
+        print("✓ Esquema al día (migraciones registradas)")
+        
         # Ask if user wants sample data
         if len(sys.argv) > 1 and sys.argv[1] == '--sample':
             create_sample_data()
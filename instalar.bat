@@ -22,6 +22,7 @@ pip install -r requirements.txt
 
 echo [3/3] Inicializando base de datos con datos de ejemplo...
 python init_db.py --sample
+python build_assets.py
 
 echo.
 echo ========================================
@@ -0,0 +1,13 @@
+"""
+Versioned schema migrations
+
+Each step has a version number and is recorded in the schema_version table
+once applied, so it runs only once per database. Steps are idempotent (they
+inspect the schema before changing it) and data backfills run set-based in
+id ranges, committing every batch to keep write locks short.
+
+Usage:
+    python -m migrations status
+    python -m migrations upgrade --dry-run
+    python -m migrations upgrade --batch-size 5000
+"""
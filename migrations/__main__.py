@@ -0,0 +1,61 @@
+"""
+Command line entry point: python -m migrations {status,upgrade}
+"""
+import argparse
+import sys
+
+from migrations.runner import DEFAULT_BATCH_SIZE, MigrationRunner
+from migrations.steps import MIGRATIONS
+
+
+def command_status(runner, args):
+    for migration, applied in runner.status():
+        print(f"[{migration.version:04d}] {'✓' if applied else ' '} {migration.name}")
+    pending = len(runner.pending())
+    print(f'{pending} migraciones pendientes' if pending else '✓ Esquema al día')
+    return 0
+
+
+def command_upgrade(runner, args):
+    if args.dry_run:
+        plan = runner.dry_run()
+        if not plan:
+            print('✓ Esquema al día')
+        for migration, estimates in plan:
+            print(f'[{migration.version:04d}] {migration.name}')
+            if not estimates:
+                print('       sin cambios (solo se registrará la versión)')
+            for description, rows in estimates:
+                print(f'       {description}: ' + ('sin reescritura de filas' if rows is None else f'~{rows} filas'))
+        return 0
+
+    applied = runner.upgrade()
+    print(f'✓ {len(applied)} migraciones aplicadas' if applied else '✓ Esquema al día')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m migrations', description='Migraciones del esquema')
+    parser.add_argument('--config', default='default', help='Configuración de la aplicación')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('status', help='Migraciones aplicadas y pendientes')
+
+    upgrade = subparsers.add_parser('upgrade', help='Aplicar las migraciones pendientes')
+    upgrade.add_argument('--dry-run', action='store_true', help='Mostrar los cambios y filas estimadas sin aplicarlos')
+    upgrade.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                         help='Filas por transacción en los rellenos de datos')
+
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    app = create_app(args.config)
+    with app.app_context():
+        from models import db
+        runner = MigrationRunner(db.engine, MIGRATIONS, batch_size=getattr(args, 'batch_size', DEFAULT_BATCH_SIZE))
+        commands = {'status': command_status, 'upgrade': command_upgrade}
+        return commands[args.command](runner, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
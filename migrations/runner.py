@@ -0,0 +1,135 @@
+"""
+Migration runner: schema_version bookkeeping, batching and dry-run estimates
+"""
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+
+DEFAULT_BATCH_SIZE = 5000
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+class Migration:
+    """A versioned schema step
+
+    `apply(ctx)` makes the change and must be safe to run on a database that
+    already has it. `estimate(ctx)` returns a list of (description, rows)
+    with the rows the step would touch; rows is None for metadata-only
+    changes. An empty list means there is nothing to do.
+    """
+
+    def __init__(self, version, name, apply, estimate):
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.estimate = estimate
+
+
+class MigrationContext:
+    """Database access shared by the migration steps"""
+
+    def __init__(self, engine, batch_size=DEFAULT_BATCH_SIZE, log=print):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.log = log
+
+    @property
+    def dialect(self):
+        return self.engine.dialect.name
+
+    def has_table(self, table):
+        return inspect(self.engine).has_table(table)
+
+    def columns(self, table):
+        """Current columns of a table by name (empty if the table does not exist)"""
+        if not self.has_table(table):
+            return {}
+        return {column['name']: column for column in inspect(self.engine).get_columns(table)}
+
+    def indexes(self, table):
+        return {index['name'] for index in inspect(self.engine).get_indexes(table)}
+
+    def execute(self, sql, **params):
+        with self.engine.begin() as conn:
+            return conn.execute(text(sql), params).rowcount
+
+    def fetch_all(self, sql, **params):
+        with self.engine.connect() as conn:
+            return conn.execute(text(sql), params).all()
+
+    def scalar(self, sql, **params):
+        with self.engine.connect() as conn:
+            return conn.execute(text(sql), params).scalar()
+
+    def id_ranges(self, table):
+        """Half-open id ranges [start, end) of batch_size covering the table"""
+        with self.engine.connect() as conn:
+            low, high = conn.execute(text(f'SELECT MIN(id), MAX(id) FROM {table}')).one()
+        if low is None:
+            return
+        for start in range(low, high + 1, self.batch_size):
+            yield start, start + self.batch_size
+
+    def execute_in_batches(self, table, sql, **params):
+        """Run a set-based statement over id ranges of `table`, one transaction per batch
+
+        The statement receives :start and :end and must restrict itself to
+        rows with start <= id < end. Returns the total rowcount.
+        """
+        total = 0
+        for start, end in self.id_ranges(table):
+            with self.engine.begin() as conn:
+                total += conn.execute(text(sql), dict(params, start=start, end=end)).rowcount
+        return total
+
+
+class MigrationRunner:
+    """Applies pending migrations in version order"""
+
+    def __init__(self, engine, migrations, batch_size=DEFAULT_BATCH_SIZE, log=print):
+        self.engine = engine
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.context = MigrationContext(engine, batch_size=batch_size, log=log)
+        self.log = log
+
+    def applied_versions(self):
+        if not inspect(self.engine).has_table(schema_version.name):
+            return set()
+        with self.engine.connect() as conn:
+            return set(conn.execute(schema_version.select().with_only_columns(schema_version.c.version)).scalars())
+
+    def pending(self):
+        applied = self.applied_versions()
+        return [migration for migration in self.migrations if migration.version not in applied]
+
+    def status(self):
+        """List of (migration, applied) in version order"""
+        applied = self.applied_versions()
+        return [(migration, migration.version in applied) for migration in self.migrations]
+
+    def dry_run(self):
+        """Estimates for every pending migration, without changing the database"""
+        return [(migration, migration.estimate(self.context)) for migration in self.pending()]
+
+    def upgrade(self):
+        """Apply pending migrations, recording each one as it completes"""
+        schema_version.create(self.engine, checkfirst=True)
+        applied = []
+        for migration in self.pending():
+            started = time.time()
+            self.log(f'[{migration.version:04d}] {migration.name}...')
+            migration.apply(self.context)
+            with self.engine.begin() as conn:
+                conn.execute(schema_version.insert().values(
+                    version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                ))
+            self.log(f'       ✓ {time.time() - started:.1f}s')
+            applied.append(migration)
+        return applied
@@ -0,0 +1,337 @@
+"""
+Schema history of the application, replacing the old migrate_*.py scripts
+
+Versions are permanent: never renumber or edit an applied step, add a new
+one at the end of MIGRATIONS instead.
+"""
+from sqlalchemy.schema import CreateTable
+
+from models import db, POSTGRESQL_INDEXES
+from migrations.runner import Migration
+from seed_demo import LOCATIONS
+from utils.search import SEARCH_KINDS, backfill_statement, fts5_trigram_supported, search_index_ddl
+
+
+def count_rows(ctx, table, where='1 = 1', **params):
+    return ctx.scalar(f'SELECT COUNT(*) FROM {table} WHERE {where}', **params)
+
+
+# --- New tables ---
+
+def missing_tables(ctx):
+    return [table for table in db.metadata.sorted_tables if not ctx.has_table(table.name)]
+
+
+def create_missing_tables(ctx):
+    # Only creates what is missing; existing tables are never altered here
+    db.metadata.create_all(ctx.engine, tables=missing_tables(ctx))
+
+
+def estimate_missing_tables(ctx):
+    return [(f'crear tabla {table.name}', None) for table in missing_tables(ctx)]
+
+
+# --- Columns ---
+
+def add_columns(table, columns):
+    """Step adding the columns [(name, SQL type and constraints)] that are missing"""
+    def missing(ctx):
+        # A missing table is created complete by the first migration
+        existing = ctx.columns(table)
+        return [(name, ddl) for name, ddl in columns if existing and name not in existing]
+
+    def apply(ctx):
+        for name, ddl in missing(ctx):
+            ctx.execute(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}')
+
+    def estimate(ctx):
+        # Adding a column with a constant default does not rewrite existing rows
+        return [(f'{table}: añadir columna {name}', None) for name, _ in missing(ctx)]
+
+    return apply, estimate
+
+
+def make_nullable(table, columns):
+    """Step dropping NOT NULL from columns
+
+    SQLite cannot alter a column, so the table is rebuilt from its current
+    model definition in a single transaction (rows are copied by column name).
+    """
+    def not_null(ctx):
+        existing = ctx.columns(table)
+        return [name for name in columns if name in existing and not existing[name]['nullable']]
+
+    def apply(ctx):
+        names = not_null(ctx)
+        if not names:
+            return
+        if ctx.dialect == 'sqlite':
+            rebuild_sqlite_table(ctx, table)
+        else:
+            for name in names:
+                ctx.execute(f'ALTER TABLE {table} ALTER COLUMN {name} DROP NOT NULL')
+
+    def estimate(ctx):
+        names = not_null(ctx)
+        if not names:
+            return []
+        rows = count_rows(ctx, table) if ctx.dialect == 'sqlite' else None
+        return [(f'{table}: permitir nulos en {", ".join(names)}', rows)]
+
+    return apply, estimate
+
+
+def rebuild_sqlite_table(ctx, table):
+    model_table = db.metadata.tables[table]
+    existing = ctx.columns(table)
+    copied = ', '.join(column.name for column in model_table.columns if column.name in existing)
+    temporary = f'{table}_rebuild'
+    create = str(CreateTable(model_table).compile(dialect=ctx.engine.dialect)).replace(
+        f'CREATE TABLE {table} ', f'CREATE TABLE {temporary} ', 1)
+
+    with ctx.engine.begin() as conn:
+        # Triggers (search index) are dropped with the table and recreated afterwards
+        triggers = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)).scalars().all()
+        conn.exec_driver_sql(create)
+        conn.exec_driver_sql(f'INSERT INTO {temporary} ({copied}) SELECT {copied} FROM {table}')
+        conn.exec_driver_sql(f'DROP TABLE {table}')
+        conn.exec_driver_sql(f'ALTER TABLE {temporary} RENAME TO {table}')
+        for index in model_table.indexes:
+            index.create(conn)
+        for trigger in triggers:
+            conn.exec_driver_sql(trigger)
+
+
+# --- Reference data and backfills ---
+
+def missing_locations(ctx):
+    if not ctx.has_table('locations'):
+        return list(LOCATIONS)
+    existing = {code for code, in ctx.fetch_all('SELECT code FROM locations')}
+    return [location for location in LOCATIONS if location[0] not in existing]
+
+
+def create_default_locations(ctx):
+    for code, name, is_available in missing_locations(ctx):
+        ctx.execute('INSERT INTO locations (code, name, is_available, active) '
+                    'VALUES (:code, :name, :is_available, :active)',
+                    code=code, name=name, is_available=is_available, active=True)
+
+
+def estimate_default_locations(ctx):
+    return [(f'locations: crear {code}', 1) for code, _, _ in missing_locations(ctx)]
+
+
+# Lots with stock but no location rows get it all in LIB (NC if blocked)
+LOTS_WITHOUT_LOCATION = (
+    'lots.current_quantity > 0 '
+    'AND NOT EXISTS (SELECT 1 FROM lot_locations WHERE lot_locations.lot_id = lots.id)'
+)
+
+
+def backfill_lot_locations(ctx):
+    location_ids = dict(ctx.fetch_all("SELECT code, id FROM locations WHERE code IN ('LIB', 'NC')"))
+    rows = ctx.execute_in_batches('lots', f"""
+        INSERT INTO lot_locations (lot_id, location_id, quantity)
+        SELECT lots.id, CASE WHEN lots.blocked THEN :nc ELSE :lib END, lots.current_quantity
+        FROM lots
+        WHERE lots.id >= :start AND lots.id < :end AND {LOTS_WITHOUT_LOCATION}
+    """, lib=location_ids['LIB'], nc=location_ids.get('NC', location_ids['LIB']))
+    ctx.log(f'       {rows} lotes asignados a ubicaciones')
+
+
+def estimate_lot_locations(ctx):
+    # In a dry run the table may not exist yet: every lot with stock would be backfilled
+    rows = count_rows(ctx, 'lots', LOTS_WITHOUT_LOCATION if ctx.has_table('lot_locations')
+                      else 'lots.current_quantity > 0')
+    return [('lot_locations: stock de lotes sin ubicación', rows)] if rows else []
+
+
+# Orders created before multi-product support keep their product in the legacy columns
+LEGACY_ORDERS = (
+    'production_orders.finished_product_id IS NOT NULL '
+    'AND production_orders.finished_lot_number IS NOT NULL'
+)
+NOT_MIGRATED = (
+    'NOT EXISTS (SELECT 1 FROM production_order_finished_products fp '
+    'WHERE fp.production_order_id = production_orders.id)'
+)
+
+
+def backfill_finished_products(ctx):
+    rows = ctx.execute_in_batches('production_orders', f"""
+        INSERT INTO production_order_finished_products (
+            production_order_id, finished_product_id, lot_number, target_quantity,
+            produced_quantity, unit, expiration_date, lot_id, created_at
+        )
+        SELECT production_orders.id, production_orders.finished_product_id,
+               production_orders.finished_lot_number, production_orders.target_quantity,
+               production_orders.produced_quantity, COALESCE(production_orders.unit, 'ud'),
+               production_orders.expiration_date,
+               (SELECT MIN(lots.id) FROM lots
+                WHERE lots.product_id = production_orders.finished_product_id
+                  AND lots.lot_number = production_orders.finished_lot_number),
+               CURRENT_TIMESTAMP
+        FROM production_orders
+        WHERE production_orders.id >= :start AND production_orders.id < :end
+          AND {LEGACY_ORDERS} AND {NOT_MIGRATED}
+    """)
+    ctx.log(f'       {rows} órdenes migradas')
+
+
+def estimate_finished_products(ctx):
+    where = LEGACY_ORDERS
+    if ctx.has_table('production_order_finished_products'):
+        where += f' AND {NOT_MIGRATED}'
+    rows = count_rows(ctx, 'production_orders', where)
+    return [('production_order_finished_products: órdenes antiguas', rows)] if rows else []
+
+
+# --- Indexes ---
+
+def missing_indexes(ctx):
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not ctx.has_table(table.name):
+            continue  # Created with its indexes by the first migration
+        existing = ctx.indexes(table.name)
+        # Indexes on columns a later migration adds are built by that migration
+        columns = ctx.columns(table.name)
+        missing.extend(index for index in table.indexes
+                       if index.name not in existing and all(column.name in columns for column in index.columns))
+    return missing
+
+
+def create_indexes(ctx):
+    with ctx.engine.begin() as conn:
+        for index in missing_indexes(ctx):
+            index.create(conn)
+        if ctx.dialect == 'postgresql':
+            for statement in POSTGRESQL_INDEXES:
+                conn.exec_driver_sql(statement)
+
+
+def estimate_indexes(ctx):
+    # Building an index reads the whole table
+    estimates = [(f'{index.table.name}: crear índice {index.name}', count_rows(ctx, index.table.name))
+                 for index in missing_indexes(ctx)]
+    if ctx.dialect == 'postgresql':
+        estimates.append(('índices trigrama y FEFO de PostgreSQL (IF NOT EXISTS)', None))
+    return estimates
+
+
+# --- Search index ---
+
+def search_index_applies(ctx):
+    return ctx.dialect == 'sqlite' and fts5_trigram_supported()
+
+
+def create_search_index(ctx):
+    if not search_index_applies(ctx):
+        return  # PostgreSQL searches use the trigram indexes of migration 10
+    with ctx.engine.begin() as conn:
+        for statement in search_index_ddl():
+            conn.exec_driver_sql(statement)
+    for kind, (_, table, _, _, _) in SEARCH_KINDS.items():
+        rows = ctx.execute_in_batches(table, backfill_statement(kind))
+        ctx.log(f'       {rows} filas de {table} indexadas')
+
+
+def estimate_search_index(ctx):
+    if not search_index_applies(ctx):
+        return []
+    indexed = ctx.has_table('search_index')
+    estimates = []
+    for kind, (offset, table, _, _, _) in SEARCH_KINDS.items():
+        where = f'NOT EXISTS (SELECT 1 FROM search_index WHERE rowid = {table}.id * 4 + {offset})' if indexed else '1 = 1'
+        rows = count_rows(ctx, table, where)
+        if rows:
+            estimates.append((f'search_index: indexar {table}', rows))
+    return estimates
+
+
+# --- Delta sync ---
+
+# table -> expression for the updated_at of existing rows
+SYNC_TABLES = {
+    'products': 'created_at',
+    'customers': 'created_at',
+    'lots': 'created_at',
+    'lot_locations': 'CURRENT_TIMESTAMP',
+    'stock_movements': 'movement_date',
+    'production_orders': 'COALESCE(closed_at, created_at)',
+    'production_order_materials': 'CURRENT_TIMESTAMP',
+}
+SYNC_COLUMN_STEPS = {table: add_columns(table, [('updated_at', 'TIMESTAMP')]) for table in SYNC_TABLES}
+
+
+def add_sync_columns(ctx):
+    for table, initial in SYNC_TABLES.items():
+        add_column, _ = SYNC_COLUMN_STEPS[table]
+        add_column(ctx)
+        rows = ctx.execute_in_batches(table, f'UPDATE {table} SET updated_at = COALESCE({initial}, CURRENT_TIMESTAMP) '
+                                             'WHERE updated_at IS NULL AND id >= :start AND id < :end')
+        ctx.log(f'       {rows} filas de {table} con updated_at')
+    create_indexes(ctx)
+
+
+def estimate_sync_columns(ctx):
+    estimates = []
+    for table in SYNC_TABLES:
+        _, estimate = SYNC_COLUMN_STEPS[table]
+        if estimate(ctx):
+            estimates.append((f'{table}: añadir y rellenar updated_at', count_rows(ctx, table)))
+    return estimates + estimate_indexes(ctx)
+
+
+# --- Expiry sweep ---
+
+def create_expiry_sweeps(ctx):
+    create_missing_tables(ctx)
+    create_indexes(ctx)  # lots.expiration_date
+
+
+def estimate_expiry_sweeps(ctx):
+    return estimate_missing_tables(ctx) + estimate_indexes(ctx)
+
+
+MIGRATIONS = [
+    Migration(1, 'Tablas nuevas (ubicaciones, devoluciones, productos acabados por orden)',
+              create_missing_tables, estimate_missing_tables),
+    Migration(2, 'Bloqueo de lotes', *add_columns('lots', [
+        ('blocked', 'BOOLEAN DEFAULT FALSE NOT NULL'),
+    ])),
+    Migration(3, 'Unidades de almacenamiento y consumo de productos', *add_columns('products', [
+        ('storage_unit', 'VARCHAR(20)'),
+        ('consumption_unit', 'VARCHAR(20)'),
+        ('density', 'FLOAT'),
+    ])),
+    Migration(4, 'Campos de cabecera en órdenes de producción', *add_columns('production_orders', [
+        ('base_product_name', 'VARCHAR(200)'),
+        ('base_lot_number', 'VARCHAR(100)'),
+        ('expiration_date', 'DATE'),
+    ])),
+    Migration(5, 'Campos heredados de órdenes de producción opcionales', *make_nullable('production_orders', [
+        'finished_product_id', 'finished_lot_number', 'target_quantity', 'unit',
+    ])),
+    Migration(6, 'Trazabilidad de materiales por producto acabado', *add_columns('production_order_materials', [
+        ('related_finished_product_id', 'INTEGER REFERENCES production_order_finished_products(id)'),
+    ])),
+    Migration(7, 'Ubicaciones predefinidas', create_default_locations, estimate_default_locations),
+    Migration(8, 'Stock de lotes por ubicación', backfill_lot_locations, estimate_lot_locations),
+    Migration(9, 'Órdenes antiguas con varios productos acabados', backfill_finished_products,
+              estimate_finished_products),
+    Migration(10, 'Índices de claves ajenas, búsqueda y FEFO', create_indexes, estimate_indexes),
+    Migration(11, 'Índice de búsqueda de lotes, productos, clientes y órdenes', create_search_index,
+              estimate_search_index),
+    Migration(12, 'Contadores de cambios por tabla (ETag)', create_missing_tables, estimate_missing_tables),
+    Migration(13, 'Cola de eventos en vivo (/api/events)', create_missing_tables, estimate_missing_tables),
+    Migration(14, 'Sincronización incremental (updated_at y borrados)', add_sync_columns, estimate_sync_columns),
+    Migration(15, 'Índices de ordenación de las tablas paginadas', create_indexes, estimate_indexes),
+    Migration(16, 'Instantáneas de stock (inventario a una fecha)', create_missing_tables, estimate_missing_tables),
+    Migration(17, 'Tareas programadas (historial de ejecuciones)', create_missing_tables, estimate_missing_tables),
+    Migration(18, 'Barrido de lotes caducados (índice de caducidad)', create_expiry_sweeps, estimate_expiry_sweeps),
+    Migration(19, 'Tablas de archivo (órdenes, lotes y movimientos antiguos)', create_missing_tables,
+              estimate_missing_tables),
+]
@@ -1,7 +1,10 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, date
 from enum import Enum as PyEnum
 
+from sqlalchemy import and_, false, or_
+
 db = SQLAlchemy()
 
 
@@ -65,6 +68,7 @@ class Product(db.Model):
     
     active = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     lots = db.relationship('Lot', back_populates='product', lazy='dynamic')
@@ -161,21 +165,24 @@ class Lot(db.Model):
     )
     
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
     lot_number = db.Column(db.String(100), nullable=False, index=True)
     manufacturing_date = db.Column(db.Date, nullable=False)
-    expiration_date = db.Column(db.Date, nullable=True)
+    expiration_date = db.Column(db.Date, nullable=True, index=True)
     initial_quantity = db.Column(db.Float, nullable=False)
     current_quantity = db.Column(db.Float, nullable=False)
     unit = db.Column(db.String(20), nullable=False)
     blocked = db.Column(db.Boolean, default=False, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     product = db.relationship('Product', back_populates='lots')
     movements = db.relationship('StockMovement', back_populates='lot', lazy='dynamic')
     production_materials = db.relationship('ProductionOrderMaterial', back_populates='lot')
     shipment_details = db.relationship('ShipmentDetail', back_populates='lot')
+    # Read-only view of the stock breakdown, used to eager load locations in list endpoints
+    lot_locations = db.relationship('LotLocation', viewonly=True)
     
     @property
     def status(self):
@@ -188,6 +195,21 @@ class Lot(db.Model):
             return LotStatus.EXPIRED
         return LotStatus.ACTIVE
     
+    @classmethod
+    def status_condition(cls, status):
+        """SQL condition for the lots whose `status` is `status` today, to filter before paging"""
+        today = date.today()
+        if status == LotStatus.BLOCKED.value:
+            return cls.blocked.is_(True)
+        if status == LotStatus.DEPLETED.value:
+            return and_(cls.blocked.is_(False), cls.current_quantity <= 0)
+        if status == LotStatus.EXPIRED.value:
+            return and_(cls.blocked.is_(False), cls.current_quantity > 0, cls.expiration_date < today)
+        if status == LotStatus.ACTIVE.value:
+            return and_(cls.blocked.is_(False), cls.current_quantity > 0,
+                        or_(cls.expiration_date.is_(None), cls.expiration_date >= today))
+        return false()
+    
     @property
     def is_available(self):
         """Check if lot is available for use (not expired and not depleted)"""
@@ -251,8 +273,9 @@ class ProductionOrder(db.Model):
     expiration_date = db.Column(db.Date, nullable=True)
     status = db.Column(db.Enum(ProductionOrderStatus), default=ProductionOrderStatus.DRAFT, nullable=False)
     notes = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     closed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     finished_product = db.relationship('Product', foreign_keys=[finished_product_id])
@@ -262,7 +285,8 @@ class ProductionOrder(db.Model):
     def __repr__(self):
         return f'<ProductionOrder {self.order_number} - {self.status.value}>'
     
-    def to_dict(self, include_materials=False, include_finished_products=False):
+    def to_dict(self, include_materials=False, include_finished_products=False, include_finished_product=True,
+                include_lot=True, include_product=True):
         result = {
             'id': self.id,
             'order_number': self.order_number,
@@ -282,12 +306,13 @@ class ProductionOrder(db.Model):
         }
         
         if include_materials:
-            result['materials'] = [m.to_dict() for m in self.materials]
+            result['materials'] = [m.to_dict(include_lot=include_lot, include_product=include_product)
+                                   for m in self.materials]
         
         if include_finished_products:
             result['finished_products'] = [fp.to_dict(include_product=True, include_lot=True) for fp in self.finished_products]
         
-        if self.finished_product:
+        if include_finished_product and self.finished_product:
             result['finished_product'] = self.finished_product.to_dict()
         
         return result
@@ -298,14 +323,14 @@ class ProductionOrderFinishedProduct(db.Model):
     __tablename__ = 'production_order_finished_products'
     
     id = db.Column(db.Integer, primary_key=True)
-    production_order_id = db.Column(db.Integer, db.ForeignKey('production_orders.id'), nullable=False)
+    production_order_id = db.Column(db.Integer, db.ForeignKey('production_orders.id'), nullable=False, index=True)
     finished_product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     lot_number = db.Column(db.String(100), nullable=False)
     target_quantity = db.Column(db.Float, nullable=True)
     produced_quantity = db.Column(db.Float, nullable=True)
     unit = db.Column(db.String(20), default='ud', nullable=False)
     expiration_date = db.Column(db.Date, nullable=True)
-    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=True)  # Set when order is closed
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=True, index=True)  # Set when order is closed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -346,8 +371,8 @@ class ProductionOrderMaterial(db.Model):
     )
     
     id = db.Column(db.Integer, primary_key=True)
-    production_order_id = db.Column(db.Integer, db.ForeignKey('production_orders.id'), nullable=False)
-    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False)
+    production_order_id = db.Column(db.Integer, db.ForeignKey('production_orders.id'), nullable=False, index=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False, index=True)
     quantity_consumed = db.Column(db.Float, nullable=False)
     unit = db.Column(db.String(20), nullable=False)
     
@@ -357,6 +382,7 @@ class ProductionOrderMaterial(db.Model):
     
     # Traceability: Link material to specific finished product (null = common/base)
     related_finished_product_id = db.Column(db.Integer, db.ForeignKey('production_order_finished_products.id'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     production_order = db.relationship('ProductionOrder', back_populates='materials')
@@ -366,7 +392,7 @@ class ProductionOrderMaterial(db.Model):
     def __repr__(self):
         return f'<Material {self.lot.lot_number if self.lot else "Unknown"} for Order {self.production_order.order_number if self.production_order else "Unknown"}>'
     
-    def to_dict(self):
+    def to_dict(self, include_lot=True, include_product=True):
         result = {
             'id': self.id,
             'production_order_id': self.production_order_id,
@@ -375,10 +401,12 @@ class ProductionOrderMaterial(db.Model):
             'unit': self.unit,
             'original_quantity': self.original_quantity,
             'original_unit': self.original_unit,
-            'lot': self.lot.to_dict(include_product=True) if self.lot else None,
             'related_finished_product_id': self.related_finished_product_id
         }
         
+        if include_lot:
+            result['lot'] = self.lot.to_dict(include_product=include_product) if self.lot else None
+        
         if self.related_finished_product:
             result['related_finished_product'] = {
                 'id': self.related_finished_product.id,
@@ -393,10 +421,10 @@ class StockMovement(db.Model):
     __tablename__ = 'stock_movements'
     
     id = db.Column(db.Integer, primary_key=True)
-    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False)
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False, index=True)
     movement_type = db.Column(db.Enum(MovementType), nullable=False)
     quantity = db.Column(db.Float, nullable=False)  # Positive for entries, negative for exits
-    movement_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    movement_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     reference_id = db.Column(db.Integer, nullable=True)
     reference_type = db.Column(db.String(50), nullable=True)
     notes = db.Column(db.Text, nullable=True)
@@ -404,6 +432,7 @@ class StockMovement(db.Model):
     # Location fields for transfers
     from_location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=True)
     to_location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     lot = db.relationship('Lot', back_populates='movements')
@@ -413,7 +442,7 @@ class StockMovement(db.Model):
     def __repr__(self):
         return f'<Movement {self.movement_type.value}: {self.quantity} {self.lot.unit if self.lot else ""}>'
     
-    def to_dict(self, include_lot=False):
+    def to_dict(self, include_lot=False, include_locations=True, include_product=True):
         result = {
             'id': self.id,
             'lot_id': self.lot_id,
@@ -424,13 +453,15 @@ class StockMovement(db.Model):
             'reference_type': self.reference_type,
             'notes': self.notes,
             'from_location_id': self.from_location_id,
-            'to_location_id': self.to_location_id,
-            'from_location': self.from_location.to_dict() if self.from_location else None,
-            'to_location': self.to_location.to_dict() if self.to_location else None
+            'to_location_id': self.to_location_id
         }
         
+        if include_locations:
+            result['from_location'] = self.from_location.to_dict() if self.from_location else None
+            result['to_location'] = self.to_location.to_dict() if self.to_location else None
+        
         if include_lot and self.lot:
-            result['lot'] = self.lot.to_dict(include_product=True)
+            result['lot'] = self.lot.to_dict(include_product=include_product)
         
         return result
 
@@ -446,6 +477,7 @@ class Customer(db.Model):
     address = db.Column(db.Text, nullable=True)
     active = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     shipments = db.relationship('Shipment', back_populates='customer', lazy='dynamic')
@@ -483,7 +515,7 @@ class Shipment(db.Model):
     def __repr__(self):
         return f'<Shipment {self.shipment_number} to {self.customer.name if self.customer else "Unknown"}>'
     
-    def to_dict(self, include_details=False):
+    def to_dict(self, include_details=False, include_customer=True, include_lot=True, include_product=True):
         result = {
             'id': self.id,
             'customer_id': self.customer_id,
@@ -493,11 +525,12 @@ class Shipment(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
         
-        if self.customer:
+        if include_customer and self.customer:
             result['customer'] = self.customer.to_dict()
         
         if include_details:
-            result['details'] = [d.to_dict() for d in self.details]
+            result['details'] = [d.to_dict(include_lot=include_lot, include_product=include_product)
+                                 for d in self.details]
         
         return result
 
@@ -509,8 +542,8 @@ class ShipmentDetail(db.Model):
     )
     
     id = db.Column(db.Integer, primary_key=True)
-    shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.id'), nullable=False)
-    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False)
+    shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.id'), nullable=False, index=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False, index=True)
     quantity = db.Column(db.Float, nullable=False)
     unit = db.Column(db.String(20), nullable=False)
     
@@ -521,15 +554,17 @@ class ShipmentDetail(db.Model):
     def __repr__(self):
         return f'<ShipmentDetail {self.quantity} {self.unit} of Lot {self.lot.lot_number if self.lot else "Unknown"}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_lot=True, include_product=True):
+        result = {
             'id': self.id,
             'shipment_id': self.shipment_id,
             'lot_id': self.lot_id,
             'quantity': self.quantity,
-            'unit': self.unit,
-            'lot': self.lot.to_dict(include_product=True) if self.lot else None
+            'unit': self.unit
         }
+        if include_lot:
+            result['lot'] = self.lot.to_dict(include_product=include_product) if self.lot else None
+        return result
 
 
 class Alert(db.Model):
@@ -539,7 +574,7 @@ class Alert(db.Model):
     alert_type = db.Column(db.Enum(AlertType), nullable=False)
     severity = db.Column(db.Enum(AlertSeverity), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=True)
-    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=True, index=True)
     message = db.Column(db.String(500), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False, nullable=False)
@@ -552,8 +587,8 @@ class Alert(db.Model):
     def __repr__(self):
         return f'<Alert {self.alert_type.value}: {self.severity.value}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_product=True, include_lot=True, include_lot_product=True):
+        result = {
             'id': self.id,
             'alert_type': self.alert_type.value,
             'severity': self.severity.value,
@@ -562,10 +597,13 @@ class Alert(db.Model):
             'message': self.message,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'is_read': self.is_read,
-            'is_dismissed': self.is_dismissed,
-            'product': self.product.to_dict() if self.product else None,
-            'lot': self.lot.to_dict(include_product=True) if self.lot else None
+            'is_dismissed': self.is_dismissed
         }
+        if include_product:
+            result['product'] = self.product.to_dict() if self.product else None
+        if include_lot:
+            result['lot'] = self.lot.to_dict(include_product=include_lot_product) if self.lot else None
+        return result
 
 
 class Return(db.Model):
@@ -587,7 +625,7 @@ class Return(db.Model):
     def __repr__(self):
         return f'<Return {self.return_number}>'
     
-    def to_dict(self, include_details=False):
+    def to_dict(self, include_details=False, include_customer=True, include_lot=True, include_product=True):
         result = {
             'id': self.id,
             'customer_id': self.customer_id,
@@ -598,11 +636,12 @@ class Return(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
         
-        if self.customer:
+        if include_customer and self.customer:
             result['customer'] = self.customer.to_dict()
         
         if include_details:
-            result['details'] = [d.to_dict() for d in self.details]
+            result['details'] = [d.to_dict(include_lot=include_lot, include_product=include_product)
+                                 for d in self.details]
         
         return result
 
@@ -615,8 +654,8 @@ class ReturnDetail(db.Model):
     )
     
     id = db.Column(db.Integer, primary_key=True)
-    return_id = db.Column(db.Integer, db.ForeignKey('returns.id'), nullable=False)
-    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False)
+    return_id = db.Column(db.Integer, db.ForeignKey('returns.id'), nullable=False, index=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False, index=True)
     quantity = db.Column(db.Float, nullable=False)
     unit = db.Column(db.String(20), nullable=False)
     
@@ -627,15 +666,17 @@ class ReturnDetail(db.Model):
     def __repr__(self):
         return f'<ReturnDetail {self.quantity} {self.unit} of Lot {self.lot.lot_number if self.lot else "Unknown"}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_lot=True, include_product=True):
+        result = {
             'id': self.id,
             'return_id': self.return_id,
             'lot_id': self.lot_id,
             'quantity': self.quantity,
-            'unit': self.unit,
-            'lot': self.lot.to_dict(include_product=True) if self.lot else None
+            'unit': self.unit
         }
+        if include_lot:
+            result['lot'] = self.lot.to_dict(include_product=include_product) if self.lot else None
+        return result
 
 
 class Location(db.Model):
@@ -673,8 +714,9 @@ class LotLocation(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False)
-    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=False)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=False, index=True)
     quantity = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     lot = db.relationship('Lot')
@@ -693,3 +735,254 @@ class LotLocation(db.Model):
         if include_location and self.location:
             result['location'] = self.location.to_dict()
         return result
+
+
+class StockSnapshot(db.Model):
+    """Saldos de todos los lotes por ubicación en un instante, punto de partida del stock a una fecha"""
+    __tablename__ = 'stock_snapshots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cutoff = db.Column(db.DateTime, unique=True, nullable=False)  # Includes movements dated before it
+    last_movement_id = db.Column(db.Integer, nullable=False, default=0)  # ... and recorded up to this one
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    balances = db.relationship('StockSnapshotBalance', back_populates='snapshot', cascade='all, delete-orphan',
+                               lazy='dynamic')
+
+    def __repr__(self):
+        return f'<StockSnapshot {self.cutoff.isoformat()}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'cutoff': self.cutoff.isoformat(),
+            'last_movement_id': self.last_movement_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class StockSnapshotBalance(db.Model):
+    """Stock de un lote en una ubicación según una instantánea"""
+    __tablename__ = 'stock_snapshot_balances'
+    __table_args__ = (
+        db.Index('ix_stock_snapshot_balances_snapshot_lot', 'snapshot_id', 'lot_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('stock_snapshots.id', ondelete='CASCADE'), nullable=False)
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id', ondelete='CASCADE'), nullable=False, index=True)
+    # NULL: movements recorded without a location (manual lot entries and adjustments)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=True)
+    quantity = db.Column(db.Float, nullable=False)
+
+    snapshot = db.relationship('StockSnapshot', back_populates='balances')
+
+    def __repr__(self):
+        return f'<StockSnapshotBalance lot {self.lot_id} @ {self.location_id}: {self.quantity}>'
+
+
+class ExpirySweep(db.Model):
+    """Paso a No Conforme del stock en Liberado de los lotes caducados antes de una fecha"""
+    __tablename__ = 'expiry_sweeps'
+
+    id = db.Column(db.Integer, primary_key=True)
+    swept_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expired_from = db.Column(db.Date, nullable=True)  # NULL: every lot expired before expired_before
+    expired_before = db.Column(db.Date, nullable=False, index=True)
+    lots = db.Column(db.Integer, nullable=False, default=0)
+
+    swept_lots = db.relationship('ExpirySweepLot', back_populates='sweep', cascade='all, delete-orphan',
+                                 lazy='dynamic')
+
+    def __repr__(self):
+        return f'<ExpirySweep {self.expired_before.isoformat()}: {self.lots} lotes>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'swept_at': self.swept_at.isoformat() if self.swept_at else None,
+            'expired_from': self.expired_from.isoformat() if self.expired_from else None,
+            'expired_before': self.expired_before.isoformat(),
+            'lots': self.lots,
+        }
+
+
+class ExpirySweepLot(db.Model):
+    """Lote pasado a No Conforme por un barrido de caducados, con la cantidad trasladada"""
+    __tablename__ = 'expiry_sweep_lots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sweep_id = db.Column(db.Integer, db.ForeignKey('expiry_sweeps.id', ondelete='CASCADE'), nullable=False,
+                         index=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id', ondelete='CASCADE'), nullable=False, index=True)
+    quantity = db.Column(db.Float, nullable=False)
+
+    sweep = db.relationship('ExpirySweep', back_populates='swept_lots')
+
+    def __repr__(self):
+        return f'<ExpirySweepLot lot {self.lot_id}: {self.quantity}>'
+
+
+class TableVersion(db.Model):
+    """Contador de cambios de una tabla, incrementado en cada commit que la modifica"""
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TableVersion {self.table_name}: {self.version}>'
+
+
+class EventOutbox(db.Model):
+    """Evento publicado en el mismo commit que el cambio, leído por los streams /api/events de cada worker"""
+    __tablename__ = 'event_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # stock, alerts, orders
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<EventOutbox {self.id}: {self.channel}>'
+
+
+class SyncTombstone(db.Model):
+    """Fila borrada de una colección sincronizable, para que las réplicas la eliminen"""
+    __tablename__ = 'sync_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(100), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<SyncTombstone {self.table_name}#{self.row_id}>'
+
+
+class JobRun(db.Model):
+    """Ejecución de una tarea programada: cuándo, cuánto tardó y con qué resultado"""
+    __tablename__ = 'job_runs'
+    __table_args__ = (
+        db.Index('ix_job_runs_job_started', 'job', 'started_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(100), nullable=False)
+    trigger = db.Column(db.String(20), nullable=False)  # schedule, manual
+    status = db.Column(db.String(20), nullable=False, index=True)  # queued, running, success, error
+    worker = db.Column(db.String(200), nullable=True)  # host:pid that ran it
+    queued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<JobRun {self.job}#{self.id}: {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job': self.job,
+            'trigger': self.trigger,
+            'status': self.status,
+            'worker': self.worker,
+            'queued_at': self.queued_at.isoformat() if self.queued_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+        }
+
+
+class SchedulerLock(db.Model):
+    """Concesión que convierte a un worker en el único que ejecuta las tareas programadas"""
+    __tablename__ = 'scheduler_locks'
+
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(200), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SchedulerLock {self.name}: {self.owner}>'
+
+    def to_dict(self):
+        return {
+            'owner': self.owner,
+            'expires_at': self.expires_at.isoformat(),
+            'active': self.expires_at > datetime.utcnow(),
+        }
+
+
+class ArchiveRun(db.Model):
+    """Paso de registros antiguos a las tablas de archivo; su fecha límite dice hasta dónde llega el archivo"""
+    __tablename__ = 'archive_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    cutoff = db.Column(db.DateTime, nullable=False, index=True)  # Everything archived is older
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    lots = db.Column(db.Integer, nullable=False, default=0)
+    movements = db.Column(db.Integer, nullable=False, default=0)
+    shipments = db.Column(db.Integer, nullable=False, default=0)
+    returns = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ArchiveRun {self.cutoff.isoformat()}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'cutoff': self.cutoff.isoformat(),
+            'orders': self.orders,
+            'lots': self.lots,
+            'movements': self.movements,
+            'shipments': self.shipments,
+            'returns': self.returns,
+        }
+
+
+# Cold copies of the rows moved out of the hot tables by utils/archive.py:
+# same columns and ids, no constraints, indexed on the columns traceability looks up
+ARCHIVE_LOOKUP_COLUMNS = {'lot_id', 'lot_number', 'production_order_id', 'shipment_id', 'return_id', 'customer_id'}
+
+
+def _archive_table(model):
+    table = model.__table__
+    return db.Table(f'archive_{table.name}', db.metadata, *[
+        db.Column(column.name, column.type.copy(), primary_key=column.primary_key, nullable=column.nullable,
+                  index=column.name in ARCHIVE_LOOKUP_COLUMNS)
+        for column in table.columns
+    ])
+
+
+ARCHIVE_TABLES = {model: _archive_table(model) for model in (
+    Lot, StockMovement, ProductionOrder, ProductionOrderFinishedProduct, ProductionOrderMaterial,
+    Shipment, ShipmentDetail, Return, ReturnDetail,
+)}
+
+
+# PostgreSQL-only indexes, created together with the tables:
+# - trigram GIN indexes for the ILIKE '%...%' searches on codes, names and lot numbers
+# - expiry-ordered B-tree indexes for the FEFO listings (ORDER BY expiration_date NULLS LAST)
+POSTGRESQL_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_products_code_trgm ON products USING gin (code gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_customers_code_trgm ON customers USING gin (code gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_customers_name_trgm ON customers USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_lots_lot_number_trgm ON lots USING gin (lot_number gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_lots_fefo ON lots (expiration_date ASC NULLS LAST, created_at)',
+    'CREATE INDEX IF NOT EXISTS ix_lots_product_fefo ON lots (product_id, expiration_date ASC NULLS LAST)',
+    'CREATE INDEX IF NOT EXISTS ix_lots_in_stock_fefo ON lots (expiration_date ASC NULLS LAST) '
+    'WHERE current_quantity > 0',
+]
+
+for statement in POSTGRESQL_INDEXES:
+    db.event.listen(db.metadata, 'after_create', db.DDL(statement).execute_if(dialect='postgresql'))
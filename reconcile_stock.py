@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Check (and optionally correct) the stock quantities of every lot
+
+Compares Lot.current_quantity with the sum of its locations and of its
+movements, and counts the rows left behind by deleted lots. With --fix
+records the ADJUSTMENT movements that make the ledger agree with the stock
+and deletes those rows. See utils/reconciliation.py.
+
+Usage:
+    python reconcile_stock.py
+    python reconcile_stock.py --fix
+"""
+import argparse
+import sys
+import time
+
+from app import create_app
+from models import db
+from utils.reconciliation import check, fix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Concilia el stock de los lotes con sus ubicaciones y movimientos')
+    parser.add_argument('--fix', action='store_true',
+                        help='Registrar ajustes para que los movimientos cuadren con el stock')
+    parser.add_argument('--limit', type=int, default=50, help='Lotes con diferencias a mostrar')
+    parser.add_argument('--config', default='development', help='Configuración de la aplicación')
+    return parser.parse_args(argv)
+
+
+def print_report(report):
+    print(f'{report["lots"]} lotes revisados')
+    print(f'  - movimientos que no suman el stock: {report["movement_mismatches"]}')
+    print(f'  - ubicaciones que no suman el stock: {report["location_mismatches"]}')
+    print(f'  - ubicaciones de lotes borrados: {report["orphan_lot_locations"]}')
+    print(f'  - movimientos de lotes borrados: {report["orphan_movements"]}')
+    for item in report['discrepancies']:
+        print(f'{item["product_code"]} {item["lot_number"]} (#{item["lot_id"]}): stock {item["current_quantity"]:g}, '
+              f'movimientos {item["movements_quantity"]:g}, ubicaciones {item["locations_quantity"]:g}')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_app(args.config)
+    with app.app_context():
+        started = time.perf_counter()
+        report = check(args.limit)
+        print_report(report)
+        print(f'Revisión en {time.perf_counter() - started:.1f} s')
+
+        if args.fix:
+            started = time.perf_counter()
+            adjustments, orphans = fix()
+            db.session.commit()
+            print(f'\n{adjustments} ajuste(s) registrados y {orphans} ubicación(es) de lotes borrados eliminadas '
+                  f'en {time.perf_counter() - started:.1f} s')
+            print_report(check(args.limit))
+
+        clean = not (report['movement_mismatches'] or report['location_mismatches']
+                     or report['orphan_lot_locations'] or report['orphan_movements'])
+    return 0 if clean else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
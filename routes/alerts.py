@@ -1,13 +1,15 @@
 from flask import Blueprint, request, jsonify
-from models import (db, Alert, AlertType, AlertSeverity, Product, Lot)
-from datetime import date, timedelta
-from sqlalchemy import func
-from config import Config
+from models import (db, Alert, AlertType, AlertSeverity, Lot)
+from sqlalchemy.orm import joinedload
+from utils.alerts import generate_alerts as build_alerts
+from utils.fieldsets import Fieldset
+from utils.versions import conditional
 
 bp = Blueprint('alerts', __name__, url_prefix='/api/alerts')
 
 
 @bp.route('', methods=['GET'])
+@conditional('alerts', 'lots', 'products')
 def get_alerts():
     """Get all alerts with optional filters"""
     alert_type = request.args.get('alert_type')
@@ -15,7 +17,15 @@ def get_alerts():
     is_read = request.args.get('is_read')
     is_dismissed = request.args.get('is_dismissed')
     
-    query = Alert.query
+    try:
+        fieldset = Fieldset.from_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = Alert.query.options(
+        joinedload(Alert.product),
+        joinedload(Alert.lot).joinedload(Lot.product)
+    )
     
     # Filter by type
     if alert_type:
@@ -42,7 +52,11 @@ def get_alerts():
         query = query.filter_by(is_dismissed=is_dismissed_bool)
     
     alerts = query.order_by(Alert.created_at.desc()).all()
-    return jsonify([a.to_dict() for a in alerts])
+    return fieldset.response([a.to_dict(
+        include_product=fieldset.inline('product'),
+        include_lot=fieldset.inline('lot'),
+        include_lot_product=fieldset.inline('product', nested=True),
+    ) for a in alerts])
 
 
 @bp.route('/count', methods=['GET'])
@@ -72,102 +86,12 @@ def dismiss_alert(alert_id):
 
 @bp.route('/generate', methods=['POST'])
 def generate_alerts():
-    """Generate alerts based on current inventory and stock levels"""
+    """Generate alerts based on current inventory and stock levels
+
+    The scheduler runs the same generation periodically (job 'alerts').
+    """
     try:
-        # Clear old alerts (optional: keep history by not deleting)
-        Alert.query.delete()
-        
-        alerts_created = 0
-        
-        # 1. Check for expired lots
-        expired_lots = Lot.query.filter(
-            Lot.expiration_date < date.today(),
-            Lot.current_quantity > 0
-        ).all()
-        
-        for lot in expired_lots:
-            alert = Alert(
-                alert_type=AlertType.EXPIRED,
-                severity=AlertSeverity.CRITICAL,
-                product_id=lot.product_id,
-                lot_id=lot.id,
-                message=f'Lote {lot.lot_number} de {lot.product.name} ha caducado ({lot.expiration_date.isoformat()})'
-            )
-            db.session.add(alert)
-            alerts_created += 1
-        
-        # 2. Check for expiring soon (within EXPIRING_SOON_DAYS)
-        expiring_soon_date = date.today() + timedelta(days=Config.EXPIRING_SOON_DAYS)
-        expiring_lots = Lot.query.filter(
-            Lot.expiration_date.isnot(None),
-            Lot.expiration_date >= date.today(),
-            Lot.expiration_date <= expiring_soon_date,
-            Lot.current_quantity > 0
-        ).all()
-        
-        for lot in expiring_lots:
-            days_remaining = (lot.expiration_date - date.today()).days
-            severity = AlertSeverity.WARNING if days_remaining > 7 else AlertSeverity.CRITICAL
-            
-            alert = Alert(
-                alert_type=AlertType.EXPIRING_SOON,
-                severity=severity,
-                product_id=lot.product_id,
-                lot_id=lot.id,
-                message=f'Lote {lot.lot_number} de {lot.product.name} caduca en {days_remaining} días ({lot.expiration_date.isoformat()})'
-            )
-            db.session.add(alert)
-            alerts_created += 1
-        
-        # 3. Check for low stock (products with min_stock defined)
-        products_with_min_stock = Product.query.filter(
-            Product.min_stock.isnot(None),
-            Product.active == True
-        ).all()
-        
-        for product in products_with_min_stock:
-            # Calculate total available stock (excluding expired lots)
-            total_stock = 0
-            lots = Lot.query.filter_by(product_id=product.id).all()
-            for lot in lots:
-                if lot.is_available:  # Only count available lots
-                    total_stock += lot.current_quantity
-            
-            if total_stock < product.min_stock:
-                # Determine severity
-                if total_stock == 0:
-                    severity = AlertSeverity.CRITICAL
-                elif total_stock < product.min_stock * 0.5:
-                    severity = AlertSeverity.CRITICAL
-                else:
-                    severity = AlertSeverity.WARNING
-                
-                alert = Alert(
-                    alert_type=AlertType.LOW_STOCK,
-                    severity=severity,
-                    product_id=product.id,
-                    message=f'Stock bajo de {product.name}: {total_stock} (mínimo: {product.min_stock})'
-                )
-                db.session.add(alert)
-                alerts_created += 1
-        
-        # 4. Check for blocked lots (returns, quality issues, etc.)
-        blocked_lots = Lot.query.filter(
-            Lot.blocked == True,
-            Lot.current_quantity > 0
-        ).all()
-        
-        for lot in blocked_lots:
-            alert = Alert(
-                alert_type=AlertType.BLOCKED,
-                severity=AlertSeverity.CRITICAL,
-                product_id=lot.product_id,
-                lot_id=lot.id,
-                message=f'Lote {lot.lot_number} de {lot.product.name} está bloqueado ({lot.current_quantity} {lot.unit})'
-            )
-            db.session.add(alert)
-            alerts_created += 1
-        
+        alerts_created = build_alerts()
         db.session.commit()
         
         return jsonify({
@@ -0,0 +1,19 @@
+from flask import Blueprint, request, jsonify
+from models import ArchiveRun
+from utils.archive import table_sizes
+
+bp = Blueprint('archive', __name__, url_prefix='/api/archive')
+
+DEFAULT_LIMIT = 10
+
+
+@bp.route('', methods=['GET'])
+def get_archive():
+    """Rows in the hot and archive tables, and the latest archive runs (up to ?limit=, 10 by default)"""
+    limit = min(max(1, request.args.get('limit', DEFAULT_LIMIT, type=int)), 1000)
+    runs = ArchiveRun.query.order_by(ArchiveRun.id.desc()).limit(limit).all()
+    return jsonify({
+        'horizon': runs[0].cutoff.isoformat() if runs else None,
+        'tables': table_sizes(),
+        'runs': [run.to_dict() for run in runs],
+    })
@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify
 from models import db, Customer
-from sqlalchemy import or_
+from utils.search import search_condition
+from utils.versions import conditional
 
 bp = Blueprint('customers', __name__, url_prefix='/api/customers')
 
 
 @bp.route('', methods=['GET'])
+@conditional('customers')
 def get_customers():
     """Get all customers with optional search"""
     search = request.args.get('search')
@@ -14,17 +16,14 @@ def get_customers():
     
     # Search by code or name
     if search:
-        search_filter = or_(
-            Customer.code.ilike(f'%{search}%'),
-            Customer.name.ilike(f'%{search}%')
-        )
-        query = query.filter(search_filter)
+        query = query.filter(search_condition('customer', Customer.id, [Customer.code, Customer.name], search))
     
     customers = query.order_by(Customer.name).all()
     return jsonify([c.to_dict() for c in customers])
 
 
 @bp.route('/<int:customer_id>', methods=['GET'])
+@conditional('customers')
 def get_customer(customer_id):
     """Get a single customer by ID"""
     customer = Customer.query.get_or_404(customer_id)
@@ -0,0 +1,75 @@
+import queue
+import time
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from models import db
+from utils.events import format_event, replay
+
+bp = Blueprint('events', __name__, url_prefix='/api/events')
+
+# Reconnection delay suggested to EventSource after a stream ends
+RETRY_MS = 3000
+# Delay suggested when the worker already has EVENTS_MAX_STREAMS streams open
+BUSY_RETRY_SECONDS = 30
+
+
+@bp.route('', methods=['GET'])
+def stream_events():
+    """Server-sent events with stock, alert and production order changes
+
+    Streams end after EVENTS_STREAM_SECONDS and EventSource reconnects with
+    Last-Event-ID, so no event is lost and no worker thread is held forever.
+    A worker serves at most EVENTS_MAX_STREAMS streams, so the rest of its
+    threads stay free for API requests; beyond that it answers 503 with the
+    delay to retry after.
+    """
+    bus = current_app.extensions.get('events')
+    if bus is None:
+        return jsonify({'error': 'Eventos desactivados'}), 404
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID inválido'}), 400
+    
+    duration = current_app.config.get('EVENTS_STREAM_SECONDS', 300)
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+    
+    subscriber = bus.subscribe(limit=current_app.config.get('EVENTS_MAX_STREAMS'))
+    if subscriber is None:
+        response = Response(f'retry: {BUSY_RETRY_SECONDS * 1000}\n\n', status=503, mimetype='text/event-stream')
+        response.headers['Retry-After'] = str(BUSY_RETRY_SECONDS)
+        return response
+
+    def generate():
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            
+            # Events committed while the client was reconnecting
+            replayed = set()
+            if last_event_id is not None:
+                for row in replay(last_event_id):
+                    replayed.add(row.id)
+                    yield format_event(row)
+            # Do not hold a database connection while waiting
+            db.session.remove()
+            
+            deadline = time.monotonic() + duration
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    row = subscriber.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    yield ': ping\n\n'  # Keeps proxies and the ngrok tunnel from closing the connection
+                    continue
+                if row.id not in replayed:
+                    yield format_event(row)
+        finally:
+            bus.unsubscribe(subscriber)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # Frees the slot even if the client leaves before the stream starts
+    response.call_on_close(lambda: bus.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,190 @@
+import re
+from datetime import datetime, timedelta
+
+from flask import Blueprint, abort, request, jsonify
+from models import (Customer, Location, Lot, LotLocation, MovementType, Product, ProductionOrder,
+                    ProductionOrderFinishedProduct, ProductionOrderMaterial, Shipment, ShipmentDetail, StockMovement)
+from sqlalchemy import func, literal, null, select, union
+from sqlalchemy.orm import aliased
+from utils.archive import ArchiveReader, unified
+from utils.exports import export_format, export_response
+from utils.lots import FEFO_ORDER, filter_lots
+from utils.search import search_condition
+from utils.snapshots import EPSILON
+
+bp = Blueprint('exports', __name__, url_prefix='/api/exports')
+
+
+def _date_arg(name, label):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Formato de fecha {label} inválido')
+
+
+@bp.route('/inventory', methods=['GET'])
+def export_inventory():
+    """Lots with stock, one row per location holding it (?format=csv|xlsx)
+
+    Takes the lot filters of /api/inventory (available lots by default) and
+    location_id= to export one location.
+    """
+    location_id = request.args.get('location_id', type=int)
+    try:
+        file_format = export_format()
+        statement = filter_lots(
+            select(Product.code, Product.name, Product.type, Lot.lot_number, Lot.manufacturing_date,
+                   Lot.expiration_date, Lot.blocked, Lot.current_quantity, Location.code, Location.name,
+                   LotLocation.quantity, Lot.unit)
+            .select_from(Lot).join(Lot.product)
+            .outerjoin(LotLocation, (LotLocation.lot_id == Lot.id) & (func.abs(LotLocation.quantity) > EPSILON))
+            .outerjoin(Location, Location.id == LotLocation.location_id)
+            .where(Lot.current_quantity > 0),
+            available_only_default='true'
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if location_id:
+        statement = statement.where(LotLocation.location_id == location_id)
+    statement = statement.order_by(Product.code, *FEFO_ORDER, Lot.id, Location.code)
+
+    headers = ['Código', 'Producto', 'Tipo', 'Lote', 'Fabricación', 'Caducidad', 'Bloqueado', 'Stock lote',
+               'Ubicación', 'Nombre ubicación', 'Cantidad', 'Unidad']
+    return export_response('inventario', 'Inventario', headers, statement, file_format)
+
+
+@bp.route('/movements', methods=['GET'])
+def export_movements():
+    """Movement ledger in date order (?format=csv|xlsx)
+
+    Filters: product_id, lot_number, type and date_from/date_to (YYYY-MM-DD).
+    """
+    product_id = request.args.get('product_id', type=int)
+    lot_number = request.args.get('lot_number')
+    movement_type = request.args.get('type')
+    try:
+        file_format = export_format()
+        date_from = _date_arg('date_from', 'desde')
+        date_to = _date_arg('date_to', 'hasta')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if movement_type:
+        try:
+            movement_type = MovementType(movement_type)
+        except ValueError:
+            return jsonify({'error': 'Tipo de movimiento inválido'}), 400
+
+    from_location, to_location = aliased(Location), aliased(Location)
+    statement = (
+        select(StockMovement.movement_date, StockMovement.movement_type, Product.code, Product.name,
+               Lot.lot_number, StockMovement.quantity, Lot.unit, from_location.code, to_location.code,
+               StockMovement.reference_type, StockMovement.reference_id, StockMovement.notes)
+        .select_from(StockMovement).join(Lot, Lot.id == StockMovement.lot_id).join(Lot.product)
+        .outerjoin(from_location, from_location.id == StockMovement.from_location_id)
+        .outerjoin(to_location, to_location.id == StockMovement.to_location_id)
+    )
+    if product_id:
+        statement = statement.where(Lot.product_id == product_id)
+    if lot_number:
+        statement = statement.where(search_condition('lot', Lot.id, [Lot.lot_number], lot_number))
+    if movement_type:
+        statement = statement.where(StockMovement.movement_type == movement_type)
+    if date_from:
+        statement = statement.where(StockMovement.movement_date >= date_from)
+    if date_to:
+        statement = statement.where(StockMovement.movement_date < date_to + timedelta(days=1))
+    statement = statement.order_by(StockMovement.movement_date, StockMovement.id)
+
+    headers = ['Fecha', 'Tipo', 'Código', 'Producto', 'Lote', 'Cantidad', 'Unidad', 'Desde', 'Hacia',
+               'Referencia', 'Id referencia', 'Notas']
+    return export_response('movimientos', 'Movimientos', headers, statement, file_format)
+
+
+@bp.route('/shipments', methods=['GET'])
+def export_shipments():
+    """Shipped lots, one row per shipment line, by customer and date (?format=csv|xlsx)
+
+    Filters: customer_id, product_id and date_from/date_to (YYYY-MM-DD).
+    """
+    customer_id = request.args.get('customer_id', type=int)
+    product_id = request.args.get('product_id', type=int)
+    try:
+        file_format = export_format()
+        date_from = _date_arg('date_from', 'desde')
+        date_to = _date_arg('date_to', 'hasta')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    statement = (
+        select(Customer.code, Customer.name, Shipment.shipment_date, Shipment.shipment_number, Product.code,
+               Product.name, Lot.lot_number, Lot.expiration_date, ShipmentDetail.quantity, ShipmentDetail.unit)
+        .select_from(ShipmentDetail).join(ShipmentDetail.shipment).join(Shipment.customer)
+        .join(Lot, Lot.id == ShipmentDetail.lot_id).join(Lot.product)
+    )
+    if customer_id:
+        statement = statement.where(Shipment.customer_id == customer_id)
+    if product_id:
+        statement = statement.where(Lot.product_id == product_id)
+    if date_from:
+        statement = statement.where(Shipment.shipment_date >= date_from)
+    if date_to:
+        statement = statement.where(Shipment.shipment_date <= date_to)
+    statement = statement.order_by(Customer.code, Shipment.shipment_date, Shipment.id, ShipmentDetail.id)
+
+    headers = ['Código cliente', 'Cliente', 'Fecha', 'Envío', 'Código', 'Producto', 'Lote', 'Caducidad',
+               'Cantidad', 'Unidad']
+    return export_response('envios', 'Envíos', headers, statement, file_format)
+
+
+@bp.route('/recall/<int:lot_id>', methods=['GET'])
+def export_recall(lot_id):
+    """Everything to recall with a lot (?format=csv|xlsx)
+
+    The lot and the finished lots produced with it, each with the customers
+    that received it (one row per shipment line, or one row without
+    shipment for lots not shipped), archived records included.
+    """
+    try:
+        file_format = export_format()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    reader = ArchiveReader()
+    lot = reader.get(Lot, lot_id)
+    if lot is None:
+        abort(404)
+    archived = reader.may_be_archived(lot)
+
+    lots, orders, finished, materials, details, shipments = (
+        unified(model, archived) for model in (Lot, ProductionOrder, ProductionOrderFinishedProduct,
+                                               ProductionOrderMaterial, ShipmentDetail, Shipment)
+    )
+    # The lot itself and the finished lots of the orders that used it (the shared materials
+    # go into every finished product of the order, the others into theirs)
+    affected = union(
+        select(literal(lot_id).label('lot_id'), null().label('order_number')),
+        select(finished.c.lot_id, orders.c.order_number)
+        .join(orders, orders.c.id == finished.c.production_order_id)
+        .join(materials, materials.c.production_order_id == finished.c.production_order_id)
+        .where(materials.c.lot_id == lot_id, finished.c.lot_id.isnot(None),
+               materials.c.related_finished_product_id.is_(None)
+               | (materials.c.related_finished_product_id == finished.c.id)),
+    ).subquery('affected')
+    statement = (
+        select(literal(lot.lot_number), affected.c.order_number, Product.code, Product.name, lots.c.lot_number,
+               lots.c.expiration_date, shipments.c.shipment_date, shipments.c.shipment_number, Customer.code,
+               Customer.name, Customer.email, Customer.phone, details.c.quantity, details.c.unit)
+        .select_from(affected)
+        .join(lots, lots.c.id == affected.c.lot_id)
+        .join(Product, Product.id == lots.c.product_id)
+        .outerjoin(details, details.c.lot_id == lots.c.id)
+        .outerjoin(shipments, shipments.c.id == details.c.shipment_id)
+        .outerjoin(Customer, Customer.id == shipments.c.customer_id)
+        .order_by(lots.c.lot_number, shipments.c.shipment_date, details.c.id)
+    )
+
+    headers = ['Lote retirado', 'Orden', 'Código', 'Producto', 'Lote afectado', 'Caducidad', 'Fecha envío',
+               'Envío', 'Código cliente', 'Cliente', 'Email', 'Teléfono', 'Cantidad', 'Unidad']
+    return export_response('retirada-' + re.sub(r'[^\w.-]', '_', lot.lot_number), 'Retirada', headers, statement, file_format)
@@ -1,60 +1,139 @@
+from datetime import date
+
 from flask import Blueprint, request, jsonify
-from models import db, Lot, Product, LotLocation
-from sqlalchemy import func
+from models import db, Lot, Product, LotLocation, Location
+from sqlalchemy import and_, func
+from sqlalchemy.orm import contains_eager, joinedload
+from utils.fieldsets import Fieldset
+from utils.lots import FEFO_ORDER, LOT_SORT_KEYS, add_months, filter_lots
+from utils.pagination import Page
+from utils.snapshots import EPSILON, ledger_balances, parse_as_of
+from utils.versions import conditional
 
 bp = Blueprint('inventory', __name__, url_prefix='/api/inventory')
 
 
 @bp.route('', methods=['GET'])
+@conditional('lots', 'products', 'lot_locations', 'locations', 'stock_movements', 'stock_snapshots')
 def get_inventory():
-    """Get current inventory with filters"""
-    product_id = request.args.get('product_id', type=int)
-    lot_number = request.args.get('lot_number')
-    status = request.args.get('status')
-    available_only = request.args.get('available_only', 'true').lower() == 'true'  # Default: show only available
-    
-    query = Lot.query.filter(Lot.current_quantity > 0)
-    
-    # Filter by product
-    if product_id:
-        query = query.filter_by(product_id=product_id)
+    """Get current inventory with filters, sorting and paging
+
+    Besides the lot filters: below_min_stock=true (products under their
+    minimum), blocked=true and expiration=expired|soon (expired, or expiring
+    within three months). With as_of= the stock at that date instead.
+    """
+    if request.args.get('as_of'):
+        return get_inventory_as_of()
+
+    try:
+        fieldset = Fieldset.from_request()
+        page = Page.from_request(LOT_SORT_KEYS)
+        query = filter_lots(Lot.query.join(Lot.product).filter(Lot.current_quantity > 0), available_only_default='true')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Filter by lot number
-    if lot_number:
-        query = query.filter(Lot.lot_number.ilike(f'%{lot_number}%'))
+    # Total stock per product, computed once for all lots
+    stock_by_product = (
+        db.session.query(Lot.product_id, func.sum(Lot.current_quantity).label('total'))
+        .filter(Lot.current_quantity > 0)
+        .group_by(Lot.product_id)
+        .subquery()
+    )
+    query = query.outerjoin(stock_by_product, stock_by_product.c.product_id == Lot.product_id)
+    below_min_stock = and_(Product.min_stock.isnot(None), func.coalesce(stock_by_product.c.total, 0) < Product.min_stock)
     
-    lots = query.order_by(Lot.expiration_date.asc().nullslast()).all()
+    if request.args.get('below_min_stock', 'false').lower() == 'true':
+        query = query.filter(below_min_stock)
+    if request.args.get('blocked', 'false').lower() == 'true':
+        query = query.filter(Lot.blocked.is_(True))
     
-    # Filter by status (computed property)
-    if status:
-        lots = [lot for lot in lots if lot.status.value == status]
+    expiration = request.args.get('expiration')
+    if expiration:
+        today = date.today()
+        if expiration == 'expired':
+            query = query.filter(Lot.expiration_date < today)
+        elif expiration == 'soon':
+            query = query.filter(Lot.expiration_date >= today, Lot.expiration_date <= add_months(today, 3))
+        else:
+            return jsonify({'error': 'expiration debe ser expired o soon'}), 400
     
-    # Filter by availability
-    if available_only:
-        lots = [lot for lot in lots if lot.is_available]
+    query = query.options(
+        contains_eager(Lot.product),
+        joinedload(Lot.lot_locations).joinedload(LotLocation.location)
+    ).add_columns(below_min_stock)
+    rows = page.fetch(page.order(query, LOT_SORT_KEYS, FEFO_ORDER, Lot.id))
     
     # Build response with additional info
     inventory = []
-    for lot in lots:
-        lot_dict = lot.to_dict(include_product=True)
+    for lot, is_below_min_stock in rows:
+        lot_dict = lot.to_dict(include_product=fieldset.inline('product'))
         
         # Add location info
-        lot_locations = LotLocation.query.filter_by(lot_id=lot.id).all()
-        lot_dict['locations'] = [ll.to_dict() for ll in lot_locations]
+        if fieldset.needs('locations'):
+            lot_dict['locations'] = [ll.to_dict(include_location=fieldset.inline('location', nested=True))
+                                     for ll in lot.lot_locations]
         
         # Add stock status relative to min_stock
-        if lot.product and lot.product.min_stock is not None:
-            # Calculate total stock for this product
-            total_stock = db.session.query(func.sum(Lot.current_quantity)).filter(
-                Lot.product_id == lot.product_id,
-                Lot.current_quantity > 0
-            ).scalar() or 0
-            
-            lot_dict['is_below_min_stock'] = total_stock < lot.product.min_stock
-        else:
-            lot_dict['is_below_min_stock'] = False
+        lot_dict['is_below_min_stock'] = bool(is_below_min_stock)
         
         inventory.append(lot_dict)
     
-    return jsonify(inventory)
+    return fieldset.response(inventory, page)
+
+
+def get_inventory_as_of():
+    """Stock per lot and location at ?as_of=YYYY-MM-DD (end of day) or a date and time
+
+    Computed from the movement ledger starting at the nearest snapshot
+    (utils/snapshots.py). Each lot keeps its current fields and adds
+    'quantity' at that date and its 'locations'; location_id null holds
+    movements recorded without a location. location_id= keeps the stock in
+    one location. The lot filters apply (status ones to the current
+    status), and sort=quantity sorts by the stock at that date. Lots without
+    stock at that date are left out.
+    """
+    location_id = request.args.get('location_id', type=int)
+    try:
+        as_of = parse_as_of(request.args['as_of'])
+        fieldset = Fieldset.from_request()
+        balances = ledger_balances(as_of).subquery()
+        totals = db.session.query(balances.c.lot_id, func.sum(balances.c.quantity).label('quantity'))
+        if location_id:
+            totals = totals.filter(balances.c.location_id == location_id)
+        totals = totals.group_by(balances.c.lot_id).having(func.sum(balances.c.quantity) > EPSILON).subquery()
+        sort_keys = dict(LOT_SORT_KEYS, quantity=totals.c.quantity)
+        page = Page.from_request(sort_keys)
+        query = filter_lots(Lot.query.join(Lot.product).join(totals, totals.c.lot_id == Lot.id))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = query.options(contains_eager(Lot.product)).add_columns(totals.c.quantity)
+    rows = page.fetch(page.order(query, sort_keys, FEFO_ORDER, Lot.id))
+
+    # Breakdown of the lots of the page only
+    locations = {}
+    if rows and fieldset.needs('locations'):
+        breakdown = ledger_balances(as_of, lot_ids=[lot.id for lot, _ in rows]).subquery()
+        query = (
+            db.session.query(breakdown.c.lot_id, breakdown.c.quantity, Location)
+            .outerjoin(Location, Location.id == breakdown.c.location_id)
+            .order_by(breakdown.c.lot_id, Location.code)
+        )
+        if location_id:
+            query = query.filter(breakdown.c.location_id == location_id)
+        for lot_id, quantity, location in query:
+            entry = {'lot_id': lot_id, 'location_id': location.id if location else None, 'quantity': quantity}
+            if fieldset.inline('location', nested=True):
+                entry['location'] = location.to_dict() if location else None
+            locations.setdefault(lot_id, []).append(entry)
+
+    inventory = []
+    for lot, quantity in rows:
+        lot_dict = lot.to_dict(include_product=fieldset.inline('product'))
+        lot_dict['as_of'] = as_of.isoformat()
+        lot_dict['quantity'] = quantity
+        if fieldset.needs('locations'):
+            lot_dict['locations'] = locations.get(lot.id, [])
+        inventory.append(lot_dict)
 
+    return fieldset.response(inventory, page)
@@ -0,0 +1,58 @@
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import func
+from models import db, JobRun, SchedulerLock
+from utils.scheduler import LOCK_NAME
+
+bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+DEFAULT_LIMIT = 50
+
+
+def _scheduler():
+    return current_app.extensions['scheduler']
+
+
+@bp.route('', methods=['GET'])
+def get_jobs():
+    """Scheduled jobs with their last run and next scheduled time, and the current leader"""
+    scheduler = _scheduler()
+    latest = db.session.query(func.max(JobRun.id)).filter(JobRun.status != 'queued').group_by(JobRun.job)
+    last_runs = {run.job: run for run in JobRun.query.filter(JobRun.id.in_(latest))}
+    scheduled = dict(
+        db.session.query(JobRun.job, func.max(JobRun.queued_at))
+        .filter(JobRun.trigger == 'schedule').group_by(JobRun.job)
+    )
+    lock = db.session.get(SchedulerLock, LOCK_NAME)
+
+    jobs = []
+    for name, job in scheduler.jobs.items():
+        next_run = scheduler.next_run(job, scheduled.get(name))
+        jobs.append(dict(job.to_dict(),
+                         next_run=next_run.isoformat() if next_run else None,
+                         last_run=last_runs[name].to_dict() if name in last_runs else None))
+    return jsonify({
+        'enabled': current_app.config.get('SCHEDULER', True),
+        'leader': lock.to_dict() if lock else None,
+        'jobs': jobs,
+    })
+
+
+@bp.route('/runs', methods=['GET'])
+def get_job_runs():
+    """Run history, newest first (?job= to filter, up to ?limit=, 50 by default)"""
+    limit = min(max(1, request.args.get('limit', DEFAULT_LIMIT, type=int)), 1000)
+    query = JobRun.query
+    job = request.args.get('job')
+    if job:
+        query = query.filter_by(job=job)
+    runs = query.order_by(JobRun.id.desc()).limit(limit).all()
+    return jsonify([run.to_dict() for run in runs])
+
+
+@bp.route('/<name>/run', methods=['POST'])
+def run_job(name):
+    """Queue a run of a job for the scheduler leader"""
+    if name not in _scheduler().jobs:
+        return jsonify({'error': 'Tarea no encontrada'}), 404
+    run = _scheduler().trigger(name)
+    return jsonify(run.to_dict()), 202
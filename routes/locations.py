@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify
 from models import (db, Location, LotLocation, Lot, StockMovement, MovementType)
+from sqlalchemy.orm import contains_eager, joinedload
+from utils.database import lock_lots, stock_transaction
+from utils.versions import conditional
 
 bp = Blueprint('locations', __name__, url_prefix='/api/locations')
 
 
 @bp.route('', methods=['GET'])
+@conditional('locations')
 def get_locations():
     """Get all locations"""
     active_only = request.args.get('active_only', 'true').lower() == 'true'
@@ -18,6 +22,7 @@ def get_locations():
 
 
 @bp.route('/<int:location_id>', methods=['GET'])
+@conditional('locations')
 def get_location(location_id):
     """Get a single location"""
     location = Location.query.get_or_404(location_id)
@@ -51,6 +56,7 @@ def create_location():
 
 
 @bp.route('/transfer', methods=['POST'])
+@stock_transaction
 def transfer_stock():
     """Transfer stock between locations"""
     data = request.get_json()
@@ -61,6 +67,7 @@ def transfer_stock():
         if field not in data:
             return jsonify({'error': f'Campo requerido: {field}'}), 400
     
+    lock_lots([data['lot_id']])
     lot = Lot.query.get(data['lot_id'])
     if not lot:
         return jsonify({'error': 'Lote no encontrado'}), 404
@@ -74,7 +81,13 @@ def transfer_stock():
     if from_loc.id == to_loc.id:
         return jsonify({'error': 'Las ubicaciones origen y destino deben ser diferentes'}), 400
     
-    quantity = float(data['quantity'])
+    try:
+        quantity = float(data['quantity'])
+        expected = data.get('expected_quantity')
+        if expected is not None:
+            expected = float(expected)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Cantidad inválida'}), 400
     if quantity <= 0:
         return jsonify({'error': 'La cantidad debe ser mayor que cero'}), 400
     
@@ -90,6 +103,13 @@ def transfer_stock():
             'error': f'Stock insuficiente en ubicación origen. Disponible: {available}'
         }), 400
     
+    # Optimistic check: the origin stock changed since the transfer was prepared
+    # (another movement, or an offline transfer sent twice)
+    if expected is not None and abs(expected - from_lot_loc.quantity) > 1e-9:
+        return jsonify({
+            'error': f'El stock en {from_loc.name} ha cambiado: {from_lot_loc.quantity} {lot.unit} (esperado {expected})'
+        }), 409
+    
     try:
         # Decrease stock in origin
         from_lot_loc.quantity -= quantity
@@ -163,6 +183,8 @@ def get_available_stock():
     query = LotLocation.query.join(Lot).filter(
         LotLocation.location_id == lib_location.id,
         LotLocation.quantity > 0
+    ).options(
+        contains_eager(LotLocation.lot).joinedload(Lot.product)
     )
     
     if product_id:
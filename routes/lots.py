@@ -1,47 +1,30 @@
 from flask import Blueprint, request, jsonify
-from models import db, Lot, Product, StockMovement, MovementType
+from models import db, Lot, LotLocation, Product, StockMovement, MovementType
 from datetime import datetime
 from sqlalchemy import or_
+from sqlalchemy.orm import contains_eager
+from utils.database import lock_lots, stock_transaction
+from utils.fieldsets import Fieldset
+from utils.lots import FEFO_ORDER, LOT_SORT_KEYS, filter_lots
+from utils.pagination import Page
+from utils.versions import conditional
 
 bp = Blueprint('lots', __name__, url_prefix='/api/lots')
 
 
 @bp.route('', methods=['GET'])
+@conditional('lots', 'products')
 def get_lots():
-    """Get all lots with optional filters"""
-    product_id = request.args.get('product_id', type=int)
-    status = request.args.get('status')
-    lot_number = request.args.get('lot_number')
-    available_only = request.args.get('available_only', 'false').lower() == 'true'
-    
-    query = Lot.query
-    
-    # Filter by product
-    if product_id:
-        query = query.filter_by(product_id=product_id)
-    
-    # Filter by lot number
-    if lot_number:
-        query = query.filter(Lot.lot_number.ilike(f'%{lot_number}%'))
-    
-    # Combined FEFO/FIFO ordering:
-    # - FEFO (First Expired First Out) for lots WITH expiration dates (raw materials)
-    # - FIFO (First In First Out) for lots WITHOUT expiration dates (packaging)
-    # ORDER BY: expiration_date ASC (nulls last), then created_at ASC for FIFO on nulls
-    lots = query.order_by(
-        Lot.expiration_date.asc().nullslast(),
-        Lot.created_at.asc()  # FIFO: older lots first for items without expiration
-    ).all()
-    
-    # Filter by status (computed property, so we filter after query)
-    if status:
-        lots = [lot for lot in lots if lot.status.value == status]
-    
-    # Filter by availability
-    if available_only:
-        lots = [lot for lot in lots if lot.is_available]
+    """Get all lots with optional filters, sorting and paging"""
+    try:
+        fieldset = Fieldset.from_request()
+        page = Page.from_request(LOT_SORT_KEYS)
+        query = filter_lots(Lot.query.join(Lot.product).options(contains_eager(Lot.product)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify([lot.to_dict(include_product=True) for lot in lots])
+    lots = page.fetch(page.order(query, LOT_SORT_KEYS, FEFO_ORDER, Lot.id))
+    return fieldset.response([lot.to_dict(include_product=fieldset.inline('product')) for lot in lots], page)
 
 
 @bp.route('/<int:lot_id>', methods=['GET'])
@@ -52,6 +35,7 @@ def get_lot(lot_id):
 
 
 @bp.route('', methods=['POST'])
+@stock_transaction
 def create_lot():
     """Create a new lot and generate entry movement"""
     data = request.get_json()
@@ -172,8 +156,10 @@ def toggle_block(lot_id):
 
 
 @bp.route('/<int:lot_id>/adjust', methods=['POST'])
+@stock_transaction
 def adjust_lot(lot_id):
     """Adjust stock quantity for a lot"""
+    lock_lots([lot_id])
     lot = Lot.query.get_or_404(lot_id)
     
     data = request.get_json()
@@ -184,8 +170,18 @@ def adjust_lot(lot_id):
         real_quantity = float(data['real_quantity'])
         if real_quantity < 0:
             return jsonify({'error': 'La cantidad no puede ser negativa'}), 400
-    except ValueError:
+        expected = data.get('expected_quantity')
+        if expected is not None:
+            expected = float(expected)
+    except (TypeError, ValueError):
         return jsonify({'error': 'Cantidad inválida'}), 400
+    
+    # Optimistic check: the count was compared with a stock that has changed since
+    # (another movement, or an offline adjustment sent twice)
+    if expected is not None and abs(expected - lot.current_quantity) > 1e-9:
+        return jsonify({
+            'error': f'El stock del lote ha cambiado: {lot.current_quantity} {lot.unit} (esperado {expected})'
+        }), 409
         
     # Calculate difference
     diff = real_quantity - lot.current_quantity
@@ -211,6 +207,7 @@ def adjust_lot(lot_id):
 
 
 @bp.route('/<int:lot_id>', methods=['DELETE'])
+@stock_transaction
 def delete_lot(lot_id):
     """Delete a lot and its movements"""
     lot = Lot.query.get_or_404(lot_id)
@@ -221,9 +218,11 @@ def delete_lot(lot_id):
     if lot.shipment_details:
         return jsonify({'error': 'No se puede eliminar: el lote ha sido enviado a clientes'}), 400
     
-    # Delete associated movements first
+    # Delete associated movements and location stock first
     for movement in lot.movements:
         db.session.delete(movement)
+    for lot_location in LotLocation.query.filter_by(lot_id=lot.id):
+        db.session.delete(lot_location)
     
     db.session.delete(lot)
     db.session.commit()
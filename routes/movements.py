@@ -1,10 +1,55 @@
-from flask import Blueprint, jsonify
-from models import StockMovement
+from flask import Blueprint, request, jsonify
+from models import MovementType, Product, StockMovement, Lot
+from sqlalchemy.orm import contains_eager, joinedload
+from utils.fieldsets import Fieldset
+from utils.pagination import Page
+from utils.search import search_condition
+from utils.versions import conditional
 
 bp = Blueprint('movements', __name__, url_prefix='/api/movements')
 
+SORT_KEYS = {
+    'movement_date': StockMovement.movement_date,
+    'movement_type': StockMovement.movement_type,
+    'quantity': StockMovement.quantity,
+    'lot_number': Lot.lot_number,
+    'product': Product.name,
+}
+
+
 @bp.route('', methods=['GET'])
+@conditional('stock_movements', 'lots', 'products', 'locations')
 def get_movements():
-    """Get all stock movements sorted by date descending"""
-    movements = StockMovement.query.order_by(StockMovement.movement_date.desc()).all()
-    return jsonify([m.to_dict(include_lot=True) for m in movements])
+    """Get all stock movements sorted by date descending, with optional filters and paging"""
+    product_id = request.args.get('product_id', type=int)
+    lot_number = request.args.get('lot_number')
+    movement_type = request.args.get('type')
+    
+    try:
+        fieldset = Fieldset.from_request()
+        page = Page.from_request(SORT_KEYS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = StockMovement.query.join(StockMovement.lot).join(Lot.product).options(
+        contains_eager(StockMovement.lot).contains_eager(Lot.product),
+        joinedload(StockMovement.from_location),
+        joinedload(StockMovement.to_location)
+    )
+    
+    if product_id:
+        query = query.filter(Lot.product_id == product_id)
+    if lot_number:
+        query = query.filter(search_condition('lot', Lot.id, [Lot.lot_number], lot_number))
+    if movement_type:
+        try:
+            query = query.filter(StockMovement.movement_type == MovementType(movement_type))
+        except ValueError:
+            return jsonify({'error': 'Tipo de movimiento inválido'}), 400
+    
+    movements = page.fetch(page.order(query, SORT_KEYS, (StockMovement.movement_date.desc(),), StockMovement.id))
+    return fieldset.response([m.to_dict(
+        include_lot=fieldset.inline('lot'),
+        include_locations=fieldset.inline('from_location') or fieldset.inline('to_location'),
+        include_product=fieldset.inline('product', nested=True),
+    ) for m in movements], page)
@@ -3,6 +3,12 @@ from models import (db, ProductionOrder, ProductionOrderMaterial, ProductionOrde
                     ProductionOrderStatus, Lot, Product, ProductType, StockMovement, MovementType,
                     Location, LotLocation)
 from datetime import datetime
+from sqlalchemy.orm import joinedload, subqueryload
+from utils.database import lock_lots, stock_transaction
+from utils.fieldsets import Fieldset
+from utils.pagination import Page
+from utils.requirements import parse_plan, requirements
+from utils.search import search_condition
 
 bp = Blueprint('production_orders', __name__, url_prefix='/api/production-orders')
 
@@ -36,12 +42,52 @@ def get_next_order_number():
     return jsonify({'next_number': next_number})
 
 
+@bp.route('/requirements', methods=['POST'])
+def check_requirements():
+    """Materials needed by planned orders and the shortages against LIB stock
+
+    Body: {"production_date": "YYYY-MM-DD", "orders": [{"product_id", "quantity",
+    "recipe": [{"product_id", "quantity", "unit"}]}]}; recipe quantities are
+    per unit of finished product, and orders without recipe use the last
+    closed order of the product. See utils/requirements.py.
+    """
+    try:
+        production_date, plan = parse_plan(request.get_json(silent=True))
+        result = requirements(production_date, plan)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'production_date': production_date.isoformat(), **result})
+
+
+SORT_KEYS = {
+    'order_number': ProductionOrder.order_number,
+    'base_product_name': ProductionOrder.base_product_name,
+    'base_lot_number': ProductionOrder.base_lot_number,
+    'production_date': ProductionOrder.production_date,
+    'status': ProductionOrder.status,
+    'created_at': ProductionOrder.created_at,
+}
+
+
 @bp.route('', methods=['GET'])
 def get_production_orders():
-    """Get all production orders with optional filters"""
+    """Get all production orders with optional filters, sorting and paging"""
     status = request.args.get('status')
+    search = request.args.get('q')
     
-    query = ProductionOrder.query
+    try:
+        fieldset = Fieldset.from_request()
+        page = Page.from_request(SORT_KEYS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = ProductionOrder.query.options(
+        joinedload(ProductionOrder.finished_product),
+        subqueryload(ProductionOrder.materials).joinedload(ProductionOrderMaterial.lot).joinedload(Lot.product),
+        subqueryload(ProductionOrder.materials)
+        .joinedload(ProductionOrderMaterial.related_finished_product)
+        .joinedload(ProductionOrderFinishedProduct.finished_product)
+    )
     
     # Filter by status
     if status:
@@ -50,8 +96,19 @@ def get_production_orders():
         except ValueError:
             return jsonify({'error': 'Estado inválido'}), 400
     
-    orders = query.order_by(ProductionOrder.created_at.desc()).all()
-    return jsonify([o.to_dict(include_materials=True) for o in orders])
+    # Order number, base product or base lot
+    if search:
+        query = query.filter(search_condition('order', ProductionOrder.id, [
+            ProductionOrder.order_number, ProductionOrder.base_product_name, ProductionOrder.base_lot_number
+        ], search))
+    
+    orders = page.fetch(page.order(query, SORT_KEYS, (ProductionOrder.created_at.desc(),), ProductionOrder.id))
+    return fieldset.response([o.to_dict(
+        include_materials=fieldset.needs('materials'),
+        include_finished_product=fieldset.inline('finished_product'),
+        include_lot=fieldset.inline('lot', nested=True),
+        include_product=fieldset.inline('product', nested=True),
+    ) for o in orders], page)
 
 
 @bp.route('/<int:order_id>', methods=['GET'])
@@ -319,9 +376,11 @@ def remove_material(order_id, material_id):
 
 
 @bp.route('/<int:order_id>/close', methods=['POST'])
+@stock_transaction
 def close_production_order(order_id):
     """Close a production order: create finished product lots, consume materials, update stock"""
-    order = ProductionOrder.query.get_or_404(order_id)
+    # Row lock so the same order cannot be closed twice concurrently
+    order = ProductionOrder.query.filter_by(id=order_id).with_for_update().first_or_404()
     
     if order.status == ProductionOrderStatus.CLOSED:
         return jsonify({'error': 'La orden ya está cerrada'}), 400
@@ -329,6 +388,8 @@ def close_production_order(order_id):
     if not order.materials:
         return jsonify({'error': 'Debe agregar materiales antes de cerrar la orden'}), 400
     
+    lock_lots(material.lot_id for material in order.materials)
+    
     data = request.get_json()
     
     # Check if using new format (finished_products array) or old format
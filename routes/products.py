@@ -1,11 +1,14 @@
 from flask import Blueprint, request, jsonify
 from models import db, Product, ProductType
-from sqlalchemy import or_, func
+from sqlalchemy import func
+from utils.search import search_condition
+from utils.versions import conditional
 
 bp = Blueprint('products', __name__, url_prefix='/api/products')
 
 
 @bp.route('', methods=['GET'])
+@conditional('products', 'lots')
 def get_products():
     """Get all products with optional filters"""
     product_type = request.args.get('type')
@@ -23,36 +26,37 @@ def get_products():
     
     # Search by code or name
     if search:
-        search_filter = or_(
-            Product.code.ilike(f'%{search}%'),
-            Product.name.ilike(f'%{search}%')
-        )
-        query = query.filter(search_filter)
+        query = query.filter(search_condition('product', Product.id, [Product.code, Product.name], search))
     
     products = query.order_by(Product.name).all()
     result = [p.to_dict() for p in products]
     
     # Add alerts info if requested
     if with_alerts:
-        from models import Lot, AlertType
+        from models import Lot
+        
+        # Calculate current stock for all products in a single query
+        stock_by_product = dict(
+            db.session.query(Lot.product_id, func.sum(Lot.current_quantity))
+            .filter(Lot.current_quantity > 0)
+            .group_by(Lot.product_id)
+            .all()
+        )
+        
         for product_dict in result:
-            product = Product.query.get(product_dict['id'])
-            
-            # Calculate current stock
-            total_stock = db.session.query(func.sum(Lot.current_quantity)).filter(
-                Lot.product_id == product.id,
-                Lot.current_quantity > 0
-            ).scalar() or 0
+            total_stock = stock_by_product.get(product_dict['id']) or 0
+            min_stock = product_dict['min_stock']
             
             product_dict['current_stock'] = total_stock
             product_dict['has_low_stock_alert'] = (
-                product.min_stock is not None and total_stock < product.min_stock
+                min_stock is not None and total_stock < min_stock
             )
     
     return jsonify(result)
 
 
 @bp.route('/<int:product_id>', methods=['GET'])
+@conditional('products')
 def get_product(product_id):
     """Get a single product by ID"""
     product = Product.query.get_or_404(product_id)
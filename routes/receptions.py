@@ -1,15 +1,35 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from models import db, Lot, Product, ProductType, StockMovement, MovementType, Location, LotLocation
 from datetime import datetime
+from sqlalchemy import func, or_
+from sqlalchemy.orm import contains_eager, joinedload
 from utils.document_generator import process_reception_document
+from utils.database import stock_transaction
+from utils.pagination import Page
+from utils.search import search_condition
 
 bp = Blueprint('receptions', __name__, url_prefix='/api/receptions')
 
 
+SORT_KEYS = {
+    'created_at': Lot.created_at,
+    'manufacturing_date': Lot.manufacturing_date,
+    'lot_number': Lot.lot_number,
+    'product': Product.name,
+    'current_quantity': Lot.current_quantity,
+}
+
+
 @bp.route('', methods=['GET'])
 def get_receptions():
-    """Get all receptions (blocked lots of raw materials and packaging)"""
+    """Get all receptions (blocked lots of raw materials and packaging), newest first"""
     reception_type = request.args.get('type')
+    search = request.args.get('q')
+    
+    try:
+        page = Page.from_request(SORT_KEYS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Receptions are blocked lots of raw materials or packaging
     query = Lot.query.join(Product).filter(
@@ -23,34 +43,59 @@ def get_receptions():
         except ValueError:
             pass
     
-    lots = query.order_by(Lot.created_at.desc()).all()
+    # Lot number, product code or product name
+    if search:
+        query = query.filter(or_(
+            search_condition('lot', Lot.id, [Lot.lot_number], search),
+            search_condition('product', Product.id, [Product.code, Product.name], search),
+        ))
+    
+    lots = page.fetch(page.order(query.options(
+        contains_eager(Lot.product),
+        joinedload(Lot.lot_locations).joinedload(LotLocation.location)
+    ), SORT_KEYS, (Lot.created_at.desc(),), Lot.id))
+    
+    # Notes of the first entry movement of each reception lot, in a single query
+    # (only for the lots of the page when paging)
+    lot_ids = [lot.id for lot in lots] if page.paged else query.with_entities(Lot.id)
+    first_entries = db.session.query(func.min(StockMovement.id)).filter(
+        StockMovement.lot_id.in_(lot_ids),
+        StockMovement.movement_type == MovementType.ENTRY
+    ).group_by(StockMovement.lot_id)
+    entry_notes = dict(
+        db.session.query(StockMovement.lot_id, StockMovement.notes)
+        .filter(StockMovement.id.in_(first_entries))
+        .all()
+    )
     
     # Add supplier info from first entry movement
     result = []
     for lot in lots:
         lot_dict = lot.to_dict(include_product=True)
         # Get supplier from entry movement notes
-        entry_movement = lot.movements.filter_by(movement_type=MovementType.ENTRY).first()
-        if entry_movement and entry_movement.notes:
+        notes = entry_notes.get(lot.id)
+        if notes:
             # Extract supplier from notes like "Recepción - Proveedor: XXXX"
-            if 'Proveedor:' in entry_movement.notes:
-                lot_dict['supplier'] = entry_movement.notes.split('Proveedor:')[1].strip()
+            if 'Proveedor:' in notes:
+                lot_dict['supplier'] = notes.split('Proveedor:')[1].strip()
             else:
                 lot_dict['supplier'] = '-'
         else:
             lot_dict['supplier'] = '-'
         
         # Add location breakdown
-        lot_locations = LotLocation.query.filter_by(lot_id=lot.id).all()
-        lot_dict['locations'] = [ll.to_dict() for ll in lot_locations]
+        lot_dict['locations'] = [ll.to_dict() for ll in lot.lot_locations]
         
         result.append(lot_dict)
     
+    if page.paged:
+        return jsonify(page.envelope({'data': result}))
     return jsonify(result)
 
 
 
 @bp.route('', methods=['POST'])
+@stock_transaction
 def create_reception():
     """Create a reception - creates a lot with stock in REC location"""
     data = request.get_json()
@@ -176,7 +221,10 @@ def create_reception():
         'lot_number': data['lot_number'],
         'expiration_date': data.get('expiration_date')
     }
-    doc_result = process_reception_document(doc_data)
+    if current_app.config['RECEPTION_DOCUMENTS']:
+        doc_result = process_reception_document(doc_data)
+    else:
+        doc_result = {'success': False, 'message': 'Generación de documentos desactivada'}
     
     return jsonify({
         'message': 'Recepción registrada correctamente',
@@ -0,0 +1,38 @@
+import time
+
+from flask import Blueprint, request, jsonify
+from models import db
+from utils.database import stock_transaction
+from utils.reconciliation import check, fix
+
+bp = Blueprint('reconciliation', __name__, url_prefix='/api/reconciliation')
+
+DEFAULT_LIMIT = 1000
+
+
+@bp.route('', methods=['GET'])
+def get_reconciliation():
+    """Lots whose quantity, location stock and movements disagree (up to ?limit=, 1000 by default)"""
+    limit = max(0, request.args.get('limit', DEFAULT_LIMIT, type=int))
+    started = time.perf_counter()
+    report = check(limit)
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000)
+    return jsonify(report)
+
+
+@bp.route('', methods=['POST'])
+@stock_transaction
+def apply_reconciliation():
+    """Record ADJUSTMENT movements so every lot's movements add up to its quantity
+
+    Also deletes the location rows of deleted lots. Returns what was
+    corrected and the report afterwards.
+    """
+    limit = max(0, request.args.get('limit', DEFAULT_LIMIT, type=int))
+    started = time.perf_counter()
+    adjustments, orphan_lot_locations = fix()
+    db.session.commit()
+    report = check(limit)
+    report.update(adjustments=adjustments, deleted_lot_locations=orphan_lot_locations,
+                  elapsed_ms=round((time.perf_counter() - started) * 1000))
+    return jsonify(report)
@@ -0,0 +1,69 @@
+from datetime import date
+
+from flask import Blueprint, current_app, request, jsonify
+from models import ProductType
+from utils.aging import AGE_BUCKETS, EXPIRY_KEYS, aging_report
+from utils.forecast import forecast
+from utils.versions import conditional
+
+bp = Blueprint('reports', __name__, url_prefix='/api/reports')
+
+# Responses kept per worker by the ETag cache (one per filter combination in use)
+REPORT_CACHE_SIZE = 32
+
+
+def _product_type():
+    product_type = request.args.get('product_type')
+    if product_type and product_type not in {t.value for t in ProductType}:
+        raise ValueError('Tipo de producto inválido')
+    return product_type
+
+
+@bp.route('/aging', methods=['GET'])
+@conditional('lots', 'lot_locations', 'products', 'locations', cache_size=REPORT_CACHE_SIZE)
+def get_aging():
+    """Stock per product and location by age and by months to expiry
+
+    Filters: product_id, product_type and location_id. Computed in one
+    query and kept in memory until the day or the stock changes.
+    """
+    try:
+        product_type = _product_type()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    today = date.today()
+    report = aging_report(
+        today,
+        product_id=request.args.get('product_id', type=int),
+        product_type=product_type,
+        location_id=request.args.get('location_id', type=int),
+    )
+    return jsonify({
+        'date': today.isoformat(),
+        'age_buckets': [key for key, _ in AGE_BUCKETS],
+        'expiry_buckets': EXPIRY_KEYS,
+        **report,
+    })
+
+
+@bp.route('/forecast', methods=['GET'])
+@conditional('stock_movements', 'lots', 'products', cache_size=REPORT_CACHE_SIZE)
+def get_forecast():
+    """Expected daily consumption, suggested reorder point and days of cover per product
+
+    Filters: product_id and product_type. See utils/forecast.py.
+    """
+    try:
+        product_type = _product_type()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    config = current_app.config
+    today = date.today()
+    return jsonify({
+        'date': today.isoformat(),
+        'history_days': config['FORECAST_HISTORY_DAYS'],
+        'lead_time_days': config['FORECAST_LEAD_TIME_DAYS'],
+        'products': forecast(today, product_id=request.args.get('product_id', type=int), product_type=product_type),
+    })
@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from models import (db, Return, ReturnDetail, Customer, Lot, ProductType,
                     StockMovement, MovementType, Location, LotLocation)
 from datetime import datetime
+from sqlalchemy.orm import joinedload, subqueryload
+from utils.database import lock_lots, stock_transaction
+from utils.fieldsets import Fieldset
 
 bp = Blueprint('returns', __name__, url_prefix='/api/returns')
 
@@ -14,7 +17,15 @@ def get_returns():
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     
-    query = Return.query
+    try:
+        fieldset = Fieldset.from_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = Return.query.options(
+        joinedload(Return.customer),
+        subqueryload(Return.details).joinedload(ReturnDetail.lot).joinedload(Lot.product)
+    )
     
     # Filter by customer
     if customer_id:
@@ -41,7 +52,12 @@ def get_returns():
     
     returns = query.order_by(Return.return_date.desc()).all()
     
-    return jsonify([r.to_dict(include_details=True) for r in returns])
+    return fieldset.response([r.to_dict(
+        include_details=fieldset.needs('details'),
+        include_customer=fieldset.inline('customer'),
+        include_lot=fieldset.inline('lot', nested=True),
+        include_product=fieldset.inline('product', nested=True),
+    ) for r in returns])
 
 
 @bp.route('/<int:return_id>', methods=['GET'])
@@ -52,6 +68,7 @@ def get_return(return_id):
 
 
 @bp.route('', methods=['POST'])
+@stock_transaction
 def create_return():
     """Create a new return - receives products back into DEV location"""
     data = request.get_json()
@@ -93,6 +110,8 @@ def create_return():
         return jsonify({'error': 'Ubicación DEV no encontrada. Ejecute la migración.'}), 500
     
     try:
+        lock_lots(detail.get('lot_id') for detail in data['details'] if isinstance(detail, dict))
+
         # Validate all lots before creating return
         validated_details = []
         for detail_data in data['details']:
@@ -0,0 +1,123 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy import func
+from models import db, Customer, Location, Lot, LotLocation, Product, ProductType
+from utils.lots import FEFO_ORDER
+from utils.search import SEARCH_KINDS, search, load_results, search_condition
+
+bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+MAX_LIMIT = 100
+
+
+@bp.route('', methods=['GET'])
+def search_all():
+    """Ranked search across lots, products, customers and production orders"""
+    term = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_LIMIT))
+    kinds = [kind.strip() for kind in request.args.get('types', '').split(',') if kind.strip()]
+    
+    unknown = set(kinds) - set(SEARCH_KINDS)
+    if unknown:
+        return jsonify({'error': f'Tipos de búsqueda inválidos: {", ".join(sorted(unknown))}'}), 400
+    
+    if not term:
+        return jsonify({'query': term, 'results': []})
+    
+    matches = search(term, kinds=kinds, limit=limit)
+    return jsonify({'query': term, 'results': load_results(matches)})
+
+
+# ========== Pickers ==========
+# Typeahead selects of the forms: the top matches of what is typed, with only
+# the fields the picker shows, instead of downloading whole collections.
+
+PICKER_LIMIT = 20
+
+
+def picker_options():
+    """Search term and number of results of a picker request"""
+    term = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', PICKER_LIMIT, type=int), MAX_LIMIT))
+    return term, limit
+
+
+def ranked(query, kind, id_column, code, columns, term):
+    """Filter by term through the search index, exact and prefix code matches first"""
+    if not term:
+        return query
+    return query.filter(search_condition(kind, id_column, columns, term)).order_by(
+        (func.lower(code) == term.lower()).desc(),
+        code.ilike(f'{term}%').desc()
+    )
+
+
+@bp.route('/products', methods=['GET'])
+def search_products():
+    """Product picker: active products, optionally of the given types (type=raw_material,packaging)"""
+    term, limit = picker_options()
+    try:
+        types = [ProductType(value) for value in request.args.get('type', '').split(',') if value]
+    except ValueError:
+        return jsonify({'error': 'Tipo de producto inválido'}), 400
+    
+    query = db.session.query(
+        Product.id, Product.code, Product.name, Product.type,
+        Product.storage_unit, Product.consumption_unit, Product.density
+    ).filter(Product.active.is_(True))
+    if types:
+        query = query.filter(Product.type.in_(types))
+    
+    rows = ranked(query, 'product', Product.id, Product.code, [Product.code, Product.name], term) \
+        .order_by(Product.name, Product.id).limit(limit)
+    return jsonify({'query': term, 'results': [dict(row._mapping, type=row.type.value) for row in rows]})
+
+
+@bp.route('/customers', methods=['GET'])
+def search_customers():
+    """Customer picker: active customers"""
+    term, limit = picker_options()
+    query = db.session.query(Customer.id, Customer.code, Customer.name).filter(Customer.active.is_(True))
+    rows = ranked(query, 'customer', Customer.id, Customer.code, [Customer.code, Customer.name], term) \
+        .order_by(Customer.name, Customer.id).limit(limit)
+    return jsonify({'query': term, 'results': [dict(row._mapping) for row in rows]})
+
+
+@bp.route('/lots', methods=['GET'])
+def search_lots():
+    """Lot picker, in FEFO order
+
+    Filters: product_id, type (product type), in_stock=true and location=<code>,
+    which keeps the lots with stock in that location and adds the quantity
+    available there (location=LIB for production and shipments).
+    """
+    term, limit = picker_options()
+    product_id = request.args.get('product_id', type=int)
+    product_type = request.args.get('type')
+    location_code = request.args.get('location')
+    
+    query = db.session.query(
+        Lot.id, Lot.lot_number, Lot.product_id, Lot.expiration_date, Lot.current_quantity, Lot.unit
+    )
+    if product_id:
+        query = query.filter(Lot.product_id == product_id)
+    if product_type:
+        try:
+            query = query.join(Product, Product.id == Lot.product_id).filter(Product.type == ProductType(product_type))
+        except ValueError:
+            return jsonify({'error': 'Tipo de producto inválido'}), 400
+    if request.args.get('in_stock', 'false').lower() == 'true':
+        query = query.filter(Lot.current_quantity > 0)
+    if location_code:
+        query = query.join(LotLocation, LotLocation.lot_id == Lot.id) \
+            .join(Location, Location.id == LotLocation.location_id) \
+            .filter(Location.code == location_code, LotLocation.quantity > 0) \
+            .add_columns(LotLocation.quantity.label('available_quantity'))
+    
+    rows = ranked(query, 'lot', Lot.id, Lot.lot_number, [Lot.lot_number], term) \
+        .order_by(*FEFO_ORDER, Lot.id).limit(limit)
+    results = []
+    for row in rows:
+        result = dict(row._mapping)
+        result['expiration_date'] = row.expiration_date.isoformat() if row.expiration_date else None
+        results.append(result)
+    return jsonify({'query': term, 'results': results})
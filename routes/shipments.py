@@ -3,6 +3,9 @@ from models import (db, Shipment, ShipmentDetail, Customer, Lot, ProductType,
                     StockMovement, MovementType, Location, LotLocation)
 from datetime import datetime
 from sqlalchemy import or_
+from sqlalchemy.orm import joinedload, subqueryload
+from utils.database import lock_lots, stock_transaction
+from utils.fieldsets import Fieldset
 
 bp = Blueprint('shipments', __name__, url_prefix='/api/shipments')
 
@@ -16,7 +19,15 @@ def get_shipments():
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     
-    query = Shipment.query
+    try:
+        fieldset = Fieldset.from_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = Shipment.query.options(
+        joinedload(Shipment.customer),
+        subqueryload(Shipment.details).joinedload(ShipmentDetail.lot).joinedload(Lot.product)
+    )
     
     # Filter by customer
     if customer_id:
@@ -52,7 +63,12 @@ def get_shipments():
                 break
         shipments = filtered_shipments
     
-    return jsonify([s.to_dict(include_details=True) for s in shipments])
+    return fieldset.response([s.to_dict(
+        include_details=fieldset.needs('details'),
+        include_customer=fieldset.inline('customer'),
+        include_lot=fieldset.inline('lot', nested=True),
+        include_product=fieldset.inline('product', nested=True),
+    ) for s in shipments])
 
 
 @bp.route('/<int:shipment_id>', methods=['GET'])
@@ -63,6 +79,7 @@ def get_shipment(shipment_id):
 
 
 @bp.route('', methods=['POST'])
+@stock_transaction
 def create_shipment():
     """Create a new shipment with details - only ships from LIB location"""
     data = request.get_json()
@@ -127,6 +144,8 @@ def create_shipment():
         return jsonify({'error': 'Ubicación LIB no encontrada. Ejecute la migración.'}), 500
     
     try:
+        lock_lots(detail.get('lot_id') for detail in data['details'] if isinstance(detail, dict))
+
         # Validate all lots before creating shipment
         validated_details = []
         for detail_data in data['details']:
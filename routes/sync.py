@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from flask import Blueprint, current_app, request, jsonify
+from utils.sync import SYNC_COLLECTIONS, InvalidCursor, changes_since
+
+bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+
+@bp.route('/<collection>', methods=['GET'])
+def get_changes(collection):
+    """Rows of a collection inserted, updated or deleted after the `since` cursor"""
+    if collection not in SYNC_COLLECTIONS:
+        return jsonify({'error': f'Colección desconocida (valores: {", ".join(SYNC_COLLECTIONS)})'}), 404
+    
+    since = request.args.get('since')
+    if not since:
+        return jsonify({'error': 'Falta since (0 para descargar la colección completa)'}), 400
+    
+    page_size = current_app.config.get('SYNC_PAGE_SIZE', 5000)
+    limit = max(1, min(request.args.get('limit', page_size, type=int), page_size))
+    lookback = timedelta(seconds=current_app.config.get('SYNC_LOOKBACK_SECONDS', 60))
+    
+    try:
+        return jsonify(changes_since(collection, since, limit, lookback))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
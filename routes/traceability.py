@@ -1,20 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, request, jsonify
 from models import (db, Lot, ProductionOrder, ProductionOrderMaterial, Shipment, ShipmentDetail,
                     Product, ProductType, Customer, ProductionOrderFinishedProduct, StockMovement, MovementType,
                     Return, ReturnDetail)
+from sqlalchemy.orm import joinedload, subqueryload
+from utils.archive import ArchiveReader, lot_dict
 
 bp = Blueprint('traceability', __name__, url_prefix='/api/traceability')
 
 
+def _get_lot_or_404(reader, lot_id):
+    lot = reader.get(Lot, lot_id)
+    if lot is None:
+        abort(404)
+    return lot
+
+
 @bp.route('/lot/<int:lot_id>', methods=['GET'])
 def trace_lot_forward(lot_id):
     """
     Forward traceability: Given a lot of finished product, find which customers received it
     """
-    lot = Lot.query.get_or_404(lot_id)
+    reader = ArchiveReader()
+    lot = _get_lot_or_404(reader, lot_id)
+    archived = reader.may_be_archived(lot)
     
     # Get all shipments containing this lot
-    shipment_details = ShipmentDetail.query.filter_by(lot_id=lot_id).all()
+    shipment_details = reader.history(ShipmentDetail, lot)
     
     customers = []
     for detail in shipment_details:
@@ -31,24 +42,26 @@ def trace_lot_forward(lot_id):
     production_info = None
     
     # 1. Try finding via specific lot_id link (new format)
-    fp_record = ProductionOrderFinishedProduct.query.filter_by(lot_id=lot_id).first()
+    fp_record = reader.first(ProductionOrderFinishedProduct, archived, lot_id=lot_id)
     
     if fp_record:
         order = fp_record.production_order
     else:
         # 2. Try legacy lookup (single product per order) or fallback if lot_id link missing
         # We need to find an order that produced this product + lot number
-        order = ProductionOrder.query.filter_by(
+        order = reader.first(
+            ProductionOrder, archived,
             finished_product_id=lot.product_id,
             finished_lot_number=lot.lot_number
-        ).first()
+        )
         
         if not order:
              # 3. New format fallback: check if any FP record matches product+lot (but lot_id might be null or drift)
-            fp_record = ProductionOrderFinishedProduct.query.filter_by(
+            fp_record = reader.first(
+                ProductionOrderFinishedProduct, archived,
                 finished_product_id=lot.product_id,
                 lot_number=lot.lot_number
-            ).first()
+            )
             if fp_record:
                 order = fp_record.production_order
 
@@ -72,13 +85,11 @@ def trace_lot_forward(lot_id):
         }
     
     # Get adjustments for this lot
-    adjustments = StockMovement.query.filter_by(
-        lot_id=lot.id, 
-        movement_type=MovementType.ADJUSTMENT
-    ).order_by(StockMovement.movement_date.desc()).all()
+    adjustments = sorted(reader.history(StockMovement, lot, movement_type=MovementType.ADJUSTMENT),
+                         key=lambda m: m.movement_date, reverse=True)
     
     # Get returns for this lot
-    return_details = ReturnDetail.query.filter_by(lot_id=lot_id).all()
+    return_details = reader.history(ReturnDetail, lot)
     
     returns = []
     for detail in return_details:
@@ -100,7 +111,7 @@ def trace_lot_forward(lot_id):
         })
 
     return jsonify({
-        'lot': lot.to_dict(include_product=True),
+        'lot': lot_dict(lot, include_product=True),
         'produced_from': production_info,
         'customers': customers,
         'returns': returns,
@@ -114,10 +125,11 @@ def trace_lot_reverse(lot_id):
     Reverse traceability: Given a lot of raw material/packaging, find which finished products used it
     Also shows which customers received those finished products
     """
-    lot = Lot.query.get_or_404(lot_id)
+    reader = ArchiveReader()
+    lot = _get_lot_or_404(reader, lot_id)
     
     # Get all production orders that used this lot
-    materials = ProductionOrderMaterial.query.filter_by(lot_id=lot_id).all()
+    materials = reader.all(ProductionOrderMaterial, reader.may_be_archived(lot), lot_id=lot_id)
     
     results = []
     for material in materials:
@@ -128,10 +140,11 @@ def trace_lot_reverse(lot_id):
         
         # 1. Check legacy fields (single product)
         if production_order.finished_product_id and production_order.finished_lot_number:
-            legacy_lot = Lot.query.filter_by(
+            legacy_lot = reader.first(
+                Lot, reader.may_be_archived(production_order),
                 product_id=production_order.finished_product_id,
                 lot_number=production_order.finished_lot_number
-            ).first()
+            )
             if legacy_lot:
                 finished_lots.append(legacy_lot)
         
@@ -140,15 +153,16 @@ def trace_lot_reverse(lot_id):
             for fp in production_order.finished_products:
                 if fp.lot_id:
                     # If we have the direct link to the lot
-                    lot_obj = Lot.query.get(fp.lot_id)
+                    lot_obj = reader.get(Lot, fp.lot_id)
                     if lot_obj:
                         finished_lots.append(lot_obj)
                 else:
                     # Fallback lookup by number and product
-                    lot_obj = Lot.query.filter_by(
+                    lot_obj = reader.first(
+                        Lot, reader.may_be_archived(production_order),
                         product_id=fp.finished_product_id,
                         lot_number=fp.lot_number
-                    ).first()
+                    )
                     if lot_obj:
                         finished_lots.append(lot_obj)
         
@@ -158,7 +172,7 @@ def trace_lot_reverse(lot_id):
         # Find customers who received these finished lots
         for finished_lot in unique_lots:
             customers = []
-            shipment_details = ShipmentDetail.query.filter_by(lot_id=finished_lot.id).all()
+            shipment_details = reader.history(ShipmentDetail, finished_lot)
             for detail in shipment_details:
                 shipment = detail.shipment
                 customers.append({
@@ -174,18 +188,16 @@ def trace_lot_reverse(lot_id):
                 'production_order': production_order.to_dict(),
                 'quantity_consumed': material.quantity_consumed,
                 'unit': material.unit,
-                'finished_lot': finished_lot.to_dict(include_product=True),
+                'finished_lot': lot_dict(finished_lot, include_product=True),
                 'customers': customers
             })
     
     # Get adjustments for this lot
-    adjustments = StockMovement.query.filter_by(
-        lot_id=lot.id, 
-        movement_type=MovementType.ADJUSTMENT
-    ).order_by(StockMovement.movement_date.desc()).all()
+    adjustments = sorted(reader.history(StockMovement, lot, movement_type=MovementType.ADJUSTMENT),
+                         key=lambda m: m.movement_date, reverse=True)
 
     return jsonify({
-        'lot': lot.to_dict(include_product=True),
+        'lot': lot_dict(lot, include_product=True),
         'used_in_production': results,
         'adjustments': [m.to_dict() for m in adjustments]
     })
@@ -196,10 +208,9 @@ def trace_product_lot(product_id, lot_number):
     """Traceability by product and lot number"""
     product = Product.query.get_or_404(product_id)
     
-    lot = Lot.query.filter_by(
-        product_id=product_id,
-        lot_number=lot_number
-    ).first_or_404()
+    lot = ArchiveReader().first(Lot, True, product_id=product_id, lot_number=lot_number)
+    if lot is None:
+        abort(404)
     
     # Determine traceability direction based on product type
     if product.type == ProductType.FINISHED_PRODUCT:
@@ -215,7 +226,13 @@ def trace_customer(customer_id):
     """Get all lots received by a customer"""
     customer = Customer.query.get_or_404(customer_id)
     
-    shipments = Shipment.query.filter_by(customer_id=customer_id).order_by(Shipment.shipment_date.desc()).all()
+    shipments = Shipment.query.filter_by(customer_id=customer_id).options(
+        subqueryload(Shipment.details).joinedload(ShipmentDetail.lot).joinedload(Lot.product)
+    ).order_by(Shipment.shipment_date.desc()).all()
+    reader = ArchiveReader()
+    if reader.may_be_archived(customer):
+        shipments = sorted(shipments + reader.archived(Shipment, customer_id=customer_id),
+                           key=lambda s: s.shipment_date, reverse=True)
     
     results = []
     for shipment in shipments:
@@ -7,6 +7,16 @@ from datetime import date
 import os
 
 
+# Standard warehouse locations: (code, name, is_available)
+LOCATIONS = [
+    ('REC', 'Recepción', False),
+    ('LIB', 'Liberado', True),
+    ('DEV', 'Devoluciones', False),
+    ('NC', 'No Conforme', False),
+    ('FAB', 'Fabricación Pendiente', False),
+]
+
+
 def seed_demo_data():
     """Create demo data for the application"""
     
@@ -19,11 +29,10 @@ def seed_demo_data():
     
     # ============ LOCATIONS ============
     print("  - Creating locations...")
-    loc_rec = Location(code='REC', name='Recepción', is_available=False, active=True)
-    loc_lib = Location(code='LIB', name='Liberado', is_available=True, active=True)
-    loc_dev = Location(code='DEV', name='Devoluciones', is_available=False, active=True)
-    loc_nc = Location(code='NC', name='No Conforme', is_available=False, active=True)
-    loc_fab = Location(code='FAB', name='Fabricación Pendiente', is_available=False, active=True)
+    loc_rec, loc_lib, loc_dev, loc_nc, loc_fab = [
+        Location(code=code, name=name, is_available=is_available, active=True)
+        for code, name, is_available in LOCATIONS
+    ]
     
     db.session.add_all([loc_rec, loc_lib, loc_dev, loc_nc, loc_fab])
     db.session.flush()
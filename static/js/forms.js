@@ -61,6 +61,118 @@ function initSearchableSelectDelayed(selectId, options = {}, delay = 50) {
     }, delay);
 }
 
+// ========== Typeahead Pickers ==========
+// Searchable selects whose options are the top matches of /api/search/<collection>
+// for what is typed, so opening a form does not download whole collections.
+
+const PICKER_LIMIT = 20;
+
+/**
+ * options.collection   'products', 'customers' or 'lots'
+ * options.params       function returning the fixed filters of the search ({type: 'finished_product'}),
+ *                      or null while the picker has nothing to offer
+ * options.label        function returning the option text of a result
+ * options.placeholder  text shown while nothing is selected
+ * options.empty        text when nothing matches
+ * options.onChange     called with the selected result, or null
+ */
+function initPicker(selectId, options) {
+    const select = document.getElementById(selectId);
+    if (!select) return null;
+    if (select.picker) return select.picker;
+
+    const placeholder = options.placeholder || 'Seleccionar...';
+    const picker = {
+        results: new Map(),  // id -> result, for the fields of the selected one
+        generation: 0,       // Responses of an earlier search are dropped
+        choices: null,
+
+        get selected() {
+            return this.results.get(parseInt(select.value)) || null;
+        },
+
+        async load(term = '') {
+            const generation = ++this.generation;
+            // No filters (e.g. the lots before a product is chosen): nothing to offer
+            const params = options.params ? options.params() : {};
+            let results = [];
+            if (params) {
+                const query = new URLSearchParams({ ...params, q: term, limit: PICKER_LIMIT });
+                try {
+                    results = (await api.get(`/search/${options.collection}?${query}`)).results;
+                } catch (error) {
+                    console.error(`Error searching ${options.collection}:`, error);
+                    return;
+                }
+                if (generation !== this.generation) return;
+            }
+
+            // The selected result stays available while other terms are searched
+            const current = this.selected;
+            this.results = new Map(results.map(result => [result.id, result]));
+            if (current) this.results.set(current.id, current);
+
+            const choices = [
+                { value: '', label: placeholder, placeholder: true, selected: !current },
+                ...results.map(result => ({ value: String(result.id), label: options.label(result), selected: current?.id === result.id }))
+            ];
+            if (this.choices) {
+                this.choices.setChoices(choices, 'value', 'label', true);
+            } else {
+                select.innerHTML = choices.map(choice =>
+                    `<option value="${choice.value}" ${choice.selected ? 'selected' : ''}>${choice.label}</option>`
+                ).join('');
+            }
+        },
+
+        // Clear the selection and show the first matches of the current filters
+        reset() {
+            if (this.choices) this.choices.removeActiveItems();
+            select.value = '';
+            return this.load();
+        },
+
+        setDisabled(disabled) {
+            if (this.choices) {
+                if (disabled) this.choices.disable(); else this.choices.enable();
+            } else {
+                select.disabled = disabled;
+            }
+        }
+    };
+
+    if (typeof Choices !== 'undefined') {
+        picker.choices = new Choices(select, {
+            searchEnabled: true,
+            searchChoices: false,  // The server filters
+            searchPlaceholderValue: 'Buscar...',
+            itemSelectText: '',
+            noResultsText: options.empty || 'Sin resultados',
+            noChoicesText: options.empty || 'Sin resultados',
+            shouldSort: false
+        });
+        select.choicesInstance = picker.choices;
+        const search = debounce(term => picker.load(term.trim()), 250);
+        picker.choices.input.element.addEventListener('input', event => search(event.target.value));
+    }
+    if (options.onChange) select.addEventListener('change', () => options.onChange(picker.selected));
+
+    select.picker = picker;
+    picker.load();
+    return picker;
+}
+
+// Option texts shared by the forms
+function productPickerLabel(product) {
+    return `${product.code} - ${product.name}`;
+}
+
+function lotPickerLabel(lot, quantity = lot.current_quantity, unit = lot.unit, digits = 0) {
+    const expDate = lot.expiration_date ? new Date(lot.expiration_date).toLocaleDateString('es-ES') : 'Sin cad.';
+    const formattedQty = quantity.toLocaleString('es-ES', { minimumFractionDigits: digits, maximumFractionDigits: digits });
+    return `Lote: ${lot.lot_number} | Cad: ${expDate} | ${formattedQty} ${unit}`;
+}
+
 // ========== Modal Management ==========
 
 function showModal(title, content, onSave, saveButtonText = 'Guardar') {
@@ -254,14 +366,7 @@ async function showProductionOrderModal(order = null) {
     orderFinishedProducts = [];
 
     try {
-        const [products, nextNumberData] = await Promise.all([
-            api.get('/products?type=finished_product'),
-            !order ? api.get('/production-orders/next-number') : Promise.resolve(null)
-        ]);
-
-        const productOptions = products.map(p =>
-            `<option value="${p.id}">${p.code} - ${p.name}</option>`
-        ).join('');
+        const nextNumberData = !order ? await api.get('/production-orders/next-number') : null;
 
         const nextOrderNumber = order ? order.order_number : (nextNumberData ? nextNumberData.next_number : '');
 
@@ -305,10 +410,7 @@ async function showProductionOrderModal(order = null) {
         <div class="form-group">
             <label class="form-label">Añadir Producto Acabado</label>
             <div style="display: grid; grid-template-columns: 4fr 2fr 1fr auto; gap: 0.5rem; align-items: end;">
-                <select id="fp-product" class="form-select">
-                    <option value="">Seleccionar...</option>
-                    ${productOptions}
-                </select>
+                <select id="fp-product" class="form-select"></select>
                 <input type="number" id="fp-target-qty" class="form-input" placeholder="Cant. obj." step="0.01">
                 <input type="text" class="form-input" value="ud" readonly style="background-color: var(--gray-100); width: 60px; text-align: center;">
                 <button type="button" class="btn btn-primary btn-sm" onclick="addFinishedProductToOrder()">+</button>
@@ -362,8 +464,11 @@ async function showProductionOrderModal(order = null) {
 
         updateFinishedProductsTable();
 
-        // Initialize searchable select for finished product dropdown
-        initSearchableSelectDelayed('fp-product');
+        initPicker('fp-product', {
+            collection: 'products',
+            params: () => ({ type: 'finished_product' }),
+            label: productPickerLabel
+        });
     } catch (error) {
         console.error('Error opening modal:', error);
         showMessage(error.message, 'error');
@@ -371,27 +476,24 @@ async function showProductionOrderModal(order = null) {
 }
 
 function addFinishedProductToOrder() {
-    const productId = parseInt(document.getElementById('fp-product').value);
+    const picker = document.getElementById('fp-product').picker;
+    const product = picker?.selected;
     const targetQty = parseFloat(document.getElementById('fp-target-qty').value) || null;
 
-    if (!productId) {
+    if (!product) {
         showMessage('Debe seleccionar un producto', 'error');
         return;
     }
 
-    // Get product name
-    const productSelect = document.getElementById('fp-product');
-    const productName = productSelect.options[productSelect.selectedIndex].text;
-
     orderFinishedProducts.push({
-        finished_product_id: productId,
-        product_name: productName,
+        finished_product_id: product.id,
+        product_name: productPickerLabel(product),
         target_quantity: targetQty,
         unit: 'ud'
     });
 
     // Clear form
-    document.getElementById('fp-product').value = '';
+    picker.reset();
     document.getElementById('fp-target-qty').value = '';
 
     updateFinishedProductsTable();
@@ -550,21 +652,7 @@ async function showOrderDetails(orderId) {
 
 async function showAddMaterialModal(orderId) {
     try {
-        // Fetch products, lots with stock in LIB location, and order details
-        const [products, availableLots, order] = await Promise.all([
-            api.get('/products'),
-            api.get('/locations/available-stock'),  // Only stock in LIB location
-            api.get(`/production-orders/${orderId}`)
-        ]);
-
-        // Filter products to raw materials and packaging only
-        const materialProducts = products.filter(p => p.type === 'raw_material' || p.type === 'packaging');
-        const productOptions = materialProducts.map(p =>
-            `<option value="${p.id}" data-type="${p.type}" data-density="${p.density || 1}" data-consumption_unit="${p.consumption_unit || 'kg'}">${p.code} - ${p.name}</option>`
-        ).join('');
-
-        // Store lots with stock in LIB for filtering
-        window._materialLots = availableLots.filter(l => l.product?.type === 'raw_material' || l.product?.type === 'packaging');
+        const order = await api.get(`/production-orders/${orderId}`);
 
         // Generate assignment options
         let assignmentOptions = '<option value="">Común (Toda la orden)</option>';
@@ -580,17 +668,12 @@ async function showAddMaterialModal(orderId) {
         const content = `
             <div class="form-group">
                 <label class="form-label">Producto *</label>
-                <select id="material-product" class="form-select searchable-select" required>
-                    <option value="">Seleccionar producto...</option>
-                    ${productOptions}
-                </select>
+                <select id="material-product" class="form-select searchable-select" required></select>
             </div>
 
             <div class="form-group">
                 <label class="form-label">Lote *</label>
-                <select id="material-lot" class="form-select" required disabled>
-                    <option value="">Primero seleccione un producto</option>
-                </select>
+                <select id="material-lot" class="form-select" required></select>
             </div>
 
             <div class="form-group">
@@ -635,93 +718,70 @@ async function showAddMaterialModal(orderId) {
             }
         });
 
-        // Initialize Choices.js on product select
-        setTimeout(() => {
-            initSearchableSelect('material-product');
-            const productSelect = document.getElementById('material-product');
-            if (productSelect) {
-                productSelect.addEventListener('change', () => updateMaterialLotOptions());
-            }
-        }, 50);
+        initPicker('material-product', {
+            collection: 'products',
+            params: () => ({ type: 'raw_material,packaging' }),
+            label: productPickerLabel,
+            placeholder: 'Seleccionar producto...',
+            onChange: updateMaterialLotOptions
+        });
+        // Only lots with stock in the LIB location
+        initPicker('material-lot', {
+            collection: 'lots',
+            params: () => {
+                const product = document.getElementById('material-product').picker?.selected;
+                return product ? { product_id: product.id, location: 'LIB' } : null;
+            },
+            label: materialLotLabel,
+            placeholder: 'Primero seleccione un producto',
+            empty: 'No hay lotes disponibles en LIB'
+        }).setDisabled(true);
 
     } catch (error) {
         showMessage('Error cargando datos: ' + error.message, 'error');
     }
 }
 
-// Helper function to update lot options when product is selected
-function updateMaterialLotOptions() {
-    const productSelect = document.getElementById('material-product');
-    const lotSelect = document.getElementById('material-lot');
-    const selectedProductId = parseInt(productSelect.value);
-
-    if (!selectedProductId) {
-        lotSelect.innerHTML = '<option value="">Primero seleccione un producto</option>';
-        lotSelect.disabled = true;
-        return;
-    }
-
-    // Get product info
-    const selectedOption = productSelect.options[productSelect.selectedIndex];
-    const productType = selectedOption.dataset.type;
-    const density = parseFloat(selectedOption.dataset.density) || 1;
-
-    // Filter lots for selected product
-    const productLots = window._materialLots.filter(l => l.product_id === selectedProductId);
-
-    if (productLots.length === 0) {
-        lotSelect.innerHTML = '<option value="">No hay lotes disponibles en LIB</option>';
-        lotSelect.disabled = true;
-        return;
-    }
-
-    // Generate lot options with FEFO info (using available_quantity from LIB)
-    const lotOptions = productLots.map(l => {
-        const expDate = l.expiration_date ? new Date(l.expiration_date).toLocaleDateString('es-ES') : 'Sin cad.';
-
-        // Use available_quantity (stock in LIB) instead of current_quantity (total)
-        let displayQty = l.available_quantity || l.current_quantity;
-        let displayUnit = l.unit;
-
-        // For raw materials, show in kg (consumption unit)
-        if (productType === 'raw_material') {
-            const storageUnit = l.unit?.toLowerCase();
-            if (storageUnit === 'l') {
-                displayQty = displayQty * density;
-                displayUnit = 'kg';
-            } else if (storageUnit === 'g') {
-                displayQty = displayQty / 1000;
-                displayUnit = 'kg';
-            } else if (storageUnit === 'kg') {
-                displayUnit = 'kg';
-            }
-        } else if (productType === 'packaging') {
-            displayUnit = 'ud';
+// Lot option with the quantity in LIB, in the unit the recipe consumes
+function materialLotLabel(lot) {
+    const product = document.getElementById('material-product').picker?.selected;
+    let displayQty = lot.available_quantity;
+    let displayUnit = lot.unit;
+
+    // For raw materials, show in kg (consumption unit)
+    if (product?.type === 'raw_material') {
+        const storageUnit = lot.unit?.toLowerCase();
+        if (storageUnit === 'l') {
+            displayQty = displayQty * (product.density || 1);
+        } else if (storageUnit === 'g') {
+            displayQty = displayQty / 1000;
         }
+        if (['l', 'g', 'kg'].includes(storageUnit)) displayUnit = 'kg';
+    } else if (product?.type === 'packaging') {
+        displayUnit = 'ud';
+    }
+    return lotPickerLabel(lot, displayQty, displayUnit, 3);
+}
 
-        const formattedQty = displayQty.toLocaleString('es-ES', {
-            minimumFractionDigits: 3,
-            maximumFractionDigits: 3
-        });
-
-        return `<option value="${l.id}">Lote: ${l.lot_number} | Cad: ${expDate} | ${formattedQty} ${displayUnit}</option>`;
-    }).join('');
-
-    lotSelect.innerHTML = '<option value="">Seleccionar lote...</option>' + lotOptions;
-    lotSelect.disabled = false;
+// Reload the lots and the unit when a product is selected
+function updateMaterialLotOptions(product) {
+    const lotPicker = document.getElementById('material-lot').picker;
+    lotPicker.setDisabled(!product);
+    lotPicker.reset();
+    if (!product) return;
 
     // Auto-select unit based on product type
     const unitSelect = document.getElementById('material-unit');
     if (unitSelect) {
-        if (productType === 'packaging') {
+        if (product.type === 'packaging') {
             // For packaging, force 'ud'
             unitSelect.value = 'ud';
             unitSelect.querySelectorAll('option').forEach(opt => {
                 opt.disabled = opt.value !== 'ud' && opt.value !== '';
             });
-        } else if (productType === 'raw_material') {
+        } else if (product.type === 'raw_material') {
             // For raw materials, use consumption unit (typically kg)
-            unitSelect.value = selectedOption?.dataset?.consumption_unit || 'kg';
+            unitSelect.value = product.consumption_unit || 'kg';
             unitSelect.querySelectorAll('option').forEach(opt => {
                 opt.disabled = false;
             });
@@ -913,122 +973,116 @@ let shipmentDetails = [];
 function showShipmentModal() {
     shipmentDetails = [];
 
-    api.get('/customers').then(customers => {
-        const customerOptions = customers.map(c =>
-            `<option value="${c.id}">${c.code} - ${c.name}</option>`
-        ).join('');
-
-        const content = `
-                    <div class="form-group">
-                        <label class="form-label">Cliente *</label>
-                        <div style="display: flex; gap: 1rem; margin-bottom: 0.5rem;">
-                            <label style="display: flex; align-items: center; gap: 0.25rem; cursor: pointer;">
-                                <input type="radio" name="customer-type" value="existing" checked onchange="toggleNewCustomerFields()"> 
-                                Cliente existente
-                            </label>
-                            <label style="display: flex; align-items: center; gap: 0.25rem; cursor: pointer;">
-                                <input type="radio" name="customer-type" value="new" onchange="toggleNewCustomerFields()"> 
-                                Nuevo cliente
-                            </label>
-                        </div>
-                        <div id="existing-customer-field">
-                            <select id="shipment-customer" class="form-select">
-                                <option value="">Seleccionar cliente...</option>
-                                ${customerOptions}
-                            </select>
+    const content = `
+                <div class="form-group">
+                    <label class="form-label">Cliente *</label>
+                    <div style="display: flex; gap: 1rem; margin-bottom: 0.5rem;">
+                        <label style="display: flex; align-items: center; gap: 0.25rem; cursor: pointer;">
+                            <input type="radio" name="customer-type" value="existing" checked onchange="toggleNewCustomerFields()"> 
+                            Cliente existente
+                        </label>
+                        <label style="display: flex; align-items: center; gap: 0.25rem; cursor: pointer;">
+                            <input type="radio" name="customer-type" value="new" onchange="toggleNewCustomerFields()"> 
+                            Nuevo cliente
+                        </label>
+                    </div>
+                    <div id="existing-customer-field">
+                        <select id="shipment-customer" class="form-select"></select>
+                    </div>
+                    <div id="new-customer-fields" style="display: none; margin-top: 0.5rem; padding: 1rem; background: var(--gray-50); border-radius: 8px;">
+                        <small style="color: var(--gray-500); display: block; margin-bottom: 0.75rem;">El código se asignará automáticamente</small>
+                        <div class="form-group" style="margin-bottom: 0.75rem;">
+                            <input type="text" id="new-customer-name" class="form-input" placeholder="Nombre del cliente *" required>
                         </div>
-                        <div id="new-customer-fields" style="display: none; margin-top: 0.5rem; padding: 1rem; background: var(--gray-50); border-radius: 8px;">
-                            <small style="color: var(--gray-500); display: block; margin-bottom: 0.75rem;">El código se asignará automáticamente</small>
-                            <div class="form-group" style="margin-bottom: 0.75rem;">
-                                <input type="text" id="new-customer-name" class="form-input" placeholder="Nombre del cliente *" required>
-                            </div>
-                            <div class="form-row" style="margin-bottom: 0.75rem;">
-                                <div class="form-group" style="margin: 0;">
-                                    <input type="email" id="new-customer-email" class="form-input" placeholder="Email">
-                                </div>
-                                <div class="form-group" style="margin: 0;">
-                                    <input type="text" id="new-customer-phone" class="form-input" placeholder="Teléfono">
-                                </div>
+                        <div class="form-row" style="margin-bottom: 0.75rem;">
+                            <div class="form-group" style="margin: 0;">
+                                <input type="email" id="new-customer-email" class="form-input" placeholder="Email">
                             </div>
                             <div class="form-group" style="margin: 0;">
-                                <textarea id="new-customer-address" class="form-textarea" rows="2" placeholder="Dirección"></textarea>
+                                <input type="text" id="new-customer-phone" class="form-input" placeholder="Teléfono">
                             </div>
                         </div>
-                    </div>
-
-                    <div class="form-row">
-                        <div class="form-group">
-                            <label class="form-label">Número de Albarán *</label>
-                            <input type="text" id="shipment-number" class="form-input" required>
+                        <div class="form-group" style="margin: 0;">
+                            <textarea id="new-customer-address" class="form-textarea" rows="2" placeholder="Dirección"></textarea>
                         </div>
+                    </div>
+                </div>
 
-                        <div class="form-group">
-                            <label class="form-label">Fecha de Envío *</label>
-                            <input type="date" id="shipment-date" class="form-input" required>
-                        </div>
+                <div class="form-row">
+                    <div class="form-group">
+                        <label class="form-label">Número de Albarán *</label>
+                        <input type="text" id="shipment-number" class="form-input" required>
                     </div>
 
                     <div class="form-group">
-                        <label class="form-label">Notas</label>
-                        <textarea id="shipment-notes" class="form-textarea" rows="2"></textarea>
+                        <label class="form-label">Fecha de Envío *</label>
+                        <input type="date" id="shipment-date" class="form-input" required>
                     </div>
+                </div>
 
-                    <h4 style="margin: 1.5rem 0 1rem;">Líneas de Envío</h4>
-                    <div id="shipment-details-container"></div>
-                    <button type="button" class="btn btn-secondary btn-sm" onclick="addShipmentDetail()">+ Añadir Línea</button>
-                    `;
+                <div class="form-group">
+                    <label class="form-label">Notas</label>
+                    <textarea id="shipment-notes" class="form-textarea" rows="2"></textarea>
+                </div>
 
-        showModal('Nuevo Envío', content, async () => {
-            if (shipmentDetails.length === 0) {
-                showMessage('Debe añadir al menos una línea de envío', 'error');
-                return false;
-            }
+                <h4 style="margin: 1.5rem 0 1rem;">Líneas de Envío</h4>
+                <div id="shipment-details-container"></div>
+                <button type="button" class="btn btn-secondary btn-sm" onclick="addShipmentDetail()">+ Añadir Línea</button>
+                `;
 
-            const isNewCustomer = document.querySelector('input[name="customer-type"]:checked').value === 'new';
+    showModal('Nuevo Envío', content, async () => {
+        if (shipmentDetails.length === 0) {
+            showMessage('Debe añadir al menos una línea de envío', 'error');
+            return false;
+        }
 
-            const data = {
-                shipment_number: document.getElementById('shipment-number').value,
-                shipment_date: document.getElementById('shipment-date').value,
-                notes: document.getElementById('shipment-notes').value,
-                details: shipmentDetails
-            };
+        const isNewCustomer = document.querySelector('input[name="customer-type"]:checked').value === 'new';
 
-            if (isNewCustomer) {
-                const name = document.getElementById('new-customer-name').value.trim();
-                if (!name) {
-                    showMessage('Introduzca el nombre del cliente', 'error');
-                    return false;
-                }
-                data.new_customer = {
-                    name,
-                    email: document.getElementById('new-customer-email').value.trim() || null,
-                    phone: document.getElementById('new-customer-phone').value.trim() || null,
-                    address: document.getElementById('new-customer-address').value.trim() || null
-                };
-            } else {
-                const customerId = document.getElementById('shipment-customer').value;
-                if (!customerId) {
-                    showMessage('Seleccione un cliente', 'error');
-                    return false;
-                }
-                data.customer_id = parseInt(customerId);
-            }
+        const data = {
+            shipment_number: document.getElementById('shipment-number').value,
+            shipment_date: document.getElementById('shipment-date').value,
+            notes: document.getElementById('shipment-notes').value,
+            details: shipmentDetails
+        };
 
-            try {
-                await api.post('/shipments', data);
-                showMessage('Envío creado correctamente');
-                closeModal();
-                loadShipments();
-            } catch (error) {
-                showMessage(error.message, 'error');
+        if (isNewCustomer) {
+            const name = document.getElementById('new-customer-name').value.trim();
+            if (!name) {
+                showMessage('Introduzca el nombre del cliente', 'error');
                 return false;
             }
-        });
+            data.new_customer = {
+                name,
+                email: document.getElementById('new-customer-email').value.trim() || null,
+                phone: document.getElementById('new-customer-phone').value.trim() || null,
+                address: document.getElementById('new-customer-address').value.trim() || null
+            };
+        } else {
+            const customerId = document.getElementById('shipment-customer').value;
+            if (!customerId) {
+                showMessage('Seleccione un cliente', 'error');
+                return false;
+            }
+            data.customer_id = parseInt(customerId);
+        }
 
-        addShipmentDetail(); // Add first line by default
+        try {
+            await api.post('/shipments', data);
+            showMessage('Envío creado correctamente');
+            closeModal();
+            loadShipments();
+        } catch (error) {
+            showMessage(error.message, 'error');
+            return false;
+        }
+    });
+
+    addShipmentDetail(); // Add first line by default
 
-        // Initialize searchable select for customer
-        initSearchableSelectDelayed('shipment-customer');
+    initPicker('shipment-customer', {
+        collection: 'customers',
+        label: customer => `${customer.code} - ${customer.name}`,
+        placeholder: 'Seleccionar cliente...'
     });
 }
 
@@ -1040,103 +1094,63 @@ function toggleNewCustomerFields() {
 }
 
 function addShipmentDetail() {
-    Promise.all([
-        api.get('/products'),
-        api.get('/locations/available-stock')  // Only stock in LIB location
-    ]).then(([products, availableLots]) => {
-        // Filter to finished products only
-        const finishedProducts = products.filter(p => p.type === 'finished_product');
-        const productOptions = finishedProducts.map(p =>
-            `<option value="${p.id}">${p.code} - ${p.name}</option>`
-        ).join('');
+    const index = shipmentDetails.length;
+    const container = document.getElementById('shipment-details-container');
 
-        // Store lots with available stock in LIB
-        window._shipmentLots = availableLots.filter(l => l.product?.type === 'finished_product');
-
-        const index = shipmentDetails.length;
-        const container = document.getElementById('shipment-details-container');
-
-        const detailHtml = `
-            <div class="detail-row" id="detail-${index}" style="display: flex; gap: 0.5rem; align-items: center; margin-bottom: 0.75rem;">
-                <div class="form-group" style="margin: 0; flex: 1.2;">
-                    <select class="form-select" id="detail-product-${index}" required>
-                        <option value="">Producto...</option>
-                        ${productOptions}
-                    </select>
-                </div>
-                <div class="form-group" style="margin: 0; flex: 1.5;">
-                    <select class="form-select" id="detail-lot-${index}" required disabled>
-                        <option value="">Primero seleccione producto</option>
-                    </select>
-                </div>
-                <div class="form-group" style="margin: 0; width: 100px;">
-                    <input type="number" class="form-input" id="detail-qty-${index}" placeholder="Cantidad" step="1" required>
-                </div>
-                <div class="form-group" style="margin: 0; width: 50px;">
-                    <input type="text" class="form-input" id="detail-unit-${index}" value="ud" readonly style="background-color: var(--gray-100); text-align: center;">
-                </div>
-                <button type="button" class="btn btn-sm btn-danger" onclick="removeShipmentDetail(${index})">×</button>
+    const detailHtml = `
+        <div class="detail-row" id="detail-${index}" style="display: flex; gap: 0.5rem; align-items: center; margin-bottom: 0.75rem;">
+            <div class="form-group" style="margin: 0; flex: 1.2;">
+                <select class="form-select" id="detail-product-${index}" required></select>
             </div>
-        `;
+            <div class="form-group" style="margin: 0; flex: 1.5;">
+                <select class="form-select" id="detail-lot-${index}" required></select>
+            </div>
+            <div class="form-group" style="margin: 0; width: 100px;">
+                <input type="number" class="form-input" id="detail-qty-${index}" placeholder="Cantidad" step="1" required>
+            </div>
+            <div class="form-group" style="margin: 0; width: 50px;">
+                <input type="text" class="form-input" id="detail-unit-${index}" value="ud" readonly style="background-color: var(--gray-100); text-align: center;">
+            </div>
+            <button type="button" class="btn btn-sm btn-danger" onclick="removeShipmentDetail(${index})">×</button>
+        </div>
+    `;
 
-        container.insertAdjacentHTML('beforeend', detailHtml);
+    container.insertAdjacentHTML('beforeend', detailHtml);
 
-        shipmentDetails.push({ unit: 'ud' });
+    shipmentDetails.push({ unit: 'ud' });
 
-        // Initialize Choices.js on product select
-        initSearchableSelect(`detail-product-${index}`);
-        const productSelect = document.getElementById(`detail-product-${index}`);
-        if (productSelect) {
-            productSelect.addEventListener('change', () => updateShipmentLotOptions(index));
+    initPicker(`detail-product-${index}`, {
+        collection: 'products',
+        params: () => ({ type: 'finished_product' }),
+        label: productPickerLabel,
+        placeholder: 'Producto...',
+        onChange: product => {
+            const lotPicker = document.getElementById(`detail-lot-${index}`).picker;
+            lotPicker.setDisabled(!product);
+            lotPicker.reset();
         }
-
-        // Update shipmentDetails when fields change
-        document.getElementById(`detail-lot-${index}`).addEventListener('change', (e) => {
-            shipmentDetails[index].lot_id = parseInt(e.target.value);
-        });
-        document.getElementById(`detail-qty-${index}`).addEventListener('input', (e) => {
-            shipmentDetails[index].quantity = parseFloat(e.target.value);
-        });
+    });
+    // Lots with available stock in the LIB location, FEFO
+    initPicker(`detail-lot-${index}`, {
+        collection: 'lots',
+        params: () => {
+            const product = document.getElementById(`detail-product-${index}`).picker?.selected;
+            return product ? { product_id: product.id, location: 'LIB' } : null;
+        },
+        label: lot => `${lotPickerLabel(lot, lot.available_quantity)} disponible`,
+        placeholder: 'Primero seleccione producto',
+        empty: 'No hay lotes disponibles'
+    }).setDisabled(true);
+
+    // Update shipmentDetails when fields change
+    document.getElementById(`detail-lot-${index}`).addEventListener('change', (e) => {
+        shipmentDetails[index].lot_id = parseInt(e.target.value);
+    });
+    document.getElementById(`detail-qty-${index}`).addEventListener('input', (e) => {
+        shipmentDetails[index].quantity = parseFloat(e.target.value);
     });
 }
 
-// Helper function to update lot options when product is selected in shipment
-function updateShipmentLotOptions(index) {
-    const productSelect = document.getElementById(`detail-product-${index}`);
-    const lotSelect = document.getElementById(`detail-lot-${index}`);
-    const selectedProductId = parseInt(productSelect.value);
-
-    if (!selectedProductId) {
-        lotSelect.innerHTML = '<option value="">Primero seleccione producto</option>';
-        lotSelect.disabled = true;
-        return;
-    }
-
-    // Filter lots for selected product
-    const productLots = window._shipmentLots.filter(l => l.product_id === selectedProductId);
-
-    if (productLots.length === 0) {
-        lotSelect.innerHTML = '<option value="">No hay lotes disponibles</option>';
-        lotSelect.disabled = true;
-        return;
-    }
-
-    // Generate lot options with FEFO info (using available_quantity from LIB location)
-    const lotOptions = productLots.map(l => {
-        const expDate = l.expiration_date ? new Date(l.expiration_date).toLocaleDateString('es-ES') : 'Sin cad.';
-        const availableQty = l.available_quantity || l.current_quantity;
-        const formattedQty = availableQty.toLocaleString('es-ES', {
-            minimumFractionDigits: 0,
-            maximumFractionDigits: 0
-        });
-        return `<option value="${l.id}">${l.lot_number} | Cad: ${expDate} | ${formattedQty} ${l.unit} disponible</option>`;
-    }).join('');
-
-    lotSelect.innerHTML = '<option value="">Seleccionar lote...</option>' + lotOptions;
-    lotSelect.disabled = false;
-}
-
-
 function removeShipmentDetail(index) {
     document.getElementById(`detail-${index}`).remove();
     shipmentDetails.splice(index, 1);
@@ -1191,18 +1205,10 @@ async function showShipmentDetails(shipmentId) {
 
 async function showLotModal() {
     try {
-        const products = await api.get('/products');
-        const productOptions = products.map(p =>
-            `<option value="${p.id}" data-unit="${p.storage_unit || 'ud'}">${p.code} - ${p.name}</option>`
-        ).join('');
-
         const content = `
             <div class="form-group">
                 <label class="form-label">Producto *</label>
-                <select id="lot-product" class="form-select" required onchange="updateLotUnit()">
-                    <option value="">Seleccionar producto...</option>
-                    ${productOptions}
-                </select>
+                <select id="lot-product" class="form-select" required></select>
             </div>
             
             <div class="form-group">
@@ -1238,15 +1244,6 @@ async function showLotModal() {
                 <label class="form-label">Notas</label>
                 <textarea id="lot-notes" class="form-textarea" rows="2"></textarea>
             </div>
-            
-            <script>
-                function updateLotUnit() {
-                    const select = document.getElementById('lot-product');
-                    const option = select.options[select.selectedIndex];
-                    const unit = option.getAttribute('data-unit') || '';
-                    document.getElementById('lot-unit').value = unit;
-                }
-            </script>
         `;
 
         showModal('Nuevo Lote', content, async () => {
@@ -1271,28 +1268,24 @@ async function showLotModal() {
             }
         });
 
-        // Initialize searchable select for product
-        initSearchableSelectDelayed('lot-product');
+        initPicker('lot-product', {
+            collection: 'products',
+            label: productPickerLabel,
+            placeholder: 'Seleccionar producto...',
+            onChange: product => {
+                document.getElementById('lot-unit').value = product ? product.storage_unit || 'ud' : '';
+            }
+        });
 
     } catch (error) {
         showMessage('Error cargando productos: ' + error.message, 'error');
     }
 }
 
-// Make updateLotUnit available globally since it's used in inline event
-window.updateLotUnit = function () {
-    const select = document.getElementById('lot-product');
-    const option = select.options[select.selectedIndex];
-    const unit = option.getAttribute('data-unit') || 'ud';
-    document.getElementById('lot-unit').value = unit;
-};
-
 // ========== Reception Forms ==========
 
 async function showReceptionModal() {
     try {
-        const products = await api.get('/products');
-
         // Get today's date in YYYY-MM-DD format
         const today = new Date().toISOString().split('T')[0];
 
@@ -1318,9 +1311,7 @@ async function showReceptionModal() {
             
             <div class="form-group">
                 <label class="form-label">Producto *</label>
-                <select id="reception-product" class="form-select" required disabled>
-                    <option value="">Primero seleccione tipo de producto</option>
-                </select>
+                <select id="reception-product" class="form-select" required></select>
             </div>
             
             <div class="form-row">
@@ -1354,9 +1345,6 @@ async function showReceptionModal() {
             </div>
         `;
 
-        // Store products globally for filtering
-        window._receptionProducts = products;
-
         showModal('Nueva Recepción', content, async () => {
             const receptType = document.getElementById('reception-type').value;
 
@@ -1388,12 +1376,14 @@ async function showReceptionModal() {
                 updateReceptionProgress('Creando lote y generando documento...');
                 const result = await api.post('/receptions', data);
 
-                updateReceptionProgress('Enviando documento por email...');
-                // Small delay to show the email step
-                await new Promise(resolve => setTimeout(resolve, 500));
+                if (!result.queued) {
+                    updateReceptionProgress('Enviando documento por email...');
+                    // Small delay to show the email step
+                    await new Promise(resolve => setTimeout(resolve, 500));
+                }
 
                 hideReceptionProgress();
-                showMessage('Recepción registrada correctamente');
+                showMessage(result.queued ? result.message : 'Recepción registrada correctamente');
                 closeModal();
                 loadReceptions();
             } catch (error) {
@@ -1406,6 +1396,22 @@ async function showReceptionModal() {
         // Initialize searchable selects
         initSearchableSelectDelayed('reception-type');
         initSearchableSelectDelayed('reception-unit');
+        initPicker('reception-product', {
+            collection: 'products',
+            params: () => {
+                const type = document.getElementById('reception-type').value;
+                return type ? { type } : null;
+            },
+            label: productPickerLabel,
+            placeholder: 'Primero seleccione tipo de producto',
+            onChange: product => {
+                // Auto-select the storage unit of raw materials
+                const unitSelect = document.getElementById('reception-unit');
+                if (product && product.type === 'raw_material' && product.storage_unit && unitSelect) {
+                    unitSelect.value = product.storage_unit;
+                }
+            }
+        }).setDisabled(true);
 
     } catch (error) {
         showMessage('Error cargando datos: ' + error.message, 'error');
@@ -1414,26 +1420,13 @@ async function showReceptionModal() {
 
 // Update product dropdown based on type selection
 function updateReceptionProducts() {
-    const typeSelect = document.getElementById('reception-type');
-    const productSelect = document.getElementById('reception-product');
+    const selectedType = document.getElementById('reception-type').value;
+    const productPicker = document.getElementById('reception-product').picker;
     const expirationGroup = document.getElementById('reception-expiration-group');
-    const selectedType = typeSelect.value;
-
-    if (!selectedType) {
-        productSelect.innerHTML = '<option value="">Primero seleccione tipo de producto</option>';
-        productSelect.disabled = true;
-        return;
-    }
 
-    // Filter products by type
-    const filteredProducts = window._receptionProducts.filter(p => p.type === selectedType);
-
-    const productOptions = filteredProducts.map(p =>
-        `<option value="${p.id}" data-unit="${p.storage_unit || 'ud'}">${p.code} - ${p.name}</option>`
-    ).join('');
-
-    productSelect.innerHTML = '<option value="">Seleccionar producto...</option>' + productOptions;
-    productSelect.disabled = false;
+    productPicker.setDisabled(!selectedType);
+    productPicker.reset();
+    if (!selectedType) return;
 
     // Show/hide expiration date based on type
     if (selectedType === 'packaging') {
@@ -1456,38 +1449,8 @@ function updateReceptionProducts() {
         // For raw materials, show dropdown
         unitContainer.innerHTML = getUnitSelector('reception-unit', '', true);
     }
-
-    // Destroy any existing Choices instance first
-    if (productSelect.choicesInstance) {
-        productSelect.choicesInstance.destroy();
-        productSelect.choicesInstance = null;
-    }
-
-    // Initialize searchable select and add change event for auto-selecting unit
-    setTimeout(() => {
-        const choicesInstance = initSearchableSelect('reception-product');
-
-        // Add change event listener for auto-selecting unit (for raw materials)
-        if (selectedType === 'raw_material') {
-            productSelect.addEventListener('change', function () {
-                const selectedProductId = parseInt(this.value);
-                if (selectedProductId) {
-                    // Find the product in our stored list
-                    const product = window._receptionProducts.find(p => p.id === selectedProductId);
-                    if (product && product.storage_unit) {
-                        const unitSelect = document.getElementById('reception-unit');
-                        if (unitSelect) {
-                            unitSelect.value = product.storage_unit;
-                        }
-                    }
-                }
-            });
-        }
-    }, 50);
 }
 
-// Helper function removed - logic now inline in filterReceptionProducts
-
 // ========== Reception Progress Overlay ==========
 
 function showReceptionProgress(message) {
@@ -1655,30 +1618,11 @@ async function showReturnModal() {
     returnDetails = [];
 
     try {
-        // Fetch customers, products, lots, and next number
-        const [customers, products, lots, nextNumberData] = await Promise.all([
-            api.get('/customers'),
-            api.get('/products?type=finished_product'),
-            api.get('/lots'),
-            api.get('/returns/next-number')
-        ]);
-
-        const customerOptions = customers.map(c =>
-            `<option value="${c.id}">${c.code} - ${c.name}</option>`
-        ).join('');
-
-        const productOptions = products.map(p =>
-            `<option value="${p.id}">${p.code} - ${p.name}</option>`
-        ).join('');
+        const nextNumberData = await api.get('/returns/next-number');
 
         const today = new Date().toISOString().split('T')[0];
         const nextReturnNumber = nextNumberData ? nextNumberData.next_number : '';
 
-        // Store lots globally for filtering - include all finished product lots (even with 0 stock)
-        window._returnLots = lots.filter(l => l.product?.type === 'finished_product');
-        window._returnProducts = products;
-        window._returnProductOptions = productOptions;
-
         const content = `
             <div class="form-row">
                 <div class="form-group">
@@ -1694,10 +1638,7 @@ async function showReturnModal() {
             
             <div class="form-group">
                 <label class="form-label">Cliente</label>
-                <select id="return-customer" class="form-select">
-                    <option value="">Sin cliente (Devolución interna)</option>
-                    ${customerOptions}
-                </select>
+                <select id="return-customer" class="form-select"></select>
                 <small style="color: var(--gray-500);">Opcional - dejar vacío para devoluciones internas</small>
             </div>
             
@@ -1776,7 +1717,11 @@ async function showReturnModal() {
         });
 
         // Initialize searchable selects
-        initSearchableSelectDelayed('return-customer');
+        initPicker('return-customer', {
+            collection: 'customers',
+            label: customer => `${customer.code} - ${customer.name}`,
+            placeholder: 'Sin cliente (Devolución interna)'
+        });
         initSearchableSelectDelayed('return-reason');
 
         // Add first row
@@ -1792,20 +1737,14 @@ let returnDetailIndex = 0;
 function addReturnDetailRow() {
     const index = returnDetailIndex++;
     const container = document.getElementById('return-details-container');
-    const productOptions = window._returnProductOptions || '';
 
     const rowHtml = `
         <div class="return-detail-row" id="return-row-${index}" style="display: flex; gap: 0.5rem; align-items: center; margin-bottom: 0.75rem; padding: 0.5rem; background: var(--gray-50); border-radius: 6px;">
             <div class="form-group" style="margin: 0; flex: 1.2;">
-                <select class="form-select" id="return-product-${index}" onchange="updateReturnLotOptions(${index})">
-                    <option value="">Producto...</option>
-                    ${productOptions}
-                </select>
+                <select class="form-select" id="return-product-${index}"></select>
             </div>
             <div class="form-group" style="margin: 0; flex: 1.5;">
-                <select class="form-select" id="return-lot-${index}" disabled>
-                    <option value="">Primero seleccione producto</option>
-                </select>
+                <select class="form-select" id="return-lot-${index}"></select>
             </div>
             <div class="form-group" style="margin: 0; width: 100px;">
                 <input type="number" class="form-input" id="return-qty-${index}" placeholder="Cant." step="1" min="1">
@@ -1822,48 +1761,34 @@ function addReturnDetailRow() {
 
     container.insertAdjacentHTML('beforeend', rowHtml);
 
-    // Initialize searchable select
-    initSearchableSelect(`return-product-${index}`);
+    initPicker(`return-product-${index}`, {
+        collection: 'products',
+        params: () => ({ type: 'finished_product' }),
+        label: productPickerLabel,
+        placeholder: 'Producto...',
+        onChange: product => {
+            const lotPicker = document.getElementById(`return-lot-${index}`).picker;
+            lotPicker.setDisabled(!product);
+            lotPicker.reset();
+        }
+    });
+    // All lots of the product, even with 0 stock: they may have been shipped
+    initPicker(`return-lot-${index}`, {
+        collection: 'lots',
+        params: () => {
+            const product = document.getElementById(`return-product-${index}`).picker?.selected;
+            return product ? { product_id: product.id } : null;
+        },
+        label: lot => lotPickerLabel(lot),
+        placeholder: 'Primero seleccione producto',
+        empty: 'No hay lotes disponibles'
+    }).setDisabled(true);
 }
 
 function removeReturnDetailRow(index) {
     document.getElementById(`return-row-${index}`)?.remove();
 }
 
-function updateReturnLotOptions(index) {
-    const productSelect = document.getElementById(`return-product-${index}`);
-    const lotSelect = document.getElementById(`return-lot-${index}`);
-    const selectedProductId = parseInt(productSelect.value);
-
-    if (!selectedProductId) {
-        lotSelect.innerHTML = '<option value="">Primero seleccione producto</option>';
-        lotSelect.disabled = true;
-        return;
-    }
-
-    // Filter lots for selected product
-    const productLots = window._returnLots.filter(l => l.product_id === selectedProductId);
-
-    if (productLots.length === 0) {
-        lotSelect.innerHTML = '<option value="">No hay lotes disponibles</option>';
-        lotSelect.disabled = true;
-        return;
-    }
-
-    // Generate lot options
-    const lotOptions = productLots.map(l => {
-        const expDate = l.expiration_date ? new Date(l.expiration_date).toLocaleDateString('es-ES') : 'Sin cad.';
-        const formattedQty = l.current_quantity.toLocaleString('es-ES', {
-            minimumFractionDigits: 0,
-            maximumFractionDigits: 0
-        });
-        return `<option value="${l.id}">Lote: ${l.lot_number} | Cad: ${expDate} | ${formattedQty} ${l.unit}</option>`;
-    }).join('');
-
-    lotSelect.innerHTML = '<option value="">Seleccionar lote...</option>' + lotOptions;
-    lotSelect.disabled = false;
-}
-
 // ========== Stock Transfer (Location) ==========
 
 async function showTransferModal(lotId) {
@@ -1938,17 +1863,21 @@ async function showTransferModal(lotId) {
                 return;
             }
 
+            const fromSelect = document.getElementById('transfer-from');
+
             try {
-                await api.post('/locations/transfer', {
+                const result = await api.post('/locations/transfer', {
                     lot_id: lotId,
                     from_location_id: parseInt(fromLocationId),
                     to_location_id: parseInt(toLocationId),
                     quantity: quantity,
+                    // Stock seen in the origin: the transfer is rejected if it changed meanwhile
+                    expected_quantity: parseFloat(fromSelect.options[fromSelect.selectedIndex].dataset.qty),
                     notes: notes
                 });
 
                 closeModal();
-                showMessage('Transferencia realizada correctamente', 'success');
+                showMessage(result.queued ? result.message : 'Transferencia realizada correctamente', 'success');
 
                 // Reload inventory if we're on that page
                 if (typeof loadInventory === 'function') {
@@ -3,37 +3,95 @@
 // ============================================
 
 const API_BASE = '/api';
+const API_CACHE_SIZE = 200;  // Responses kept for revalidation; every page of a table is one entry
 
 // ========== State Management ==========
 const app = {
     currentView: 'dashboard',
     data: {
         products: [],
-        lots: [],
         customers: [],
         alerts: []
-    }
+    },
+    // Virtualized tables of the views (tables.js), by view name
+    tables: {}
 };
 
 // ========== API Client ==========
 const api = {
+    // endpoint -> { etag, body } of the last response that carried an ETag
+    cache: new Map(),
+
     async get(endpoint) {
-        const response = await fetch(`${API_BASE}${endpoint}`);
+        // Lists the local replica can answer are rendered at once and checked in the background
+        const local = replica.read(endpoint);
+        if (local) {
+            replica.revalidate();
+            return local;
+        }
+
+        const cached = this.cache.get(endpoint);
+        const headers = cached ? { 'If-None-Match': cached.etag } : {};
+        let response;
+        try {
+            // The validators are handled here, so the browser cache stays out of the way
+            response = await fetch(`${API_BASE}${endpoint}`, { headers, cache: 'no-store' });
+        } catch (error) {
+            return this.offlineFallback(endpoint, error);
+        }
+        if (isOfflineStatus(response.status)) return this.offlineFallback(endpoint, new Error('Sin conexión con el servidor'));
+        if (response.status === 304 && cached) return JSON.parse(cached.body);
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-        return await response.json();
+
+        const body = await response.text();
+        const etag = response.headers.get('ETag');
+        if (etag) {
+            // Least recently stored first: drop the oldest ones
+            this.cache.delete(endpoint);
+            this.cache.set(endpoint, { etag, body });
+            while (this.cache.size > API_CACHE_SIZE) this.cache.delete(this.cache.keys().next().value);
+        } else {
+            this.cache.delete(endpoint);
+        }
+        // Parsed on every call: callers may modify the objects they receive
+        return JSON.parse(body);
+    },
+
+    // Last known answer of an endpoint while the server cannot be reached
+    offlineFallback(endpoint, error) {
+        const cached = this.cache.get(endpoint);
+        if (cached) return JSON.parse(cached.body);
+        const local = replica.readDetail(endpoint);
+        if (local) return local;
+        throw error;
     },
 
     async post(endpoint, data) {
-        const response = await fetch(`${API_BASE}${endpoint}`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(data)
-        });
+        // Writes made while others wait in the queue go after them
+        if (writeQueue.accepts(endpoint) && writeQueue.pending().length) {
+            const result = await writeQueue.enqueue(endpoint, data);
+            writeQueue.replay();
+            return result;
+        }
+        let response;
+        try {
+            response = await fetch(`${API_BASE}${endpoint}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(data)
+            });
+        } catch (error) {
+            if (writeQueue.accepts(endpoint)) return writeQueue.enqueue(endpoint, data);
+            throw error;
+        }
+        if (isOfflineStatus(response.status) && writeQueue.accepts(endpoint)) return writeQueue.enqueue(endpoint, data);
         if (!response.ok) {
             const error = await response.json();
             throw new Error(error.error || 'Error en la solicitud');
         }
-        return await response.json();
+        const result = await response.json();
+        await replica.afterWrite();
+        return result;
     },
 
     async put(endpoint, data) {
@@ -46,7 +104,9 @@ const api = {
             const error = await response.json();
             throw new Error(error.error || 'Error en la solicitud');
         }
-        return await response.json();
+        const result = await response.json();
+        await replica.afterWrite();
+        return result;
     },
 
     async delete(endpoint) {
@@ -54,7 +114,9 @@ const api = {
             method: 'DELETE'
         });
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-        return await response.json();
+        const result = await response.json();
+        await replica.afterWrite();
+        return result;
     }
 };
 
@@ -252,7 +314,7 @@ function renderLots() {
             <div class="card">
                 <div class="card-body">
                     <div class="filters" style="margin-bottom: 1rem;">
-                        <input type="text" id="lot-search" class="form-input" placeholder="Buscar por lote, código o nombre de artículo..." style="max-width: 500px; width: 100%;" oninput="loadLots()">
+                        <input type="text" id="lot-search" class="form-input" placeholder="Buscar por lote, código o nombre de artículo..." style="max-width: 500px; width: 100%;" oninput="searchLots()">
                     </div>
                     <div id="lots-table"></div>
                 </div>
@@ -265,20 +327,24 @@ function renderLots() {
 function renderMovements() {
     return `
         <div>
-            <h2 style="font-size: 1.875rem; font-weight: 700; margin-bottom: 1.5rem;">Movimientos de Stock</h2>
+            <div class="flex items-center justify-between mb-4">
+                <h2 style="font-size: 1.875rem; font-weight: 700;">Movimientos de Stock</h2>
+                <div>
+                    <button class="btn btn-secondary" onclick="downloadExport('movements', movementsParams(), 'csv')">Exportar CSV</button>
+                    <button class="btn btn-secondary" onclick="downloadExport('movements', movementsParams(), 'xlsx')">Exportar Excel</button>
+                </div>
+            </div>
             
             <div class="card">
                 <div class="card-body">
                     <div class="flex flex-wrap gap-4 mb-4" style="display: flex; flex-wrap: wrap; gap: 1rem; margin-bottom: 1rem;">
                         <div class="form-group" style="flex: 1; min-width: 200px; margin: 0;">
                             <label class="form-label" style="font-size: 0.875rem;">Producto</label>
-                            <select id="movements-product-filter" class="form-select" onchange="loadAllMovements()">
-                                <option value="">Todos los productos</option>
-                            </select>
+                            <select id="movements-product-filter" class="form-select"></select>
                         </div>
                         <div class="form-group" style="flex: 1; min-width: 150px; margin: 0;">
                             <label class="form-label" style="font-size: 0.875rem;">Lote</label>
-                            <input type="text" id="movements-lot-filter" class="form-input" placeholder="Buscar lote..." oninput="loadAllMovements()">
+                            <input type="text" id="movements-lot-filter" class="form-input" placeholder="Buscar lote..." oninput="searchMovements()">
                         </div>
                         <div class="form-group" style="flex: 1; min-width: 150px; margin: 0;">
                             <label class="form-label" style="font-size: 0.875rem;">Tipo</label>
@@ -291,9 +357,7 @@ function renderMovements() {
                             </select>
                         </div>
                     </div>
-                    <div id="movements-table-container">
-                        <p class="text-center" style="color: var(--gray-500); padding: 2rem;">Cargando movimientos...</p>
-                    </div>
+                    <div id="movements-table-container"></div>
                 </div>
             </div>
         </div>
@@ -313,78 +377,55 @@ function renderReceptions() {
                     <h3 class="card-title">Recepciones Recientes</h3>
                 </div>
                 <div class="card-body">
-                    <div id="receptions-table">
-                        <p class="text-center" style="color: var(--gray-500); padding: 2rem;">Cargando recepciones...</p>
+                    <div class="filters" style="margin-bottom: 1rem;">
+                        <input type="text" id="reception-search" class="form-input" placeholder="Buscar por lote, código o nombre de artículo..." style="max-width: 500px; width: 100%;" oninput="searchReceptions()">
                     </div>
+                    <div id="receptions-table"></div>
                 </div>
             </div>
         </div>
     `;
 }
 
-async function loadReceptions() {
-    try {
-        const receptions = await api.get('/receptions');
-        const tableContainer = document.getElementById('receptions-table');
-
-        if (receptions.length === 0) {
-            tableContainer.innerHTML = '<p class="text-center" style="color: var(--gray-500); padding: 2rem;">No hay recepciones registradas</p>';
-            return;
-        }
-
-        const html = `
-            <div class="table-container">
-                <table class="table">
-                    <thead>
-                        <tr>
-                            <th>Fecha</th>
-                            <th>Producto</th>
-                            <th>Tipo</th>
-                            <th>Lote</th>
-                            <th>Cantidad</th>
-                            <th>Estado</th>
-                            <th>Proveedor</th>
-                            <th>Acciones</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        ${receptions.map(r => `
-                            <tr>
-                                <td>${formatDate(r.manufacturing_date)}</td>
-                                <td style="font-weight: 500;">${r.product?.name || '-'}</td>
-                                <td>${getProductTypeLabel(r.product?.type)}</td>
-                                <td style="font-family: monospace;">${r.lot_number}</td>
-                                <td>${formatQuantity(r.current_quantity, r.unit)} ${r.unit}</td>
-                                <td>${r.blocked ? '<span class="badge badge-danger">Bloqueado</span>' : '<span class="badge badge-success">Liberado</span>'}</td>
-                                <td>${r.supplier || '-'}</td>
-                                <td>
-                                    <button class="btn btn-sm" style="background: transparent; border: none; color: var(--gray-400); padding: 6px; border-radius: 6px; transition: all 0.2s ease;" 
-                                            onmouseover="this.style.background='#fee2e2'; this.style.color='#dc2626';" 
-                                            onmouseout="this.style.background='transparent'; this.style.color='var(--gray-400)';" 
-                                            onclick="deleteLot(${r.id})" title="Eliminar">
-                                        <svg width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
-                                            <polyline points="3 6 5 6 21 6"></polyline>
-                                            <path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"></path>
-                                            <line x1="10" y1="11" x2="10" y2="17"></line>
-                                            <line x1="14" y1="11" x2="14" y2="17"></line>
-                                        </svg>
-                                    </button>
-                                </td>
-                            </tr>
-                        `).join('')}
-                    </tbody>
-                </table>
-            </div>
-        `;
+function receptionsTable() {
+    return mountTable('receptions', 'receptions-table', {
+        endpoint: '/receptions',
+        params: () => ({ q: document.getElementById('reception-search')?.value || '' }),
+        empty: 'No hay recepciones registradas',
+        columns: [
+            { label: 'Fecha', sort: 'manufacturing_date', render: r => formatDate(r.manufacturing_date) },
+            { label: 'Producto', width: '1.4fr', sort: 'product', render: r => `<span style="font-weight: 500;">${r.product?.name || '-'}</span>` },
+            { label: 'Tipo', render: r => getProductTypeLabel(r.product?.type) },
+            { label: 'Lote', sort: 'lot_number', render: r => `<span style="font-family: monospace;">${r.lot_number}</span>` },
+            { label: 'Cantidad', sort: 'current_quantity', render: r => `${formatQuantity(r.current_quantity, r.unit)} ${r.unit}` },
+            { label: 'Estado', render: r => r.blocked ? '<span class="badge badge-danger">Bloqueado</span>' : '<span class="badge badge-success">Liberado</span>' },
+            { label: 'Proveedor', render: r => r.supplier || '-' },
+            {
+                label: 'Acciones', width: '90px', render: r => `
+                    <button class="btn btn-sm" style="background: transparent; border: none; color: var(--gray-400); padding: 6px; border-radius: 6px; transition: all 0.2s ease;" 
+                            onmouseover="this.style.background='#fee2e2'; this.style.color='#dc2626';" 
+                            onmouseout="this.style.background='transparent'; this.style.color='var(--gray-400)';" 
+                            onclick="deleteLot(${r.id})" title="Eliminar">
+                        <svg width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+                            <polyline points="3 6 5 6 21 6"></polyline>
+                            <path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"></path>
+                            <line x1="10" y1="11" x2="10" y2="17"></line>
+                            <line x1="14" y1="11" x2="14" y2="17"></line>
+                        </svg>
+                    </button>
+                `
+            }
+        ]
+    });
+}
 
-        tableContainer.innerHTML = html;
-    } catch (error) {
-        console.error('Error loading receptions:', error);
-        document.getElementById('receptions-table').innerHTML =
-            `<p class="text-center" style="color: var(--danger-500); padding: 2rem;">Error al cargar recepciones: ${error.message}</p>`;
-    }
+// Newest first unless a column is sorted
+function loadReceptions() {
+    receptionsTable()?.reload();
 }
 
+const searchReceptions = debounce(loadReceptions);
+
 function extractSupplier(notes) {
     if (!notes) return '-';
     const match = notes.match(/Recepción de ([^.]+)/);
@@ -489,9 +530,7 @@ async function deleteLot(lotId) {
         await api.delete(`/lots/${lotId}`);
         showMessage('Lote eliminado correctamente');
         // Refresh the current view
-        if (typeof loadReceptions === 'function') loadReceptions();
-        if (typeof loadLots === 'function') loadLots();
-        if (typeof loadInventory === 'function') loadInventory();
+        refreshTable(app.currentView);
     } catch (error) {
         showMessage(error.message, 'error');
     }
@@ -499,100 +538,66 @@ async function deleteLot(lotId) {
 
 
 
-async function loadAllMovements() {
-    try {
-        // Load products into dropdown if empty
-        const productSelect = document.getElementById('movements-product-filter');
-        if (productSelect && productSelect.options.length <= 1) {
-            const products = await api.get('/products');
-            products.forEach(p => {
-                const option = document.createElement('option');
-                option.value = p.id;
-                option.textContent = `${p.code} - ${p.name}`;
-                productSelect.appendChild(option);
-            });
-        }
-
-        // Get filter values
-        const productId = document.getElementById('movements-product-filter')?.value || '';
-        const lotSearch = document.getElementById('movements-lot-filter')?.value?.toLowerCase() || '';
-        const typeFilter = document.getElementById('movements-type-filter')?.value || '';
-
-        // Load all movements
-        const movements = await api.get('/movements');
-
-        // Apply filters client-side
-        const filteredMovements = movements.filter(m => {
-            // Product filter
-            if (productId && m.lot?.product_id != productId) return false;
-
-            // Lot filter
-            if (lotSearch && !m.lot?.lot_number?.toLowerCase().includes(lotSearch)) return false;
-
-            // Type filter
-            if (typeFilter && m.movement_type !== typeFilter) return false;
-
-            return true;
-        });
-
-        renderMovementsTable(filteredMovements);
-    } catch (error) {
-        console.error('Error loading movements:', error);
-        document.getElementById('movements-table-container').innerHTML =
-            `<p class="text-center" style="color: var(--danger-500); padding: 2rem;">Error al cargar movimientos: ${error.message}</p>`;
-    }
+// Exports stream from the server straight into a download (routes/exports.py)
+function downloadExport(path, params, format) {
+    const query = new URLSearchParams({ ...params, format });
+    for (const [key, value] of [...query]) if (value === '') query.delete(key);
+    window.location.href = `${API_BASE}/exports/${path}?${query}`;
 }
 
-function renderMovementsTable(movements) {
-    const container = document.getElementById('movements-table-container');
-
-    if (movements.length === 0) {
-        container.innerHTML = '<p class="text-center" style="color: var(--gray-500); padding: 2rem;">No hay movimientos registrados</p>';
-        return;
-    }
+function movementsParams() {
+    return {
+        product_id: document.getElementById('movements-product-filter')?.value || '',
+        lot_number: document.getElementById('movements-lot-filter')?.value || '',
+        type: document.getElementById('movements-type-filter')?.value || ''
+    };
+}
 
-    const html = `
-        <div class="table-container">
-            <table class="table">
-                <thead>
-                    <tr>
-                        <th>Fecha</th>
-                        <th>Producto</th>
-                        <th>Lote</th>
-                        <th>Tipo</th>
-                        <th>Cantidad</th>
-                        <th>Notas</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    ${movements.map(m => `
-                        <tr>
-                            <td>${new Date(m.movement_date).toLocaleString('es-ES')}</td>
-                            <td style="font-weight: 500;">${m.lot && m.lot.product ? m.lot.product.name : 'Desconocido'}</td>
-                            <td style="font-family: monospace;">${m.lot ? m.lot.lot_number : '-'}</td>
-                            <td>
-                                <span class="badge ${getMovementBadgeClass(m.movement_type, m.quantity)}">
-                                    ${getPaymentTypeLabel(m.movement_type, m.quantity)}
-                                </span>
-                            </td>
-                            <td>${formatQuantity(m.quantity, m.lot ? m.lot.unit : '')} ${m.lot ? m.lot.unit : ''}</td>
-                            <td>${m.notes || '-'}</td>
-                        </tr>
-                    `).join('')}
-                </tbody>
-            </table>
-        </div>
-    `;
+function movementsTable() {
+    return mountTable('movements', 'movements-table-container', {
+        endpoint: '/movements',
+        params: movementsParams,
+        empty: 'No hay movimientos registrados',
+        columns: [
+            { label: 'Fecha', sort: 'movement_date', render: m => new Date(m.movement_date).toLocaleString('es-ES') },
+            { label: 'Producto', width: '1.4fr', sort: 'product', render: m => `<span style="font-weight: 500;">${m.lot?.product?.name || 'Desconocido'}</span>` },
+            { label: 'Lote', sort: 'lot_number', render: m => `<span style="font-family: monospace;">${m.lot?.lot_number || '-'}</span>` },
+            {
+                label: 'Tipo', sort: 'movement_type', render: m => `
+                    <span class="badge ${getMovementBadgeClass(m.movement_type, m.quantity)}">${getPaymentTypeLabel(m.movement_type, m.quantity)}</span>
+                `
+            },
+            { label: 'Cantidad', sort: 'quantity', render: m => `${formatQuantity(m.quantity, m.lot?.unit || '')} ${m.lot?.unit || ''}` },
+            { label: 'Notas', width: '1.6fr', render: m => `<span title="${(m.notes || '').replace(/"/g, '&quot;')}">${m.notes || '-'}</span>` }
+        ]
+    });
+}
 
-    container.innerHTML = html;
+// Newest first unless a column is sorted; the filters are applied by the server
+function loadAllMovements() {
+    initPicker('movements-product-filter', {
+        collection: 'products',
+        label: productPickerLabel,
+        placeholder: 'Todos los productos',
+        onChange: () => loadAllMovements()
+    });
+    movementsTable()?.reload();
 }
 
+const searchMovements = debounce(loadAllMovements);
+
 let currentInventoryTab = 'raw_material';
 
 function renderInventory() {
     return `
         <div>
-            <h2 style="font-size: 1.875rem; font-weight: 700; margin-bottom: 1.5rem;">Inventario Actual</h2>
+            <div class="flex items-center justify-between mb-4">
+                <h2 style="font-size: 1.875rem; font-weight: 700;">Inventario Actual</h2>
+                <div>
+                    <button class="btn btn-secondary" onclick="downloadExport('inventory', inventoryParams(), 'csv')">Exportar CSV</button>
+                    <button class="btn btn-secondary" onclick="downloadExport('inventory', inventoryParams(), 'xlsx')">Exportar Excel</button>
+                </div>
+            </div>
             
             <div class="card">
                 <div class="card-header" style="padding-bottom: 0;">
@@ -616,12 +621,13 @@ function renderInventory() {
                                 <option value="low_stock">Bajo Mínimo</option>
                                 <option value="expiring_soon">Por Caducar (< 3 Meses)</option>
                                 <option value="expired">Caducados</option>
+                                <option value="blocked">Bloqueados</option>
                             </select>
                         </div>
                         <div class="search-bar" style="flex: 1; max-width: 300px; margin-left: auto;">
                             <span class="search-icon">🔍</span>
                             <input type="text" id="inventory-search" class="form-input search-input" 
-                                   placeholder="Buscar por referencia, nombre o lote..." oninput="loadInventory()">
+                                   placeholder="Buscar por referencia, nombre o lote..." oninput="searchInventory()">
                         </div>
                     </div>
                     
@@ -676,25 +682,25 @@ function renderTraceability() {
 
 // ========== Data Loading ==========
 
+function updateAlertsBadge(unreadCount) {
+    const badge = document.getElementById('alerts-count');
+    if (unreadCount > 0) {
+        badge.textContent = unreadCount;
+        badge.classList.remove('hidden');
+    } else {
+        badge.classList.add('hidden');
+    }
+}
+
 async function loadDashboard() {
     try {
-        // Auto-regenerate alerts each time dashboard loads
-        await api.post('/alerts/generate', {});
-
-        // Load alerts
+        // Load alerts (regenerated in the background by the scheduler)
         const alerts = await api.get('/alerts?is_dismissed=false');
         app.data.alerts = alerts;
 
 
         // Update badge
-        const unreadCount = alerts.filter(a => !a.is_read).length;
-        const badge = document.getElementById('alerts-count');
-        if (unreadCount > 0) {
-            badge.textContent = unreadCount;
-            badge.classList.remove('hidden');
-        } else {
-            badge.classList.add('hidden');
-        }
+        updateAlertsBadge(alerts.filter(a => !a.is_read).length);
 
         // Load products and check which ones are below minimum - segregated by type
         const products = await api.get('/products?with_alerts=true');
@@ -714,72 +720,16 @@ async function loadDashboard() {
         document.getElementById('low-stock-packaging').textContent = lowStockPackaging;
         document.getElementById('low-stock-finished').textContent = lowStockFinished;
 
-        // Load lots and check expiration - segregated by type
-        const allLots = await api.get('/inventory?available_only=false');
-        const today = new Date();
-        today.setHours(0, 0, 0, 0);
-        const threeMonthsFromNow = new Date();
-        threeMonthsFromNow.setMonth(today.getMonth() + 3);
-
-        // Counters for expiring soon by type
-        let expiringRawMaterial = 0;
-        let expiringPackaging = 0;
-        let expiringFinished = 0;
-
-        // Counters for expired by type
-        let expiredRawMaterial = 0;
-        let expiredPackaging = 0;
-        let expiredFinished = 0;
-
-        // Counters for blocked by type
-        let blockedRawMaterial = 0;
-        let blockedPackaging = 0;
-        let blockedFinished = 0;
-
-        allLots.forEach(lot => {
-            const productType = lot.product?.type;
-
-            // Count blocked lots
-            if (lot.blocked && lot.current_quantity > 0) {
-                if (productType === 'raw_material') blockedRawMaterial++;
-                else if (productType === 'packaging') blockedPackaging++;
-                else if (productType === 'finished_product') blockedFinished++;
-            }
-
-            // Count expiration status
-            if (lot.expiration_date && lot.current_quantity > 0) {
-                const expDate = new Date(lot.expiration_date);
-                expDate.setHours(0, 0, 0, 0);
-
-                if (expDate < today) {
-                    // Expired
-                    if (productType === 'raw_material') expiredRawMaterial++;
-                    else if (productType === 'packaging') expiredPackaging++;
-                    else if (productType === 'finished_product') expiredFinished++;
-                } else if (expDate <= threeMonthsFromNow) {
-                    // Expiring soon
-                    if (productType === 'raw_material') expiringRawMaterial++;
-                    else if (productType === 'packaging') expiringPackaging++;
-                    else if (productType === 'finished_product') expiringFinished++;
-                }
-            }
+        // Lot counts by type (blocked, expired and expiring within three months), computed by the server
+        const aging = await api.get('/reports/aging');
+        const types = { 'raw_material': 'raw-material', 'packaging': 'packaging', 'finished_product': 'finished' };
+        Object.entries(types).forEach(([type, suffix]) => {
+            const counts = aging.summary[type] || { blocked: 0, expired: 0, expiring_soon: 0 };
+            document.getElementById(`expiring-${suffix}`).textContent = counts.expiring_soon;
+            document.getElementById(`expired-${suffix}`).textContent = counts.expired;
+            document.getElementById(`blocked-${suffix}`).textContent = counts.blocked;
         });
 
-        // Update expiring soon counters
-        document.getElementById('expiring-raw-material').textContent = expiringRawMaterial;
-        document.getElementById('expiring-packaging').textContent = expiringPackaging;
-        document.getElementById('expiring-finished').textContent = expiringFinished;
-
-        // Update expired counters
-        document.getElementById('expired-raw-material').textContent = expiredRawMaterial;
-        document.getElementById('expired-packaging').textContent = expiredPackaging;
-        document.getElementById('expired-finished').textContent = expiredFinished;
-
-        // Update blocked counters
-        document.getElementById('blocked-raw-material').textContent = blockedRawMaterial;
-        document.getElementById('blocked-packaging').textContent = blockedPackaging;
-        document.getElementById('blocked-finished').textContent = blockedFinished;
-
         // Render alerts list
         renderAlertsList(alerts);
 
@@ -926,154 +876,41 @@ function editProduct(product) {
     showProductModal(product);
 }
 
-async function loadLots() {
-    try {
-        const search = document.getElementById('lot-search')?.value?.toLowerCase() || '';
-
-        // Get all lots from API
-        const lots = await api.get('/lots');
-        app.data.lots = lots;
-
-        // Filter by search term (lot number, product code, or product name)
-        const filteredLots = search
-            ? lots.filter(lot =>
-                lot.lot_number.toLowerCase().includes(search) ||
-                (lot.product?.code?.toLowerCase().includes(search)) ||
-                (lot.product?.name?.toLowerCase().includes(search))
-            )
-            : lots;
-
-        // Group and sort lots
-        const groups = groupLotsByProductForLotsView(filteredLots);
-        renderLotsTable(groups);
-    } catch (error) {
-        console.error('Error loading lots:', error);
-    }
-}
-
-function groupLotsByProductForLotsView(lots) {
-    const groups = {};
-
-    lots.forEach(lot => {
-        // Handle lots without product (shouldn't happen but safe to handle)
-        const prodId = lot.product_id || 'unknown';
-        if (!groups[prodId]) {
-            groups[prodId] = {
-                product: lot.product || { name: 'Producto Desconocido', code: '???' },
-                lots: []
-            };
-        }
-        groups[prodId].lots.push(lot);
-    });
-
-    // Sort groups by product name
-    const sortedGroups = Object.values(groups).sort((a, b) =>
-        a.product.name.localeCompare(b.product.name)
-    );
-
-    // Sort lots within each group
-    sortedGroups.forEach(group => {
-        group.lots.sort((a, b) => {
-            // Priority 1: Has Expiration Date vs No Expiration Date
-            const aHasExp = !!a.expiration_date;
-            const bHasExp = !!b.expiration_date;
-
-            if (aHasExp && bHasExp) {
-                // Both have expiration: FEFO - earliest expiration first
-                return new Date(a.expiration_date) - new Date(b.expiration_date);
-            }
-
-            if (aHasExp && !bHasExp) return -1; // Expiration first
-            if (!aHasExp && bHasExp) return 1;
-
-            // Priority 2: If no expiration (packaging), FIFO - oldest first
-            const dateA = new Date(a.created_at || a.manufacturing_date);
-            const dateB = new Date(b.created_at || b.manufacturing_date);
-
-            // Handle cases where dates might be invalid or missing
-            if (isNaN(dateA.getTime()) && isNaN(dateB.getTime())) {
-                return 0; // Both invalid/missing, consider equal
-            }
-            if (isNaN(dateA.getTime())) {
-                return 1; // 'a' is invalid, 'b' comes first
-            }
-            if (isNaN(dateB.getTime())) {
-                return -1; // 'b' is invalid, 'a' comes first
+function lotsTable() {
+    return mountTable('lots', 'lots-table', {
+        endpoint: '/lots',
+        params: () => ({ q: document.getElementById('lot-search')?.value || '' }),
+        empty: 'No se encontraron lotes',
+        columns: [
+            { label: 'Código', width: '0.7fr', sort: 'product', render: lot => `<span style="font-weight: 600; color: var(--primary-700); font-family: monospace;">${lot.product?.code || '-'}</span>` },
+            { label: 'Producto', width: '1.4fr', sort: 'product', render: lot => lot.product?.name || '-' },
+            { label: 'Número Lote', sort: 'lot_number', render: lot => `<span style="font-weight: 500; font-family: monospace;">${lot.lot_number}</span>` },
+            { label: 'Fabricación', sort: 'manufacturing_date', render: lot => formatDate(lot.manufacturing_date) },
+            { label: 'Caducidad', sort: 'expiration_date', render: lot => formatDate(lot.expiration_date) },
+            { label: 'Stock Actual', sort: 'current_quantity', render: lot => `${formatQuantity(lot.current_quantity, lot.unit)} ${lot.unit}` },
+            { label: 'Disponibilidad', render: lot => getAvailabilityBadge(lot.is_available) },
+            { label: 'Estado', render: lot => getStatusBadge(lot.status) },
+            {
+                label: 'Acciones', width: '260px', render: lot => `
+                    <button class="btn btn-sm btn-info" style="padding: 0.2rem 0.5rem; font-size: 0.75rem; margin-right: 0.25rem;"
+                            onclick="showLotMovements(${lot.id})">Movimientos</button>
+                    <button class="btn btn-sm btn-secondary" style="padding: 0.2rem 0.5rem; font-size: 0.75rem; margin-right: 0.25rem;"
+                            onclick="showTransferModal(${lot.id})">Transferir</button>
+                    <button class="btn btn-sm ${lot.blocked ? 'btn-success' : 'btn-danger'}" style="padding: 0.2rem 0.5rem; font-size: 0.75rem;"
+                            onclick="toggleLotBlock(${lot.id})">${lot.blocked ? 'Desbloquear' : 'Bloquear'}</button>
+                `
             }
-
-            return dateA.getTime() - dateB.getTime(); // FIFO: Ascending (oldest first)
-        });
+        ]
     });
-
-    return sortedGroups;
 }
 
-function renderLotsTable(groups) {
-    const container = document.getElementById('lots-table');
-
-    if (groups.length === 0) {
-        container.innerHTML = '<p class="text-center" style="color: var(--gray-500); padding: 2rem;">No se encontraron lotes</p>';
-        return;
-    }
-
-    const html = groups.map(group => {
-        const p = group.product;
-        return `
-            <div class="product-group">
-                <div class="product-header" onclick="toggleProductGroup(this)">
-                    <div style="font-weight: 600; color: var(--primary-700); font-family: monospace;">${p.code}</div>
-                    <div style="font-weight: 500;">${p.name}</div>
-                    <div class="text-right" style="font-size: 0.875rem; color: var(--gray-500);">
-                        ${group.lots.length} Lote(s)
-                    </div>
-                    <div class="text-center toggle-icon">▼</div>
-                </div>
-                
-                <div class="lots-container">
-                    <div class="lot-header" style="grid-template-columns: 1fr 1fr 1fr 1fr 1fr 1fr 180px;">
-                        <div>Número Lote</div>
-                        <div>Fabricación</div>
-                        <div>Caducidad</div>
-                        <div>Stock Actual</div>
-                        <div>Disponibilidad</div>
-                        <div>Estado</div>
-                        <div>Acciones</div>
-                    </div>
-                    ${group.lots.map(lot => `
-                        <div class="lot-row" style="grid-template-columns: 1fr 1fr 1fr 1fr 1fr 1fr 180px;">
-                            <div style="font-weight: 500; font-family: monospace;">${lot.lot_number}</div>
-                            <div>${formatDate(lot.manufacturing_date)}</div>
-                            <div>${formatDate(lot.expiration_date)}</div>
-                            <div>${formatQuantity(lot.current_quantity, lot.unit)} ${lot.unit}</div>
-                            <div>${getAvailabilityBadge(lot.is_available)}</div>
-                            <div>${getStatusBadge(lot.status)}</div>
-                            <div>
-                                <button class="btn btn-sm btn-info" 
-                                        style="padding: 0.2rem 0.5rem; font-size: 0.75rem; margin-right: 0.25rem;"
-                                        onclick="showLotMovements(${lot.id})">
-                                    Movimientos
-                                </button>
-                                <button class="btn btn-sm btn-secondary" 
-                                        style="padding: 0.2rem 0.5rem; font-size: 0.75rem; margin-right: 0.25rem;"
-                                        onclick="showTransferModal(${lot.id})">
-                                    Transferir
-                                </button>
-                                <button class="btn btn-sm ${lot.blocked ? 'btn-success' : 'btn-danger'}" 
-                                        style="padding: 0.2rem 0.5rem; font-size: 0.75rem;"
-                                        onclick="toggleLotBlock(${lot.id})">
-                                    ${lot.blocked ? 'Desbloquear' : 'Bloquear'}
-                                </button>
-                            </div>
-                        </div>
-                    `).join('')}
-                </div>
-            </div>
-        `;
-    }).join('');
-
-    container.innerHTML = html;
+// FEFO/FIFO order of the server unless a column is sorted
+function loadLots() {
+    lotsTable()?.reload();
 }
 
+const searchLots = debounce(loadLots);
+
 async function showLotMovements(lotId) {
     try {
         const movements = await api.get(`/lots/${lotId}/movements`);
@@ -1146,7 +983,7 @@ async function toggleLotBlock(lotId) {
 
     try {
         await api.post(`/lots/${lotId}/toggle-block`);
-        loadLots(); // Reload to show updated status
+        refreshTable('lots'); // Reload to show updated status
     } catch (error) {
         console.error('Error toggling lot block:', error);
         alert('Error al actualizar el estado del lote');
@@ -1194,7 +1031,7 @@ async function showAdjustStockModal(lotId) {
             </div>
             
             <div class="text-right" style="margin-top: 1.5rem;">
-                <button class="btn btn-primary" onclick="adjustStock(${lot.id})">Guardar Ajuste</button>
+                <button class="btn btn-primary" onclick="adjustStock(${lot.id}, ${lot.current_quantity})">Guardar Ajuste</button>
             </div>
         `;
 
@@ -1206,7 +1043,7 @@ async function showAdjustStockModal(lotId) {
     }
 }
 
-async function adjustStock(lotId) {
+async function adjustStock(lotId, expectedQuantity) {
     const quantityInput = document.getElementById('adjust-quantity');
     const notesInput = document.getElementById('adjust-notes');
 
@@ -1224,14 +1061,16 @@ async function adjustStock(lotId) {
     if (!confirm(`¿Confirmar ajuste de stock a ${quantity}? Esta acción registrará un movimiento de ajuste.`)) return;
 
     try {
-        await api.post(`/lots/${lotId}/adjust`, {
+        const result = await api.post(`/lots/${lotId}/adjust`, {
             real_quantity: quantity,
+            // System stock the count was compared with: the adjustment is rejected if it changed meanwhile
+            expected_quantity: expectedQuantity,
             notes: notesInput.value
         });
 
         closeModal();
-        loadInventory(); // Reload inventory view
-        alert('Stock ajustado correctamente');
+        refreshTable('inventory'); // Reload inventory view
+        alert(result.queued ? result.message : 'Stock ajustado correctamente');
 
     } catch (error) {
         console.error('Error adjusting stock:', error);
@@ -1254,242 +1093,76 @@ function applyDashboardFilter(filterType) {
     navigateTo('inventory');
 }
 
-async function loadInventory() {
-    try {
-        // Use pending filter from dashboard if available, otherwise use select value
-        let statusFilter;
-        if (typeof window.pendingInventoryFilter !== 'undefined' && window.pendingInventoryFilter) {
-            statusFilter = window.pendingInventoryFilter;
-            window.pendingInventoryFilter = null;
-            // Update select to show 'all' to avoid confusion since custom filter is applied
-            const statusSelect = document.getElementById('inventory-status-filter');
-            if (statusSelect) {
-                statusSelect.value = 'all';
-            }
-        } else {
-            statusFilter = document.getElementById('inventory-status-filter')?.value || 'available';
-        }
-
-        const search = document.getElementById('inventory-search')?.value.toLowerCase() || '';
-
-        // Determine if we need to fetch all lots or just available ones
-        // 'available' -> true
-        // 'all', 'low_stock', 'expiring_soon', 'expired' -> false (we need potentially all to filter client side, or specifically expired ones which are available)
-        // Wait, 'expired' lots usually have quantity > 0, so they ARE available in DB terms? 
-        // Backend `available_only=true` means `current_quantity > 0`.
-        // So actually 'expired' lots ARE returned even with `available_only=true` if qty > 0.
-        // But 'all' status usually implies seeing history (qty=0)? No, usually "All current stock".
-        // If users want to see 0 stock lots (history), `available_only=false`.
-        // Let's assume 'all' means 'all with stock + history' or just 'all with stock'?
-        // Usually inventory view hides 0 stock.
-        // But if I want to see "Expired", it must have stock to be relevant for "Lotes Caducados" card which counts stock > 0.
-        // So `available_only=true` (qty>0) is sufficient for expired/expiring/low_stock.
-        // BUT 'all' option might want 0 stock?
-        // Let's stick to `available_only=false` only if 'all' is selected, or if we want to be safe.
-        // Actually, logic:
-        // status='available' -> available_only=true
-        // status='all' -> available_only=false (show 0 stock?)
-        // status='expired' -> available_only=false (just in case) logic handled client side.
-
-        const fetchAvailableOnly = (statusFilter === 'available');
-        const lots = await api.get(`/inventory?available_only=${fetchAvailableOnly ? 'true' : 'false'}`);
-
-        const today = new Date();
-        today.setHours(0, 0, 0, 0);
-        const threeMonthsFromNow = new Date();
-        threeMonthsFromNow.setMonth(today.getMonth() + 3);
-
-        // Filter by Tab Type and Search
-        const filteredLots = lots.filter(lot => {
-            const matchesTab = lot.product && lot.product.type === currentInventoryTab;
-
-            let matchesSearch = true;
-            if (search) {
-                matchesSearch = (
-                    lot.lot_number.toLowerCase().includes(search) ||
-                    (lot.product && lot.product.code.toLowerCase().includes(search)) ||
-                    (lot.product && lot.product.name.toLowerCase().includes(search))
-                );
-            }
-
-            let matchesStatus = true;
-            if (statusFilter === 'low_stock') {
-                matchesStatus = lot.product && lot.product.has_low_stock_alert;
-            } else if (statusFilter === 'expiring_soon') {
-                if (!lot.expiration_date) matchesStatus = false;
-                else {
-                    const d = new Date(lot.expiration_date);
-                    d.setHours(0, 0, 0, 0);
-                    matchesStatus = (d >= today && d <= threeMonthsFromNow && lot.current_quantity > 0);
-                }
-            } else if (statusFilter === 'expired') {
-                if (!lot.expiration_date) matchesStatus = false;
-                else {
-                    const d = new Date(lot.expiration_date);
-                    d.setHours(0, 0, 0, 0);
-                    matchesStatus = (d < today && lot.current_quantity > 0);
-                }
-            } else if (statusFilter === 'available') {
-                matchesStatus = lot.current_quantity > 0;
-                // Low stock filters by type
-            } else if (statusFilter === 'low_stock_raw_material') {
-                matchesStatus = lot.product && lot.product.has_low_stock_alert && lot.product.type === 'raw_material';
-            } else if (statusFilter === 'low_stock_packaging') {
-                matchesStatus = lot.product && lot.product.has_low_stock_alert && lot.product.type === 'packaging';
-            } else if (statusFilter === 'low_stock_finished') {
-                matchesStatus = lot.product && lot.product.has_low_stock_alert && lot.product.type === 'finished_product';
-                // Expiring soon filters by type
-            } else if (statusFilter.startsWith('expiring_soon_')) {
-                if (!lot.expiration_date) matchesStatus = false;
-                else {
-                    const d = new Date(lot.expiration_date);
-                    d.setHours(0, 0, 0, 0);
-                    matchesStatus = (d >= today && d <= threeMonthsFromNow && lot.current_quantity > 0);
-                }
-                // Expired filters by type
-            } else if (statusFilter.startsWith('expired_')) {
-                if (!lot.expiration_date) matchesStatus = false;
-                else {
-                    const d = new Date(lot.expiration_date);
-                    d.setHours(0, 0, 0, 0);
-                    matchesStatus = (d < today && lot.current_quantity > 0);
-                }
-                // Blocked filters by type
-            } else if (statusFilter === 'blocked_raw_material') {
-                matchesStatus = lot.blocked && lot.current_quantity > 0 && lot.product?.type === 'raw_material';
-            } else if (statusFilter === 'blocked_packaging') {
-                matchesStatus = lot.blocked && lot.current_quantity > 0 && lot.product?.type === 'packaging';
-            } else if (statusFilter === 'blocked_finished') {
-                matchesStatus = lot.blocked && lot.current_quantity > 0 && lot.product?.type === 'finished_product';
-            }
-
-            return matchesTab && matchesSearch && matchesStatus;
-        });
-
-        const groups = groupLotsByProduct(filteredLots);
-        renderInventoryGroups(groups);
+// Status select -> filters of /inventory, all of them applied by the server
+const INVENTORY_STATUS_PARAMS = {
+    available: { available_only: 'true' },
+    all: { available_only: 'false' },
+    low_stock: { available_only: 'false', below_min_stock: 'true' },
+    expiring_soon: { available_only: 'false', expiration: 'soon' },
+    expired: { available_only: 'false', expiration: 'expired' },
+    blocked: { available_only: 'false', blocked: 'true' }
+};
 
-    } catch (error) {
-        console.error('Error loading inventory:', error);
-    }
+function inventoryParams() {
+    const statusFilter = document.getElementById('inventory-status-filter')?.value || 'available';
+    return {
+        ...(INVENTORY_STATUS_PARAMS[statusFilter] || INVENTORY_STATUS_PARAMS.available),
+        type: currentInventoryTab,
+        q: document.getElementById('inventory-search')?.value || ''
+    };
 }
 
-function groupLotsByProduct(lots) {
-    const groups = {};
-
-    lots.forEach(lot => {
-        const prodId = lot.product_id;
-        if (!groups[prodId]) {
-            groups[prodId] = {
-                product: lot.product,
-                lots: [],
-                totalStock: 0,
-                unit: lot.unit
-            };
-        }
-        groups[prodId].lots.push(lot);
-        groups[prodId].totalStock += lot.current_quantity;
-    });
-
-    return Object.values(groups).sort((a, b) => a.product.name.localeCompare(b.product.name));
+function renderLotLocations(lot) {
+    const locations = (lot.locations || []).filter(ll => ll.quantity > 0);
+    if (locations.length === 0) return '<span class="badge badge-gray">Sin ubicación</span>';
+    return locations.map(ll => `
+        <span class="badge ${ll.location?.is_available ? 'badge-success' : 'badge-gray'}" title="${ll.location?.name || ''}: ${formatQuantity(ll.quantity, lot.unit)} ${lot.unit}">${ll.location?.code || '-'}</span>
+    `).join(' ');
 }
 
-function toggleProductGroup(element) {
-    element.closest('.product-group').classList.toggle('expanded');
+function inventoryTable() {
+    return mountTable('inventory', 'inventory-table', {
+        endpoint: '/inventory',
+        params: inventoryParams,
+        empty: 'No hay productos en esta categoría',
+        columns: [
+            { label: 'Código', width: '0.7fr', sort: 'product', render: lot => `<span style="font-weight: 600; color: var(--primary-700); font-family: monospace;">${lot.product?.code || '-'}</span>` },
+            {
+                label: 'Producto', width: '1.4fr', sort: 'product', render: lot => `
+                    ${lot.product?.name || '-'}
+                    ${lot.is_below_min_stock ? '<span class="badge badge-warning" title="Stock del producto por debajo del mínimo">Bajo mínimo</span>' : ''}
+                `
+            },
+            { label: 'Lote', sort: 'lot_number', render: lot => `<span style="font-weight: 500; font-family: monospace;">${lot.lot_number}</span>` },
+            { label: 'Caducidad', width: '0.8fr', sort: 'expiration_date', render: lot => formatDate(lot.expiration_date) },
+            { label: 'Ubicaciones', render: renderLotLocations },
+            { label: 'Cantidad', width: '0.8fr', sort: 'current_quantity', render: lot => `${formatQuantity(lot.current_quantity, lot.unit)} ${lot.unit}` },
+            { label: 'Estado', width: '0.8fr', render: lot => getStatusBadge(lot.status) },
+            { label: 'Disponible', width: '0.8fr', render: lot => getAvailabilityBadge(lot.is_available) },
+            {
+                label: 'Acciones', width: '180px', render: lot => `
+                    <button class="btn btn-sm btn-secondary" style="padding: 0.2rem 0.4rem; font-size: 0.7rem; margin-right: 2px;"
+                            onclick="showTransferModal(${lot.id})">📦 Transferir</button>
+                    <button class="btn btn-sm btn-warning" style="padding: 0.2rem 0.4rem; font-size: 0.7rem;"
+                            onclick="showAdjustStockModal(${lot.id})">Ajustar</button>
+                `
+            }
+        ]
+    });
 }
 
-function renderInventoryGroups(groups) {
-    const container = document.getElementById('inventory-table');
-
-    if (groups.length === 0) {
-        container.innerHTML = '<p class="text-center" style="color: var(--gray-500); padding: 2rem;">No hay productos en esta categoría</p>';
-        return;
+function loadInventory() {
+    // A filter chosen on the dashboard (e.g. 'expired_packaging'): the tab was set from its suffix
+    if (window.pendingInventoryFilter) {
+        const statusSelect = document.getElementById('inventory-status-filter');
+        if (statusSelect) statusSelect.value = window.pendingInventoryFilter.replace(/_(raw_material|packaging|finished)$/, '');
+        window.pendingInventoryFilter = null;
     }
-
-    const html = groups.map(group => {
-        const p = group.product;
-
-        // Expand lots by location - one row per location
-        const lotRows = [];
-        group.lots.forEach(lot => {
-            if (lot.locations && lot.locations.length > 0) {
-                // Create one row per location
-                lot.locations.forEach(ll => {
-                    if (ll.quantity > 0) {
-                        lotRows.push({
-                            lot: lot,
-                            location: ll.location,
-                            quantity: ll.quantity
-                        });
-                    }
-                });
-            } else {
-                // No location info - show as single row
-                lotRows.push({
-                    lot: lot,
-                    location: null,
-                    quantity: lot.current_quantity
-                });
-            }
-        });
-
-        return `
-            <div class="product-group">
-                <div class="product-header" onclick="toggleProductGroup(this)">
-                    <div style="font-weight: 600; color: var(--primary-700); font-family: monospace;">${p.code}</div>
-                    <div style="font-weight: 500;">${p.name}</div>
-                    <div class="text-right" style="font-weight: 600;">${formatQuantity(group.totalStock, group.unit)} ${group.unit}</div>
-                    <div class="text-right" style="font-size: 0.875rem; color: var(--gray-500);">
-                        ${lotRows.length} Registro(s)
-                    </div>
-                    <div class="text-center toggle-icon">▼</div>
-                </div>
-                
-                <div class="lots-container">
-                    <div class="lot-header" style="grid-template-columns: 1fr 0.8fr 0.8fr 0.8fr 0.8fr 0.8fr 180px;">
-                        <div>Lote</div>
-                        <div>Caducidad</div>
-                        <div>Ubicación</div>
-                        <div>Cantidad</div>
-                        <div>Estado</div>
-                        <div>Disponible</div>
-                        <div>Acciones</div>
-                    </div>
-                    ${lotRows.map(row => {
-            const lot = row.lot;
-            const locCode = row.location?.code || '-';
-            const locName = row.location?.name || 'Sin ubicación';
-            const isAvailable = row.location?.is_available || false;
-            return `
-                        <div class="lot-row" style="grid-template-columns: 1fr 0.8fr 0.8fr 0.8fr 0.8fr 0.8fr 180px;">
-                            <div style="font-weight: 500; font-family: monospace;">${lot.lot_number}</div>
-                            <div>${formatDate(lot.expiration_date)}</div>
-                            <div><span class="badge ${isAvailable ? 'badge-success' : 'badge-gray'}" title="${locName}">${locCode}</span></div>
-                            <div>${formatQuantity(row.quantity, lot.unit)} ${lot.unit}</div>
-                            <div>${getStatusBadge(lot.status)}</div>
-                            <div>${getAvailabilityBadge(lot.is_available)}</div>
-                            <div>
-                                <button class="btn btn-sm btn-secondary" 
-                                        style="padding: 0.2rem 0.4rem; font-size: 0.7rem; margin-right: 2px;"
-                                        onclick="showTransferModal(${lot.id})">
-                                    📦 Transferir
-                                </button>
-                                <button class="btn btn-sm btn-warning" 
-                                        style="padding: 0.2rem 0.4rem; font-size: 0.7rem;"
-                                        onclick="showAdjustStockModal(${lot.id})">
-                                    Ajustar
-                                </button>
-                            </div>
-                        </div>
-                    `}).join('')}
-                </div>
-            </div>
-        `;
-    }).join('');
-
-    container.innerHTML = html;
+    inventoryTable()?.reload();
 }
 
+const searchInventory = debounce(loadInventory);
+
 async function loadCustomers() {
     try {
         const customers = await api.get('/customers');
@@ -1608,9 +1281,6 @@ function navigateTo(view) {
         case 'lots':
             content.innerHTML = renderLots();
             loadLots();
-            setTimeout(() => {
-                document.getElementById('lot-search').addEventListener('input', loadLots);
-            }, 0);
             break;
         case 'receptions':
             content.innerHTML = renderReceptions();
@@ -1677,10 +1347,116 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    replica.onChange = reloadReplicaView;
+    initOfflineSupport();
+
     // Load initial view
     navigateTo('dashboard');
+
+    connectLiveUpdates();
 });
 
+// Views rendered from the local replica, refreshed when a revalidation brings changes
+const replicaReloads = {
+    products: () => loadProducts(),
+    customers: () => loadCustomers(),
+    lots: () => refreshTable('lots'),
+    inventory: () => refreshTable('inventory')
+};
+
+function reloadReplicaView() {
+    const reload = replicaReloads[app.currentView];
+    if (reload) reload();
+}
+
+// ========== Live Updates ==========
+// /api/events pushes the changes committed by any user. Rows already on
+// screen are patched in place; views without a local copy reload once the
+// burst of events is over.
+
+const liveReloads = {
+    dashboard: () => loadDashboard(),
+    lots: () => refreshTable('lots'),
+    inventory: () => refreshTable('inventory'),
+    receptions: () => refreshTable('receptions'),
+    movements: () => refreshTable('movements'),
+    production: () => refreshTable('production'),
+    returns: () => loadReturns()
+};
+let liveReloadTimer = null;
+
+let lastEventId = null;
+
+function connectLiveUpdates() {
+    if (typeof EventSource === 'undefined') return;
+    // EventSource reconnects by itself and resumes from the last event id. A busy server (503)
+    // closes it for good, so open a new one later from the last event received
+    const query = lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : '';
+    const source = new EventSource(`${API_BASE}/events${query}`);
+    source.addEventListener('error', () => {
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(connectLiveUpdates, 30000 + Math.random() * 10000);
+        }
+    });
+    ['stock', 'orders', 'alerts'].forEach(channel => source.addEventListener(channel, event => {
+        lastEventId = event.lastEventId || lastEventId;
+    }));
+    source.addEventListener('stock', event => {
+        applyStockEvent(JSON.parse(event.data));
+        scheduleReplicaRefresh();
+    });
+    source.addEventListener('orders', event => applyOrderEvent(JSON.parse(event.data)));
+    source.addEventListener('alerts', event => updateAlertsBadge(JSON.parse(event.data).unread));
+}
+
+let replicaRefreshTimer = null;
+
+function scheduleReplicaRefresh() {
+    clearTimeout(replicaRefreshTimer);
+    replicaRefreshTimer = setTimeout(() => replica.revalidate(true), 500);
+}
+
+function scheduleLiveReload() {
+    const reload = liveReloads[app.currentView];
+    if (!reload) return;
+    clearTimeout(liveReloadTimer);
+    liveReloadTimer = setTimeout(reload, 500);
+}
+
+async function applyStockEvent(change) {
+    const table = app.tables[app.currentView];
+    const lot = (app.currentView === 'lots' || app.currentView === 'inventory') && table?.connected
+        ? table.find(change.id) : null;
+    if (!lot || change.deleted) {
+        // Not on the loaded pages, new, or deleted: positions and totals change, reload the pages once
+        scheduleLiveReload();
+        return;
+    }
+
+    const { locations_changed: locationsChanged, ...fields } = change;
+    Object.assign(lot, fields);
+    if (locationsChanged && lot.locations) {
+        try {
+            lot.locations = (await api.get(`/locations/lot/${lot.id}/stock`)).locations;
+        } catch (error) {
+            console.error('Error loading lot locations:', error);
+        }
+    }
+    table.update();
+}
+
+function applyOrderEvent(order) {
+    if (app.currentView !== 'production') return;
+    const table = app.tables.production;
+    const existing = table?.connected ? table.find(order.id) : null;
+    if (existing) {
+        Object.assign(existing, order);
+        table.update();
+    } else {
+        scheduleLiveReload();
+    }
+}
+
 // ========== Production Orders ==========
 
 function renderProduction() {
@@ -1693,6 +1469,9 @@ function renderProduction() {
             
             <div class="card">
                 <div class="card-body">
+                    <div class="filters" style="margin-bottom: 1rem;">
+                        <input type="text" id="production-search" class="form-input" placeholder="Buscar por orden, producto o lote base..." style="max-width: 500px; width: 100%;" oninput="searchProductionOrders()">
+                    </div>
                     <div id="production-orders-table"></div>
                 </div>
             </div>
@@ -1700,61 +1479,28 @@ function renderProduction() {
     `;
 }
 
-async function loadProductionOrders() {
-    try {
-        const orders = await api.get('/production-orders');
-        renderProductionOrdersTable(orders);
-    } catch (error) {
-        console.error('Error loading production orders:', error);
-        const container = document.getElementById('production-orders-table');
-        if (container) {
-            container.innerHTML = `<p class="text-center" style="color: var(--danger-500); padding: 2rem;">Error al cargar órdenes: ${error.message}</p>`;
-        }
-    }
+function productionOrdersTable() {
+    return mountTable('production', 'production-orders-table', {
+        endpoint: '/production-orders',
+        params: () => ({ q: document.getElementById('production-search')?.value || '' }),
+        empty: 'No hay órdenes de fabricación',
+        columns: [
+            { label: 'Número Orden', sort: 'order_number', render: o => `<strong>${o.order_number}</strong>` },
+            { label: 'Producto Base', width: '1.4fr', sort: 'base_product_name', render: o => o.base_product_name || '-' },
+            { label: 'Lote Base', sort: 'base_lot_number', render: o => o.base_lot_number || '-' },
+            { label: 'Fecha Fabricación', sort: 'production_date', render: o => formatDate(o.production_date) },
+            { label: 'Estado', sort: 'status', render: o => getStatusBadge(o.status) },
+            { label: 'Acciones', width: '120px', render: o => `<button class="btn btn-sm btn-secondary" onclick="showOrderDetails(${o.id})">Detalles</button>` }
+        ]
+    });
 }
 
-function renderProductionOrdersTable(orders) {
-    const container = document.getElementById('production-orders-table');
-
-    if (orders.length === 0) {
-        container.innerHTML = '<p class="text-center" style="color: var(--gray-500); padding: 2rem;">No hay órdenes de fabricación</p>';
-        return;
-    }
-
-    const html = `
-        <div class="table-container">
-            <table class="table">
-                <thead>
-                    <tr>
-                        <th>Número Orden</th>
-                        <th>Producto Base</th>
-                        <th>Lote Base</th>
-                        <th>Fecha Fabricación</th>
-                        <th>Estado</th>
-                        <th>Acciones</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    ${orders.map(o => `
-                        <tr>
-                            <td><strong>${o.order_number}</strong></td>
-                            <td>${o.base_product_name || '-'}</td>
-                            <td>${o.base_lot_number || '-'}</td>
-                            <td>${formatDate(o.production_date)}</td>
-                            <td>${getStatusBadge(o.status)}</td>
-                            <td>
-                                <button class="btn btn-sm btn-secondary" onclick="showOrderDetails(${o.id})">Detalles</button>
-                            </td>
-                        </tr>
-                    `).join('')}
-                </tbody>
-            </table>
-        </div>
-    `;
-
-    container.innerHTML = html;
+function loadProductionOrders() {
+    productionOrdersTable()?.reload();
 }
 
+const searchProductionOrders = debounce(loadProductionOrders);
+
 function renderShipments() {
     return `
         <div>
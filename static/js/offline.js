@@ -0,0 +1,634 @@
+// ============================================
+// OFFLINE REPLICA AND WRITE QUEUE - JavaScript
+// ============================================
+// Products, customers, locations and lots are kept in IndexedDB and in
+// memory, fed by the delta sync API (/api/sync/<collection>). List views
+// are answered from the replica at once and revalidated in the background;
+// receptions, transfers and adjustments made without connection wait in a
+// queue and are sent in order when the server is reachable again.
+
+const REPLICA_DB = 'gestion-almacen';
+const REPLICA_DB_VERSION = 1;
+// Collections of /api/sync mirrored locally; locations are few and come from /api/locations
+const REPLICA_COLLECTIONS = ['products', 'customers', 'lots', 'lot_locations'];
+const REPLICA_MAX_AGE_MS = 10000;
+const QUEUE_RETRY_MS = 30000;
+
+// No answer, or the ngrok tunnel / proxy answering for an unreachable server
+function isOfflineStatus(status) {
+    return status === 502 || status === 503 || status === 504;
+}
+
+function idbRequest(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function idbTransaction(tx) {
+    return new Promise((resolve, reject) => {
+        tx.oncomplete = () => resolve();
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
+
+function daysFromToday(isoDate) {
+    const [year, month, day] = isoDate.split('-').map(Number);
+    const today = new Date();
+    return Math.round((Date.UTC(year, month - 1, day) - Date.UTC(today.getFullYear(), today.getMonth(), today.getDate())) / 86400000);
+}
+
+// Filters, sorting and paging of the lot lists answered from the replica
+const LOT_PARAMS = ['product_id', 'type', 'status', 'available_only', 'lot_number', 'q', 'limit', 'offset', 'sort'];
+const LOT_SORT_KEYS = ['lot_number', 'product', 'manufacturing_date', 'expiration_date', 'current_quantity', 'created_at'];
+
+// Date `months` from today as YYYY-MM-DD, on the last day of the month when it is shorter
+function isoDateInMonths(months) {
+    const today = new Date();
+    const target = new Date(today.getFullYear(), today.getMonth() + months, 1);
+    const lastDay = new Date(target.getFullYear(), target.getMonth() + 1, 0).getDate();
+    target.setDate(Math.min(today.getDate(), lastDay));
+    return `${target.getFullYear()}-${String(target.getMonth() + 1).padStart(2, '0')}-${String(target.getDate()).padStart(2, '0')}`;
+}
+
+// ========== Replica ==========
+
+const replica = {
+    db: null,
+    ready: false,  // Every collection downloaded at least once
+    rows: {},      // collection -> Map(id -> row)
+    cursors: {},
+    locationsEtag: null,
+    syncing: null,
+    lastSync: 0,
+    // Called when a revalidation brought changes, to refresh the view on screen
+    onChange: null,
+
+    async open() {
+        if (typeof indexedDB === 'undefined') return;
+        try {
+            const request = indexedDB.open(REPLICA_DB, REPLICA_DB_VERSION);
+            request.onupgradeneeded = () => {
+                const db = request.result;
+                for (const name of [...REPLICA_COLLECTIONS, 'locations']) {
+                    db.createObjectStore(name, { keyPath: 'id' });
+                }
+                db.createObjectStore('meta');
+                db.createObjectStore('queue', { keyPath: 'id', autoIncrement: true });
+            };
+            this.db = await idbRequest(request);
+
+            const tx = this.db.transaction([...REPLICA_COLLECTIONS, 'locations', 'meta'], 'readonly');
+            for (const name of [...REPLICA_COLLECTIONS, 'locations']) {
+                const rows = await idbRequest(tx.objectStore(name).getAll());
+                this.rows[name] = new Map(rows.map(row => [row.id, row]));
+            }
+            const meta = tx.objectStore('meta');
+            for (const name of REPLICA_COLLECTIONS) {
+                this.cursors[name] = await idbRequest(meta.get(`cursor:${name}`));
+            }
+            this.locationsEtag = await idbRequest(meta.get('etag:locations'));
+            this.ready = Boolean(await idbRequest(meta.get('hydrated')));
+        } catch (error) {
+            // Private browsing or storage disabled: the API is used directly
+            console.error('Error opening local replica:', error);
+            this.db = null;
+        }
+    },
+
+    // Bring the replica up to date; concurrent calls share the same run
+    revalidate(force = false) {
+        if (!this.db) return Promise.resolve(false);
+        if (this.syncing) return this.syncing;
+        if (!force && Date.now() - this.lastSync < REPLICA_MAX_AGE_MS) return Promise.resolve(false);
+
+        this.syncing = this.sync()
+            .then(changed => {
+                this.lastSync = Date.now();
+                if (changed && this.onChange) this.onChange();
+                writeQueue.replay();
+                return changed;
+            })
+            .catch(error => {
+                console.error('Error synchronizing local replica:', error);
+                return false;
+            })
+            .finally(() => { this.syncing = null; });
+        return this.syncing;
+    },
+
+    // After a write of this browser, so the lists read next include it
+    afterWrite() {
+        if (!this.ready) return Promise.resolve(false);  // Still downloading: nothing to refresh yet
+        if (this.syncing) return this.syncing.then(() => this.revalidate(true));
+        return this.revalidate(true);
+    },
+
+    async sync() {
+        const results = await Promise.all([
+            ...REPLICA_COLLECTIONS.map(name => this.syncCollection(name)),
+            this.syncLocations()
+        ]);
+        if (!this.ready) {
+            const tx = this.db.transaction('meta', 'readwrite');
+            tx.objectStore('meta').put(true, 'hydrated');
+            await idbTransaction(tx);
+            this.ready = true;
+        }
+        return results.some(Boolean);
+    },
+
+    async syncCollection(name) {
+        let since = this.cursors[name] || '0';
+        let changed = false;
+        while (true) {
+            const response = await fetch(`${API_BASE}/sync/${name}?since=${encodeURIComponent(since)}`, { cache: 'no-store' });
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            const page = await response.json();
+            // Rows inside the lookback window come again: only real differences count
+            changed = await this.store(name, page.deleted, page.changes, page.cursor) || changed;
+            since = page.cursor;
+            if (!page.has_more) return changed;
+        }
+    },
+
+    async syncLocations() {
+        const headers = this.locationsEtag ? { 'If-None-Match': this.locationsEtag } : {};
+        const response = await fetch(`${API_BASE}/locations?active_only=false`, { headers, cache: 'no-store' });
+        if (response.status === 304) return false;
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        const locations = await response.json();
+        const current = this.rows.locations;
+        const ids = new Set(locations.map(location => location.id));
+        const deleted = [...current.keys()].filter(id => !ids.has(id));
+        this.locationsEtag = response.headers.get('ETag');
+        return this.store('locations', deleted, locations, null);
+    },
+
+    // Apply a page to memory at once and to IndexedDB in one transaction with its cursor
+    async store(name, deleted, changes, cursor) {
+        const rows = this.rows[name];
+        let changed = false;
+        for (const id of deleted) {
+            changed = rows.delete(id) || changed;
+        }
+        const modified = changes.filter(row => JSON.stringify(rows.get(row.id)) !== JSON.stringify(row));
+        for (const row of modified) rows.set(row.id, row);
+        changed = changed || modified.length > 0;
+
+        const tx = this.db.transaction([name, 'meta'], 'readwrite');
+        const objects = tx.objectStore(name);
+        deleted.forEach(id => objects.delete(id));
+        modified.forEach(row => objects.put(row));
+        if (cursor) {
+            this.cursors[name] = cursor;
+            tx.objectStore('meta').put(cursor, `cursor:${name}`);
+        } else if (name === 'locations') {
+            tx.objectStore('meta').put(this.locationsEtag, 'etag:locations');
+        }
+        await idbTransaction(tx);
+        return changed;
+    },
+
+    // Response of a GET endpoint computed from the replica, or null when it cannot answer it
+    read(endpoint) {
+        if (!this.ready) return null;
+        const [path, query = ''] = endpoint.split('?');
+        const params = new URLSearchParams(query);
+        for (const [key, value] of [...params]) {
+            if (value === '') params.delete(key);
+        }
+        const only = (...names) => [...params.keys()].every(key => names.includes(key));
+
+        switch (path) {
+            case '/products':
+                return only('type', 'search', 'with_alerts') ? this.products(params) : null;
+            case '/customers':
+                return only('search') ? this.customers(params) : null;
+            case '/locations':
+                return only('active_only') ? this.locations(params.get('active_only') !== 'false') : null;
+            case '/lots':
+                return only(...LOT_PARAMS) && this.validPage(params)
+                    ? this.page(params, this.lots(params, false)) : null;
+            case '/search/products':
+                return only('q', 'type', 'limit') ? this.searchProducts(params) : null;
+            case '/search/customers':
+                return only('q', 'limit') ? this.searchCustomers(params) : null;
+            case '/search/lots':
+                return only('q', 'product_id', 'type', 'in_stock', 'location', 'limit') ? this.searchLots(params) : null;
+            case '/inventory':
+                return only(...LOT_PARAMS, 'below_min_stock', 'blocked', 'expiration') && this.validPage(params)
+                    && [null, 'expired', 'soon'].includes(params.get('expiration'))
+                    ? this.page(params, this.inventory(params)) : null;
+            default:
+                return null;
+        }
+    },
+
+    // Detail endpoints, only used when the server cannot be reached
+    readDetail(endpoint) {
+        if (!this.ready) return null;
+        let match = endpoint.match(/^\/lots\/(\d+)$/);
+        if (match) {
+            const lot = this.rows.lots.get(Number(match[1]));
+            return lot ? this.lot(lot, true) : null;
+        }
+        match = endpoint.match(/^\/locations\/lot\/(\d+)\/stock$/);
+        if (match) {
+            const lot = this.rows.lots.get(Number(match[1]));
+            return lot ? {
+                lot_id: lot.id,
+                lot_number: lot.lot_number,
+                total_quantity: lot.current_quantity,
+                unit: lot.unit,
+                locations: this.lotLocations(lot.id)
+            } : null;
+        }
+        return null;
+    },
+
+    matches(search, ...values) {
+        const term = search.toLowerCase();
+        return values.some(value => value && value.toLowerCase().includes(term));
+    },
+
+    byName(a, b) {
+        return a.name < b.name ? -1 : a.name > b.name ? 1 : 0;
+    },
+
+    stockByProduct() {
+        const stock = new Map();
+        for (const lot of this.rows.lots.values()) {
+            if (lot.current_quantity > 0) {
+                stock.set(lot.product_id, (stock.get(lot.product_id) || 0) + lot.current_quantity);
+            }
+        }
+        return stock;
+    },
+
+    products(params) {
+        const type = params.get('type');
+        const search = params.get('search');
+        const products = [...this.rows.products.values()]
+            .filter(p => p.active && (!type || p.type === type) && (!search || this.matches(search, p.code, p.name)))
+            .sort(this.byName)
+            .map(p => ({ ...p }));
+        if (params.get('with_alerts') === 'true') {
+            const stock = this.stockByProduct();
+            for (const product of products) {
+                product.current_stock = stock.get(product.id) || 0;
+                product.has_low_stock_alert = product.min_stock !== null && product.current_stock < product.min_stock;
+            }
+        }
+        return products;
+    },
+
+    customers(params) {
+        const search = params.get('search');
+        return [...this.rows.customers.values()]
+            .filter(c => c.active && (!search || this.matches(search, c.code, c.name)))
+            .sort(this.byName)
+            .map(c => ({ ...c }));
+    },
+
+    locations(activeOnly) {
+        return [...this.rows.locations.values()]
+            .filter(location => !activeOnly || location.active)
+            .sort((a, b) => (a.code < b.code ? -1 : a.code > b.code ? 1 : 0))
+            .map(location => ({ ...location }));
+    },
+
+    // Lot.to_dict() with the fields that depend on today's date recomputed
+    lot(row, includeProduct) {
+        const lot = { ...row };
+        lot.days_to_expiration = lot.expiration_date ? daysFromToday(lot.expiration_date) : null;
+        if (lot.blocked) lot.status = 'blocked';
+        else if (lot.current_quantity <= 0) lot.status = 'depleted';
+        else if (lot.days_to_expiration !== null && lot.days_to_expiration < 0) lot.status = 'expired';
+        else lot.status = 'active';
+        lot.is_available = lot.status === 'active';
+        if (includeProduct) {
+            const product = this.rows.products.get(lot.product_id);
+            if (product) lot.product = { ...product };
+        }
+        return lot;
+    },
+
+    lotLocations(lotId) {
+        return [...this.rows.lot_locations.values()]
+            .filter(ll => ll.lot_id === lotId)
+            .map(ll => ({ ...ll, location: { ...this.rows.locations.get(ll.location_id) } }));
+    },
+
+    // Same limit/offset/sort validation as the server; anything else is left to it
+    validPage(params) {
+        const sort = (params.get('sort') || '').replace(/^-/, '');
+        if (sort && !LOT_SORT_KEYS.includes(sort)) return false;
+        if (!params.has('limit')) return true;
+        const limit = Number(params.get('limit'));
+        const offset = Number(params.get('offset') || 0);
+        return Number.isInteger(limit) && limit >= 1 && limit <= 500 && Number.isInteger(offset) && offset >= 0;
+    },
+
+    // Paged envelope of the API: total on the first page only
+    page(params, rows) {
+        if (!params.has('limit')) return rows;
+        const limit = Number(params.get('limit'));
+        const offset = Number(params.get('offset') || 0);
+        const body = { data: rows.slice(offset, offset + limit), offset, limit };
+        if (offset === 0) body.total = rows.length;
+        return body;
+    },
+
+    // ORDER BY of the API: the sort key with nulls last and id, or FEFO
+    // (expiration date, lots without one last, then creation)
+    lotOrder(sort) {
+        const compare = (a, b) => (a < b ? -1 : a > b ? 1 : 0);
+        if (!sort) {
+            return (a, b) => compare(a.expiration_date || '9999-12-31', b.expiration_date || '9999-12-31')
+                || compare(a.created_at || '', b.created_at || '') || a.id - b.id;
+        }
+        const direction = sort.startsWith('-') ? -1 : 1;
+        const key = sort.replace(/^-/, '');
+        const value = key === 'product' ? lot => this.rows.products.get(lot.product_id)?.name ?? null : lot => lot[key] ?? null;
+        return (a, b) => {
+            const va = value(a);
+            const vb = value(b);
+            if (va === null || vb === null) return va === vb ? direction * (a.id - b.id) : va === null ? 1 : -1;
+            return direction * (compare(va, vb) || a.id - b.id);
+        };
+    },
+
+    lots(params, inStockOnly) {
+        const productId = Number(params.get('product_id')) || null;
+        const type = params.get('type');
+        const status = params.get('status');
+        const lotNumber = params.get('lot_number');
+        const search = params.get('q');
+        const availableOnly = params.get('available_only') === 'true';
+        return [...this.rows.lots.values()]
+            .filter(lot => (!inStockOnly || lot.current_quantity > 0) && (!productId || lot.product_id === productId))
+            .filter(lot => !lotNumber || this.matches(lotNumber, lot.lot_number))
+            .sort(this.lotOrder(params.get('sort')))
+            .map(lot => this.lot(lot, true))
+            .filter(lot => (!type || lot.product?.type === type)
+                && (!search || this.matches(search, lot.lot_number, lot.product?.code, lot.product?.name))
+                && (!status || lot.status === status) && (!availableOnly || lot.is_available));
+    },
+
+    // Picker searches (/api/search/<collection>): matches of q in the code or name,
+    // exact code first, then code prefix, then the collection's own order
+    pickerMatches(params, rows, code, name, order) {
+        const limit = Number(params.get('limit') || 20);
+        if (!Number.isInteger(limit) || limit < 1 || limit > 100) return null;
+        const term = (params.get('q') || '').trim();
+        const lower = term.toLowerCase();
+        const rank = row => (code(row).toLowerCase() === lower ? 0 : code(row).toLowerCase().startsWith(lower) ? 1 : 2);
+        const results = rows
+            .filter(row => !term || this.matches(term, code(row), name(row)))
+            .sort((a, b) => (term ? rank(a) - rank(b) : 0) || order(a, b))
+            .slice(0, limit);
+        return { query: term, results };
+    },
+
+    searchProducts(params) {
+        const types = (params.get('type') || '').split(',').filter(Boolean);
+        if (types.some(type => !['raw_material', 'packaging', 'finished_product'].includes(type))) return null;
+        const products = [...this.rows.products.values()].filter(p => p.active && (!types.length || types.includes(p.type)));
+        const body = this.pickerMatches(params, products, p => p.code, p => p.name, (a, b) => this.byName(a, b) || a.id - b.id);
+        if (body) {
+            body.results = body.results.map(({ id, code, name, type, storage_unit, consumption_unit, density }) =>
+                ({ id, code, name, type, storage_unit, consumption_unit, density }));
+        }
+        return body;
+    },
+
+    searchCustomers(params) {
+        const customers = [...this.rows.customers.values()].filter(c => c.active);
+        const body = this.pickerMatches(params, customers, c => c.code, c => c.name, (a, b) => this.byName(a, b) || a.id - b.id);
+        if (body) body.results = body.results.map(({ id, code, name }) => ({ id, code, name }));
+        return body;
+    },
+
+    searchLots(params) {
+        const productId = Number(params.get('product_id')) || null;
+        const type = params.get('type');
+        const inStock = params.get('in_stock') === 'true';
+        const locationCode = params.get('location');
+        if (type && !['raw_material', 'packaging', 'finished_product'].includes(type)) return null;
+
+        // Quantity of each lot in the requested location
+        let available = null;
+        if (locationCode) {
+            const location = [...this.rows.locations.values()].find(l => l.code === locationCode);
+            available = new Map();
+            for (const ll of this.rows.lot_locations.values()) {
+                if (location && ll.location_id === location.id && ll.quantity > 0) available.set(ll.lot_id, ll.quantity);
+            }
+        }
+        const lots = [...this.rows.lots.values()].filter(lot => (!productId || lot.product_id === productId)
+            && (!type || this.rows.products.get(lot.product_id)?.type === type)
+            && (!inStock || lot.current_quantity > 0)
+            && (!available || available.has(lot.id)));
+        const body = this.pickerMatches(params, lots, lot => lot.lot_number, () => null, this.lotOrder(null));
+        if (body) {
+            body.results = body.results.map(({ id, lot_number, product_id, expiration_date, current_quantity, unit }) => {
+                const result = { id, lot_number, product_id, expiration_date, current_quantity, unit };
+                if (available) result.available_quantity = available.get(id);
+                return result;
+            });
+        }
+        return body;
+    },
+
+    inventory(params) {
+        if (!params.has('available_only')) params.set('available_only', 'true');
+        const expiration = params.get('expiration');
+        const soon = isoDateInMonths(3);
+        const stock = this.stockByProduct();
+        const locations = new Map();
+        for (const ll of this.rows.lot_locations.values()) {
+            if (!locations.has(ll.lot_id)) locations.set(ll.lot_id, []);
+            locations.get(ll.lot_id).push({ ...ll, location: { ...this.rows.locations.get(ll.location_id) } });
+        }
+        return this.lots(params, true).map(lot => {
+            lot.locations = locations.get(lot.id) || [];
+            const minStock = lot.product ? lot.product.min_stock : null;
+            lot.is_below_min_stock = minStock !== null && minStock !== undefined && (stock.get(lot.product_id) || 0) < minStock;
+            return lot;
+        }).filter(lot => {
+            if (params.get('below_min_stock') === 'true' && !lot.is_below_min_stock) return false;
+            if (params.get('blocked') === 'true' && !lot.blocked) return false;
+            if (expiration === 'expired') return lot.days_to_expiration !== null && lot.days_to_expiration < 0;
+            if (expiration === 'soon') return lot.days_to_expiration !== null && lot.days_to_expiration >= 0 && lot.expiration_date <= soon;
+            return true;
+        });
+    }
+};
+
+// ========== Write Queue ==========
+
+const writeQueue = {
+    // Writes that can wait: they only add stock movements to existing data
+    QUEUEABLE: [/^\/receptions$/, /^\/locations\/transfer$/, /^\/lots\/\d+\/adjust$/],
+    items: [],
+    replaying: null,
+    timer: null,
+
+    accepts(endpoint) {
+        return this.QUEUEABLE.some(pattern => pattern.test(endpoint));
+    },
+
+    pending() {
+        return this.items.filter(item => !item.conflict);
+    },
+
+    async load() {
+        if (!replica.db) return;
+        const tx = replica.db.transaction('queue', 'readonly');
+        this.items = await idbRequest(tx.objectStore('queue').getAll());
+        this.updateIndicator();
+    },
+
+    describe(endpoint, data) {
+        const lotNumber = id => replica.rows.lots?.get(id)?.lot_number || `#${id}`;
+        if (endpoint === '/receptions') return `Recepción del lote ${data.lot_number}`;
+        if (endpoint === '/locations/transfer') return `Transferencia de ${data.quantity} del lote ${lotNumber(data.lot_id)}`;
+        const match = endpoint.match(/^\/lots\/(\d+)\/adjust$/);
+        if (match) return `Ajuste del lote ${lotNumber(Number(match[1]))} a ${data.real_quantity}`;
+        return endpoint;
+    },
+
+    async enqueue(endpoint, data) {
+        if (!replica.db) throw new Error('Sin conexión con el servidor');
+        const item = { endpoint, data, description: this.describe(endpoint, data), queued_at: new Date().toISOString() };
+        const tx = replica.db.transaction('queue', 'readwrite');
+        item.id = await idbRequest(tx.objectStore('queue').add(item));
+        await idbTransaction(tx);
+        this.items.push(item);
+        this.updateIndicator();
+        this.scheduleRetry();
+        return { queued: true, message: `Sin conexión: ${item.description} se enviará al recuperar la conexión` };
+    },
+
+    async save(item) {
+        const tx = replica.db.transaction('queue', 'readwrite');
+        tx.objectStore('queue').put(item);
+        await idbTransaction(tx);
+    },
+
+    async remove(item) {
+        const tx = replica.db.transaction('queue', 'readwrite');
+        tx.objectStore('queue').delete(item.id);
+        await idbTransaction(tx);
+        this.items = this.items.filter(other => other.id !== item.id);
+        this.updateIndicator();
+    },
+
+    // Send the pending writes in the order they were made; stops at the first one the server does not get
+    replay() {
+        if (!this.replaying && this.pending().length) {
+            this.replaying = this.send().finally(() => { this.replaying = null; });
+        }
+        return this.replaying || Promise.resolve();
+    },
+
+    async send() {
+        let sent = 0;
+        for (const item of this.pending()) {
+            let response;
+            try {
+                response = await fetch(`${API_BASE}${item.endpoint}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(item.data)
+                });
+            } catch (error) {
+                break;
+            }
+            if (isOfflineStatus(response.status)) break;
+
+            if (response.ok) {
+                await this.remove(item);
+                sent += 1;
+            } else {
+                // Rejected by the server (stock changed meanwhile, duplicated lot...): kept for the user to review
+                const error = await response.json().catch(() => ({}));
+                item.conflict = error.error || `HTTP ${response.status}`;
+                await this.save(item);
+                this.updateIndicator();
+                showMessage(`Operación rechazada: ${item.description}. ${item.conflict}`, 'error');
+            }
+        }
+        if (this.pending().length) {
+            this.scheduleRetry();
+        } else if (sent) {
+            showMessage(`${sent} operación(es) pendiente(s) enviada(s) correctamente`);
+        }
+        if (sent) replica.revalidate(true);
+    },
+
+    scheduleRetry() {
+        clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.replay(), QUEUE_RETRY_MS);
+    },
+
+    updateIndicator() {
+        const indicator = document.getElementById('offline-status');
+        if (!indicator) return;
+        const pending = this.pending().length;
+        const conflicts = this.items.length - pending;
+        const parts = [];
+        if (pending) parts.push(`${pending} pendiente(s)`);
+        if (conflicts) parts.push(`${conflicts} rechazada(s)`);
+        indicator.textContent = `⏳ ${parts.join(' · ')}`;
+        indicator.classList.toggle('hidden', parts.length === 0);
+        indicator.classList.toggle('has-conflicts', conflicts > 0);
+    }
+};
+
+function showWriteQueue() {
+    const rows = writeQueue.items.map(item => `
+        <tr>
+            <td>${formatDate(item.queued_at)}</td>
+            <td>${item.description}</td>
+            <td>${item.conflict
+                ? `<span class="badge badge-danger">Rechazada</span> ${item.conflict}`
+                : '<span class="badge badge-warning">Pendiente</span>'}</td>
+            <td>${item.conflict ? `<button class="btn btn-sm btn-secondary" onclick="discardQueuedWrite(${item.id})">Descartar</button>` : ''}</td>
+        </tr>
+    `).join('');
+
+    showModal('Operaciones sin Enviar', `
+        <p style="color: var(--gray-500); margin-bottom: 1rem;">
+            Las operaciones registradas sin conexión se envían en orden al recuperarla.
+            Las rechazadas por el servidor deben revisarse y registrarse de nuevo si procede.
+        </p>
+        <div class="table-container">
+            <table class="table">
+                <thead><tr><th>Fecha</th><th>Operación</th><th>Estado</th><th></th></tr></thead>
+                <tbody>${rows || '<tr><td colspan="4" class="text-center">Sin operaciones</td></tr>'}</tbody>
+            </table>
+        </div>
+    `, async () => {
+        closeModal();
+        await writeQueue.replay();
+    }, 'Reintentar Envío');
+}
+
+async function discardQueuedWrite(id) {
+    const item = writeQueue.items.find(other => other.id === id);
+    if (!item || !confirm(`¿Descartar "${item.description}"?`)) return;
+    await writeQueue.remove(item);
+    closeModal();
+    showWriteQueue();
+}
+
+async function initOfflineSupport() {
+    await replica.open();
+    await writeQueue.load();
+    window.addEventListener('online', () => replica.revalidate(true));
+    replica.revalidate(true);
+}
@@ -0,0 +1,247 @@
+// ============================================
+// VIRTUALIZED TABLES - JavaScript
+// ============================================
+// Tables backed by the paged list endpoints (limit/offset/sort): rows are
+// requested one page at a time as they scroll into view, only the rows in
+// view are in the DOM and only a few pages are kept in memory. Sorting and
+// filtering are query parameters, so they happen in the server.
+
+const TABLE_ROW_HEIGHT = 48;
+const TABLE_PAGE_SIZE = 100;
+const TABLE_MAX_PAGES = 10;   // Pages kept in memory; the rest are requested again when scrolled back to
+const TABLE_OVERSCAN = 10;    // Rows rendered above and below the visible ones
+// Browsers cap element heights (about 17.9M px in Firefox, 33.5M px in Chrome).
+// Longer lists get a spacer of this height and the scroll position is mapped
+// proportionally to a row, so each pixel of scroll moves more than a pixel of rows.
+const TABLE_MAX_HEIGHT = 10000000;
+
+function debounce(fn, delay = 300) {
+    let timer = null;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), delay);
+    };
+}
+
+class VirtualTable {
+    /**
+     * options.endpoint  list endpoint, e.g. '/lots'
+     * options.params    function returning the filters of the request ({q: 'abc', type: ''}); empty ones are left out
+     * options.columns   [{label, width, sort, render(row)}]; sort is the endpoint's sort key of the column
+     * options.sort      initial sort ('' for the endpoint's default order, '-key' descending)
+     * options.empty     message when there are no rows
+     */
+    constructor(container, options) {
+        this.container = container;
+        this.endpoint = options.endpoint;
+        this.params = options.params || (() => ({}));
+        this.columns = options.columns;
+        this.sort = options.sort || '';
+        this.empty = options.empty || 'No hay registros';
+        this.pages = new Map();    // page index -> rows
+        this.loading = new Map();  // page index -> pending request
+        this.total = null;
+        this.generation = 0;       // Responses of an earlier reload are dropped
+        this.error = null;
+        this.build();
+    }
+
+    build() {
+        const template = this.columns.map(column => column.width || '1fr').join(' ');
+        this.container.innerHTML = `
+            <div class="vtable">
+                <div class="vtable-header" style="grid-template-columns: ${template};">
+                    ${this.columns.map((column, index) => `
+                        <div class="vtable-cell ${column.sort ? 'sortable' : ''}" data-index="${index}">${column.label}</div>
+                    `).join('')}
+                </div>
+                <div class="vtable-viewport">
+                    <div class="vtable-spacer">
+                        <div class="vtable-rows"></div>
+                    </div>
+                </div>
+                <div class="vtable-footer"></div>
+            </div>
+        `;
+        this.template = template;
+        this.header = this.container.querySelector('.vtable-header');
+        this.viewport = this.container.querySelector('.vtable-viewport');
+        this.spacer = this.container.querySelector('.vtable-spacer');
+        this.rowsElement = this.container.querySelector('.vtable-rows');
+        this.footer = this.container.querySelector('.vtable-footer');
+
+        this.header.addEventListener('click', event => {
+            const cell = event.target.closest('.sortable');
+            if (cell) this.toggleSort(this.columns[cell.dataset.index].sort);
+        });
+        let frame = null;
+        this.viewport.addEventListener('scroll', () => {
+            if (frame) return;
+            frame = requestAnimationFrame(() => {
+                frame = null;
+                this.update();
+            });
+        });
+        this.updateHeader();
+    }
+
+    get connected() {
+        return document.body.contains(this.container);
+    }
+
+    url(index) {
+        const query = new URLSearchParams();
+        for (const [key, value] of Object.entries(this.params())) {
+            if (value !== '' && value !== null && value !== undefined) query.set(key, value);
+        }
+        if (this.sort) query.set('sort', this.sort);
+        query.set('limit', TABLE_PAGE_SIZE);
+        query.set('offset', index * TABLE_PAGE_SIZE);
+        return `${this.endpoint}?${query}`;
+    }
+
+    // Start again from the first page; keepScroll for refreshes of the same list
+    async reload({ keepScroll = false } = {}) {
+        this.generation += 1;
+        this.pages.clear();
+        this.loading.clear();
+        this.error = null;
+        if (!keepScroll) {
+            this.total = null;
+            this.viewport.scrollTop = 0;
+        }
+        // The first page carries the total
+        await this.fetchPage(0);
+        this.update();
+    }
+
+    fetchPage(index) {
+        if (this.pages.has(index)) return Promise.resolve();
+        if (this.loading.has(index)) return this.loading.get(index);
+
+        const generation = this.generation;
+        const request = api.get(this.url(index))
+            .then(body => {
+                if (generation !== this.generation) return;
+                if (body.total !== undefined) this.total = body.total;
+                this.pages.set(index, body.data);
+                this.evict(index);
+            })
+            .catch(error => {
+                if (generation !== this.generation) return;
+                console.error(`Error loading ${this.endpoint}:`, error);
+                this.error = error;
+            })
+            .finally(() => {
+                if (this.loading.get(index) === request) this.loading.delete(index);
+            });
+        this.loading.set(index, request);
+        return request;
+    }
+
+    // Drop the pages farthest from the one in view
+    evict(current) {
+        while (this.pages.size > TABLE_MAX_PAGES) {
+            const farthest = [...this.pages.keys()].reduce((a, b) => (Math.abs(a - current) >= Math.abs(b - current) ? a : b));
+            this.pages.delete(farthest);
+        }
+    }
+
+    update() {
+        if (this.error && this.total === null) {
+            this.rowsElement.innerHTML = `<p class="text-center" style="color: var(--danger-500); padding: 2rem;">Error al cargar los datos: ${this.error.message}</p>`;
+            this.footer.textContent = '';
+            return;
+        }
+        if (this.total === null) {
+            this.rowsElement.innerHTML = '<p class="text-center" style="color: var(--gray-500); padding: 2rem;">Cargando...</p>';
+            return;
+        }
+        if (this.total === 0) {
+            this.spacer.style.height = 'auto';
+            this.rowsElement.style.transform = '';
+            this.rowsElement.innerHTML = `<p class="text-center" style="color: var(--gray-500); padding: 2rem;">${this.empty}</p>`;
+            this.footer.textContent = '';
+            return;
+        }
+
+        // `offset` is the position of the rows in the full list minus their position in the spacer
+        const fullHeight = this.total * TABLE_ROW_HEIGHT;
+        const height = Math.min(fullHeight, TABLE_MAX_HEIGHT);
+        this.spacer.style.height = `${height}px`;
+        const visible = this.viewport.clientHeight;
+        const top = Math.min(this.viewport.scrollTop, Math.max(height - visible, 0));
+        const virtualTop = fullHeight > height ? top * (fullHeight - visible) / (height - visible) : top;
+        const offset = virtualTop - top;
+
+        const first = Math.max(0, Math.floor(virtualTop / TABLE_ROW_HEIGHT) - TABLE_OVERSCAN);
+        const last = Math.min(this.total, Math.ceil((virtualTop + visible) / TABLE_ROW_HEIGHT) + TABLE_OVERSCAN);
+
+        const missing = [];
+        const rows = [];
+        for (let i = first; i < last; i++) {
+            const index = Math.floor(i / TABLE_PAGE_SIZE);
+            const page = this.pages.get(index);
+            if (!page) {
+                if (!missing.includes(index)) missing.push(index);
+                rows.push('<div class="vtable-row vtable-placeholder"><div class="vtable-cell">Cargando...</div></div>');
+            } else if (page[i % TABLE_PAGE_SIZE]) {
+                const row = page[i % TABLE_PAGE_SIZE];
+                rows.push(`
+                    <div class="vtable-row" style="grid-template-columns: ${this.template};">
+                        ${this.columns.map(column => `<div class="vtable-cell">${column.render(row)}</div>`).join('')}
+                    </div>
+                `);
+            }
+        }
+
+        this.rowsElement.style.transform = `translateY(${first * TABLE_ROW_HEIGHT - offset}px)`;
+        this.rowsElement.innerHTML = rows.join('');
+        this.footer.textContent = `${this.total.toLocaleString('es-ES')} registro(s)`;
+
+        if (missing.length) {
+            Promise.all(missing.map(index => this.fetchPage(index))).then(() => {
+                if (missing.some(index => this.pages.has(index))) this.update();
+            });
+        }
+    }
+
+    toggleSort(key) {
+        // key -> -key -> default order of the endpoint
+        this.sort = this.sort === key ? `-${key}` : this.sort === `-${key}` ? '' : key;
+        this.updateHeader();
+        this.reload();
+    }
+
+    updateHeader() {
+        this.header.querySelectorAll('.sortable').forEach(cell => {
+            const key = this.columns[cell.dataset.index].sort;
+            cell.classList.toggle('sorted-asc', this.sort === key);
+            cell.classList.toggle('sorted-desc', this.sort === `-${key}`);
+        });
+    }
+
+    // Loaded row with this id, to patch it in place
+    find(id) {
+        for (const page of this.pages.values()) {
+            const row = page.find(item => item.id === id);
+            if (row) return row;
+        }
+        return null;
+    }
+}
+
+// One table per container: reused while its container is on screen
+function mountTable(name, containerId, options) {
+    const existing = app.tables[name];
+    if (existing && existing.connected) return existing;
+    const container = document.getElementById(containerId);
+    if (!container) return null;
+    app.tables[name] = new VirtualTable(container, options);
+    return app.tables[name];
+}
+
+function refreshTable(name) {
+    const table = app.tables[name];
+    if (table && table.connected) table.reload({ keepScroll: true });
+}
@@ -15,9 +15,7 @@ function renderTraceability() {
                     <div class="form-row">
                         <div class="form-group">
                             <label class="form-label">Producto</label>
-                            <select id="trace-product" class="form-select">
-                                <option value="">Todos los productos...</option>
-                            </select>
+                            <select id="trace-product" class="form-select"></select>
                         </div>
                         
                         <div class="form-group">
@@ -35,42 +33,12 @@ function renderTraceability() {
     `;
 }
 
-async function loadTraceabilityView() {
-    try {
-        // Load products for dropdown
-        const products = await api.get('/products');
-        const select = document.getElementById('trace-product');
-
-        products.forEach(p => {
-            const option = document.createElement('option');
-            option.value = p.id;
-            option.textContent = `${p.code} - ${p.name}`;
-            select.appendChild(option);
-        });
-
-        // Initialize searchable select for product
-        if (typeof initSearchableSelect === 'function') {
-            initSearchableSelect('trace-product');
-        }
-
-        // Add event listener for lot search
-        document.getElementById('trace-lot-number').addEventListener('input', suggestLots);
-
-    } catch (error) {
-        console.error('Error loading traceability view:', error);
-    }
-}
-
-async function suggestLots() {
-    const lotNumber = document.getElementById('trace-lot-number').value;
-    if (lotNumber.length < 2) return;
-
-    try {
-        const lots = await api.get(`/lots?lot_number=${lotNumber}`);
-        // Could add autocomplete suggestions here
-    } catch (error) {
-        console.error('Error searching lots:', error);
-    }
+function loadTraceabilityView() {
+    initPicker('trace-product', {
+        collection: 'products',
+        label: productPickerLabel,
+        placeholder: 'Todos los productos...'
+    });
 }
 
 async function searchTraceability() {
@@ -143,8 +111,9 @@ async function showLotTraceability(lotId) {
         // TABLA 1: Información del Lote (común para todos)
         traceabilityHtml += `
             <div class="card" style="margin-bottom: 1.5rem;">
-                <div class="card-header">
+                <div class="card-header flex items-center justify-between">
                     <h3 class="card-title">📋 Información del Lote</h3>
+                    <button class="btn btn-sm btn-secondary" onclick="downloadExport('recall/${lotId}', {}, 'xlsx')">Exportar retirada</button>
                 </div>
                 <div class="card-body">
                     <div class="table-container">
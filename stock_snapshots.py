@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Take the stock snapshots behind /api/inventory?as_of=
+
+Without options takes every missing month-start snapshot (stock at month
+end) from the first movement to today, oldest first. Run it once to
+backfill an existing database; afterwards one snapshot per month is enough.
+See utils/snapshots.py.
+
+Usage:
+    python stock_snapshots.py
+    python stock_snapshots.py --at 2026-07-01
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime
+
+from app import create_app
+from models import db
+from utils.snapshots import take_monthly_snapshots, take_snapshot
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Genera las instantáneas de stock mensuales')
+    parser.add_argument('--at', type=date.fromisoformat,
+                        help='Instantánea al inicio de este día YYYY-MM-DD (por defecto, las mensuales que falten)')
+    parser.add_argument('--config', default='development', help='Configuración de la aplicación')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_app(args.config)
+    with app.app_context():
+        started = time.perf_counter()
+        if args.at:
+            snapshots = [take_snapshot(datetime.combine(args.at, datetime.min.time()))]
+            db.session.commit()
+        else:
+            snapshots = take_monthly_snapshots()
+        for snapshot in snapshots:
+            print(f'{snapshot.cutoff:%Y-%m-%d}: {snapshot.balances.count()} saldos '
+                  f'(movimientos hasta #{snapshot.last_movement_id})')
+        print(f'{len(snapshots)} instantánea(s) en {time.perf_counter() - started:.1f} s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
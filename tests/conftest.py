@@ -0,0 +1,224 @@
+"""
+Shared fixtures for the test suite
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from models import (db, Product, ProductType, Lot, Customer, Location, LotLocation, StockMovement,
+                    MovementType, ProductionOrder, ProductionOrderStatus, ProductionOrderFinishedProduct,
+                    ProductionOrderMaterial, Shipment, ShipmentDetail, Return, ReturnDetail, Alert,
+                    AlertType, AlertSeverity)
+
+
+def build_dataset(n_lots):
+    """Create a consistent synthetic dataset with n_lots lots
+
+    Reference data (locations, products, customers) has a fixed size, while
+    transactional data (lots, movements, orders, shipments, returns, alerts)
+    grows linearly with n_lots. Even lots are receptions of raw materials or
+    packaging; odd lots are finished product lots produced by a closed order
+    that consumed the previous reception lot.
+
+    Returns a dict with the ids used to build per-entity URLs.
+    """
+    today = date.today()
+
+    # ============ REFERENCE DATA ============
+    rec = Location(code='REC', name='Recepción', is_available=False)
+    lib = Location(code='LIB', name='Liberado', is_available=True)
+    dev = Location(code='DEV', name='Devoluciones', is_available=False)
+    nc = Location(code='NC', name='No Conforme', is_available=False)
+    fab = Location(code='FAB', name='Fabricación Pendiente', is_available=False)
+    db.session.add_all([rec, lib, dev, nc, fab])
+
+    materials = [
+        Product(code='MP-001', name='Agua destilada', type=ProductType.RAW_MATERIAL, min_stock=100.0,
+                storage_unit='l', consumption_unit='kg', density=1.0),
+        Product(code='MP-002', name='Glicerina', type=ProductType.RAW_MATERIAL, min_stock=50.0,
+                storage_unit='kg', consumption_unit='kg'),
+        Product(code='ENV-001', name='Tarro 50ml', type=ProductType.PACKAGING, min_stock=500.0,
+                storage_unit='ud', consumption_unit='ud'),
+    ]
+    finished = [
+        Product(code='PA-001', name='Crema Hidratante 50ml', type=ProductType.FINISHED_PRODUCT,
+                min_stock=50.0, storage_unit='ud', consumption_unit='ud'),
+        Product(code='PA-002', name='Crema Hidratante 100ml', type=ProductType.FINISHED_PRODUCT,
+                min_stock=None, storage_unit='ud', consumption_unit='ud'),
+    ]
+    customers = [
+        Customer(code=f'CLI-{i:03d}', name=f'Cliente {i}', email=f'cliente{i}@example.com')
+        for i in range(1, 4)
+    ]
+    db.session.add_all(materials + finished + customers)
+    db.session.flush()
+
+    # ============ LOTS ============
+    lots = []
+    for i in range(n_lots):
+        if i % 2 == 0:
+            product = materials[(i // 2) % len(materials)]
+            unit = product.storage_unit
+            quantity = 100.0
+        else:
+            product = finished[(i // 2) % len(finished)]
+            unit = 'ud'
+            quantity = 50.0
+        # One lot in ten is already expired
+        expiration = today - timedelta(days=5) if i % 10 == 9 else today + timedelta(days=30 + i)
+        lots.append(Lot(
+            product_id=product.id,
+            lot_number=f'L{i:06d}',
+            manufacturing_date=today - timedelta(days=60),
+            expiration_date=expiration,
+            initial_quantity=quantity,
+            current_quantity=quantity,
+            unit=unit
+        ))
+    db.session.add_all(lots)
+    db.session.flush()
+
+    ids = {
+        'lot_id': lots[0].id,
+        'finished_lot_id': lots[1].id if n_lots > 1 else lots[0].id,
+        'product_id': materials[0].id,
+        'lot_number': lots[0].lot_number,
+        'customer_id': customers[0].id,
+        'location_id': lib.id,
+    }
+
+    # ============ RECEPTIONS AND PRODUCTION ============
+    for i, lot in enumerate(lots):
+        if i % 2 == 0:
+            # Reception into REC, released to LIB
+            db.session.add_all([
+                StockMovement(lot_id=lot.id, movement_type=MovementType.ENTRY, quantity=lot.initial_quantity,
+                              to_location_id=rec.id, notes=f'Recepción - Proveedor: Proveedor {i % 7}'),
+                StockMovement(lot_id=lot.id, movement_type=MovementType.TRANSFER, quantity=lot.initial_quantity,
+                              from_location_id=rec.id, to_location_id=lib.id),
+            ])
+            continue
+
+        material_lot = lots[i - 1]
+        consumed = 20.0
+        order = ProductionOrder(
+            order_number=f'OF-{i:06d}',
+            base_product_name='Crema Hidratante',
+            base_lot_number=lot.lot_number,
+            production_date=today - timedelta(days=30),
+            expiration_date=lot.expiration_date,
+            status=ProductionOrderStatus.CLOSED
+        )
+        db.session.add(order)
+        db.session.flush()
+
+        fp = ProductionOrderFinishedProduct(
+            production_order_id=order.id, finished_product_id=lot.product_id, lot_number=lot.lot_number,
+            target_quantity=lot.initial_quantity, produced_quantity=lot.initial_quantity, unit='ud',
+            expiration_date=lot.expiration_date, lot_id=lot.id
+        )
+        db.session.add(fp)
+        db.session.flush()
+
+        db.session.add_all([
+            ProductionOrderMaterial(production_order_id=order.id, lot_id=material_lot.id,
+                                    quantity_consumed=consumed, unit=material_lot.unit,
+                                    related_finished_product_id=fp.id),
+            StockMovement(lot_id=material_lot.id, movement_type=MovementType.PRODUCTION, quantity=-consumed,
+                          reference_id=order.id, reference_type='production_order', from_location_id=lib.id),
+            StockMovement(lot_id=lot.id, movement_type=MovementType.PRODUCTION, quantity=lot.initial_quantity,
+                          reference_id=order.id, reference_type='production_order', to_location_id=fab.id),
+            StockMovement(lot_id=lot.id, movement_type=MovementType.TRANSFER, quantity=lot.initial_quantity,
+                          from_location_id=fab.id, to_location_id=lib.id),
+        ])
+        material_lot.current_quantity -= consumed
+
+        # Ship part of every finished lot
+        customer = customers[(i // 2) % len(customers)]
+        shipped = 10.0
+        shipment = Shipment(customer_id=customer.id, shipment_date=today - timedelta(days=10),
+                            shipment_number=f'ENV-{i:06d}')
+        db.session.add(shipment)
+        db.session.flush()
+        db.session.add_all([
+            ShipmentDetail(shipment_id=shipment.id, lot_id=lot.id, quantity=shipped, unit='ud'),
+            StockMovement(lot_id=lot.id, movement_type=MovementType.SHIPMENT, quantity=-shipped,
+                          reference_id=shipment.id, reference_type='shipment', from_location_id=lib.id),
+        ])
+        lot.current_quantity -= shipped
+
+        # Part of one shipment in four comes back
+        returned = 0.0
+        if i % 8 == 1:
+            returned = 2.0
+            return_record = Return(customer_id=customer.id, return_date=today - timedelta(days=5),
+                                   return_number=f'DEV-{i:06d}', reason='customer_return')
+            db.session.add(return_record)
+            db.session.flush()
+            db.session.add_all([
+                ReturnDetail(return_id=return_record.id, lot_id=lot.id, quantity=returned, unit='ud'),
+                StockMovement(lot_id=lot.id, movement_type=MovementType.RETURN, quantity=returned,
+                              reference_id=return_record.id, reference_type='return', to_location_id=dev.id),
+                LotLocation(lot_id=lot.id, location_id=dev.id, quantity=returned),
+            ])
+            lot.current_quantity += returned
+            ids.setdefault('return_id', return_record.id)
+
+        ids.setdefault('order_id', order.id)
+        ids.setdefault('shipment_id', shipment.id)
+
+    # Every lot keeps its non-returned stock in LIB
+    for i, lot in enumerate(lots):
+        returned = 2.0 if i % 8 == 1 else 0.0
+        db.session.add(LotLocation(lot_id=lot.id, location_id=lib.id, quantity=lot.current_quantity - returned))
+
+    # A draft order waiting for materials
+    draft = ProductionOrder(order_number='OF-DRAFT', base_product_name='Crema Hidratante',
+                            base_lot_number='L-DRAFT', production_date=today,
+                            status=ProductionOrderStatus.DRAFT)
+    db.session.add(draft)
+
+    # ============ ALERTS ============
+    for i, lot in enumerate(lots):
+        if i % 5 == 0:
+            db.session.add(Alert(alert_type=AlertType.EXPIRING_SOON, severity=AlertSeverity.WARNING,
+                                 product_id=lot.product_id, lot_id=lot.id,
+                                 message=f'Lote {lot.lot_number} caduca pronto'))
+
+    db.session.commit()
+    return ids
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect the SQL statements executed on engine while the block runs"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def app():
+    """Application with an empty database (in memory, or TEST_DATABASE_URL)"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,95 @@
+"""
+Archival: old records leave the hot tables and traceability still finds them
+"""
+from datetime import datetime, timedelta
+
+from models import (db, ARCHIVE_TABLES, Lot, LotLocation, MovementType, ProductionOrder, ProductionOrderStatus, Shipment,
+                    ShipmentDetail, StockMovement, SyncTombstone)
+from tests.conftest import build_dataset
+from utils.archive import archive
+from utils.reconciliation import check
+
+# Three years from now, archiving what is older than two: everything in the dataset is old
+LATER = datetime.utcnow() + timedelta(days=3 * 365)
+
+
+def archived_ids(model):
+    return set(db.session.scalars(db.select(ARCHIVE_TABLES[model].c.id)))
+
+
+def prepare():
+    """build_dataset(16) with its orders closed, lots 0-3 depleted and lot 3 shipped with lot 5"""
+    build_dataset(16)
+    now = datetime.utcnow()
+    for order in ProductionOrder.query.filter_by(status=ProductionOrderStatus.CLOSED):
+        order.closed_at = now
+    lots = Lot.query.order_by(Lot.id).all()
+    for lot in lots[:4]:
+        for location in LotLocation.query.filter_by(lot_id=lot.id):
+            db.session.add(StockMovement(lot_id=lot.id, movement_type=MovementType.ADJUSTMENT,
+                                         quantity=-location.quantity, from_location_id=location.location_id))
+            location.quantity = 0
+        lot.current_quantity = 0
+    shipment = Shipment.query.filter_by(shipment_number='ENV-000003').one()
+    db.session.add(ShipmentDetail(shipment_id=shipment.id, lot_id=lots[5].id, quantity=1, unit='ud'))
+    db.session.commit()
+    return [lot.id for lot in lots]
+
+
+def test_archive_moves_old_records(app):
+    with app.app_context():
+        lot_ids = prepare()
+        movements = StockMovement.query.filter(StockMovement.lot_id.in_(lot_ids[:3])).count()
+
+        run = archive(730, batch_size=1, now=LATER)
+        assert (run.orders, run.lots, run.shipments, run.returns) == (8, 3, 1, 1)
+        assert run.movements == movements and run.finished_at is not None
+        # Lot 3 shares a shipment with lot 5, which still has stock
+        assert archived_ids(Lot) == set(lot_ids[:3])
+        assert {lot.id for lot in Lot.query} == set(lot_ids[3:])
+        assert ProductionOrder.query.count() == 1  # The draft
+        assert SyncTombstone.query.filter_by(table_name='lots').count() == 3
+        report = check()
+        assert (report['movement_mismatches'], report['location_mismatches']) == (0, 0)
+
+        assert archive(730, batch_size=1, now=LATER).lots == 0
+
+
+def test_traceability_reads_the_archive(app, client):
+    with app.app_context():
+        lot_ids = prepare()
+        product_id = db.session.get(Lot, lot_ids[0]).product_id
+        archive(730, batch_size=500, now=LATER)
+
+    body = client.get(f'/api/traceability/lot/{lot_ids[1]}').get_json()
+    assert body['lot']['archived'] is True
+    assert body['produced_from']['order_number'] == 'OF-000001'
+    assert [m['lot_id'] for m in body['produced_from']['materials']] == [lot_ids[0]]
+    assert [c['shipment_number'] for c in body['customers']] == ['ENV-000001']
+    assert [r['return_number'] for r in body['returns']] == ['DEV-000001']
+
+    body = client.get(f'/api/traceability/lot/{lot_ids[0]}/reverse').get_json()
+    assert body['lot']['archived'] is True
+    used, = body['used_in_production']
+    assert used['production_order']['order_number'] == 'OF-000001'
+    assert used['finished_lot']['id'] == lot_ids[1] and used['finished_lot']['archived'] is True
+    assert [c['shipment_number'] for c in used['customers']] == ['ENV-000001']
+
+    # A hot lot used by an archived order
+    body = client.get(f'/api/traceability/lot/{lot_ids[4]}/reverse').get_json()
+    assert 'archived' not in body['lot']
+    used, = body['used_in_production']
+    assert used['production_order']['order_number'] == 'OF-000005' and 'archived' not in used['finished_lot']
+    body = client.get(f'/api/traceability/lot/{lot_ids[5]}').get_json()
+    assert body['produced_from']['order_number'] == 'OF-000005'
+
+    body = client.get(f'/api/traceability/product/{product_id}/lot/L000000').get_json()
+    assert body['lot']['id'] == lot_ids[0]
+    customer = client.get(f'/api/traceability/lot/{lot_ids[1]}').get_json()['customers'][0]['customer']
+    shipments = {r['shipment_number'] for r in client.get(f'/api/traceability/customer/{customer["id"]}').get_json()['lots_received']}
+    assert 'ENV-000001' in shipments
+    assert client.get('/api/traceability/lot/99999').status_code == 404
+
+    body = client.get('/api/archive').get_json()
+    assert body['tables']['lots'] == {'hot': 13, 'archived': 3}
+    assert body['runs'][0]['lots'] == 3 and body['horizon'] == body['runs'][0]['cutoff']
@@ -0,0 +1,112 @@
+"""
+Static asset bundles: minification, content hashing and immutable, precompressed serving
+"""
+import gzip
+import json
+import re
+
+import pytest
+
+from utils import assets
+from utils.assets import build, minify_css, minify_js
+
+
+@pytest.fixture
+def built(app, tmp_path):
+    """Bundles built into a temporary directory the app serves from"""
+    app.config['ASSETS_DIR'] = str(tmp_path)
+    return build(str(tmp_path))
+
+
+def test_minify_js_keeps_literals():
+    source = '''
+        // Comment
+        const url = 'http://example.com'; /* block */
+        const html = `<a href="//x">
+            ${items.map(item => `<b>${item.name.replace(/"/g, '&quot;')}</b>`).join('')}
+        </a>`;
+        const ratio = total / count / 2;
+        let a = b
+        ++c
+        return x - -y
+    '''
+    minified = minify_js(source)
+    assert 'Comment' not in minified and 'block' not in minified
+    assert "'http://example.com'" in minified
+    assert '''`<a href="//x">
+            ${items.map(item=>`<b>${item.name.replace(/"/g,'&quot;')}</b>`).join('')}
+        </a>`''' in minified
+    assert 'total/count/2' in minified
+    assert 'let a=b\n++c' in minified  # The line break keeps a statement boundary
+    assert 'x- -y' in minified
+    assert minify_js(minified) == minified
+
+
+def test_minify_css():
+    source = '''
+        /* Header */
+        .nav-item :hover,  .a > .b {
+            content: "a  b";
+            width: calc(100% - 2rem);
+        }
+    '''
+    assert minify_css(source) == '.nav-item :hover,.a>.b{content:"a  b";width:calc(100% - 2rem)}\n'
+
+
+def test_build_writes_hashed_precompressed_bundles(tmp_path):
+    manifest = build(str(tmp_path))
+    assert set(manifest) == set(assets.BUNDLES)
+    assert re.fullmatch(r'app\.[0-9a-f]{12}\.js', manifest['app.js'])
+    assert json.loads((tmp_path / 'manifest.json').read_text()) == manifest
+
+    content = (tmp_path / manifest['app.js']).read_bytes()
+    assert b'class VirtualTable' in content and b'async function searchTraceability' in content
+    assert gzip.decompress((tmp_path / (manifest['app.js'] + '.gz')).read_bytes()) == content
+    if assets.brotli is not None:
+        assert assets.brotli.decompress((tmp_path / (manifest['app.js'] + '.br')).read_bytes()) == content
+
+    # Same sources, same names
+    assert build(str(tmp_path)) == manifest
+
+
+def test_index_links_the_build(app, client, built):
+    page = client.get('/')
+    html = page.get_data(as_text=True)
+    assert f'/assets/{built["app.js"]}' in html and f'/assets/{built["app.css"]}' in html
+    assert '/static/js/main.js' not in html
+    assert 'no-cache' in page.headers['Cache-Control']
+
+    app.config['ASSETS_BUNDLED'] = False
+    html = client.get('/').get_data(as_text=True)
+    assert '/static/js/tables.js' in html and '/static/css/forms.css' in html and '"/assets/' not in html
+
+
+def test_index_links_the_sources_without_a_build(app, client, tmp_path):
+    app.config['ASSETS_DIR'] = str(tmp_path)
+    html = client.get('/').get_data(as_text=True)
+    sources = re.findall(r'src="(/static/js/\w+\.js)"', html)
+    assert sources == [f'/static/{path}' for path in assets.BUNDLES['app.js']]
+
+
+def test_bundles_are_served_precompressed_and_immutable(client, built, tmp_path):
+    url = f'/assets/{built["app.js"]}'
+    content = (tmp_path / built['app.js']).read_bytes()
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == content
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    if assets.brotli is not None:
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+
+    response = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers and response.get_data() == content
+    assert 'javascript' in response.mimetype
+
+    assert client.get('/assets/app.0123456789ab.js').status_code == 404
+    assert client.get('/assets/manifest.json').status_code == 404
+    assert client.get(f'{url}.gz').status_code == 404
+    assert client.get('/assets/../app.py').status_code == 404
@@ -0,0 +1,35 @@
+"""
+Benchmark statistics and regression detection
+"""
+from benchmarks.compare import compare_results
+from benchmarks.runner import InProcessClient, percentile, run_scenario
+from benchmarks.scenarios import SCENARIOS_BY_NAME, discover_fixtures
+from tests.conftest import build_dataset
+
+
+def test_percentile_interpolates_between_ranks():
+    values = [10, 20, 30, 40]
+    assert percentile(values, 0.0) == 10
+    assert percentile(values, 0.5) == 25
+    assert percentile(values, 1.0) == 40
+    assert percentile([], 0.5) is None
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    baseline = {'scenarios': {'lots': {'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'throughput_rps': 100.0}}}
+    current = {'scenarios': {'lots': {'p50_ms': 10.5, 'p95_ms': 40.0, 'p99_ms': 30.2, 'throughput_rps': 50.0}}}
+
+    regressions = {row[1] for row in compare_results(baseline, current, threshold=0.2) if row[-1]}
+
+    assert regressions == {'p95_ms', 'throughput_rps'}
+
+
+def test_scenarios_run_in_process(app):
+    with app.app_context():
+        build_dataset(20)
+        fixtures = discover_fixtures()
+
+    for name in ('inventory', 'trace_customer', 'reception', 'shipment', 'production_close'):
+        summary = run_scenario(lambda: InProcessClient(app), SCENARIOS_BY_NAME[name], fixtures, iterations=3)
+        assert summary['errors'] == 0, summary.get('first_error')
+        assert summary['requests'] == 3
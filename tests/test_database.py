@@ -0,0 +1,97 @@
+"""
+SQLite production profile: pragmas and serialized stock writes
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from sqlalchemy import event, text
+
+from app import create_app
+from config import config, ProductionConfig, TestingConfig
+from models import db, Lot
+from tests.conftest import build_dataset
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """App on a database file with the production SQLite profile"""
+    profile = type('SqliteProfileConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "almacen.db"}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLITE_PRAGMAS': ProductionConfig.SQLITE_PRAGMAS,
+    })
+    monkeypatch.setitem(config, 'sqlite_profile', profile)
+    app = create_app('sqlite_profile')
+    with app.app_context():
+        db.create_all()
+        ids = build_dataset(10)
+    app.ids = ids
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_pragmas_are_applied_to_every_connection(file_app):
+    with file_app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql('PRAGMA busy_timeout').scalar() == ProductionConfig.SQLITE_PRAGMAS['busy_timeout']
+
+
+def test_stock_writes_begin_immediate(file_app):
+    client = file_app.test_client()
+    with file_app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        client.get('/api/inventory')
+        assert 'BEGIN IMMEDIATE' not in statements
+        response = client.post('/api/lots/%d/adjust' % file_app.ids['lot_id'],
+                               json={'real_quantity': 1})
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200, response.get_json()
+    assert 'BEGIN IMMEDIATE' in statements
+
+
+def test_concurrent_shipments_do_not_fail_or_oversell(file_app):
+    lot_id = file_app.ids['finished_lot_id']
+    with file_app.app_context():
+        stock = db.session.get(Lot, lot_id).current_quantity
+
+    def ship(i):
+        return file_app.test_client().post('/api/shipments', json={
+            'customer_id': file_app.ids['customer_id'],
+            'shipment_number': f'CONC-{i}',
+            'shipment_date': date.today().isoformat(),
+            'details': [{'lot_id': lot_id, 'quantity': 1}]
+        }).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(ship, range(16)))
+
+    assert statuses == [201] * 16
+    with file_app.app_context():
+        assert db.session.get(Lot, lot_id).current_quantity == pytest.approx(stock - 16)
+        assert db.session.execute(text('PRAGMA integrity_check')).scalar() == 'ok'
+
+
+def test_malformed_lot_ids_are_rejected_before_locking(file_app):
+    client = file_app.test_client()
+    details = [{'lot_id': file_app.ids['finished_lot_id'], 'quantity': 1}, {'lot_id': 'x', 'quantity': 1}]
+    response = client.post('/api/shipments', json={
+        'customer_id': file_app.ids['customer_id'], 'shipment_number': 'MAL-1',
+        'shipment_date': date.today().isoformat(), 'details': details})
+    assert response.status_code == 404 and response.get_json()['error'] == 'Lote x no encontrado'
+    response = client.post('/api/returns', json={
+        'customer_id': file_app.ids['customer_id'], 'return_number': 'MAL-1',
+        'return_date': date.today().isoformat(), 'reason': 'customer_return', 'details': details})
+    assert 400 <= response.status_code < 500
@@ -0,0 +1,118 @@
+"""
+Live update events: outbox written on commit and the /api/events stream
+"""
+import json
+
+from models import db, Alert, AlertSeverity, AlertType, EventOutbox, Lot, ProductionOrder, ProductionOrderStatus
+from tests.conftest import build_dataset
+
+
+def outbox(app):
+    with app.app_context():
+        return [(row.channel, json.loads(row.payload)) for row in EventOutbox.query.order_by(EventOutbox.id)]
+
+
+def read_event(chunks):
+    """Next event of an SSE stream as (id, event, data), skipping comments and retry lines"""
+    while True:
+        block = next(chunks).decode()
+        fields = dict(line.split(': ', 1) for line in block.strip().split('\n') if not line.startswith(':'))
+        if 'event' in fields:
+            return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+
+def test_commits_publish_stock_alert_and_order_events(app):
+    with app.app_context():
+        ids = build_dataset(10)
+        EventOutbox.query.delete()
+        db.session.commit()
+
+        lot = db.session.get(Lot, ids['lot_id'])
+        lot.current_quantity -= 5
+        order = ProductionOrder.query.filter_by(order_number='OF-DRAFT').one()
+        order.status = ProductionOrderStatus.IN_PROGRESS
+        db.session.add(Alert(alert_type=AlertType.LOW_STOCK, severity=AlertSeverity.WARNING,
+                             product_id=lot.product_id, message='Stock bajo'))
+        db.session.commit()
+
+        unread = Alert.query.filter_by(is_read=False, is_dismissed=False).count()
+
+        lot.blocked = lot.blocked  # Same value: nothing to publish
+        db.session.commit()
+
+        lot.current_quantity += 1
+        db.session.rollback()  # Rolled back changes are not published
+
+    events = outbox(app)
+    assert [channel for channel, _ in events] == ['stock', 'orders', 'alerts']
+    assert events[0][1]['id'] == ids['lot_id'] and events[0][1]['current_quantity'] == 75.0
+    assert events[1][1]['status'] == 'in_progress'
+    assert events[2][1] == {'unread': unread}
+
+
+def test_transfer_and_bulk_delete_are_published(app, client):
+    with app.app_context():
+        ids = build_dataset(10)
+        EventOutbox.query.delete()
+        db.session.commit()
+
+    response = client.post('/api/locations/transfer', json={
+        'lot_id': ids['lot_id'], 'from_location_id': ids['location_id'],
+        'to_location_id': ids['location_id'] - 1, 'quantity': 1})
+    assert response.status_code in (200, 201), response.get_json()
+    client.post('/api/alerts/generate', json={})
+
+    events = outbox(app)
+    assert ('stock', {'id': ids['lot_id'], 'locations_changed': True}) in events
+    assert events[-1][0] == 'alerts'
+
+
+def test_stream_delivers_new_events_and_replays_from_last_event_id(app, client):
+    app.config['EVENTS_STREAM_SECONDS'] = 5
+    with app.app_context():
+        ids = build_dataset(10)
+        first_id = EventOutbox.query.order_by(EventOutbox.id.desc()).first().id
+
+    response = client.get('/api/events')
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    next(chunks)  # retry: subscribes to the bus
+
+    client.post(f'/api/lots/{ids["lot_id"]}/toggle-block')
+    with app.app_context():
+        app.extensions['events'].dispatch()
+    event_id, channel, data = read_event(chunks)
+    assert channel == 'stock'
+    assert data['id'] == ids['lot_id'] and data['blocked'] is True
+    response.close()
+
+    replay = client.get('/api/events', headers={'Last-Event-ID': str(first_id)})
+    chunks = iter(replay.response)
+    next(chunks)
+    assert read_event(chunks)[0] == first_id + 1
+    replay.close()
+
+
+def test_streams_per_worker_are_capped(app, client):
+    app.config['EVENTS_STREAM_SECONDS'] = 5
+    app.config['EVENTS_MAX_STREAMS'] = 2
+    with app.app_context():
+        build_dataset(10)
+
+    streams = [client.get('/api/events') for _ in range(2)]
+    for stream in streams:
+        next(iter(stream.response))
+
+    busy = client.get('/api/events')
+    assert busy.status_code == 503 and busy.headers['Retry-After'] == '30'
+    assert busy.get_data(as_text=True).startswith('retry: 30000')
+    # The other threads still serve the API
+    assert client.get('/api/products').status_code == 200
+
+    streams[1].close()
+    stream = client.get('/api/events')
+    assert stream.status_code == 200
+    stream.close()
+    streams[0].close()
+    with app.app_context():
+        assert not app.extensions['events'].subscribers
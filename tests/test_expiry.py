@@ -0,0 +1,88 @@
+"""
+Expiry sweep: the LIB stock of expired lots moves to NC
+"""
+from datetime import date, datetime, timedelta
+
+from models import db, Location, Lot, LotLocation, MovementType, StockMovement
+from tests.conftest import build_dataset
+from utils.expiry import SWEEP_REFERENCE, sweep
+from utils.reconciliation import check
+
+TODAY = date.today()
+
+
+def stock(code):
+    """lot_id -> quantity in the location with this code"""
+    return {ll.lot_id: ll.quantity for ll in LotLocation.query.join(Location).filter(Location.code == code)
+            if ll.quantity}
+
+
+def expired_lots():
+    return {lot.id for lot in Lot.query.filter(Lot.expiration_date < TODAY, Lot.current_quantity > 0)}
+
+
+def test_sweep_moves_expired_stock_to_nc(app):
+    with app.app_context():
+        build_dataset(40)
+        lib_before = stock('LIB')
+        expired = expired_lots()
+        assert len(expired) == 4 and expired <= set(lib_before)
+
+        record = sweep()
+        db.session.commit()
+        assert record.lots == 4 and record.expired_from is None
+        assert stock('NC') == {lot_id: lib_before[lot_id] for lot_id in expired}
+        assert stock('LIB') == {lot_id: quantity for lot_id, quantity in lib_before.items() if lot_id not in expired}
+
+        movements = StockMovement.query.filter_by(reference_type=SWEEP_REFERENCE).all()
+        assert {(m.lot_id, m.quantity) for m in movements} == {(lot_id, lib_before[lot_id]) for lot_id in expired}
+        assert all(m.movement_type == MovementType.TRANSFER and m.reference_id == record.id for m in movements)
+        assert {item.lot_id for item in record.swept_lots} == expired
+        # Quantities, locations and ledger still agree
+        report = check()
+        assert (report['movement_mismatches'], report['location_mismatches']) == (0, 0)
+
+        # Nothing left to move
+        assert sweep().lots == 0
+
+
+def test_sweep_only_looks_at_changed_lots(app):
+    with app.app_context():
+        build_dataset(20)
+        sweep()
+        db.session.commit()
+        lots = Lot.query.filter(Lot.expiration_date >= TODAY).order_by(Lot.id).all()
+        lib = Location.query.filter_by(code='LIB').one()
+
+        # Expires overnight
+        lots[0].expiration_date = TODAY
+        # Expired long ago but left untouched in LIB by a bulk load: not looked at
+        untouched = lots[1]
+        db.session.execute(Lot.__table__.update().where(Lot.id == untouched.id).values(
+            expiration_date=TODAY - timedelta(days=100), updated_at=datetime.utcnow() - timedelta(days=1)))
+        db.session.commit()
+        first_id = lots[0].id
+
+        record = sweep(today=TODAY + timedelta(days=1))
+        db.session.commit()
+        assert record.expired_from == TODAY
+        assert {item.lot_id for item in record.swept_lots} == {first_id}
+
+        # Stock moved back to LIB after the expiry is swept again
+        moved_back = LotLocation.query.filter_by(lot_id=first_id, location_id=lib.id).one()
+        moved_back.quantity = 5.0
+        db.session.commit()
+        record = sweep(today=TODAY + timedelta(days=1))
+        assert [(item.lot_id, item.quantity) for item in record.swept_lots] == [(first_id, 5.0)]
+
+        assert {item.lot_id for item in sweep(full=True).swept_lots} == {untouched.id}
+
+
+def test_sweep_job(app, client):
+    with app.app_context():
+        build_dataset(20)
+    assert client.post('/api/jobs/expiry_sweep/run').status_code == 202
+    with app.app_context():
+        run, = app.extensions['scheduler'].tick()
+        assert run.status == 'success' and run.to_dict()['result']['lots'] == 2
+        assert stock('NC').keys() == expired_lots()
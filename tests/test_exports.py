@@ -0,0 +1,88 @@
+"""
+Streaming exports: CSV and XLSX downloads of inventory, movements, shipments and recalls
+"""
+import csv
+import gzip
+import io
+import re
+import zipfile
+
+from models import db, Lot, LotLocation, StockMovement
+from tests.conftest import build_dataset
+from utils import exports
+
+
+def read_csv(response):
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=')
+    body = response.get_data()
+    if response.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    return list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+
+
+def read_xlsx(response):
+    """{sheet name: [[cell text or value]]}"""
+    workbook = zipfile.ZipFile(io.BytesIO(response.get_data()))
+    assert workbook.testzip() is None
+    names = re.findall(r'<sheet name="([^"]+)"', workbook.read('xl/workbook.xml').decode())
+    sheets = {}
+    for n, name in enumerate(names, 1):
+        xml = workbook.read(f'xl/worksheets/sheet{n}.xml').decode()
+        sheets[name] = [re.findall(r'<(?:t|v)[^>]*>([^<]*)<', row) for row in re.findall(r'<row>(.*?)</row>', xml)]
+    return sheets
+
+
+def test_inventory_and_movements_export(app, client):
+    with app.app_context():
+        build_dataset(20)
+        located = LotLocation.query.join(Lot).filter(Lot.current_quantity > 0, LotLocation.quantity > 0).count()
+        movements = StockMovement.query.count()
+
+    rows = read_csv(client.get('/api/exports/inventory?available_only=false'))
+    assert rows[0][:4] == ['Código', 'Producto', 'Tipo', 'Lote']
+    assert len(rows) - 1 == located
+
+    response = client.get('/api/exports/movements', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    rows = read_csv(response)
+    assert len(rows) - 1 == movements
+    assert [row[0] for row in rows[1:]] == sorted(row[0] for row in rows[1:])  # By date
+
+    sheets = read_xlsx(client.get('/api/exports/movements?format=xlsx&type=shipment'))
+    rows = sheets['Movimientos']
+    assert rows[0][0] == 'Fecha' and len(rows) > 1 and {row[1] for row in rows[1:]} == {'shipment'}
+
+    assert client.get('/api/exports/movements?format=pdf').status_code == 400
+    assert client.get('/api/exports/movements?date_from=ayer').status_code == 400
+    assert client.get('/api/exports/movements?type=otro').status_code == 400
+
+
+def test_long_xlsx_exports_continue_in_new_sheets(app, client, monkeypatch):
+    monkeypatch.setattr(exports, 'SHEET_ROWS', 10)
+    monkeypatch.setattr(exports, 'BATCH_SIZE', 7)
+    with app.app_context():
+        build_dataset(10)
+        movements = StockMovement.query.count()
+
+    sheets = read_xlsx(client.get('/api/exports/movements?format=xlsx'))
+    assert list(sheets)[:2] == ['Movimientos', 'Movimientos 2']
+    assert all(len(rows) <= 10 and rows[0][0] == 'Fecha' for rows in sheets.values())
+    assert sum(len(rows) - 1 for rows in sheets.values()) == movements
+
+
+def test_shipments_and_recall_export(app, client):
+    with app.app_context():
+        ids = build_dataset(20)
+        material_lot = db.session.get(Lot, ids['lot_id'])
+        finished_lot = db.session.get(Lot, ids['finished_lot_id'])
+        numbers = material_lot.lot_number, finished_lot.lot_number
+
+    rows = read_csv(client.get(f'/api/exports/shipments?customer_id={ids["customer_id"]}'))
+    assert len(rows) > 1 and {row[0] for row in rows[1:]} == {'CLI-001'}
+
+    # The material lot was not shipped; the finished lot made with it was
+    rows = read_csv(client.get(f'/api/exports/recall/{ids["lot_id"]}'))
+    assert [(row[0], row[4]) for row in rows[1:]] == [numbers[:1] * 2, numbers]
+    assert rows[1][7] == '' and rows[2][1] == 'OF-000001' and rows[2][8] == 'CLI-001'
+    assert client.get('/api/exports/recall/99999').status_code == 404
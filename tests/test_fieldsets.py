@@ -0,0 +1,91 @@
+"""
+Sparse fieldsets and side-loaded references on list endpoints
+"""
+from models import db
+from tests.conftest import build_dataset, count_queries
+
+
+def test_default_shape_is_unchanged(app, client):
+    with app.app_context():
+        build_dataset(10)
+
+    lots = client.get('/api/lots').get_json()
+    assert isinstance(lots, list)
+    assert lots[0]['product']['id'] == lots[0]['product_id']
+
+
+def test_fields_keeps_only_the_requested_keys(app, client):
+    with app.app_context():
+        build_dataset(10)
+
+    lots = client.get('/api/lots?fields=id,lot_number,current_quantity').get_json()
+    assert all(set(lot) == {'id', 'lot_number', 'current_quantity'} for lot in lots)
+
+    response = client.get('/api/lots?fields=id,colour')
+    assert response.status_code == 400
+    assert 'colour' in response.get_json()['error']
+
+
+def test_include_side_loads_each_reference_once(app, client):
+    with app.app_context():
+        build_dataset(20)
+
+    nested = client.get('/api/inventory').get_json()
+    body = client.get('/api/inventory?include=products,locations').get_json()
+    assert set(body) == {'data', 'included'}
+    assert len(body['data']) == len(nested)
+
+    products, locations = body['included']['products'], body['included']['locations']
+    assert len(products) == len({lot['product_id'] for lot in nested})
+    for lot, original in zip(body['data'], nested):
+        assert 'product' not in lot
+        assert products[str(lot['product_id'])] == original['product']
+        for lot_location in lot['locations']:
+            assert 'location' not in lot_location
+            assert str(lot_location['location_id']) in locations
+
+
+def test_include_reaches_nested_references(app, client):
+    with app.app_context():
+        build_dataset(10)
+
+    body = client.get('/api/production-orders?fields=id,materials&include=lots,products').get_json()
+    materials = [m for order in body['data'] for m in order['materials']]
+    assert materials and all('lot' not in m for m in materials)
+    lots = body['included']['lots']
+    assert all(str(m['lot_id']) in lots for m in materials)
+    assert all('product' not in lot and str(lot['product_id']) in body['included']['products']
+               for lot in lots.values())
+
+    assert client.get('/api/lots?include=warehouses').status_code == 400
+
+
+def test_included_entities_are_loaded_once_not_serialized_per_item(app, client):
+    with app.app_context():
+        build_dataset(20)
+        engine = db.engine
+
+    nested = client.get('/api/shipments').get_json()
+    with count_queries(engine) as plain:
+        client.get('/api/shipments')
+    with count_queries(engine) as statements:
+        body = client.get('/api/shipments?include=customers,lots,products').get_json()
+    # The list queries plus one per included collection
+    assert len(statements) == len(plain) + 3
+
+    details = [detail for shipment in body['data'] for detail in shipment['details']]
+    assert details and all('lot' not in detail for detail in details)
+    assert all('customer' not in shipment for shipment in body['data'])
+    included = body['included']
+    assert set(included['customers']) == {str(shipment['customer_id']) for shipment in nested}
+    assert set(included['lots']) == {str(detail['lot_id']) for detail in details}
+    for shipment in nested:
+        for detail in shipment['details']:
+            lot = dict(detail['lot'])
+            product = lot.pop('product')
+            assert included['lots'][str(lot['id'])] == lot
+            assert included['products'][str(product['id'])] == product
+
+    fields = client.get('/api/shipments?fields=id&include=customers').get_json()
+    assert all(set(shipment) == {'id'} for shipment in fields['data'])
+    assert set(fields['included']['customers']) == set(included['customers'])
@@ -0,0 +1,66 @@
+"""
+Synthetic dataset generator
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from generate_dataset import DatasetError, DatasetGenerator, main, verify_dataset
+from models import db, Lot, MovementType, ProductionOrderMaterial, StockMovement
+
+SIZES = dict(products=30, customers=5, lots=200, orders=50, shipments=60, returns=10, movements=2000)
+
+
+def generate(seed):
+    counts = DatasetGenerator(seed, date(2026, 1, 1), **SIZES).generate()
+    lots = [(lot.lot_number, lot.current_quantity) for lot in Lot.query.order_by(Lot.id)]
+    return counts, lots
+
+
+def test_generated_dataset_keeps_stock_invariants(app):
+    with app.app_context():
+        counts, _ = generate(seed=1)
+
+        assert counts['lots'] == SIZES['lots']
+        assert counts['stock_movements'] == SIZES['movements']
+        assert ProductionOrderMaterial.query.count() > 0
+        assert verify_dataset() == 0
+
+        early = StockMovement.query.join(Lot).filter(
+            func.date(StockMovement.movement_date) < Lot.manufacturing_date).count()
+        late = StockMovement.query.filter(StockMovement.movement_date >= datetime(2026, 1, 2)).count()
+        assert early == 0 and late == 0
+
+
+def test_verify_dataset_finds_negative_balances(app):
+    with app.app_context():
+        generate(seed=1)
+        lot = Lot.query.filter(Lot.current_quantity > 10).order_by(Lot.id).first()
+        first = StockMovement.query.filter_by(lot_id=lot.id).order_by(StockMovement.movement_date).first()
+        # Same totals, but the stock leaves the lot before it arrives
+        db.session.add_all([
+            StockMovement(lot_id=lot.id, movement_type=MovementType.ADJUSTMENT, quantity=-5.0,
+                          movement_date=first.movement_date - timedelta(days=1)),
+            StockMovement(lot_id=lot.id, movement_type=MovementType.ADJUSTMENT, quantity=5.0,
+                          movement_date=first.movement_date + timedelta(days=1)),
+        ])
+        db.session.commit()
+        assert verify_dataset() == 1
+
+
+def test_too_few_products_is_an_error(app):
+    with app.app_context():
+        with pytest.raises(DatasetError):
+            DatasetGenerator(1, date(2026, 1, 1), **{**SIZES, 'products': 1}).generate()
+    assert main(['--config', 'testing', '--products', '1', '--reset']) == 1
+
+
+def test_generated_dataset_is_deterministic(app):
+    with app.app_context():
+        _, first = generate(seed=7)
+        db.drop_all()
+        db.create_all()
+        _, second = generate(seed=7)
+
+    assert first == second
@@ -0,0 +1,109 @@
+"""
+Versioned migrations: idempotency, batched backfills and dry-run estimates
+"""
+import pytest
+from sqlalchemy import inspect, text
+
+from migrations.runner import MigrationRunner
+from migrations.steps import MIGRATIONS, SYNC_TABLES
+from models import db, Lot, LotLocation, ProductionOrder, ProductionOrderFinishedProduct
+from tests.conftest import build_dataset
+
+LEGACY_NOT_NULL = ['finished_product_id', 'finished_lot_number', 'target_quantity', 'unit']
+
+
+def make_legacy_schema(conn):
+    """Turn the current schema into the one the old migrate_*.py scripts started from"""
+    for trigger in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars().all():
+        conn.exec_driver_sql(f'DROP TRIGGER {trigger}')
+    conn.exec_driver_sql('DROP TABLE search_index')
+    conn.exec_driver_sql("DELETE FROM production_orders WHERE order_number = 'OF-DRAFT'")
+    conn.exec_driver_sql("""
+        UPDATE production_orders SET
+            finished_product_id = (SELECT finished_product_id FROM production_order_finished_products fp
+                                   WHERE fp.production_order_id = production_orders.id),
+            finished_lot_number = (SELECT lot_number FROM production_order_finished_products fp
+                                   WHERE fp.production_order_id = production_orders.id),
+            target_quantity = 0, unit = 'ud'
+    """)
+    for table in ('lot_locations', 'locations', 'return_details', 'returns', 'production_order_finished_products'):
+        conn.exec_driver_sql(f'DROP TABLE {table}')
+    conn.exec_driver_sql('ALTER TABLE lots DROP COLUMN blocked')
+    conn.exec_driver_sql('ALTER TABLE products DROP COLUMN density')
+    conn.exec_driver_sql('ALTER TABLE production_orders DROP COLUMN base_lot_number')
+    conn.exec_driver_sql('DROP INDEX ix_stock_movements_lot_id')
+    for table in SYNC_TABLES:  # Added by migration 14, after the indexes of migration 10
+        if conn.exec_driver_sql(f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{table}'").first():
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS ix_{table}_updated_at')
+            conn.exec_driver_sql(f'ALTER TABLE {table} DROP COLUMN updated_at')
+
+    create = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'production_orders'").scalar()
+    create = create.replace('CREATE TABLE production_orders', 'CREATE TABLE production_orders_legacy', 1)
+    for column, sql_type in (('finished_product_id', 'INTEGER'), ('finished_lot_number', 'VARCHAR(100)'),
+                             ('target_quantity', 'FLOAT'), ('unit', 'VARCHAR(20)')):
+        create = create.replace(f'{column} {sql_type},', f'{column} {sql_type} NOT NULL,', 1)
+    conn.exec_driver_sql(create)
+    conn.exec_driver_sql('INSERT INTO production_orders_legacy SELECT * FROM production_orders')
+    conn.exec_driver_sql('DROP TABLE production_orders')
+    conn.exec_driver_sql('ALTER TABLE production_orders_legacy RENAME TO production_orders')
+
+
+@pytest.fixture
+def legacy_app(app):
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('El esquema antiguo solo existió en SQLite')
+        build_dataset(40)
+        app.lots_with_stock = Lot.query.filter(Lot.current_quantity > 0).count()
+        app.legacy_orders = ProductionOrder.query.filter(ProductionOrder.order_number != 'OF-DRAFT').count()
+        db.session.remove()
+        with db.engine.begin() as conn:
+            make_legacy_schema(conn)
+    return app
+
+
+def test_fresh_database_only_records_versions_and_locations(app):
+    with app.app_context():
+        db.create_all()
+        runner = MigrationRunner(db.engine, MIGRATIONS, log=lambda message: None)
+
+        plan = dict((migration.version, estimates) for migration, estimates in runner.dry_run())
+        assert [version for version, estimates in plan.items() if estimates] == [7]
+
+        assert len(runner.upgrade()) == len(MIGRATIONS)
+        assert runner.pending() == []
+        assert runner.upgrade() == []
+        assert db.session.execute(text('SELECT COUNT(*) FROM locations')).scalar() == 5
+
+
+def test_legacy_database_is_upgraded_in_batches(legacy_app):
+    with legacy_app.app_context():
+        runner = MigrationRunner(db.engine, MIGRATIONS, batch_size=7, log=lambda message: None)
+
+        estimates = {description: rows for _, step in runner.dry_run() for description, rows in step}
+        assert estimates['production_orders: permitir nulos en ' + ', '.join(LEGACY_NOT_NULL)] == \
+            legacy_app.legacy_orders
+        assert estimates['lots: añadir columna blocked'] is None
+        assert inspect(db.engine).has_table('locations') is False  # dry run changed nothing
+
+        runner.upgrade()
+
+        columns = {column['name']: column for column in inspect(db.engine).get_columns('production_orders')}
+        assert all(columns[name]['nullable'] for name in LEGACY_NOT_NULL)
+        assert 'base_lot_number' in columns
+        assert 'blocked' in {column['name'] for column in inspect(db.engine).get_columns('lots')}
+        assert 'ix_stock_movements_lot_id' in {index['name'] for index in inspect(db.engine).get_indexes('stock_movements')}
+        assert 'ix_production_orders_order_number' in \
+            {index['name'] for index in inspect(db.engine).get_indexes('production_orders')}
+        for table in SYNC_TABLES:
+            assert 'updated_at' in {column['name'] for column in inspect(db.engine).get_columns(table)}
+            assert f'ix_{table}_updated_at' in {index['name'] for index in inspect(db.engine).get_indexes(table)}
+
+        assert LotLocation.query.count() == legacy_app.lots_with_stock
+        assert ProductionOrderFinishedProduct.query.count() == legacy_app.legacy_orders
+        assert ProductionOrderFinishedProduct.query.filter(
+            ProductionOrderFinishedProduct.lot_id.is_(None)).count() == 0
+
+        assert runner.pending() == []
+        assert runner.upgrade() == []
@@ -0,0 +1,67 @@
+"""
+Server-side paging, sorting and filtering of the list endpoints behind the virtualized tables
+"""
+import pytest
+
+from models import db, Lot
+from tests.conftest import build_dataset
+
+
+def fetch_all(client, url, limit):
+    """Follow the pages of a paged list; returns (items, total of the first page)"""
+    first = client.get(f'{url}&limit={limit}').get_json()
+    items, offset = list(first['data']), limit
+    while True:
+        page = client.get(f'{url}&limit={limit}&offset={offset}').get_json()
+        assert 'total' not in page  # Counted on the first page only
+        if not page['data']:
+            return items, first['total']
+        items += page['data']
+        offset += limit
+
+
+@pytest.mark.parametrize('url', [
+    '/api/lots?sort=-current_quantity',
+    '/api/inventory?available_only=false&sort=product',
+    '/api/movements?sort=movement_type',
+    '/api/receptions?sort=lot_number',
+    '/api/production-orders?sort=status',
+])
+def test_pages_cover_the_list_once(app, client, url):
+    with app.app_context():
+        build_dataset(30)
+
+    complete = client.get(url).get_json()
+    items, total = fetch_all(client, url, 7)
+    assert total == len(complete)
+    assert [item['id'] for item in items] == [item['id'] for item in complete]
+
+
+def test_lot_filters_run_before_paging(app, client):
+    with app.app_context():
+        build_dataset(30)
+        lot = db.session.get(Lot, 1)
+        lot.blocked = True
+        db.session.commit()
+        available = sorted(lot.id for lot in Lot.query if lot.is_available)
+        finished = sorted(lot.id for lot in Lot.query if lot.product.type.value == 'finished_product')
+
+    items, total = fetch_all(client, '/api/lots?available_only=true', 4)
+    assert sorted(item['id'] for item in items) == available and total == len(available)
+
+    body = client.get('/api/lots?status=blocked&limit=10').get_json()
+    assert [item['id'] for item in body['data']] == [1]
+
+    body = client.get('/api/inventory?available_only=false&type=finished_product&limit=100').get_json()
+    assert sorted(item['id'] for item in body['data']) == [
+        lot_id for lot_id in finished if client.get(f'/api/lots/{lot_id}').get_json()['current_quantity'] > 0]
+
+    body = client.get('/api/inventory?available_only=false&blocked=true&limit=10').get_json()
+    assert body['total'] == 1
+
+
+def test_invalid_paging_options(app, client):
+    assert client.get('/api/lots?limit=0').status_code == 400
+    assert client.get('/api/lots?limit=10&offset=-1').status_code == 400
+    assert client.get('/api/movements?sort=colour').status_code == 400
+    assert client.get('/api/inventory?expiration=tomorrow').status_code == 400
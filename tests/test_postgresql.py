@@ -0,0 +1,76 @@
+"""
+PostgreSQL mode: indexes, session settings and row-level locking
+
+Runs only when TEST_DATABASE_URL points at PostgreSQL (see run_tests_postgres.sh).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from config import database_url
+from models import db, Lot, LotLocation, Location, Product, ProductType, POSTGRESQL_INDEXES
+from tests.conftest import build_dataset
+
+pytestmark = pytest.mark.skipif(
+    not database_url('TEST_DATABASE_URL', '').startswith('postgresql'),
+    reason='TEST_DATABASE_URL no apunta a PostgreSQL'
+)
+
+
+def test_search_and_fefo_indexes_are_created(app):
+    expected = {statement.split()[5] for statement in POSTGRESQL_INDEXES if statement.startswith('CREATE INDEX')}
+    with app.app_context():
+        indexes = set(db.session.execute(text('SELECT indexname FROM pg_indexes')).scalars())
+    assert expected <= indexes
+
+
+def test_sessions_have_statement_and_lock_timeouts(app):
+    with app.app_context():
+        assert db.session.execute(text('SHOW statement_timeout')).scalar() == '30s'
+        assert db.session.execute(text('SHOW lock_timeout')).scalar() == '10s'
+
+
+def test_concurrent_shipments_do_not_lose_updates(app):
+    with app.app_context():
+        ids = build_dataset(10)
+        lot_id = ids['finished_lot_id']
+        lib = Location.query.filter_by(code='LIB').first()
+        stock = db.session.get(Lot, lot_id).current_quantity
+        lib_stock = LotLocation.query.filter_by(lot_id=lot_id, location_id=lib.id).one().quantity
+
+    def ship(i):
+        return app.test_client().post('/api/shipments', json={
+            'customer_id': ids['customer_id'],
+            'shipment_number': f'CONC-{i}',
+            'shipment_date': date.today().isoformat(),
+            'details': [{'lot_id': lot_id, 'quantity': 1}]
+        }).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(ship, range(16)))
+
+    assert statuses == [201] * 16
+    with app.app_context():
+        assert db.session.get(Lot, lot_id).current_quantity == pytest.approx(stock - 16)
+        assert LotLocation.query.filter_by(lot_id=lot_id, location_id=lib.id).one().quantity == \
+            pytest.approx(lib_stock - 16)
+
+
+def test_generated_dataset_leaves_sequences_usable(app, client):
+    from generate_dataset import DatasetGenerator
+
+    with app.app_context():
+        DatasetGenerator(1, date(2026, 1, 1), products=5, customers=2, lots=20, orders=4, shipments=4,
+                         returns=1, movements=100).generate()
+        product_id = Product.query.filter_by(type=ProductType.RAW_MATERIAL).first().id
+
+    response = client.post('/api/receptions', json={
+        'product_id': product_id,
+        'reception_date': date.today().isoformat(),
+        'quantity': 5,
+        'unit': 'kg',
+        'lot_number': 'SEQ-1',
+    })
+    assert response.status_code == 201, response.get_json()
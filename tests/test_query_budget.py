@@ -0,0 +1,124 @@
+"""
+N+1 query budget for every GET endpoint
+
+Each endpoint declares the maximum number of SQL statements it may run. The
+budget must hold on a small and on a large dataset, and the statement count
+must not grow with the number of rows.
+"""
+import pytest
+
+from app import create_app
+from models import db
+from tests.conftest import build_dataset, count_queries
+
+SMALL_DATASET = 10
+LARGE_DATASET = 1000
+
+# endpoint -> (url builder, maximum number of SQL statements)
+# Views with an ETag (utils/versions.py) count the table_versions lookup, traceability the archive
+# horizon (utils/archive.py)
+QUERY_BUDGETS = {
+    'products.get_products': (lambda ids: '/api/products?with_alerts=true', 3),
+    'products.get_product': (lambda ids: f'/api/products/{ids["product_id"]}', 2),
+    'lots.get_lots': (lambda ids: '/api/lots', 2),
+    'lots.get_lot': (lambda ids: f'/api/lots/{ids["lot_id"]}', 5),
+    'lots.get_lot_movements': (lambda ids: f'/api/lots/{ids["lot_id"]}/movements', 5),
+    'inventory.get_inventory': (lambda ids: '/api/inventory', 3),
+    'production_orders.get_next_order_number': (lambda ids: '/api/production-orders/next-number', 1),
+    'production_orders.get_production_orders': (lambda ids: '/api/production-orders', 2),
+    'production_orders.get_production_order': (lambda ids: f'/api/production-orders/{ids["order_id"]}', 8),
+    'customers.get_customers': (lambda ids: '/api/customers', 2),
+    'customers.get_customer': (lambda ids: f'/api/customers/{ids["customer_id"]}', 2),
+    'shipments.get_shipments': (lambda ids: '/api/shipments', 2),
+    'shipments.get_shipment': (lambda ids: f'/api/shipments/{ids["shipment_id"]}', 5),
+    'traceability.trace_lot_forward': (lambda ids: f'/api/traceability/lot/{ids["finished_lot_id"]}', 14),
+    'traceability.trace_lot_reverse': (lambda ids: f'/api/traceability/lot/{ids["lot_id"]}/reverse', 12),
+    'traceability.trace_product_lot': (
+        lambda ids: f'/api/traceability/product/{ids["product_id"]}/lot/{ids["lot_number"]}', 12),
+    'traceability.trace_customer': (lambda ids: f'/api/traceability/customer/{ids["customer_id"]}', 4),
+    'alerts.get_alerts': (lambda ids: '/api/alerts', 2),
+    'alerts.get_alerts_count': (lambda ids: '/api/alerts/count', 1),
+    'movements.get_movements': (lambda ids: '/api/movements', 2),
+    'reconciliation.get_reconciliation': (lambda ids: '/api/reconciliation', 4),
+    'jobs.get_jobs': (lambda ids: '/api/jobs', 3),
+    'jobs.get_job_runs': (lambda ids: '/api/jobs/runs', 1),
+    'archive.get_archive': (lambda ids: '/api/archive', 2),
+    'exports.export_inventory': (lambda ids: '/api/exports/inventory', 1),
+    'exports.export_movements': (lambda ids: '/api/exports/movements?format=xlsx', 1),
+    'exports.export_shipments': (lambda ids: f'/api/exports/shipments?customer_id={ids["customer_id"]}', 1),
+    'exports.export_recall': (lambda ids: f'/api/exports/recall/{ids["lot_id"]}', 3),  # Lot, horizon and rows
+    'reports.get_aging': (lambda ids: '/api/reports/aging', 2),
+    'reports.get_forecast': (lambda ids: '/api/reports/forecast', 3),  # Products with stock and consumption
+    'receptions.get_receptions': (lambda ids: '/api/receptions', 2),
+    'returns.get_returns': (lambda ids: '/api/returns', 2),
+    'returns.get_return': (lambda ids: f'/api/returns/{ids["return_id"]}', 5),
+    'returns.get_next_return_number': (lambda ids: '/api/returns/next-number', 1),
+    'locations.get_locations': (lambda ids: '/api/locations', 2),
+    'locations.get_location': (lambda ids: f'/api/locations/{ids["location_id"]}', 2),
+    'locations.get_lot_stock_by_location': (lambda ids: f'/api/locations/lot/{ids["lot_id"]}/stock', 3),
+    'locations.get_available_stock': (lambda ids: '/api/locations/available-stock', 2),
+    'search.search_all': (lambda ids: '/api/search?q=L00', 4),
+    'search.search_products': (lambda ids: '/api/search/products?q=a&type=raw_material,packaging', 1),
+    'search.search_customers': (lambda ids: '/api/search/customers?q=cli', 1),
+    'search.search_lots': (lambda ids: f'/api/search/lots?product_id={ids["product_id"]}&location=LIB', 1),
+    'sync.get_changes': (lambda ids: '/api/sync/orders?since=0', 2),  # Rows and tombstones
+    'events.stream_events': (lambda ids: '/api/events?last_event_id=0', 2),  # Latest id and replay
+}
+
+
+@pytest.fixture(scope='module')
+def datasets():
+    """One application per dataset size, with the ids of the sample entities"""
+    result = {}
+    for size in (SMALL_DATASET, LARGE_DATASET):
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+            ids = build_dataset(size)
+        result[size] = (app, ids)
+    return result
+
+
+def run_endpoint(app, url):
+    """Request url and return the SQL statements it executed"""
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    with count_queries(engine) as statements:
+        response = client.get(url)
+    assert response.status_code == 200, f'{url} -> {response.status_code}'
+    return statements
+
+
+def format_statements(statements):
+    return '\n'.join(f'  {n}. {s}' for n, s in enumerate(statements, 1))
+
+
+def test_every_get_endpoint_has_a_budget():
+    app = create_app('testing')
+    endpoints = {
+        rule.endpoint for rule in app.url_map.iter_rules()
+        if 'GET' in rule.methods and '.' in rule.endpoint and not rule.endpoint.startswith('static')
+    }
+    missing = sorted(endpoints - set(QUERY_BUDGETS))
+    assert not missing, f'GET endpoints without query budget: {missing}'
+
+
+@pytest.mark.parametrize('endpoint', sorted(QUERY_BUDGETS))
+def test_query_count_is_bounded(datasets, endpoint):
+    build_url, budget = QUERY_BUDGETS[endpoint]
+
+    counts = {}
+    for size, (app, ids) in datasets.items():
+        statements = run_endpoint(app, build_url(ids))
+        counts[size] = len(statements)
+        assert len(statements) <= budget, (
+            f'{endpoint} ran {len(statements)} statements with {size} lots (budget {budget}):\n'
+            f'{format_statements(statements)}'
+        )
+
+    assert counts[LARGE_DATASET] <= counts[SMALL_DATASET], (
+        f'{endpoint} query count grows with the dataset: '
+        f'{counts[SMALL_DATASET]} with {SMALL_DATASET} lots, '
+        f'{counts[LARGE_DATASET]} with {LARGE_DATASET} lots:\n{format_statements(statements)}'
+    )
@@ -0,0 +1,87 @@
+"""
+Stock reconciliation: lot quantity, location stock and movements
+"""
+from datetime import date
+
+from models import db, Lot, LotLocation, MovementType, StockMovement, SyncTombstone
+from tests.conftest import build_dataset
+
+
+def test_consistent_dataset_has_no_discrepancies(app, client):
+    with app.app_context():
+        build_dataset(20)
+
+    report = client.get('/api/reconciliation').get_json()
+    assert report['lots'] == 20
+    assert report['discrepancies'] == []
+    assert (report['movement_mismatches'], report['location_mismatches'],
+            report['orphan_lot_locations'], report['orphan_movements']) == (0, 0, 0, 0)
+
+
+def test_drift_is_reported_and_the_ledger_corrected(app, client):
+    with app.app_context():
+        ids = build_dataset(20)
+        # Quantity changed without a movement
+        edited = db.session.get(Lot, ids['lot_id'])
+        edited.current_quantity += 7.5
+        # Movement lost
+        lost = StockMovement.query.filter(StockMovement.movement_type == MovementType.SHIPMENT,
+                                          StockMovement.lot_id.not_in([edited.id, 5])).first()
+        db.session.delete(lost)
+        db.session.commit()
+        edited_id, lost_lot_id, lost_quantity = edited.id, lost.lot_id, lost.quantity
+
+    # Adjustments do not say which location changed
+    assert client.post('/api/lots/5/adjust', json={'real_quantity': 1.0}).status_code == 200
+
+    report = client.get('/api/reconciliation').get_json()
+    by_lot = {item['lot_id']: item for item in report['discrepancies']}
+    assert set(by_lot) == {edited_id, lost_lot_id, 5}
+    assert by_lot[edited_id]['movements_difference'] == 7.5 and by_lot[edited_id]['locations_difference'] == 7.5
+    assert by_lot[lost_lot_id]['movements_difference'] == lost_quantity
+    assert by_lot[lost_lot_id]['locations_difference'] == 0
+    assert by_lot[5]['movements_difference'] == 0 and by_lot[5]['locations_difference'] != 0
+    assert (report['movement_mismatches'], report['location_mismatches']) == (2, 2)
+    assert len(client.get('/api/reconciliation?limit=1').get_json()['discrepancies']) == 1
+
+    report = client.post('/api/reconciliation').get_json()
+    assert report['adjustments'] == 2
+    assert (report['movement_mismatches'], report['location_mismatches']) == (0, 2)
+    with app.app_context():
+        adjustment = StockMovement.query.filter_by(lot_id=edited_id, reference_type='reconciliation').one()
+        assert adjustment.movement_type == MovementType.ADJUSTMENT and adjustment.quantity == 7.5
+
+    # Nothing left to correct in the ledger
+    assert client.post('/api/reconciliation').get_json()['adjustments'] == 0
+
+
+def test_deleted_lots_leave_no_location_rows(app, client):
+    with app.app_context():
+        ids = build_dataset(4)
+        lot = Lot(lot_number='L-DEL', product_id=ids['product_id'], initial_quantity=5.0, current_quantity=5.0,
+                  unit='kg', manufacturing_date=date.today())
+        db.session.add(lot)
+        db.session.flush()
+        db.session.add_all([
+            StockMovement(lot_id=lot.id, movement_type=MovementType.ENTRY, quantity=5.0, to_location_id=1),
+            LotLocation(lot_id=lot.id, location_id=1, quantity=5.0),
+        ])
+        db.session.commit()
+        lot_id = lot.id
+
+    assert client.delete(f'/api/lots/{lot_id}').status_code == 200
+    report = client.get('/api/reconciliation').get_json()
+    assert report['orphan_lot_locations'] == 0 and report['discrepancies'] == []
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return  # Foreign keys prevent orphan rows elsewhere
+        # Left behind by a lot deleted before the fix
+        db.session.add(LotLocation(lot_id=9999, location_id=2, quantity=3.0))
+        db.session.commit()
+
+    assert client.get('/api/reconciliation').get_json()['orphan_lot_locations'] == 1
+    report = client.post('/api/reconciliation').get_json()
+    assert report['deleted_lot_locations'] == 1 and report['orphan_lot_locations'] == 0
+    with app.app_context():
+        assert SyncTombstone.query.filter_by(table_name='lot_locations').count() == 2
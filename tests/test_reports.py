@@ -0,0 +1,125 @@
+"""
+Reports: aging and expiry buckets, the per-day ETag cache and the consumption forecast
+"""
+from datetime import date, datetime, time, timedelta
+
+from models import db, Alert, AlertType, Lot, MovementType, Product, ProductType, StockMovement
+from routes import reports
+from tests.conftest import build_dataset
+from utils.alerts import generate_alerts
+from utils.lots import add_months
+
+
+def test_aging_buckets_and_summary(app, client):
+    today = date.today()
+    with app.app_context():
+        build_dataset(20)
+        lot = Lot.query.filter(Lot.current_quantity > 0).order_by(Lot.id).first()
+        lot.created_at = datetime.now() - timedelta(days=100)
+        lot.expiration_date = today + timedelta(days=45)
+        db.session.commit()
+        product_id, quantity = lot.product_id, lot.current_quantity
+
+        expected = {}
+        for item in Lot.query.join(Lot.product).filter(Lot.current_quantity > 1e-9):
+            counts = expected.setdefault(item.product.type.value,
+                                         {'lots': 0, 'blocked': 0, 'expired': 0, 'expiring_soon': 0})
+            counts['lots'] += 1
+            counts['blocked'] += bool(item.blocked)
+            if item.expiration_date and item.expiration_date < today:
+                counts['expired'] += 1
+            elif item.expiration_date and item.expiration_date <= add_months(today, 3):
+                counts['expiring_soon'] += 1
+        stock = dict(db.session.query(Product.id, db.func.sum(Lot.current_quantity))
+                     .join(Lot).filter(Lot.current_quantity > 1e-9).group_by(Product.id).all())
+
+    data = client.get('/api/reports/aging').get_json()
+    assert data['summary'] == expected
+    for row in data['rows']:
+        assert abs(sum(row['age'].values()) - row['quantity']) < 1e-6
+        assert abs(sum(row['expiry'].values()) - row['quantity']) < 1e-6
+        product_rows = [r for r in data['rows'] if r['product']['id'] == row['product']['id']]
+        assert abs(row['product_quantity'] - sum(r['quantity'] for r in product_rows)) < 1e-6
+
+    data = client.get(f'/api/reports/aging?product_id={product_id}').get_json()
+    assert {row['product']['id'] for row in data['rows']} == {product_id}
+    assert abs(sum(row['quantity'] for row in data['rows']) - stock[product_id]) < 1e-6
+    assert sum(row['age']['91-180'] for row in data['rows']) >= quantity - 1e-6
+    assert sum(row['expiry']['1-3'] for row in data['rows']) >= quantity - 1e-6
+
+    data = client.get('/api/reports/aging?product_type=packaging').get_json()
+    assert {row['product']['type'] for row in data['rows']} == {'packaging'}
+    assert client.get('/api/reports/aging?product_type=otro').status_code == 400
+
+
+def test_aging_report_is_cached_until_stock_changes(app, client, monkeypatch):
+    calls = []
+    aging_report = reports.aging_report
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return aging_report(*args, **kwargs)
+
+    monkeypatch.setattr(reports, 'aging_report', counted)
+    with app.app_context():
+        build_dataset(10)
+
+    first = client.get('/api/reports/aging')
+    second = client.get('/api/reports/aging')
+    assert len(calls) == 1
+    assert second.get_json() == first.get_json() and second.headers['ETag'] == first.headers['ETag']
+    assert client.get('/api/reports/aging', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    client.get('/api/reports/aging?product_type=raw_material')
+    assert len(calls) == 2
+
+    with app.app_context():
+        Lot.query.filter(Lot.current_quantity > 0).first().blocked = True
+        db.session.commit()
+    assert client.get('/api/reports/aging').headers['ETag'] != first.headers['ETag']
+    assert len(calls) == 3
+
+
+def test_forecast_and_reorder_point_alerts(app, client):
+    app.config.update(FORECAST_HISTORY_DAYS=30, FORECAST_LEAD_TIME_DAYS=14, LOW_STOCK_FORECAST=True)
+    today = date.today()
+    with app.app_context():
+        build_dataset(10)
+        product = Product(code='MP-100', name='Perfume', type=ProductType.RAW_MATERIAL, storage_unit='kg',
+                          min_stock=10.0)
+        db.session.add(product)
+        db.session.flush()
+        lot = Lot(product_id=product.id, lot_number='P-1', manufacturing_date=today - timedelta(days=60),
+                  expiration_date=today + timedelta(days=365),
+                  initial_quantity=400.0, current_quantity=70.0, unit='kg')
+        db.session.add(lot)
+        db.session.flush()
+        # 10 kg a day, half shipped and half produced; today and days before the history do not count
+        for days in range(0, 32):
+            moment = datetime.combine(today - timedelta(days=days), time(10))
+            for movement_type in (MovementType.SHIPMENT, MovementType.PRODUCTION):
+                db.session.add(StockMovement(lot_id=lot.id, movement_type=movement_type, quantity=-5.0,
+                                             movement_date=moment))
+        db.session.add(StockMovement(lot_id=lot.id, movement_type=MovementType.ADJUSTMENT, quantity=-50.0,
+                                     movement_date=datetime.combine(today - timedelta(days=3), time(10))))
+        db.session.commit()
+        product_id = product.id
+
+    data = client.get(f'/api/reports/forecast?product_id={product_id}').get_json()
+    assert data['history_days'] == 30
+    [item] = data['products']
+    assert item['consumption'] == 300.0
+    assert item['daily_forecast'] == 10.0 and item['daily_deviation'] == 0.0
+    assert item['reorder_point'] == 140.0 and item['days_of_cover'] == 7.0
+
+    data = client.get('/api/reports/forecast').get_json()
+    by_code = {item['product']['code']: item for item in data['products']}
+    assert by_code['MP-100']['reorder_point'] == 140.0
+    assert by_code['PA-002']['daily_forecast'] == 0.0 and by_code['PA-002']['reorder_point'] is None
+    assert client.get('/api/reports/forecast?product_type=otro').status_code == 400
+
+    with app.app_context():
+        generate_alerts()
+        db.session.commit()
+        alert = Alert.query.filter_by(alert_type=AlertType.LOW_STOCK, product_id=product_id).one()
+        assert 'punto de pedido: 140.0' in alert.message
@@ -0,0 +1,85 @@
+"""
+Material requirements of planned production orders, netted against LIB stock, reservations and expiry
+"""
+from datetime import timedelta
+
+from models import db, Lot, Product, ProductionOrder, ProductionOrderMaterial, ProductType
+from tests.conftest import build_dataset, count_queries
+
+
+def test_requirements_net_stock_reservations_and_expiry(app, client):
+    with app.app_context():
+        build_dataset(4)
+        products = {product.code: product.id for product in Product.query}
+        water = Lot.query.filter_by(lot_number='L000000').one()  # MP-001: 80 in LIB after its order
+        draft = ProductionOrder.query.filter_by(order_number='OF-DRAFT').one()
+        db.session.add(ProductionOrderMaterial(production_order_id=draft.id, lot_id=water.id,
+                                               quantity_consumed=30.0, unit=water.unit))
+        db.session.commit()
+        expiration = water.expiration_date
+
+    def check(*orders, production_date=None):
+        body = {'orders': list(orders)}
+        if production_date:
+            body['production_date'] = production_date.isoformat()
+        response = client.post('/api/production-orders/requirements', json=body)
+        assert response.status_code == 200, response.get_json()
+        data = response.get_json()
+        return data, {item['product']['code']: item for item in data['materials']}
+
+    # PA-001 was last made with 20 l of MP-001 for 50 units: 0.4 per unit
+    data, materials = check({'product_id': products['PA-001'], 'quantity': 100})
+    assert data['orders'][0]['recipe_source'] == 'OF-000001'
+    assert materials['MP-001'] == {**materials['MP-001'], 'required': 40.0, 'stock': 80.0, 'reserved': 30.0,
+                                   'available': 50.0, 'shortage': 0.0}
+    assert data['shortages'] == 0
+
+    data, materials = check({'product_id': products['PA-001'], 'quantity': 100},
+                            {'product_id': products['PA-001'], 'quantity': 100},
+                            {'product_id': products['PA-002'], 'quantity': 10,
+                             'recipe': [{'product_id': products['ENV-001'], 'quantity': 1},
+                                        {'product_id': products['MP-001'], 'quantity': 0.5, 'unit': 'kg'}]})
+    assert materials['MP-001']['required'] == 85.0 and materials['MP-001']['shortage'] == 35.0
+    assert materials['ENV-001']['stock'] == 0.0 and materials['ENV-001']['shortage'] == 10.0
+    assert data['shortages'] == 2 and [item['product']['code'] for item in data['materials']] == ['MP-001', 'ENV-001']
+
+    # Lots expiring before the production date do not count
+    _, materials = check({'product_id': products['PA-001'], 'quantity': 100},
+                         production_date=expiration + timedelta(days=1))
+    assert materials['MP-001']['stock'] == 0.0 and materials['MP-001']['unusable_stock'] == 80.0
+    assert materials['MP-001']['shortage'] == 40.0
+
+    with app.app_context():
+        db.session.add(Product(code='PA-003', name='Sérum', type=ProductType.FINISHED_PRODUCT,
+                               storage_unit='ud'))
+        db.session.commit()
+        new_product = Product.query.filter_by(code='PA-003').one().id
+    data, materials = check({'product_id': new_product, 'quantity': 5})
+    assert data['missing_recipes'] == [new_product] and materials == {}
+
+    url = '/api/production-orders/requirements'
+    assert client.post(url, json={'orders': []}).status_code == 400
+    assert client.post(url, json={'orders': [{'product_id': 999, 'quantity': 1}]}).status_code == 400
+    assert client.post(url, json={'orders': [{'product_id': products['PA-001'], 'quantity': -1}]}).status_code == 400
+    assert client.post(url, json={'orders': [{'product_id': products['PA-001'], 'quantity': 1,
+                                              'recipe': [{'product_id': products['PA-002'], 'quantity': 1}]}]}
+                       ).status_code == 400
+    assert client.post(url, json={'production_date': 'mañana',
+                                  'orders': [{'product_id': products['PA-001'], 'quantity': 1}]}).status_code == 400
+
+
+def test_requirements_run_a_fixed_number_of_queries(app, client):
+    with app.app_context():
+        build_dataset(200)
+        finished = [p.id for p in Product.query.filter_by(type=ProductType.FINISHED_PRODUCT)]
+        materials = [p.id for p in Product.query.filter(Product.type != ProductType.FINISHED_PRODUCT)]
+        engine = db.engine
+    orders = [{'product_id': finished[n % len(finished)], 'quantity': 10 + n} for n in range(40)]
+    orders += [{'product_id': finished[0], 'quantity': 5,
+                'recipe': [{'product_id': material, 'quantity': 1} for material in materials]}] * 20
+
+    with count_queries(engine) as statements:
+        response = client.post('/api/production-orders/requirements', json={'orders': orders})
+    assert response.status_code == 200
+    assert len(response.get_json()['materials']) == len(materials)
+    assert len(statements) <= 3  # Historic recipes, products and availability
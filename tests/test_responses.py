@@ -0,0 +1,57 @@
+"""
+Response encoding: orjson provider and gzip/brotli negotiation
+"""
+import gzip
+import json
+from datetime import date
+from enum import Enum
+
+from flask.json.provider import DefaultJSONProvider
+
+from utils import responses
+from utils.responses import OrjsonProvider
+from tests.conftest import build_dataset
+
+
+def test_orjson_provider_matches_the_default_encoder(app):
+    class Color(Enum):
+        RED = 'rojo'
+
+    payload = {'b': [1, 2.5, None, True], 'a': {'name': 'Crema Hidratante 50ml', 'z': 1, 'y': 2}, 'c': 'x'}
+    assert json.loads(OrjsonProvider(app).dumps(payload)) == json.loads(DefaultJSONProvider(app).dumps(payload))
+    assert OrjsonProvider(app).dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}\n'  # sorted keys, as jsonify
+
+    encoded = OrjsonProvider(app).dumps({'date': date(2025, 3, 1), 'color': Color.RED, 'text': 'Recepción'})
+    assert json.loads(encoded) == {'date': '2025-03-01', 'color': 'rojo', 'text': 'Recepción'}
+
+
+def test_large_responses_are_compressed_when_accepted(app, client):
+    with app.app_context():
+        build_dataset(40)
+
+    plain = client.get('/api/lots', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    compressed = client.get('/api/lots', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert int(compressed.headers['Content-Length']) < len(plain.get_data()) / 4
+    assert json.loads(gzip.decompress(compressed.get_data())) == plain.get_json()
+
+    refused = client.get('/api/lots', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+    small = client.get('/api', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers  # below COMPRESS_MIN_SIZE
+
+
+def test_without_brotli_only_gzip_is_offered(app, client, monkeypatch):
+    monkeypatch.setattr(responses, 'brotli', None)
+    with app.app_context():
+        build_dataset(40)
+
+    response = client.get('/api/lots', headers={'Accept-Encoding': 'br'})
+    assert 'Content-Encoding' not in response.headers  # brotli not available: only gzip is offered
+
+    response = client.get('/api/lots', headers={'Accept-Encoding': 'br, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
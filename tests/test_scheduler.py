@@ -0,0 +1,135 @@
+"""
+Background jobs: cron schedules, leader lease and run history
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Alert, EventOutbox, JobRun, SchedulerLock
+from tests.conftest import build_dataset
+from utils import jobs
+from utils.scheduler import CronSchedule, INTERRUPTED, Job, Scheduler
+
+NOW = datetime(2026, 3, 6, 10, 7)  # A Friday
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('*/15 * * * *', datetime(2026, 3, 6, 10, 15)),
+    ('15 0 1 * *', datetime(2026, 4, 1, 0, 15)),
+    ('0 9 * * 1-5', datetime(2026, 3, 9, 9, 0)),  # Next Monday
+    ('30 6 13 * 0', datetime(2026, 3, 8, 6, 30)),  # The 13th or a Sunday
+    ('0 0 29 2 *', datetime(2028, 2, 29, 0, 0)),
+])
+def test_cron_next_time(expression, expected):
+    assert CronSchedule(expression).next_after(NOW) == expected
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '*/0 * * * *', 'a * * * *', '0 0 31 2 *'])
+def test_invalid_cron_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression).next_after(NOW)
+
+
+def test_due_jobs_run_once_per_scheduled_time(app, client, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, 'SCHEDULER_HISTORY_DAYS', 3650)  # Cleanup keeps the simulated runs
+    monkeypatch.setattr(jobs, 'OUTPUT_DIR', str(tmp_path))  # Cleanup must not touch generated_docs/
+    with app.app_context():
+        build_dataset(10)
+        scheduler = app.extensions['scheduler']
+        scheduler.started_at = NOW
+
+        assert scheduler.tick(NOW) == []
+        runs = scheduler.tick(NOW + timedelta(minutes=8))
+        assert [run.job for run in runs] == ['alerts']
+        assert runs[0].status == 'success' and runs[0].duration_ms >= 0
+        assert runs[0].to_dict()['result'] == {'alerts_created': Alert.query.count()} != {'alerts_created': 0}
+        # Same slot: nothing due; several missed slots run once
+        assert scheduler.tick(NOW + timedelta(minutes=9)) == []
+        assert [run.job for run in scheduler.tick(NOW + timedelta(hours=17))] == [
+            'alerts', 'expiry_sweep', 'reconciliation', 'cleanup']
+
+    response = client.post('/api/jobs/stock_snapshots/run')
+    assert response.status_code == 202 and response.get_json()['status'] == 'queued'
+    assert client.post('/api/jobs/unknown/run').status_code == 404
+
+    with app.app_context():
+        runs = app.extensions['scheduler'].tick(NOW + timedelta(hours=17, minutes=1))
+        assert [(run.job, run.trigger, run.status) for run in runs] == [('stock_snapshots', 'manual', 'success')]
+
+    body = client.get('/api/jobs').get_json()
+    by_name = {job['name']: job for job in body['jobs']}
+    assert by_name['stock_snapshots']['last_run']['trigger'] == 'manual'
+    assert by_name['stock_snapshots']['next_run'] == '2026-04-01T00:15:00'
+    assert by_name['alerts']['next_run'] == '2026-03-07T03:15:00'
+    assert body['leader']['active'] is False  # Lease taken at the simulated times, now long expired
+    assert [run['job'] for run in client.get('/api/jobs/runs?job=alerts').get_json()] == ['alerts', 'alerts']
+
+
+def test_only_the_leader_runs_jobs(app):
+    with app.app_context():
+        first = Scheduler(app, jobs.JOBS)
+        second = Scheduler(app, jobs.JOBS)
+        first.owner, second.owner = 'a:1', 'b:2'
+        second.started_at = NOW - timedelta(days=1)  # Every job is due
+        assert first.acquire(NOW) and not second.acquire(NOW)
+        assert second.tick(NOW + timedelta(minutes=1)) == []
+        assert JobRun.query.count() == 0
+
+        # The leader stops renewing in the middle of a run
+        db.session.add(JobRun(job='alerts', trigger='schedule', status='running', worker='a:1', started_at=NOW))
+        db.session.commit()
+        assert second.acquire(NOW + first.lease + timedelta(seconds=1))
+        assert not first.acquire(NOW + first.lease + timedelta(seconds=2))
+        interrupted = JobRun.query.filter_by(worker='a:1').one()
+        assert (interrupted.status, interrupted.error) == ('error', INTERRUPTED)
+
+
+def test_lease_is_renewed_while_a_job_runs(app):
+    app.config['SCHEDULER_LEASE_SECONDS'] = 0.6
+
+    def slow():
+        time.sleep(1.5)  # Longer than the lease
+        return 'ok'
+
+    with app.app_context():
+        scheduler = Scheduler(app, [Job('slow', '* * * * *', slow, 'Más larga que la concesión')])
+        scheduler.started_at = datetime.utcnow() - timedelta(hours=1)
+        run, = scheduler.tick()
+        assert run.status == 'success'
+        assert db.session.get(SchedulerLock, 'scheduler').expires_at > datetime.utcnow()
+        other = Scheduler(app, [])
+        other.owner = 'b:2'
+        assert not other.acquire()
+
+
+def test_failing_job_is_recorded(app):
+    def fail():
+        raise RuntimeError('sin conexión')
+
+    with app.app_context():
+        scheduler = Scheduler(app, [Job('broken', '0 * * * *', fail, 'Falla siempre')])
+        scheduler.started_at = NOW
+        run, = scheduler.tick(NOW + timedelta(hours=1))
+        assert (run.status, run.error) == ('error', 'RuntimeError: sin conexión')
+        assert run.finished_at is not None and run.duration_ms is not None
+
+
+def test_cleanup_job(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'OUTPUT_DIR', str(tmp_path))
+    old, recent = tmp_path / 'REC_old.pdf', tmp_path / 'REC_new.pdf'
+    old.write_bytes(b'%PDF')
+    recent.write_bytes(b'%PDF')
+    month_ago = time.time() - 31 * 86400
+    os.utime(old, (month_ago, month_ago))
+
+    with app.app_context():
+        db.session.add_all([
+            EventOutbox(channel='alerts', payload='{}', created_at=datetime.utcnow() - timedelta(days=1)),
+            EventOutbox(channel='alerts', payload='{}'),
+            JobRun(job='alerts', trigger='schedule', status='success', queued_at=datetime.utcnow() - timedelta(days=91)),
+        ])
+        db.session.commit()
+        assert jobs.cleanup_job() == {'documents': 1, 'events': 1, 'job_runs': 1}
+    assert not old.exists() and recent.exists()
@@ -0,0 +1,104 @@
+"""
+Search index and unified search endpoint
+"""
+import pytest
+
+from models import db, Customer, Lot, Product
+from tests.conftest import build_dataset
+from utils import search as search_module
+
+
+def search(client, query, **params):
+    response = client.get('/api/search', query_string=dict(params, q=query))
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['results']
+
+
+def test_search_ranks_exact_code_first_across_types(app, client):
+    with app.app_context():
+        build_dataset(20)
+
+    results = search(client, 'L000003')
+    assert (results[0]['type'], results[0]['code']) == ('lot', 'L000003')
+    assert {result['type'] for result in results} == {'lot', 'order'}  # orders share the base lot number
+
+    assert [result['type'] for result in search(client, 'cliente')] == ['customer'] * 3
+    assert [result['code'] for result in search(client, 'crema', types='product')] == ['PA-001', 'PA-002']
+    assert len(search(client, 'L0', limit=5)) == 5  # shorter than a trigram
+
+
+def test_search_index_follows_inserts_updates_and_deletes(app, client):
+    with app.app_context():
+        build_dataset(4)
+        product = Product.query.filter_by(code='MP-002').one()
+        product.name = 'Pantenol'
+        db.session.commit()
+
+    assert [result['code'] for result in search(client, 'pantenol')] == ['MP-002']
+    assert search(client, 'glicerina') == []
+
+    response = client.post('/api/products', json={'code': 'MP-900', 'name': 'Ácido hialurónico',
+                                                  'type': 'raw_material', 'storage_unit': 'kg'})
+    assert response.status_code == 201, response.get_json()
+    assert [result['code'] for result in search(client, 'hialur')] == ['MP-900']
+
+    client.delete(f'/api/products/{response.get_json()["id"]}')
+    assert search(client, 'hialur') == []
+
+
+@pytest.mark.parametrize('use_index', [True, False])
+def test_inactive_rows_do_not_take_up_the_limit(app, client, monkeypatch, use_index):
+    if not use_index:
+        monkeypatch.setattr(search_module, 'has_search_index', lambda: False)
+    with app.app_context():
+        build_dataset(20)
+
+    ranked = [result['code'] for result in search(client, 'cliente', types='customer')]
+    assert len(ranked) == 3
+    with app.app_context():
+        for customer in Customer.query.filter(Customer.code.in_(ranked[:2])):
+            customer.active = False
+        db.session.commit()
+
+    assert [result['code'] for result in search(client, 'cliente', types='customer', limit=1)] == ranked[2:]
+
+
+def test_list_filters_use_the_index_with_ilike_semantics(app, client):
+    with app.app_context():
+        build_dataset(30)
+        expected = sorted(lot.lot_number for lot in Lot.query.filter(Lot.lot_number.ilike('%l00001%')))
+
+    lots = client.get('/api/lots', query_string={'lot_number': 'l00001'}).get_json()
+    assert sorted(lot['lot_number'] for lot in lots) == expected
+
+    products = client.get('/api/products', query_string={'search': 'hidrat'}).get_json()
+    assert [product['code'] for product in products] == ['PA-002', 'PA-001']
+
+
+def test_pickers_return_the_top_matches(app, client):
+    with app.app_context():
+        ids = build_dataset(60)
+        in_lib = sorted(
+            (lot.expiration_date, lot.created_at, lot.id) for lot in Lot.query.filter_by(product_id=ids['product_id'])
+            if any(ll.location.code == 'LIB' and ll.quantity > 0 for ll in lot.lot_locations)
+        )
+
+    products = client.get('/api/search/products', query_string={'q': 'mp-001'}).get_json()['results']
+    assert products[0]['code'] == 'MP-001'
+    assert set(products[0]) == {'id', 'code', 'name', 'type', 'storage_unit', 'consumption_unit', 'density'}
+
+    products = client.get('/api/search/products', query_string={'type': 'raw_material,packaging'}).get_json()['results']
+    assert {product['type'] for product in products} == {'raw_material', 'packaging'}
+
+    lots = client.get('/api/search/lots', query_string={'product_id': ids['product_id'], 'location': 'LIB',
+                                                        'limit': 5}).get_json()['results']
+    assert [lot['id'] for lot in lots] == [lot_id for _, _, lot_id in in_lib[:5]]
+    assert all(lot['available_quantity'] > 0 for lot in lots)
+
+    assert client.get('/api/search/products', query_string={'type': 'bulk'}).status_code == 400
+
+
+def test_search_validates_types(client):
+    response = client.get('/api/search', query_string={'q': 'x', 'types': 'lot,unknown'})
+    assert response.status_code == 400
+    assert client.get('/api/search').get_json()['results'] == []
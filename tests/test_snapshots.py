@@ -0,0 +1,112 @@
+"""
+Stock as of a date: ledger replay from the nearest snapshot
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Lot, LotLocation, MovementType, StockMovement
+from tests.conftest import build_dataset
+from utils.snapshots import ledger_balances, take_monthly_snapshots, take_snapshot
+
+START = datetime(2026, 1, 1)
+
+
+def spread_movements():
+    """Date the movements of the dataset every three days from START"""
+    for movement in StockMovement.query.order_by(StockMovement.id):
+        movement.movement_date = START + timedelta(days=3 * movement.id, hours=movement.id % 24)
+    db.session.commit()
+
+
+def replay(as_of):
+    """Balances at `as_of` replaying every movement"""
+    balances = defaultdict(float)
+    for movement in StockMovement.query.filter(StockMovement.movement_date < as_of):
+        if movement.movement_type == MovementType.TRANSFER:
+            balances[movement.lot_id, movement.from_location_id] -= movement.quantity
+            balances[movement.lot_id, movement.to_location_id] += movement.quantity
+        else:
+            location_id = movement.to_location_id or movement.from_location_id
+            balances[movement.lot_id, location_id] += movement.quantity
+    return {key: round(quantity, 6) for key, quantity in balances.items() if abs(quantity) > 1e-6}
+
+
+def ledger(as_of, **kwargs):
+    return {(lot_id, location_id): round(quantity, 6)
+            for lot_id, location_id, quantity in db.session.execute(ledger_balances(as_of, **kwargs))}
+
+
+INSTANTS = [START + timedelta(days=days) for days in (0, 10, 45, 58, 59, 100, 170, 400)]
+
+
+def test_ledger_matches_replay_with_and_without_snapshots(app):
+    with app.app_context():
+        build_dataset(20)
+        spread_movements()
+        expected = {instant: replay(instant) for instant in INSTANTS}
+        assert all(ledger(instant) == expected[instant] for instant in INSTANTS)
+
+        # The end of the ledger is the current stock per location
+        current = {(ll.lot_id, ll.location_id): round(ll.quantity, 6) for ll in LotLocation.query if ll.quantity}
+        assert ledger(INSTANTS[-1]) == current
+
+        taken = take_monthly_snapshots(now=START + timedelta(days=200))
+        assert [snapshot.cutoff for snapshot in taken] == [datetime(2026, month, 1) for month in range(2, 8)]
+        assert take_monthly_snapshots(now=START + timedelta(days=200)) == []
+        # Snapshots before and after each instant
+        assert all(ledger(instant) == expected[instant] for instant in INSTANTS)
+        assert ledger(INSTANTS[3], lot_ids=[1, 2]) == {
+            key: value for key, value in expected[INSTANTS[3]].items() if key[0] in (1, 2)}
+
+
+def test_movements_recorded_after_a_snapshot_count(app):
+    with app.app_context():
+        build_dataset(10)
+        spread_movements()
+        take_snapshot(datetime(2026, 2, 1))
+        take_snapshot(datetime(2026, 3, 1))
+        db.session.commit()
+
+        # Back-dated before both snapshots, and dated between them
+        lot = db.session.get(Lot, 1)
+        db.session.add_all([
+            StockMovement(lot_id=lot.id, movement_type=MovementType.ADJUSTMENT, quantity=-2.5,
+                          movement_date=datetime(2026, 1, 15), notes='Recuento tardío'),
+            StockMovement(lot_id=lot.id, movement_type=MovementType.RETURN, quantity=4.0,
+                          movement_date=datetime(2026, 2, 10), to_location_id=3),
+        ])
+        db.session.commit()
+
+        for instant in INSTANTS:
+            assert ledger(instant) == replay(instant)
+
+
+def test_inventory_as_of(app, client):
+    with app.app_context():
+        build_dataset(20)
+        spread_movements()
+        take_monthly_snapshots(now=START + timedelta(days=200))
+        expected = defaultdict(float)
+        for (lot_id, _), quantity in replay(datetime(2026, 2, 15)).items():  # End of 2026-02-14
+            expected[lot_id] += quantity
+        current = {lot.id: lot.current_quantity for lot in Lot.query if lot.current_quantity > 0}
+
+    body = client.get('/api/inventory?as_of=2026-02-14').get_json()
+    assert body
+    assert {item['id']: item['quantity'] for item in body} == pytest.approx(
+        {lot_id: quantity for lot_id, quantity in expected.items() if quantity > 1e-6})
+    for item in body:
+        assert sum(location['quantity'] for location in item['locations']) == pytest.approx(item['quantity'])
+        assert item['as_of'] == '2026-02-15T00:00:00'
+
+    # Far in the future: the current stock
+    body = client.get('/api/inventory?as_of=2030-01-01&sort=-quantity&limit=5').get_json()
+    assert body['total'] == len(current)
+    assert [item['quantity'] for item in body['data']] == pytest.approx(sorted(current.values(), reverse=True)[:5])
+
+    lib = client.get('/api/inventory?as_of=2030-01-01&location_id=2').get_json()
+    assert lib and all([location['location']['code'] for location in item['locations']] == ['LIB'] for item in lib)
+
+    assert client.get('/api/inventory?as_of=ayer').status_code == 400
@@ -0,0 +1,113 @@
+"""
+Delta sync: /api/sync/<collection> pages, deltas and tombstones
+"""
+from datetime import date
+
+from models import db, Location, Lot, LotLocation, Product, ProductionOrder, ProductionOrderMaterial
+from tests.conftest import build_dataset
+
+
+def download(client, collection, since='0', limit=None):
+    """Follow a sync sequence to its end; returns (changes, deleted, cursor, pages)"""
+    changes, deleted, pages = [], [], 0
+    while True:
+        url = f'/api/sync/{collection}?since={since}' + (f'&limit={limit}' if limit else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.get_json()
+        changes += data['changes']
+        deleted += data['deleted']
+        since = data['cursor']
+        pages += 1
+        if not data['has_more']:
+            return changes, deleted, since, pages
+
+
+def test_full_download_in_pages(app, client):
+    with app.app_context():
+        build_dataset(10)
+        lot_ids = sorted(lot.id for lot in Lot.query)
+
+    changes, deleted, cursor, pages = download(client, 'lots', limit=3)
+    assert sorted(row['id'] for row in changes) == lot_ids
+    assert pages == 4 and deleted == []
+    assert cursor.startswith('w_')
+
+
+def test_delta_returns_updates_and_deletions(app, client):
+    with app.app_context():
+        ids = build_dataset(10)
+        lot = Lot(lot_number='L-SYNC', product_id=ids['product_id'], initial_quantity=5.0,
+                  current_quantity=5.0, unit='kg', manufacturing_date=date.today())
+        db.session.add(lot)
+        order = ProductionOrder.query.filter_by(order_number='OF-DRAFT').one()
+        material = ProductionOrderMaterial(production_order_id=order.id, lot_id=ids['lot_id'],
+                                           quantity_consumed=1.0, unit='kg')
+        db.session.add(material)
+        db.session.commit()
+        lot_id, order_id, material_id = lot.id, order.id, material.id
+
+    _, _, lots_cursor, _ = download(client, 'lots')
+    _, _, materials_cursor, _ = download(client, 'order_materials')
+
+    with app.app_context():
+        product = db.session.get(Product, ids['product_id'])
+        product.name = 'Renombrado'
+        db.session.commit()
+        updated = db.session.get(Lot, ids['lot_id'])
+        updated.current_quantity -= 1
+        db.session.commit()
+
+    assert client.delete(f'/api/lots/{lot_id}').status_code == 200
+    assert client.delete(f'/api/production-orders/{order_id}/materials/{material_id}').status_code == 200
+
+    changes, deleted, _, _ = download(client, 'lots', since=lots_cursor)
+    assert ids['lot_id'] in {row['id'] for row in changes}
+    assert lot_id not in {row['id'] for row in changes}
+    assert deleted == [lot_id]
+
+    _, deleted, _, _ = download(client, 'order_materials', since=materials_cursor)
+    assert deleted == [material_id]
+
+    changes, _, _, _ = download(client, 'products', since=lots_cursor)
+    assert 'Renombrado' in {row['name'] for row in changes}
+
+
+def test_invalid_requests(app, client):
+    assert client.get('/api/sync/lots').status_code == 400
+    assert client.get('/api/sync/lots?since=ayer').status_code == 400
+    assert client.get('/api/sync/shipments?since=0').status_code == 404
+
+
+def test_stale_offline_writes_are_rejected(app, client):
+    """Writes replayed from the offline queue carry the stock they were prepared with"""
+    with app.app_context():
+        ids = build_dataset(10)
+        lot = db.session.get(Lot, ids['lot_id'])
+        stock = lot.current_quantity
+        in_lib = LotLocation.query.filter_by(lot_id=lot.id, location_id=ids['location_id']).one().quantity
+        nc_id = Location.query.filter_by(code='NC').one().id
+
+    adjust = {'real_quantity': stock - 3, 'expected_quantity': stock}
+    assert client.post(f'/api/lots/{ids["lot_id"]}/adjust', json=adjust).status_code == 200
+    # Sent again after a lost response: the stock is no longer the one counted against
+    assert client.post(f'/api/lots/{ids["lot_id"]}/adjust', json=adjust).status_code == 409
+
+    transfer = {'lot_id': ids['lot_id'], 'from_location_id': ids['location_id'], 'to_location_id': nc_id,
+                'quantity': 1.0, 'expected_quantity': in_lib}
+    assert client.post('/api/locations/transfer', json=transfer).status_code == 200
+    assert client.post('/api/locations/transfer', json=transfer).status_code == 409
+
+
+def test_invalid_expected_quantity_is_rejected(app, client):
+    with app.app_context():
+        ids = build_dataset(10)
+        nc_id = Location.query.filter_by(code='NC').one().id
+
+    response = client.post(f'/api/lots/{ids["lot_id"]}/adjust', json={'real_quantity': 1, 'expected_quantity': 'x'})
+    assert response.status_code == 400 and response.get_json()['error'] == 'Cantidad inválida'
+    transfer = {'lot_id': ids['lot_id'], 'from_location_id': ids['location_id'], 'to_location_id': nc_id,
+                'quantity': 1.0, 'expected_quantity': 'x'}
+    response = client.post('/api/locations/transfer', json=transfer)
+    assert response.status_code == 400 and response.get_json()['error'] == 'Cantidad inválida'
+    assert client.post('/api/locations/transfer', json={**transfer, 'quantity': 'x'}).status_code == 400
@@ -0,0 +1,64 @@
+"""
+Per-table change counters and ETag / If-None-Match on GET endpoints
+"""
+from models import db, Alert, Product, ProductType
+from tests.conftest import build_dataset, count_queries
+from utils.versions import table_versions
+
+
+def test_commits_bump_the_tables_they_write(app):
+    with app.app_context():
+        build_dataset(10)
+        before = table_versions(['products', 'customers', 'alerts'])
+
+        product = Product.query.first()
+        product.name = 'Agua purificada'
+        db.session.commit()
+
+        db.session.add(Product(code='MP-999', name='Nuevo', type=ProductType.RAW_MATERIAL))
+        db.session.flush()
+        db.session.rollback()  # Rolled back writes do not count
+
+        Alert.query.delete()  # Bulk statements count too
+        db.session.commit()
+
+        after = table_versions(['products', 'customers', 'alerts'])
+        assert after == {'products': before['products'] + 1, 'customers': before['customers'],
+                         'alerts': before['alerts'] + 1}
+
+
+def test_unchanged_list_answers_304_without_running_the_view(app, client):
+    with app.app_context():
+        build_dataset(10)
+
+    first = client.get('/api/products')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    with app.app_context(), count_queries(db.engine) as statements:
+        cached = client.get('/api/products', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+    assert cached.headers['ETag'] == etag
+    assert len(statements) == 1  # Only the table_versions lookup
+
+    assert client.get('/api/products?type=packaging', headers={'If-None-Match': etag}).status_code == 200
+
+    product_id = first.get_json()[0]['id']
+    client.put(f'/api/products/{product_id}', json={'name': 'Agua purificada'})
+    changed = client.get('/api/products', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_compressed_etag_is_accepted(app, client):
+    with app.app_context():
+        build_dataset(40)
+
+    compressed = client.get('/api/lots', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    etag = compressed.headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    cached = client.get('/api/lots', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert cached.status_code == 304
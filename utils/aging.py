@@ -0,0 +1,120 @@
+"""
+Inventory aging and expiry calendar
+
+aging_report() buckets the stock of every lot with stock, per product and
+location, by days since it was received (Lot.created_at) and by months to
+its expiration date, in one query:
+
+    inner  one row per lot and location (or per lot, for stock without
+           location), with its age and expiry buckets as CASE expressions
+           over boundary dates computed here, and row_number() over the lot
+           marking its first row so lots are counted once
+    outer  GROUP BY product and location with a conditional sum per bucket,
+           and sum() over the product for the product total
+
+Comparing columns with boundary dates keeps the query portable between
+SQLite and PostgreSQL (no date arithmetic in SQL) and lets it use the date
+indexes.
+"""
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import and_, case, func, select
+
+from models import db, Location, Lot, LotLocation, Product, ProductType
+from utils.lots import add_months
+from utils.snapshots import EPSILON
+
+# (key, upper bound in days since reception); the last bucket is open
+AGE_BUCKETS = [('0-30', 30), ('31-90', 90), ('91-180', 180), ('181-365', 365), ('>365', None)]
+# (key, upper bound in months to expiry, inclusive); besides these: expired and none (no expiry date)
+EXPIRY_BUCKETS = [('0-1', 1), ('1-3', 3), ('3-6', 6), ('6-12', 12), ('>12', None)]
+EXPIRY_KEYS = ['expired'] + [key for key, _ in EXPIRY_BUCKETS] + ['none']
+# Expiring within three months, as the inventory filter expiration=soon
+SOON = ('0-1', '1-3')
+
+
+def _age_bucket(today):
+    whens = [(Lot.created_at >= datetime.combine(today - timedelta(days=days), time.min), key)
+             for key, days in AGE_BUCKETS if days is not None]
+    return case(*whens, else_=AGE_BUCKETS[-1][0])
+
+
+def _expiry_bucket(today):
+    whens = [(Lot.expiration_date.is_(None), 'none'), (Lot.expiration_date < today, 'expired')]
+    whens += [(Lot.expiration_date <= add_months(today, months), key)
+              for key, months in EXPIRY_BUCKETS if months is not None]
+    return case(*whens, else_=EXPIRY_BUCKETS[-1][0])
+
+
+def aging_report(today, product_id=None, product_type=None, location_id=None):
+    """{'rows': [...], 'summary': {...}} of the stock on `today`
+
+    Each row is a product in a location (location None: stock recorded
+    without one) with its quantity per age and expiry bucket, its lots and
+    the total of the product. The summary counts lots per product type:
+    all, blocked, expired and expiring within three months.
+    """
+    first_row = func.row_number().over(partition_by=Lot.id, order_by=LotLocation.location_id) == 1
+    lots = (
+        select(Lot.product_id, LotLocation.location_id, Lot.blocked,
+               func.coalesce(LotLocation.quantity, Lot.current_quantity).label('quantity'),
+               _age_bucket(today).label('age'),
+               _expiry_bucket(today).label('expiry'),
+               case((first_row, 1), else_=0).label('first'))
+        .select_from(Lot)
+        .outerjoin(LotLocation, and_(LotLocation.lot_id == Lot.id, LotLocation.quantity > EPSILON))
+        .where(Lot.current_quantity > EPSILON)
+    )
+    if product_id:
+        lots = lots.where(Lot.product_id == product_id)
+    if product_type:
+        lots = lots.join(Product, Product.id == Lot.product_id).where(Product.type == ProductType(product_type))
+    if location_id:
+        lots = lots.where(LotLocation.location_id == location_id)
+    lots = lots.subquery()
+
+    def quantity_in(column, key):
+        return func.sum(case((column == key, lots.c.quantity), else_=0.0))
+
+    def lots_in(condition):
+        return func.sum(case((and_(lots.c.first == 1, condition), 1), else_=0))
+
+    quantity = func.sum(lots.c.quantity)
+    statement = (
+        select(Product.id, Product.code, Product.name, Product.type, Product.storage_unit,
+               Location.id, Location.code, Location.name,
+               func.count(), quantity, func.sum(quantity).over(partition_by=Product.id),
+               lots_in(lots.c.first == 1), lots_in(lots.c.blocked.is_(True)),
+               *[quantity_in(lots.c.age, key) for key, _ in AGE_BUCKETS],
+               *[quantity_in(lots.c.expiry, key) for key in EXPIRY_KEYS],
+               *[lots_in(lots.c.expiry == key) for key in EXPIRY_KEYS])
+        .select_from(lots)
+        .join(Product, Product.id == lots.c.product_id)
+        .outerjoin(Location, Location.id == lots.c.location_id)
+        .group_by(Product.id, Location.id)
+        .order_by(Product.code, quantity.desc(), Location.code)
+    )
+
+    rows, summary = [], {}
+    for row in db.session.execute(statement):
+        (product_id, code, name, ptype, unit, location_id, location_code, location_name,
+         lot_rows, total, product_total, distinct_lots, blocked) = row[:13]
+        values = iter(row[13:])
+        age = {key: next(values) for key, _ in AGE_BUCKETS}
+        expiry = {key: next(values) for key in EXPIRY_KEYS}
+        expiry_lots = {key: next(values) for key in EXPIRY_KEYS}
+        rows.append({
+            'product': {'id': product_id, 'code': code, 'name': name, 'type': ptype.value, 'unit': unit},
+            'location': {'id': location_id, 'code': location_code, 'name': location_name} if location_id else None,
+            'lots': lot_rows,
+            'quantity': total,
+            'product_quantity': product_total,
+            'age': age,
+            'expiry': expiry,
+        })
+        counts = summary.setdefault(ptype.value, {'lots': 0, 'blocked': 0, 'expired': 0, 'expiring_soon': 0})
+        counts['lots'] += distinct_lots
+        counts['blocked'] += blocked
+        counts['expired'] += expiry_lots['expired']
+        counts['expiring_soon'] += sum(expiry_lots[key] for key in SOON)
+    return {'rows': rows, 'summary': summary}
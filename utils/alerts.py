@@ -0,0 +1,104 @@
+"""
+Alert generation from the current stock
+
+generate_alerts() replaces every alert with the ones the stock calls for
+today: expired, expiring within EXPIRING_SOON_DAYS, blocked lots and
+products below their minimum stock. With LOW_STOCK_FORECAST the minimum of
+a product with consumption history is its suggested reorder point
+(utils/forecast.py) instead of min_stock. It runs from the scheduler
+(utils/jobs.py) and from POST /api/alerts/generate.
+"""
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from models import db, Alert, AlertSeverity, AlertType, Lot, LotStatus, Product
+from utils.forecast import reorder_points
+
+
+def _lots(*conditions):
+    return Lot.query.options(joinedload(Lot.product)).filter(Lot.current_quantity > 0, *conditions) \
+        .order_by(Lot.id).all()
+
+
+def generate_alerts(today=None):
+    """Replace the alerts with the current ones; returns how many were created
+
+    The caller commits.
+    """
+    today = today or date.today()
+    Alert.query.delete()
+    alerts = []
+
+    # 1. Expired lots
+    for lot in _lots(Lot.expiration_date < today):
+        alerts.append(Alert(
+            alert_type=AlertType.EXPIRED,
+            severity=AlertSeverity.CRITICAL,
+            product_id=lot.product_id,
+            lot_id=lot.id,
+            message=f'Lote {lot.lot_number} de {lot.product.name} ha caducado ({lot.expiration_date.isoformat()})'
+        ))
+
+    # 2. Expiring soon (within EXPIRING_SOON_DAYS)
+    expiring_soon_date = today + timedelta(days=current_app.config['EXPIRING_SOON_DAYS'])
+    for lot in _lots(Lot.expiration_date >= today, Lot.expiration_date <= expiring_soon_date):
+        days_remaining = (lot.expiration_date - today).days
+        alerts.append(Alert(
+            alert_type=AlertType.EXPIRING_SOON,
+            severity=AlertSeverity.WARNING if days_remaining > 7 else AlertSeverity.CRITICAL,
+            product_id=lot.product_id,
+            lot_id=lot.id,
+            message=f'Lote {lot.lot_number} de {lot.product.name} caduca en {days_remaining} días ({lot.expiration_date.isoformat()})'
+        ))
+
+    # 3. Low stock: available stock (active lots) per product with a minimum, in one query
+    points = reorder_points(today) if current_app.config['LOW_STOCK_FORECAST'] else {}
+    available = (
+        db.session.query(Lot.product_id, func.sum(Lot.current_quantity).label('quantity'))
+        .filter(Lot.status_condition(LotStatus.ACTIVE.value))
+        .group_by(Lot.product_id)
+        .subquery()
+    )
+    products = (
+        db.session.query(Product, func.coalesce(available.c.quantity, 0))
+        .outerjoin(available, available.c.product_id == Product.id)
+        .filter(Product.active.is_(True))
+        .order_by(Product.id)
+    )
+    if not points:
+        products = products.filter(Product.min_stock.isnot(None))
+    for product, total_stock in products:
+        if product.id in points:
+            minimum, label = points[product.id], 'punto de pedido'
+        elif product.min_stock is not None:
+            minimum, label = product.min_stock, 'mínimo'
+        else:
+            continue
+        if total_stock >= minimum:
+            continue
+        if total_stock == 0 or total_stock < minimum * 0.5:
+            severity = AlertSeverity.CRITICAL
+        else:
+            severity = AlertSeverity.WARNING
+        alerts.append(Alert(
+            alert_type=AlertType.LOW_STOCK,
+            severity=severity,
+            product_id=product.id,
+            message=f'Stock bajo de {product.name}: {total_stock} ({label}: {minimum})'
+        ))
+
+    # 4. Blocked lots (returns, quality issues, etc.)
+    for lot in _lots(Lot.blocked.is_(True)):
+        alerts.append(Alert(
+            alert_type=AlertType.BLOCKED,
+            severity=AlertSeverity.CRITICAL,
+            product_id=lot.product_id,
+            lot_id=lot.id,
+            message=f'Lote {lot.lot_number} de {lot.product.name} está bloqueado ({lot.current_quantity} {lot.unit})'
+        ))
+
+    db.session.add_all(alerts)
+    return len(alerts)
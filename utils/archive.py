@@ -0,0 +1,322 @@
+"""
+Hot/cold archival of old orders, depleted lots and their history
+
+Closed production orders, depleted lots and their movements stay forever in
+the tables every listing, report and index lookup works on. archive()
+moves the records past a retention horizon (ARCHIVE_AFTER_DAYS, two years
+by default) to archive_<table> copies of those tables (same columns and
+ids, no constraints, see ARCHIVE_TABLES in models.py):
+
+    orders     closed before the horizon, with their materials and finished products
+    lots       depleted, no stock in any location and no movement, update or
+               use by an order still in the hot tables since the horizon;
+               with their movements
+    shipments  dated before the horizon, when every lot they carry is archived
+    returns    the same
+
+Lots, shipments and returns sharing a shipment or return line go together,
+so a hot row never points at an archived one and the foreign keys hold.
+Each group is moved with INSERT ... SELECT and DELETE in its own
+transaction, in batches of about ARCHIVE_BATCH_SIZE lots. Synced tables
+get their tombstones; location rows, alerts, sweep lines and snapshot
+balances of archived lots are deleted.
+
+Every record archived by a run is older than its cutoff, recorded in
+archive_runs before anything moves. ArchiveReader is the unified view used
+by traceability: hot rows first, and the archive only for records that may
+be there (an archived lot, or a hot one created before the latest cutoff).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import g
+from sqlalchemy import exists, func, insert, inspect, literal, select, union_all
+from sqlalchemy.orm import MANYTOONE
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import (db, ARCHIVE_TABLES, Alert, ArchiveRun, ExpirySweepLot, Lot, LotLocation, ProductionOrder,
+                    ProductionOrderFinishedProduct, ProductionOrderMaterial, ProductionOrderStatus, Return,
+                    ReturnDetail, Shipment, ShipmentDetail, StockMovement, StockSnapshotBalance, SyncTombstone)
+from utils.sync import SYNCED_TABLES
+
+# Quantities below this are float residue of a depleted lot
+EPSILON = 1e-6
+
+
+def _order_is_cold(cutoff):
+    return (ProductionOrder.status == ProductionOrderStatus.CLOSED) & (ProductionOrder.closed_at < cutoff)
+
+
+def _candidate_lots(cutoff):
+    """Lots that can be archived unless a shipment or return keeps them"""
+    hot_orders = select(ProductionOrder.id).where(~_order_is_cold(cutoff))
+    return select(Lot.id).where(
+        Lot.current_quantity <= EPSILON,
+        Lot.created_at < cutoff,
+        func.coalesce(Lot.updated_at, Lot.created_at) < cutoff,
+        ~exists().where(StockMovement.lot_id == Lot.id, StockMovement.movement_date >= cutoff),
+        ~exists().where(LotLocation.lot_id == Lot.id, func.abs(LotLocation.quantity) > EPSILON),
+        ~exists().where(ProductionOrderMaterial.lot_id == Lot.id,
+                        ProductionOrderMaterial.production_order_id.in_(hot_orders)),
+        ~exists().where(ProductionOrderFinishedProduct.lot_id == Lot.id,
+                        ProductionOrderFinishedProduct.production_order_id.in_(hot_orders)),
+    )
+
+
+def plan(cutoff, batch_size):
+    """(order ids, [(lot ids, shipment ids, return ids)]) to archive, the lots in batches"""
+    orders = db.session.scalars(select(ProductionOrder.id).where(_order_is_cold(cutoff))
+                                .order_by(ProductionOrder.id)).all()
+    lots = set(db.session.scalars(_candidate_lots(cutoff)))
+
+    # Shipments and returns with a line of a candidate lot, with all their lots
+    members, old = defaultdict(set), {}
+    for kind, header, header_id, header_date in (
+            ('shipment', Shipment, ShipmentDetail.shipment_id, Shipment.shipment_date),
+            ('return', Return, ReturnDetail.return_id, Return.return_date)):
+        detail = header_id.class_
+        touched = select(header_id).where(detail.lot_id.in_(_candidate_lots(cutoff)))
+        rows = db.session.execute(
+            select(header_id, detail.lot_id, header_date < cutoff.date())
+            .join(header, header.id == header_id)
+            .where(header_id.in_(touched))
+        )
+        for parent_id, lot_id, is_old in rows:
+            members[kind, parent_id].add(lot_id)
+            old[kind, parent_id] = bool(is_old)
+
+    # A lot stays while a shipment or return that stays carries it, which can keep more shipments
+    while True:
+        cold = {key for key, lot_ids in members.items() if old[key] and lot_ids <= lots}
+        kept = set()
+        for key, lot_ids in members.items():
+            if key not in cold:
+                kept |= lot_ids & lots
+        if not kept:
+            break
+        lots -= kept
+
+    # Lots sharing a cold shipment or return move in the same transaction
+    parent = {lot_id: lot_id for lot_id in lots}
+
+    def root(lot_id):
+        while parent[lot_id] != lot_id:
+            parent[lot_id] = parent[parent[lot_id]]
+            lot_id = parent[lot_id]
+        return lot_id
+
+    for key in cold:
+        first, *rest = members[key]
+        for lot_id in rest:
+            parent[root(lot_id)] = root(first)
+    groups = defaultdict(lambda: ([], [], []))
+    for lot_id in sorted(lots):
+        groups[root(lot_id)][0].append(lot_id)
+    for kind, parent_id in sorted(cold):
+        groups[root(next(iter(members[kind, parent_id])))][1 if kind == 'shipment' else 2].append(parent_id)
+
+    batches, batch = [], ([], [], [])
+    for group in groups.values():
+        for part, ids in zip(batch, group):
+            part.extend(ids)
+        if len(batch[0]) >= batch_size:
+            batches.append(batch)
+            batch = ([], [], [])
+    if batch[0]:
+        batches.append(batch)
+    return orders, batches
+
+
+def _move(model, condition, now):
+    """Copy the rows to their archive table (if any), leave tombstones and delete them; returns the count"""
+    table = model.__table__
+    archive = ARCHIVE_TABLES.get(model)
+    if archive is not None:
+        db.session.execute(archive.insert().from_select(
+            [column.name for column in table.columns], select(*table.columns).where(condition)))
+    if table.name in SYNCED_TABLES:
+        db.session.execute(insert(SyncTombstone).from_select(
+            ['table_name', 'row_id', 'deleted_at'],
+            select(literal(table.name), table.c.id, literal(now, SyncTombstone.deleted_at.type)).where(condition)
+        ))
+    return db.session.execute(table.delete().where(condition)).rowcount
+
+
+def _begin():
+    # Writers queue behind each batch (BEGIN IMMEDIATE on SQLite)
+    db.session.connection(execution_options={'stock_write': True})
+
+
+def archive(days, batch_size, now=None):
+    """Move everything older than `days` to the archive tables; returns the ArchiveRun
+
+    Commits after every batch, so an interrupted run leaves consistent
+    tables and the next run carries on. `now` (default: the current time)
+    is where the `days` are counted from.
+    """
+    started = datetime.utcnow()
+    cutoff = (now or started) - timedelta(days=days)
+    orders, batches = plan(cutoff, batch_size)
+
+    # Recorded first: readers look in the archive as soon as the first batch moves
+    run = ArchiveRun(started_at=started, cutoff=cutoff)
+    db.session.add(run)
+    db.session.commit()
+
+    for start in range(0, len(orders), batch_size):
+        _begin()
+        order_ids = orders[start:start + batch_size]
+        _move(ProductionOrderMaterial, ProductionOrderMaterial.production_order_id.in_(order_ids), started)
+        _move(ProductionOrderFinishedProduct, ProductionOrderFinishedProduct.production_order_id.in_(order_ids), started)
+        run.orders += _move(ProductionOrder, ProductionOrder.id.in_(order_ids), started)
+        db.session.commit()
+
+    for lot_ids, shipment_ids, return_ids in batches:
+        _begin()
+        _move(ShipmentDetail, ShipmentDetail.shipment_id.in_(shipment_ids), started)
+        run.shipments += _move(Shipment, Shipment.id.in_(shipment_ids), started)
+        _move(ReturnDetail, ReturnDetail.return_id.in_(return_ids), started)
+        run.returns += _move(Return, Return.id.in_(return_ids), started)
+        run.movements += _move(StockMovement, StockMovement.lot_id.in_(lot_ids), started)
+        for model in (LotLocation, Alert, ExpirySweepLot, StockSnapshotBalance):
+            _move(model, model.lot_id.in_(lot_ids), started)
+        run.lots += _move(Lot, Lot.id.in_(lot_ids), started)
+        db.session.commit()
+
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    return run
+
+
+def table_sizes():
+    """{table: {'hot': rows, 'archived': rows}} of the archived tables"""
+    tables = [table for model, archive in ARCHIVE_TABLES.items() for table in (model.__table__, archive)]
+    counts = iter(db.session.execute(
+        select(*(select(func.count()).select_from(table).scalar_subquery() for table in tables))).one())
+    return {model.__tablename__: {'hot': next(counts), 'archived': next(counts)} for model in ARCHIVE_TABLES}
+
+
+# --- Unified view ---
+
+def horizon():
+    """Cutoff of the latest archive run: archived records are older (None: nothing archived)"""
+    if 'archive_horizon' not in g:
+        g.archive_horizon = db.session.query(func.max(ArchiveRun.cutoff)).scalar()
+    return g.archive_horizon
+
+
+def unified(model, archived):
+    """The model's table, or when `archived` a subquery of its hot and archived rows, for joins"""
+    table = model.__table__
+    if not archived:
+        return table
+    return union_all(select(table), select(ARCHIVE_TABLES[model])).subquery(f'{table.name}_all')
+
+
+def is_archived(instance):
+    return getattr(instance, 'archived', False)
+
+
+# Collections of archived parents loaded with them (their rows are always archived together)
+ARCHIVED_CHILDREN = {
+    ProductionOrder: ('materials', 'finished_products'),
+    Shipment: ('details',),
+    Return: ('details',),
+}
+
+
+class ArchiveReader:
+    """Hot and archived records as model instances
+
+    Archived rows come back as transient instances flagged `archived`, with
+    their many-to-one relationships (hot or archived) and the collections of
+    ARCHIVED_CHILDREN set, so to_dict() works on them as on hot ones. They
+    are never added to the session.
+    """
+
+    def __init__(self):
+        self.identity = {}
+
+    def may_be_archived(self, instance):
+        """Whether records about this instance (a lot, order or customer) may be in the archive
+
+        Archived records are older than the horizon, so anything created
+        after it only has hot ones.
+        """
+        if is_archived(instance):
+            return True
+        cutoff = horizon()
+        return cutoff is not None and instance.created_at is not None and instance.created_at < cutoff
+
+    def get(self, model, id):
+        """The hot or archived record with this id, or None"""
+        if id is None:
+            return None
+        instance = db.session.get(model, id)
+        if instance is not None or model not in ARCHIVE_TABLES or horizon() is None:
+            return instance
+        if (model, id) not in self.identity:
+            found = self.archived(model, id=id)
+            self.identity.setdefault((model, id), found[0] if found else None)
+        return self.identity[model, id]
+
+    def first(self, model, archived, **filters):
+        """The first hot record matching filters, else, when `archived`, the first archived one"""
+        instance = model.query.filter_by(**filters).first()
+        if instance is None and archived:
+            found = self.archived(model, **filters)
+            instance = found[0] if found else None
+        return instance
+
+    def all(self, model, archived, **filters):
+        """Hot records matching filters, followed by the archived ones when `archived`"""
+        instances = model.query.filter_by(**filters).all()
+        if archived:
+            instances += self.archived(model, **filters)
+        return instances
+
+    def history(self, model, lot, **filters):
+        """Shipment and return lines or movements of a lot
+
+        They are archived with the lot, so only one side is read.
+        """
+        if is_archived(lot):
+            return self.archived(model, lot_id=lot.id, **filters)
+        return model.query.filter_by(lot_id=lot.id, **filters).all()
+
+    def archived(self, model, **filters):
+        """Archived records matching filters, by id"""
+        table = ARCHIVE_TABLES[model]
+        rows = db.session.execute(select(table).filter_by(**filters).order_by(table.c.id)).all()
+        return [self._instance(model, row) for row in rows]
+
+    def _instance(self, model, row):
+        key = (model, row.id)
+        if self.identity.get(key) is not None:
+            return self.identity[key]
+        mapper = inspect(model)
+        instance = mapper.class_manager.new_instance()
+        for name, value in row._mapping.items():
+            set_committed_value(instance, name, value)
+        instance.archived = True
+        self.identity[key] = instance
+
+        for relationship in mapper.relationships:
+            if relationship.direction is MANYTOONE and not relationship.viewonly:
+                column, = relationship.local_columns
+                set_committed_value(instance, relationship.key,
+                                    self.get(relationship.mapper.class_, getattr(instance, column.key)))
+        for name in ARCHIVED_CHILDREN.get(model, ()):
+            relationship = mapper.relationships[name]
+            remote, = relationship.remote_side
+            set_committed_value(instance, name,
+                                self.archived(relationship.mapper.class_, **{remote.key: instance.id}))
+        return instance
+
+
+def lot_dict(lot, **kwargs):
+    """Lot.to_dict() flagging archived lots"""
+    result = lot.to_dict(**kwargs)
+    if is_archived(lot):
+        result['archived'] = True
+    return result
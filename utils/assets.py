@@ -0,0 +1,328 @@
+"""
+Static asset bundles: minified, content-hashed and precompressed
+
+index.html used to load five scripts and two stylesheets unminified, and
+with Flask's default static headers the browser revalidated every one of
+them on each visit, a round trip per file over the tunnel. `python
+build_assets.py` concatenates them in page order into one script and one
+stylesheet, minifies them, names each file after a hash of its content and
+writes .gz and .br variants next to it:
+
+    static/dist/app.3f9c2a1b4d5e.js      app.3f9c2a1b4d5e.js.gz      app.3f9c2a1b4d5e.js.br
+    static/dist/app.8d41c07e9b2f.css     ...
+    static/dist/manifest.json            {"app.js": "app.3f9c2a1b4d5e.js", ...}
+
+A changed source gets a new name, so /assets/ serves them as immutable for a
+year and the browser does not ask again. index.html takes the names from the
+manifest; without a build (or with ASSETS_BUNDLED=false) it links the
+source files as before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+from utils.responses import accepted_encoding, brotli
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = 'manifest.json'
+ASSETS_URL = '/assets'
+
+# Bundles in the order index.html loads their sources: the scripts share the
+# global scope, so a file can only use what an earlier one defined
+BUNDLES = {
+    'app.css': ['css/styles.css', 'css/forms.css'],
+    'app.js': ['js/tables.js', 'js/main.js', 'js/offline.js', 'js/forms.js', 'js/traceability.js'],
+}
+
+# Content-hashed names never change content: cache them for a year
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Built once, so the slowest (smallest) settings
+PRECOMPRESSED = {'.br': 'br', '.gz': 'gzip'}
+
+
+# ============ MINIFICATION ============
+
+_JS_WORD = re.compile(r'[\w$\\\u0080-\uffff]')
+# After these keywords a slash starts a regular expression, not a division
+_JS_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+                      'case', 'do', 'else', 'yield', 'await'}
+
+
+def minify_js(source):
+    """Drop comments, indentation and redundant whitespace from a script
+
+    Strings, template literals and regular expressions are copied verbatim.
+    Line breaks are kept except after `{ [ ( , ; :` and before `} ] )`, where
+    automatic semicolon insertion never depends on them, so the script keeps
+    its meaning without parsing it.
+    """
+    out = []
+    i, n = 0, len(source)
+    templates = []        # Open ${ } expressions: braces opened inside each one
+    last = ''             # Last significant character written
+    word = ''             # Last identifier or keyword written
+    pending = ''          # Whitespace seen since then: '', ' ' or '\n'
+
+    def emit(text):
+        nonlocal last, pending
+        if pending and last:
+            first = text[0]
+            if pending == '\n' and last not in '{[(,;:' and first not in '}])':
+                out.append('\n')
+            elif (_JS_WORD.match(last) and _JS_WORD.match(first)) or (last in '+-' and first == last):
+                out.append(' ')
+        pending = ''
+        out.append(text)
+        last = text[-1]
+
+    def space(char):
+        nonlocal pending
+        pending = '\n' if char == '\n' or pending == '\n' else ' '
+
+    def template(start):
+        """Copy template text from start up to the closing backtick or the next ${"""
+        j = start
+        while j < n:
+            if source[j] == '\\':
+                j += 2
+            elif source[j] == '`':
+                return j + 1, False
+            elif source.startswith('${', j):
+                return j + 2, True
+            else:
+                j += 1
+        raise ValueError('Plantilla sin cerrar')
+
+    while i < n:
+        char = source[i]
+        if char in ' \t\r\n':
+            space(char)
+            i += 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            if end == -1:
+                raise ValueError('Comentario sin cerrar')
+            if '\n' in source[i:end]:
+                space('\n')
+            else:
+                space(' ')
+            i = end + 2
+        elif char in '\'"':
+            j = i + 1
+            while j < n and source[j] != char:
+                if source[j] == '\n':
+                    raise ValueError('Cadena sin cerrar')
+                j += 2 if source[j] == '\\' else 1
+            emit(source[i:j + 1])
+            word = ''
+            i = j + 1
+        elif char == '`':
+            j, opened = template(i + 1)
+            emit(source[i:j])
+            if opened:
+                templates.append(0)
+            word = ''
+            i = j
+        elif char == '}' and templates and templates[-1] == 0:
+            templates.pop()
+            j, opened = template(i + 1)
+            emit(source[i:j])
+            if opened:
+                templates.append(0)
+            word = ''
+            i = j
+        elif char == '/' and (not last or last in '(,=:[!&|?{};+-*%<>~^' or word in _JS_REGEX_KEYWORDS):
+            j, in_class = i + 1, False
+            while j < n and (in_class or source[j] != '/'):
+                if source[j] == '\n':
+                    raise ValueError('Expresión regular sin cerrar')
+                if source[j] == '\\':
+                    j += 1
+                elif source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                j += 1
+            j += 1
+            while j < n and source[j].isalpha():  # flags
+                j += 1
+            emit(source[i:j])
+            word = ''
+            i = j
+        elif _JS_WORD.match(char):
+            j = i + 1
+            while j < n and _JS_WORD.match(source[j]):
+                j += 1
+            word = source[i:j]
+            emit(word)
+            i = j
+        else:
+            if templates and char == '{':
+                templates[-1] += 1
+            elif templates and char == '}':
+                templates[-1] -= 1
+            emit(char)
+            word = ''
+            i += 1
+    if templates:
+        raise ValueError('Plantilla sin cerrar')
+    return ''.join(out) + '\n'
+
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/|\s+', re.S)
+
+
+def minify_css(source):
+    """Drop comments and redundant whitespace from a stylesheet
+
+    Spaces around `+` and `-` are kept (calc() needs them), and so are spaces
+    before `:`, which separate a descendant selector from a pseudo-class.
+    """
+    def token(match):
+        if match.group(1):
+            return match.group(1)
+        return ' ' if match.group(0)[0].isspace() else ''
+
+    css = _CSS_TOKENS.sub(token, source)
+    parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', css)
+    for index in range(0, len(parts), 2):  # Outside strings
+        part = re.sub(r' ?([{};,>]) ?', r'\1', parts[index])
+        parts[index] = re.sub(r': ', ':', part).replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+
+# ============ BUILD ============
+
+def bundle(name, static_dir=STATIC_DIR):
+    """Concatenated sources of a bundle, minified"""
+    extension = os.path.splitext(name)[1]
+    sources = []
+    for path in BUNDLES[name]:
+        with open(os.path.join(static_dir, path), encoding='utf-8') as file:
+            sources.append(MINIFIERS[extension](file.read()))
+    # A script that ends without a semicolon must not run into the next one
+    return (';\n' if extension == '.js' else '').join(sources).encode()
+
+
+def hashed_name(name, content):
+    stem, extension = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+
+
+def read_manifest(output):
+    try:
+        with open(os.path.join(output, MANIFEST), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def build(output=DIST_DIR, static_dir=STATIC_DIR):
+    """Write every bundle with its .gz/.br variants and the manifest
+
+    Files of the previous build are kept, so a page loaded just before a
+    deploy still finds its bundles; older ones are removed. Returns the new
+    manifest.
+    """
+    os.makedirs(output, exist_ok=True)
+    previous = read_manifest(output)
+    manifest = {}
+    for name in BUNDLES:
+        content = bundle(name, static_dir)
+        manifest[name] = hashed_name(name, content)
+        variants = {'': content, '.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content, quality=11)
+        for suffix, data in variants.items():
+            with open(os.path.join(output, manifest[name] + suffix), 'wb') as file:
+                file.write(data)
+
+    keep = set(manifest.values()) | set(previous.values())
+    for filename in os.listdir(output):
+        stem = filename
+        for suffix in PRECOMPRESSED:
+            stem = stem.removesuffix(suffix)
+        if filename != MANIFEST and stem not in keep:
+            os.remove(os.path.join(output, filename))
+
+    # The manifest goes last: until it is replaced pages keep the previous build
+    path = os.path.join(output, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+# ============ SERVING ============
+
+def _manifest(app):
+    """Manifest of the configured build, or None to link the source files
+
+    Re-read when the file changes. In debug a source edited after the build
+    makes the page fall back to the sources instead of serving stale code.
+    """
+    output = app.config.get('ASSETS_DIR') or DIST_DIR
+    path = os.path.join(output, MANIFEST)
+    try:
+        modified = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = app.extensions.get('assets')
+    if not cached or cached[0] != (path, modified):
+        app.extensions['assets'] = cached = ((path, modified), read_manifest(output))
+    manifest = cached[1]
+
+    if app.debug:
+        sources = (os.path.join(STATIC_DIR, path) for paths in BUNDLES.values() for path in paths)
+        if any(os.path.getmtime(source) > modified for source in sources):
+            app.logger.warning('Los ficheros estáticos han cambiado: ejecute python build_assets.py')
+            return None
+    return manifest if set(manifest) >= set(BUNDLES) else None
+
+
+def asset_urls(name):
+    """URLs to link for a bundle: the built file, or its sources in order"""
+    manifest = _manifest(current_app) if current_app.config.get('ASSETS_BUNDLED', True) else None
+    if manifest:
+        return [f'{ASSETS_URL}/{manifest[name]}']
+    return [f'/static/{path}' for path in BUNDLES[name]]
+
+
+def send_asset(filename):
+    """A built file, precompressed when the client accepts it, cached as immutable"""
+    output = current_app.config.get('ASSETS_DIR') or DIST_DIR
+    path = safe_join(output, filename)
+    if path is None or filename == MANIFEST or filename.endswith(tuple(PRECOMPRESSED)) or not os.path.isfile(path):
+        abort(404)
+
+    encoding = accepted_encoding(request.accept_encodings)
+    suffix = next((suffix for suffix, name in PRECOMPRESSED.items() if name == encoding), None)
+    if suffix is None or not os.path.isfile(path + suffix):
+        suffix = ''
+
+    response = send_file(path + suffix, mimetype=mimetypes.guess_type(filename)[0], max_age=ASSET_MAX_AGE)
+    if suffix:
+        response.headers['Content-Encoding'] = PRECOMPRESSED[suffix]
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+
+def configure_assets(app):
+    """Serve the built bundles under /assets/ and expose asset_urls() to the templates"""
+    app.add_url_rule(f'{ASSETS_URL}/<path:filename>', 'assets', send_asset)
+    app.jinja_env.globals['asset_urls'] = asset_urls
@@ -0,0 +1,96 @@
+"""
+Database engine tuning and transaction helpers
+"""
+import os
+from functools import wraps
+
+from sqlalchemy import event, text
+
+from models import db, Lot, LotLocation
+
+
+def configure_database(app):
+    """Apply engine-level tuning from the app configuration
+
+    With SQLITE_PRAGMAS set and a SQLite database, every new connection gets
+    the configured pragmas and SQLAlchemy takes over transaction control from
+    the sqlite3 driver, so stock-mutating transactions can start with
+    BEGIN IMMEDIATE (see stock_transaction).
+    """
+    with app.app_context():
+        engine = db.engine
+
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if engine.dialect.name == 'sqlite' and pragmas:
+        event.listen(engine, 'connect', _sqlite_connect_listener(pragmas))
+        event.listen(engine, 'begin', _sqlite_begin)
+    elif engine.dialect.name != 'sqlite':
+        # A pool must not be shared across processes (gunicorn --preload forks
+        # after the app is built): children start with an empty pool of their own
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def _sqlite_connect_listener(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself instead of the driver's implicit deferred BEGIN
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+    return on_connect
+
+
+def _sqlite_begin(conn):
+    if conn.get_execution_options().get('stock_write'):
+        # Take the write lock up front: concurrent writers wait on busy_timeout
+        # instead of failing with "database is locked" when upgrading a read transaction
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+    else:
+        conn.exec_driver_sql('BEGIN')
+
+
+def stock_transaction(view):
+    """Decorator for views that modify stock quantities
+
+    Opens the request transaction as a write transaction before the view runs
+    its first query. On SQLite with SQLITE_PRAGMAS this is BEGIN IMMEDIATE;
+    on other databases it is a regular transaction.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        db.session.connection(execution_options={'stock_write': True})
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def lock_lots(lot_ids):
+    """Lock lots and their location rows until the end of the transaction
+
+    Stock is updated read-modify-write in Python, so concurrent requests on
+    PostgreSQL must hold row locks to avoid lost updates. Rows are locked in
+    id order so two requests touching the same lots cannot deadlock. The
+    locked objects are refreshed in the session, so later lookups by id see
+    the current quantities. FOR UPDATE is not rendered on SQLite, where
+    stock_transaction already serializes writers. Anything but an integer id
+    (None, or malformed input) is skipped; the caller rejects it afterwards.
+    """
+    lot_ids = sorted({lot_id for lot_id in lot_ids if isinstance(lot_id, int) and not isinstance(lot_id, bool)})
+    if not lot_ids:
+        return
+    Lot.query.filter(Lot.id.in_(lot_ids)).order_by(Lot.id).with_for_update().populate_existing().all()
+    LotLocation.query.filter(LotLocation.lot_id.in_(lot_ids)).order_by(LotLocation.id) \
+        .with_for_update().populate_existing().all()
+
+
+def reset_sequences():
+    """Move PostgreSQL id sequences past the ids inserted explicitly (bulk loads)"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in db.metadata.sorted_tables:
+        if 'id' not in table.c:
+            continue
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+        ))
@@ -0,0 +1,251 @@
+"""
+Live updates: transactional outbox and server-sent events
+
+Commits that change lot stock, alerts or production order status write an
+event row to event_outbox in the same transaction, so an event is published
+if and only if its change is committed:
+
+    stock   {"id": 7, "current_quantity": 80.0, ..., "locations_changed": true}
+            the lot fields of Lot.to_dict(); {"id": 7, "deleted": true} for
+            deleted lots and {"id": 7, "locations_changed": true} for transfers
+    alerts  {"unread": 12}
+    orders  {"id": 3, "order_number": "OF-000003", "status": "closed", ...}
+
+Every worker runs one EventBus thread that polls the outbox and hands new
+rows to the /api/events streams it is serving. The outbox is the broker:
+it is shared by every gunicorn worker through the database (the SQLite file
+or PostgreSQL) and lets a reconnecting client replay what it missed from
+its Last-Event-ID. Rows older than EVENTS_RETENTION_SECONDS are pruned.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context, json
+from sqlalchemy import event, func, inspect
+
+from models import db, Alert, EventOutbox, Lot, LotLocation, ProductionOrder
+
+PENDING_EVENTS_KEY = 'pending_events'
+
+# Ids are taken when a row is inserted but become visible when its transaction
+# commits, which on PostgreSQL may happen out of order: every poll looks back
+# this many ids and skips the ones already delivered
+LOOKBACK_IDS = 200
+
+
+class PendingEvents:
+    """Events collected from the flushes of the current transaction"""
+
+    def __init__(self):
+        self.lots = {}
+        self.orders = {}
+        self.alerts = False
+
+
+def _pending(session):
+    return session.info.setdefault(PENDING_EVENTS_KEY, PendingEvents())
+
+
+def _modified(instance, attributes):
+    # Assigning the value an attribute already has is not a change
+    state = inspect(instance)
+    return any(list(history.added) != list(history.deleted)
+               for history in (state.attrs[name].history for name in attributes) if history.added)
+
+
+def order_payload(order):
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status.value,
+        'base_product_name': order.base_product_name,
+        'base_lot_number': order.base_lot_number,
+        'production_date': order.production_date.isoformat() if order.production_date else None,
+    }
+
+
+def _after_flush(session, flush_context):
+    pending = _pending(session)
+    for instance in session.new:
+        if isinstance(instance, Lot):
+            pending.lots[instance.id] = dict(pending.lots.get(instance.id, {}), **instance.to_dict())
+        elif isinstance(instance, LotLocation):
+            pending.lots.setdefault(instance.lot_id, {'id': instance.lot_id})['locations_changed'] = True
+        elif isinstance(instance, ProductionOrder):
+            pending.orders[instance.id] = order_payload(instance)
+        elif isinstance(instance, Alert):
+            pending.alerts = True
+
+    for instance in session.dirty:
+        if isinstance(instance, Lot) and _modified(instance, (
+                'current_quantity', 'blocked', 'expiration_date', 'lot_number')):
+            pending.lots[instance.id] = dict(pending.lots.get(instance.id, {}), **instance.to_dict())
+        elif isinstance(instance, LotLocation) and _modified(instance, ('quantity', 'location_id')):
+            pending.lots.setdefault(instance.lot_id, {'id': instance.lot_id})['locations_changed'] = True
+        elif isinstance(instance, ProductionOrder) and _modified(instance, ('status',)):
+            pending.orders[instance.id] = order_payload(instance)
+        elif isinstance(instance, Alert) and _modified(instance, ('is_read', 'is_dismissed')):
+            pending.alerts = True
+
+    for instance in session.deleted:
+        if isinstance(instance, Lot):
+            pending.lots[instance.id] = {'id': instance.id, 'deleted': True}
+        elif isinstance(instance, LotLocation):
+            pending.lots.setdefault(instance.lot_id, {'id': instance.lot_id})['locations_changed'] = True
+        elif isinstance(instance, Alert):
+            pending.alerts = True
+
+
+def locations_changed(lot_ids):
+    """Publish the lots whose LotLocation rows a bulk statement changed (flushes do it by themselves)"""
+    pending = _pending(db.session)
+    for lot_id in lot_ids:
+        pending.lots.setdefault(lot_id, {'id': lot_id})['locations_changed'] = True
+
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk statements such as the Alert.query.delete() of /api/alerts/generate
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and table.name == Alert.__tablename__:
+            _pending(orm_execute_state.session).alerts = True
+
+
+def _before_commit(session):
+    session.flush()
+    pending = session.info.pop(PENDING_EVENTS_KEY, None)
+    if pending is None:
+        return
+
+    events = [('stock', payload) for _, payload in sorted(pending.lots.items())]
+    events += [('orders', payload) for _, payload in sorted(pending.orders.items())]
+    if pending.alerts:
+        unread = session.query(func.count(Alert.id)).filter(
+            Alert.is_read.is_(False), Alert.is_dismissed.is_(False)).scalar()
+        events.append(('alerts', {'unread': unread}))
+    if events:
+        # On the connection, not the session: the outbox is not an application table
+        session.connection().execute(EventOutbox.__table__.insert(), [
+            {'channel': channel, 'payload': json.dumps(payload), 'created_at': datetime.utcnow()}
+            for channel, payload in events
+        ])
+        session.info['events_published'] = True
+
+
+def _after_commit(session):
+    if session.info.pop('events_published', False) and has_app_context():
+        bus = current_app.extensions.get('events')
+        if bus is not None:
+            bus.wake()
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_EVENTS_KEY, None)
+    session.info.pop('events_published', None)
+
+
+class EventBus:
+    """Fans outbox rows out to the event streams of this process
+
+    A daemon thread polls the outbox every EVENTS_POLL_INTERVAL seconds, or
+    sooner when a commit in this process publishes events.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('EVENTS_POLL_INTERVAL', 0.5)
+        self.retention = timedelta(seconds=app.config.get('EVENTS_RETENTION_SECONDS', 3600))
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.last_id = None  # Rows up to the last id when the bus started are never delivered
+        self.first_id = None
+        self.delivered = deque(maxlen=LOOKBACK_IDS * 2)
+        self.last_pruned = 0.0
+        self.thread = None
+
+    def subscribe(self, limit=None):
+        """Queue receiving the new rows, or None when `limit` streams are already open"""
+        subscriber = queue.Queue()
+        with self.lock:
+            if limit is not None and len(self.subscribers) >= limit:
+                return None
+            if self.last_id is None:
+                self.last_id = self.first_id = self.latest_id()
+            self.subscribers.add(subscriber)
+            if self.app.config.get('EVENTS_POLLER', True) and self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='event-bus', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def wake(self):
+        self.wakeup.set()
+
+    def latest_id(self):
+        return db.session.query(func.max(EventOutbox.id)).scalar() or 0
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+            if not self.subscribers:
+                continue
+            try:
+                with self.app.app_context():
+                    self.dispatch()
+                    self.prune()
+            except Exception:
+                self.app.logger.exception('Error leyendo event_outbox')
+
+    def dispatch(self):
+        """Deliver the outbox rows not delivered yet to every subscriber"""
+        rows = replay(max(self.last_id - LOOKBACK_IDS, self.first_id))
+        db.session.remove()
+        delivered = set(self.delivered)
+        with self.lock:
+            for row in rows:
+                if row.id in delivered:
+                    continue
+                self.delivered.append(row.id)
+                self.last_id = max(self.last_id, row.id)
+                for subscriber in self.subscribers:
+                    subscriber.put(row)
+
+    def prune(self):
+        if time.time() - self.last_pruned < 60:
+            return
+        self.last_pruned = time.time()
+        outbox = EventOutbox.__table__
+        with db.engine.begin() as conn:
+            conn.execute(outbox.delete().where(outbox.c.created_at < datetime.utcnow() - self.retention))
+
+
+def replay(after_id):
+    """(id, channel, payload) of the outbox rows after `after_id`, oldest first"""
+    return db.session.query(EventOutbox.id, EventOutbox.channel, EventOutbox.payload).filter(
+        EventOutbox.id > after_id).order_by(EventOutbox.id).all()
+
+
+def format_event(row):
+    return f'id: {row.id}\nevent: {row.channel}\ndata: {row.payload}\n\n'
+
+
+def configure_events(app):
+    """Publish live update events on commit and create the bus of this app"""
+    if not app.config.get('EVENTS', True):
+        return
+    app.extensions['events'] = EventBus(app)
+    if event.contains(db.session, 'before_commit', _before_commit):
+        return  # Listeners are per session class, shared by every app
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+    event.listen(db.session, 'before_commit', _before_commit)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
@@ -0,0 +1,121 @@
+"""
+Expiry sweep: expired stock leaves LIB for NC
+
+Lot.status says a lot is expired at read time, but its stock stays in LIB
+(Liberado), so every availability check had to compare dates lot by lot.
+sweep() moves the LIB stock of the lots expired before a date to NC (No
+Conforme) in one transaction of set-based statements, whatever the number
+of lots:
+
+    expiry_sweep_lots  INSERT ... SELECT the LIB rows of the expired lots
+    stock_movements    one TRANSFER LIB -> NC per lot (reference expiry_sweep)
+    lot_locations      NC rows increased or created, LIB rows decreased
+
+Each sweep only looks at the lots that may have changed since the previous
+one, each found on an index: the lots expired since then (expiration_date
+in [previous expired_before, expired_before)), the LIB rows updated since
+then (stock released or moved back to LIB after expiry) and the lots
+updated since then (an expiry date changed to the past). Its cost follows
+those lots, not the number of lots. The first sweep, or one with full=True,
+looks at every expired lot. After a sweep the stock in LIB is the
+available stock.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import exists, insert, literal, select, union, update
+
+from models import db, ExpirySweep, ExpirySweepLot, Location, Lot, LotLocation, MovementType, StockMovement
+from utils.events import locations_changed
+
+SWEEP_REFERENCE = 'expiry_sweep'
+AVAILABLE_LOCATION = 'LIB'
+QUARANTINE_LOCATION = 'NC'
+
+
+def sweep(today=None, full=False, now=None):
+    """Quarantine the LIB stock of the lots expired before `today`; returns the ExpirySweep
+
+    The caller commits. Returns None when the LIB or NC location is missing.
+    """
+    today = today or date.today()
+    now = now or datetime.utcnow()
+    if not db.session().in_transaction():
+        # Writers queue behind the sweep instead of interleaving with it (BEGIN IMMEDIATE on SQLite)
+        db.session.connection(execution_options={'stock_write': True})
+
+    locations = dict(db.session.query(Location.code, Location.id).filter(
+        Location.code.in_([AVAILABLE_LOCATION, QUARANTINE_LOCATION])))
+    lib, nc = locations.get(AVAILABLE_LOCATION), locations.get(QUARANTINE_LOCATION)
+    if lib is None or nc is None:
+        return None
+
+    previous = None if full else ExpirySweep.query.order_by(ExpirySweep.id.desc()).first()
+    record = ExpirySweep(swept_at=now, expired_from=previous.expired_before if previous else None,
+                         expired_before=today)
+    db.session.add(record)
+    db.session.flush()
+
+    expired = [Lot.expiration_date < today]
+    if previous is not None:
+        # Three index lookups instead of an OR the planner would answer with a scan
+        changed = union(
+            select(Lot.id).where(Lot.expiration_date >= previous.expired_before, Lot.expiration_date < today),
+            select(LotLocation.lot_id).where(LotLocation.location_id == lib,
+                                             LotLocation.updated_at >= previous.swept_at),
+            select(Lot.id).where(Lot.updated_at >= previous.swept_at),
+        )
+        expired.append(LotLocation.lot_id.in_(changed))
+    db.session.execute(insert(ExpirySweepLot).from_select(
+        ['sweep_id', 'lot_id', 'quantity'],
+        select(literal(record.id), LotLocation.lot_id, LotLocation.quantity)
+        .join(Lot, Lot.id == LotLocation.lot_id)
+        .where(LotLocation.location_id == lib, LotLocation.quantity > 0, *expired)
+        .with_for_update(of=LotLocation)
+    ))
+    swept = select(ExpirySweepLot.lot_id).where(ExpirySweepLot.sweep_id == record.id)
+    moved = (select(ExpirySweepLot.quantity)
+             .where(ExpirySweepLot.sweep_id == record.id, ExpirySweepLot.lot_id == LotLocation.lot_id)
+             .scalar_subquery())
+
+    db.session.execute(insert(StockMovement).from_select(
+        ['lot_id', 'movement_type', 'quantity', 'movement_date', 'reference_id', 'reference_type',
+         'from_location_id', 'to_location_id', 'notes', 'updated_at'],
+        select(
+            ExpirySweepLot.lot_id,
+            literal(MovementType.TRANSFER, StockMovement.movement_type.type),
+            ExpirySweepLot.quantity,
+            literal(now, StockMovement.movement_date.type),
+            literal(record.id),
+            literal(SWEEP_REFERENCE),
+            literal(lib),
+            literal(nc),
+            literal('Lote caducado: traslado automático a No Conforme'),
+            literal(now, StockMovement.updated_at.type),
+        ).where(ExpirySweepLot.sweep_id == record.id)
+    ))
+    db.session.execute(
+        update(LotLocation)
+        .where(LotLocation.location_id == nc, LotLocation.lot_id.in_(swept))
+        .values(quantity=LotLocation.quantity + moved, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(insert(LotLocation).from_select(
+        ['lot_id', 'location_id', 'quantity', 'updated_at'],
+        select(ExpirySweepLot.lot_id, literal(nc), ExpirySweepLot.quantity, literal(now, LotLocation.updated_at.type))
+        .where(ExpirySweepLot.sweep_id == record.id,
+               ~exists().where(LotLocation.lot_id == ExpirySweepLot.lot_id, LotLocation.location_id == nc))
+    ))
+    db.session.execute(
+        update(LotLocation)
+        .where(LotLocation.location_id == lib, LotLocation.lot_id.in_(swept))
+        .values(quantity=LotLocation.quantity - moved, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    lot_ids = db.session.scalars(swept).all()
+    record.lots = len(lot_ids)
+    db.session.flush()
+    locations_changed(lot_ids)
+    # Objects loaded before the sweep do not see the bulk updates
+    db.session.expire_all()
+    return record
@@ -0,0 +1,264 @@
+"""
+Streaming CSV and XLSX exports
+
+An export is written while its rows are read: the query runs with
+yield_per, which uses a server-side cursor on PostgreSQL (and steps the
+SQLite cursor), and each batch of rows is encoded and sent before the next
+one is fetched. Nothing holds the whole result, so a worker exporting
+millions of movements keeps a flat memory profile.
+
+CSV is UTF-8 with a BOM (so Excel reads the accents), compressed on the fly
+with gzip when the client accepts it; streamed responses skip the
+after_request compression (utils/responses.py). XLSX is written by hand
+as a zip with data descriptors, one worksheet entry streamed row by row
+with inline strings, so it needs no spreadsheet library nor a temporary
+file. A sheet holds up to 1,048,576 rows; longer exports continue in new
+sheets.
+"""
+import csv
+import enum
+import io
+import re
+import zipfile
+import zlib
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from flask import Response, request, stream_with_context
+from sqlalchemy import Enum
+
+from models import db
+from utils.responses import GZIP_LEVEL
+
+FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Rows fetched and encoded per step
+BATCH_SIZE = 2000
+# Excel's limit, header row included
+SHEET_ROWS = 1048576
+
+
+def export_format():
+    """Format of the request (?format=csv|xlsx, csv by default); ValueError if unknown"""
+    file_format = request.args.get('format', 'csv')
+    if file_format not in FORMATS:
+        raise ValueError('Formato de exportación inválido (csv o xlsx)')
+    return file_format
+
+
+def _rows(statement):
+    """Batches of rows of a select, streamed from the database
+
+    Run on the session's connection as a Core statement: plain tuples, no
+    ORM row processing.
+    """
+    result = db.session.connection().execute(statement.execution_options(yield_per=BATCH_SIZE))
+    for partition in result.partitions():
+        yield partition
+
+
+def _enum_value(value):
+    return value if value is None else value.value
+
+
+def _csv_chunks(headers, statement):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield '\ufeff' + buffer.getvalue()
+    # Only enums need converting: csv writes None as empty and dates as YYYY-MM-DD[ HH:MM:SS]
+    enums = [index for index, column in enumerate(statement.selected_columns) if isinstance(column.type, Enum)]
+    for rows in _rows(statement):
+        buffer.seek(0)
+        buffer.truncate()
+        if enums:
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for index in enums:
+                    row[index] = _enum_value(row[index])
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _Sink:
+    """Write-only, unseekable file handing out what has been written so far
+
+    zipfile writes to it with data descriptors instead of seeking back to
+    fill in sizes and checksums.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+# Characters XML 1.0 does not allow
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_EPOCH = datetime(1899, 12, 30)
+# cellXfs of XLSX_STYLES
+_DATE_STYLE, _DATETIME_STYLE = 1, 2
+
+
+def _cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, enum.Enum):
+        value = value.value
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value!r}</v></c>'
+    if isinstance(value, datetime):
+        return f'<c s="{_DATETIME_STYLE}"><v>{(value - _EPOCH).total_seconds() / 86400!r}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="{_DATE_STYLE}"><v>{(value - _EPOCH.date()).days}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_INVALID_XML.sub("", str(value)))}</t></is></c>'
+
+
+def _row(values):
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+
+XLSX_SHEET_START = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+XLSX_SHEET_END = '</sheetData></worksheet>'
+XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def _xlsx_parts(sheet_names):
+    sheets = range(1, len(sheet_names) + 1)
+    yield '[Content_Types].xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        + ''.join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                  'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                  for n in sheets)
+        + '</Types>'
+    )
+    yield '_rels/.rels', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'officeDocument" Target="xl/workbook.xml"/></Relationships>'
+    )
+    yield 'xl/workbook.xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+        + ''.join(f'<sheet name="{escape(name)}" sheetId="{n}" r:id="rId{n}"/>'
+                  for n, name in zip(sheets, sheet_names))
+        + '</sheets></workbook>'
+    )
+    yield 'xl/_rels/workbook.xml.rels', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        + ''.join(f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                  f'relationships/worksheet" Target="worksheets/sheet{n}.xml"/>' for n in sheets)
+        + f'<Relationship Id="rId{len(sheet_names) + 1}" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/styles" Target="styles.xml"/></Relationships>'
+    )
+    yield 'xl/styles.xml', XLSX_STYLES
+
+
+def _xlsx_chunks(title, headers, statement):
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED)
+    sheet_names = []
+    sheet, rows_in_sheet = None, SHEET_ROWS
+
+    def new_sheet():
+        sheet_names.append(title if not sheet_names else f'{title} {len(sheet_names) + 1}')
+        entry = archive.open(f'xl/worksheets/sheet{len(sheet_names)}.xml', 'w', force_zip64=True)
+        entry.write((XLSX_SHEET_START + _row(headers)).encode())
+        return entry
+
+    for rows in _rows(statement):
+        parts = []
+        for row in rows:
+            if rows_in_sheet == SHEET_ROWS:
+                if sheet is not None:
+                    sheet.write(''.join(parts).encode() + XLSX_SHEET_END.encode())
+                    sheet.close()
+                    parts = []
+                sheet, rows_in_sheet = new_sheet(), 1
+            parts.append(_row(row))
+            rows_in_sheet += 1
+        if parts:
+            sheet.write(''.join(parts).encode())
+        yield sink.drain()
+
+    if sheet is None:
+        sheet = new_sheet()
+    sheet.write(XLSX_SHEET_END.encode())
+    sheet.close()
+    for name, content in _xlsx_parts(sheet_names):
+        archive.writestr(name, content)
+    archive.close()
+    yield sink.drain()
+
+
+def export_response(name, title, headers, statement, file_format):
+    """Streamed download of the rows of `statement` as <name>-<date>.csv or .xlsx
+
+    `title` names the XLSX sheet. Values may be strings, numbers, booleans,
+    dates, datetimes, enums or None.
+    """
+    filename = f'{name}-{date.today().isoformat()}.{file_format}'
+    response_headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no',  # Tell nginx to pass chunks on as they come
+    }
+    if file_format == 'xlsx':
+        chunks = _xlsx_chunks(title, headers, statement)
+    else:
+        chunks = (chunk.encode() for chunk in _csv_chunks(headers, statement))
+        if request.accept_encodings['gzip'] > 0:
+            chunks = _gzip(chunks)
+            response_headers['Content-Encoding'] = 'gzip'
+        response_headers['Vary'] = 'Accept-Encoding'
+    return Response(stream_with_context(chunks), mimetype=FORMATS[file_format], headers=response_headers)
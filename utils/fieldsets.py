@@ -0,0 +1,132 @@
+"""
+Sparse fieldsets and side-loaded references for list endpoints
+
+    ?fields=id,lot_number,current_quantity   keep only these keys of each item
+    ?include=products,locations              serialize products and locations once in
+                                             a top-level map keyed by id instead of
+                                             nested in every item
+
+Without `include` the response is the usual list. With it, the list moves to
+'data' and every entity referenced by an *_id key of the items is serialized
+once under 'included':
+
+    {"data": [{"id": 1, "product_id": 7, ...}, ...],
+     "included": {"products": {"7": {"id": 7, "code": "MP-001", ...}}}}
+
+Routes ask inline() whether to nest a reference when they serialize the
+items, so included entities are never serialized per item; they are loaded
+afterwards with one query per collection.
+"""
+from flask import jsonify, request
+from sqlalchemy.orm import joinedload
+
+from models import Customer, Location, Lot, Product
+
+# Nested key -> collection it is side-loaded into
+REFERENCES = {
+    'product': 'products',
+    'finished_product': 'products',
+    'location': 'locations',
+    'from_location': 'locations',
+    'to_location': 'locations',
+    'customer': 'customers',
+    'lot': 'lots',
+}
+COLLECTIONS = ('products', 'locations', 'customers', 'lots')
+MODELS = {'products': Product, 'locations': Location, 'customers': Customer, 'lots': Lot}
+
+
+def split_param(name):
+    value = request.args.get(name)
+    return [item.strip() for item in value.split(',') if item.strip()] if value else []
+
+
+class Fieldset:
+    """The fields= and include= options of a list request"""
+
+    def __init__(self, fields=None, include=None):
+        self.fields = fields or []
+        self.include = include or []
+        unknown = [name for name in self.include if name not in COLLECTIONS]
+        if unknown:
+            raise ValueError(f'include desconocido: {", ".join(unknown)} (valores: {", ".join(COLLECTIONS)})')
+
+    @classmethod
+    def from_request(cls):
+        return cls(split_param('fields'), split_param('include'))
+
+    def needs(self, key):
+        """Whether the nested `key` appears in the response, either inline or side-loaded"""
+        return not self.fields or key in self.fields or REFERENCES.get(key) in self.include
+
+    def inline(self, key, nested=False):
+        """Whether to serialize the reference `key` inside each item
+
+        Not when its collection is side-loaded. nested: the reference is
+        inside a nested entity (the product of a detail's lot), where
+        fields= does not apply.
+        """
+        return REFERENCES[key] not in self.include and (nested or not self.fields or key in self.fields)
+
+    def response(self, items, page=None):
+        """jsonify the serialized items with the requested fields and side-loaded references
+
+        With a paged `page` (utils.pagination) the items go in 'data' next to their position.
+        """
+        if self.fields:
+            known = set().union(*(item.keys() for item in items))
+            known.update(key for key, collection in REFERENCES.items() if collection in self.include)
+            unknown = [name for name in self.fields if items and name not in known]
+            if unknown:
+                return jsonify({'error': f'Campos desconocidos: {", ".join(unknown)}'}), 400
+
+        # Referenced ids are collected before fields= drops the keys that hold them
+        included = self.load_included(items) if self.include else None
+        items = self.select(items)
+        paged = page is not None and page.paged
+        if not self.include:
+            return jsonify(page.envelope({'data': items}) if paged else items)
+
+        body = {'data': items, 'included': included}
+        return jsonify(page.envelope(body) if paged else body)
+
+    def select(self, items):
+        if not self.fields:
+            return items
+        return [{name: item[name] for name in self.fields if name in item} for item in items]
+
+    def load_included(self, items):
+        """{collection: {id: serialized entity}} of the entities the items reference"""
+        ids = {name: set() for name in self.include}
+        referenced_ids(items, ids)
+        included = {}
+        # Lots first: the products they reference are side-loaded too
+        for name in sorted(self.include, key=lambda name: name != 'lots'):
+            model = MODELS[name]
+            query = model.query.filter(model.id.in_(sorted(ids[name]))).order_by(model.id)
+            if name == 'lots':
+                nest_products = 'products' not in self.include
+                if nest_products:
+                    query = query.options(joinedload(Lot.product))
+                rows = [lot.to_dict(include_product=nest_products) for lot in query] if ids[name] else []
+                referenced_ids(rows, ids)
+            else:
+                rows = [row.to_dict() for row in query] if ids[name] else []
+            included[name] = {row['id']: row for row in rows}
+        return included
+
+
+def referenced_ids(value, ids):
+    """Add the *_id values of `value` that point at the collections of `ids`, at any depth"""
+    if isinstance(value, list):
+        for child in value:
+            if isinstance(child, (dict, list)):
+                referenced_ids(child, ids)
+        return
+    for key, child in value.items():
+        if isinstance(child, (dict, list)):
+            referenced_ids(child, ids)
+        elif key.endswith('_id') and child is not None:
+            collection = REFERENCES.get(key[:-3])
+            if collection in ids:
+                ids[collection].add(child)
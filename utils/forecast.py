@@ -0,0 +1,130 @@
+"""
+Consumption forecast and suggested reorder points
+
+The consumption of a product is what leaves its lots in production orders
+and shipments (PRODUCTION and SHIPMENT movements with negative quantity).
+forecast() reads the last FORECAST_HISTORY_DAYS full days of it for every
+product in one GROUP BY product and day, fills the days without movements
+with zeros and fits simple exponential smoothing to each series:
+
+    level = alpha * consumption of the day + (1 - alpha) * level
+
+The final level is the expected daily consumption. With the standard
+deviation of the daily series as its uncertainty, for a replenishment lead
+time L and safety factor z:
+
+    safety stock  = z * sigma * sqrt(L)
+    reorder point = daily forecast * L + safety stock
+    days of cover = available stock / daily forecast
+
+The series are a few hundred products by a few hundred days, so the fit
+runs in Python; the database does the aggregation.
+"""
+import math
+from datetime import date, datetime, time, timedelta
+from statistics import pstdev
+
+from flask import current_app
+from sqlalchemy import Date, func, select, type_coerce
+
+from models import db, Lot, LotStatus, MovementType, Product, ProductType, StockMovement
+
+CONSUMPTION_TYPES = (MovementType.PRODUCTION, MovementType.SHIPMENT)
+
+
+def consumption_series(start, days, product_ids=None):
+    """{product_id: [consumption per day]} for the `days` days from `start`
+
+    Only products with some consumption in the period are present.
+    """
+    day = type_coerce(func.date(StockMovement.movement_date), Date)
+    statement = (
+        select(Lot.product_id, day, func.sum(-StockMovement.quantity))
+        .join(Lot, Lot.id == StockMovement.lot_id)
+        .where(StockMovement.movement_type.in_(CONSUMPTION_TYPES), StockMovement.quantity < 0,
+               StockMovement.movement_date >= datetime.combine(start, time.min),
+               StockMovement.movement_date < datetime.combine(start + timedelta(days=days), time.min))
+        .group_by(Lot.product_id, day)
+    )
+    if product_ids is not None:
+        statement = statement.where(Lot.product_id.in_(product_ids))
+    series = {}
+    for product_id, movement_day, quantity in db.session.execute(statement):
+        series.setdefault(product_id, [0.0] * days)[(movement_day - start).days] += quantity
+    return series
+
+
+def smoothed_level(values, alpha):
+    """Level of simple exponential smoothing at the end of `values`, started at their mean"""
+    level = sum(values) / len(values)
+    for value in values:
+        level += alpha * (value - level)
+    return level
+
+
+def forecast(today=None, product_id=None, product_type=None):
+    """Forecast and reorder point of every active product, in code order
+
+    Products without consumption in the history have a daily forecast of 0,
+    no reorder point and no days of cover.
+    """
+    today = today or date.today()
+    config = current_app.config
+    days = config['FORECAST_HISTORY_DAYS']
+    lead_time = config['FORECAST_LEAD_TIME_DAYS']
+
+    available = (
+        select(Lot.product_id, func.sum(Lot.current_quantity).label('quantity'))
+        .where(Lot.status_condition(LotStatus.ACTIVE.value))
+        .group_by(Lot.product_id)
+        .subquery()
+    )
+    products = (
+        select(Product, func.coalesce(available.c.quantity, 0.0))
+        .outerjoin(available, available.c.product_id == Product.id)
+        .where(Product.active.is_(True))
+        .order_by(Product.code)
+    )
+    if product_id:
+        products = products.where(Product.id == product_id)
+    if product_type:
+        products = products.where(Product.type == ProductType(product_type))
+    products = db.session.execute(products).all()
+    series = consumption_series(today - timedelta(days=days), days,
+                                [product.id for product, _ in products] if product_id or product_type else None)
+
+    result = []
+    for product, stock in products:
+        values = series.get(product.id)
+        item = {
+            'product': {'id': product.id, 'code': product.code, 'name': product.name,
+                        'type': product.type.value, 'unit': product.storage_unit},
+            'stock': stock,
+            'min_stock': product.min_stock,
+            'consumption': 0.0,
+            'daily_forecast': 0.0,
+            'daily_deviation': 0.0,
+            'safety_stock': None,
+            'reorder_point': None,
+            'days_of_cover': None,
+        }
+        if values:
+            daily = smoothed_level(values, config['FORECAST_SMOOTHING'])
+            deviation = pstdev(values)
+            safety_stock = config['FORECAST_SAFETY_FACTOR'] * deviation * math.sqrt(lead_time)
+            item.update({
+                'consumption': round(sum(values), 3),
+                'daily_forecast': round(daily, 3),
+                'daily_deviation': round(deviation, 3),
+                'safety_stock': round(safety_stock, 3),
+                'reorder_point': round(daily * lead_time + safety_stock, 3),
+                'days_of_cover': round(stock / daily, 1) if daily > 0 else None,
+            })
+        result.append(item)
+    return result
+
+
+def reorder_points(today=None):
+    """{product_id: suggested reorder point} of the products with consumption history"""
+    return {item['product']['id']: item['reorder_point'] for item in forecast(today)
+            if item['reorder_point'] is not None}
@@ -0,0 +1,85 @@
+"""
+Jobs run by the scheduler (utils/scheduler.py)
+
+Each job commits its own work and returns a small JSON summary, stored in
+job_runs. Schedules are crontab expressions in UTC and can be changed per
+job with SCHEDULER_SCHEDULES.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import db, EventOutbox, JobRun
+from utils.alerts import generate_alerts
+from utils.archive import archive
+from utils.document_generator import OUTPUT_DIR
+from utils.expiry import sweep
+from utils.reconciliation import check
+from utils.scheduler import Job
+from utils.snapshots import take_monthly_snapshots
+
+
+def alerts_job():
+    alerts_created = generate_alerts()
+    db.session.commit()
+    return {'alerts_created': alerts_created}
+
+
+def expiry_sweep_job():
+    record = sweep()
+    db.session.commit()
+    return record.to_dict() if record else {'lots': 0}
+
+
+def snapshots_job():
+    snapshots = take_monthly_snapshots()
+    return {'snapshots': [snapshot.cutoff.isoformat() for snapshot in snapshots]}
+
+
+def reconciliation_job():
+    report = check(limit=0)
+    del report['discrepancies']
+    if report['movement_mismatches'] or report['location_mismatches']:
+        current_app.logger.warning('Conciliación de stock: %s', report)
+    return report
+
+
+def archive_job():
+    config = current_app.config
+    return archive(config['ARCHIVE_AFTER_DAYS'], config['ARCHIVE_BATCH_SIZE']).to_dict()
+
+
+def cleanup_job():
+    """Delete old generated documents, outbox events and run history"""
+    config = current_app.config
+    documents = 0
+    oldest = time.time() - config['GENERATED_DOCS_RETENTION_DAYS'] * 86400
+    with os.scandir(OUTPUT_DIR) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < oldest:
+                os.remove(entry.path)
+                documents += 1
+
+    now = datetime.utcnow()
+    events = EventOutbox.query.filter(
+        EventOutbox.created_at < now - timedelta(seconds=config['EVENTS_RETENTION_SECONDS'])
+    ).delete(synchronize_session=False)
+    runs = JobRun.query.filter(
+        JobRun.status.in_(['success', 'error']),
+        JobRun.queued_at < now - timedelta(days=config['SCHEDULER_HISTORY_DAYS'])
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return {'documents': documents, 'events': events, 'job_runs': runs}
+
+
+JOBS = [
+    Job('alerts', '*/15 * * * *', alerts_job, 'Regenerar las alertas de caducidad, stock bajo y lotes bloqueados'),
+    Job('expiry_sweep', '5 0 * * *', expiry_sweep_job, 'Pasar a No Conforme el stock caducado que queda en Liberado'),
+    Job('stock_snapshots', '15 0 1 * *', snapshots_job, 'Instantáneas de stock mensuales que falten'),
+    Job('reconciliation', '30 2 * * *', reconciliation_job, 'Revisar la conciliación de stock (solo informe)'),
+    Job('cleanup', '0 3 * * *', cleanup_job,
+        'Borrar documentos generados, eventos y ejecuciones antiguos'),
+    Job('archive', '0 4 * * 0', archive_job, 'Archivar órdenes cerradas, lotes agotados y movimientos antiguos'),
+]
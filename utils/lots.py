@@ -0,0 +1,71 @@
+"""
+Filters and sort keys shared by the lot lists (/api/lots and /api/inventory)
+
+All of them run in SQL, status included, so that paged lists come out full.
+"""
+import calendar
+
+from flask import request
+from sqlalchemy import or_
+
+from models import Lot, LotStatus, Product, ProductType
+from utils.search import search_condition
+
+# Sort keys of the lots and inventory tables
+LOT_SORT_KEYS = {
+    'lot_number': Lot.lot_number,
+    'product': Product.name,
+    'manufacturing_date': Lot.manufacturing_date,
+    'expiration_date': Lot.expiration_date,
+    'current_quantity': Lot.current_quantity,
+    'created_at': Lot.created_at,
+}
+# Combined FEFO/FIFO ordering:
+# - FEFO (First Expired First Out) for lots WITH expiration dates (raw materials)
+# - FIFO (First In First Out) for lots WITHOUT expiration dates (packaging)
+FEFO_ORDER = (Lot.expiration_date.asc().nullslast(), Lot.created_at.asc())
+
+
+def add_months(day, months):
+    """Same day `months` later, or the last day of that month"""
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def filter_lots(query, available_only_default='false'):
+    """Apply the filters of the request to a lot query that joins Product"""
+    product_id = request.args.get('product_id', type=int)
+    product_type = request.args.get('type')
+    status = request.args.get('status')
+    lot_number = request.args.get('lot_number')
+    search = request.args.get('q')
+    available_only = request.args.get('available_only', available_only_default).lower() == 'true'
+    
+    if product_id:
+        query = query.filter(Lot.product_id == product_id)
+    if product_type:
+        try:
+            query = query.filter(Product.type == ProductType(product_type))
+        except ValueError:
+            raise ValueError('Tipo de producto inválido')
+    
+    # Filter by lot number
+    if lot_number:
+        query = query.filter(search_condition('lot', Lot.id, [Lot.lot_number], lot_number))
+    
+    # Lot number, product code or product name
+    if search:
+        query = query.filter(or_(
+            search_condition('lot', Lot.id, [Lot.lot_number], search),
+            search_condition('product', Product.id, [Product.code, Product.name], search),
+        ))
+    
+    # Status is a computed property, filtered with its SQL equivalent so pages stay full
+    if status:
+        query = query.filter(Lot.status_condition(status))
+    if available_only:
+        query = query.filter(Lot.status_condition(LotStatus.ACTIVE.value))
+    
+    return query
@@ -0,0 +1,77 @@
+"""
+Server-side paging and sorting of list endpoints, for the virtualized tables
+
+    ?limit=100&offset=300    rows 300 to 399 of the filtered list
+    ?sort=expiration_date    sort key of the endpoint, '-expiration_date' descending
+
+Without limit an endpoint returns its complete list as before. With it the
+response is an object whose 'data' holds the page, next to 'included' when
+include= is given:
+
+    {"data": [...], "offset": 300, "limit": 100, "total": 5321}
+
+'total' is counted for the first page (offset=0) only: tables size their
+scrollbar with it once instead of counting again for every page. Ties in
+the sort key are broken by id, so consecutive pages never overlap.
+"""
+from flask import request
+
+MAX_PAGE_SIZE = 500
+
+
+class Page:
+    """The limit=, offset= and sort= options of a list request"""
+
+    def __init__(self, limit=None, offset=0, sort=None, descending=False):
+        self.limit = limit
+        self.offset = offset
+        self.sort = sort
+        self.descending = descending
+        self.total = None
+
+    @classmethod
+    def from_request(cls, sort_keys):
+        """Read the options, accepting only the sort keys the endpoint knows"""
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', 0, type=int)
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit debe estar entre 1 y {MAX_PAGE_SIZE}')
+        if offset < 0:
+            raise ValueError('offset no puede ser negativo')
+
+        sort = request.args.get('sort') or None
+        descending = bool(sort and sort.startswith('-'))
+        if sort:
+            sort = sort.lstrip('-')
+            if sort not in sort_keys:
+                raise ValueError(f'sort desconocido: {sort} (valores: {", ".join(sort_keys)})')
+        return cls(limit, offset, sort, descending)
+
+    @property
+    def paged(self):
+        return self.limit is not None
+
+    def order(self, query, sort_keys, default, id_column):
+        """ORDER BY the requested key (or the endpoint's default order) and id"""
+        if self.sort:
+            column = sort_keys[self.sort]
+            query = query.order_by(column.desc().nullslast() if self.descending else column.asc().nullslast(),
+                                   id_column.desc() if self.descending else id_column.asc())
+        else:
+            query = query.order_by(*default, id_column)
+        return query
+
+    def fetch(self, query):
+        """Rows of the page (all of them when not paged); counts the total on the first page"""
+        if not self.paged:
+            return query.all()
+        if self.offset == 0:
+            self.total = query.order_by(None).count()
+        return query.offset(self.offset).limit(self.limit).all()
+
+    def envelope(self, body):
+        """Wrap the 'data' (and 'included') of a paged response with its position"""
+        body.update(offset=self.offset, limit=self.limit)
+        if self.total is not None:
+            body['total'] = self.total
+        return body
@@ -0,0 +1,115 @@
+"""
+Stock reconciliation: the three copies of every lot's quantity
+
+Every route keeps them in step by hand:
+
+    Lot.current_quantity == sum of its LotLocation.quantity
+                         == sum of its StockMovement.quantity (transfers excluded)
+
+check() compares them for all lots with one aggregate query (a GROUP BY per
+table, joined to lots), plus the location and movement rows left behind by
+deleted lots. fix() makes the ledger agree with the stock in one INSERT ...
+SELECT: an ADJUSTMENT movement per lot for the difference, with no location
+like manual adjustments. Differences between a lot and its locations are
+reported only, since no movement says where the stock really is; they are
+corrected with a count (adjustment) or a transfer.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, insert, literal, or_, select
+
+from models import db, Lot, LotLocation, MovementType, Product, StockMovement
+
+# Differences below this are float residue of sums
+TOLERANCE = 1e-6
+RECONCILIATION_REFERENCE = 'reconciliation'
+
+
+def _totals():
+    """(lot_id, current, movements, locations, product code, lot number) columns of every lot"""
+    movements = (
+        select(StockMovement.lot_id, func.sum(StockMovement.quantity).label('quantity'))
+        .where(StockMovement.movement_type != MovementType.TRANSFER)
+        .group_by(StockMovement.lot_id)
+        .subquery()
+    )
+    locations = (
+        select(LotLocation.lot_id, func.sum(LotLocation.quantity).label('quantity'))
+        .group_by(LotLocation.lot_id)
+        .subquery()
+    )
+    moved = func.coalesce(movements.c.quantity, 0.0)
+    located = func.coalesce(locations.c.quantity, 0.0)
+    query = (
+        select(Lot.id, Lot.lot_number, Product.code, Lot.current_quantity,
+               moved.label('movements_quantity'), located.label('locations_quantity'))
+        .join(Product, Product.id == Lot.product_id)
+        .outerjoin(movements, movements.c.lot_id == Lot.id)
+        .outerjoin(locations, locations.c.lot_id == Lot.id)
+    )
+    return query, moved, located
+
+
+def check(limit=None):
+    """Report of the lots whose three quantities disagree and the orphan rows
+
+    'discrepancies' lists up to `limit` lots (all with None); the counts
+    cover every lot.
+    """
+    query, moved, located = _totals()
+    rows = db.session.execute(
+        query.where(or_(func.abs(Lot.current_quantity - moved) > TOLERANCE,
+                        func.abs(Lot.current_quantity - located) > TOLERANCE))
+        .order_by(Lot.id)
+    ).all()
+
+    discrepancies = [{
+        'lot_id': lot_id,
+        'lot_number': lot_number,
+        'product_code': product_code,
+        'current_quantity': current,
+        'movements_quantity': movements_quantity,
+        'locations_quantity': locations_quantity,
+        'movements_difference': current - movements_quantity,
+        'locations_difference': current - locations_quantity,
+    } for lot_id, lot_number, product_code, current, movements_quantity, locations_quantity in rows]
+
+    lots = select(Lot.id)
+    return {
+        'lots': db.session.query(func.count(Lot.id)).scalar(),
+        'movement_mismatches': sum(abs(d['movements_difference']) > TOLERANCE for d in discrepancies),
+        'location_mismatches': sum(abs(d['locations_difference']) > TOLERANCE for d in discrepancies),
+        'orphan_lot_locations': db.session.query(func.count(LotLocation.id))
+                                .filter(LotLocation.lot_id.not_in(lots)).scalar(),
+        'orphan_movements': db.session.query(func.count(StockMovement.id))
+                            .filter(StockMovement.lot_id.not_in(lots)).scalar(),
+        'discrepancies': discrepancies[:limit] if limit is not None else discrepancies,
+    }
+
+
+def fix(now=None):
+    """Correct what can be corrected; returns (adjustments created, orphan locations deleted)
+
+    The caller commits. Orphan LotLocation rows are deleted through the
+    session so replicas get their tombstones.
+    """
+    now = now or datetime.utcnow()
+    query, moved, _ = _totals()
+    drifted = query.where(func.abs(Lot.current_quantity - moved) > TOLERANCE).subquery()
+    result = db.session.execute(insert(StockMovement).from_select(
+        ['lot_id', 'movement_type', 'quantity', 'movement_date', 'reference_type', 'notes', 'updated_at'],
+        select(
+            drifted.c.id,
+            literal(MovementType.ADJUSTMENT, StockMovement.movement_type.type),
+            drifted.c.current_quantity - drifted.c.movements_quantity,
+            literal(now, StockMovement.movement_date.type),
+            literal(RECONCILIATION_REFERENCE),
+            literal('Regularización por conciliación de stock'),
+            literal(now, StockMovement.updated_at.type),
+        ),
+    ))
+
+    orphans = LotLocation.query.filter(LotLocation.lot_id.not_in(select(Lot.id))).all()
+    for lot_location in orphans:
+        db.session.delete(lot_location)
+    return result.rowcount, len(orphans)
@@ -0,0 +1,235 @@
+"""
+Material requirements of planned production orders
+
+requirements() takes planned orders (finished product and quantity, with
+an optional recipe) and nets their total need of each material against the
+stock that will really be there:
+
+    available = stock in LIB of the lots usable on the production date
+                (not blocked, not expired by then)
+                - what open orders (DRAFT or IN_PROGRESS) have already
+                  reserved from those lots (their materials are consumed
+                  only when the order closes)
+    shortage  = required - available, when positive
+
+A recipe is a list of materials with the quantity per unit of finished
+product. Orders without one use the last closed order of the product: the
+materials linked to it divided by its produced quantity, plus the common
+materials of that order divided by everything the order produced.
+
+Everything is computed with a fixed number of queries, whatever the number
+of orders and materials.
+"""
+from datetime import date
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.orm import aliased
+
+from models import (db, Location, Lot, LotLocation, Product, ProductionOrder, ProductionOrderFinishedProduct,
+                    ProductionOrderMaterial, ProductionOrderStatus, ProductType)
+from utils.snapshots import EPSILON
+
+OPEN_STATUSES = (ProductionOrderStatus.DRAFT, ProductionOrderStatus.IN_PROGRESS)
+MATERIAL_TYPES = (ProductType.RAW_MATERIAL, ProductType.PACKAGING)
+
+
+def _positive(value, message):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError(message)
+    return float(value)
+
+
+def _identifier(value, message):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(message)
+    return value
+
+
+def parse_plan(data):
+    """(production date, orders) of a request body; ValueError with the first problem
+
+    Each order is {'product_id', 'quantity', 'recipe'} with the recipe as a
+    list of {'product_id', 'quantity', 'unit'} (unit None: storage unit),
+    or None.
+    """
+    data = data or {}
+    try:
+        production_date = date.fromisoformat(data['production_date']) if data.get('production_date') else date.today()
+    except (TypeError, ValueError):
+        raise ValueError('Formato de fecha de producción inválido')
+    orders = data.get('orders')
+    if not isinstance(orders, list) or not orders:
+        raise ValueError('Campo requerido: orders (lista de órdenes planificadas)')
+
+    plan = []
+    for n, order in enumerate(orders, 1):
+        if not isinstance(order, dict):
+            raise ValueError(f'Orden {n}: formato inválido')
+        recipe = order.get('recipe')
+        if recipe is not None:
+            if not isinstance(recipe, list) or not recipe:
+                raise ValueError(f'Orden {n}: la receta debe ser una lista de materiales')
+            recipe = [{
+                'product_id': _identifier(line.get('product_id') if isinstance(line, dict) else None,
+                                          f'Orden {n}: material sin product_id'),
+                'quantity': _positive(line.get('quantity'), f'Orden {n}: cantidad de material inválida'),
+                'unit': line.get('unit') or None,
+            } for line in recipe]
+        plan.append({
+            'product_id': _identifier(order.get('product_id'), f'Orden {n}: product_id requerido'),
+            'quantity': _positive(order.get('quantity'), f'Orden {n}: cantidad inválida'),
+            'recipe': recipe,
+        })
+    return production_date, plan
+
+
+def historic_recipes(product_ids):
+    """{finished product id: (order number, {material product id: quantity per unit})}
+
+    From the last closed order that produced each product; products never
+    produced are missing.
+    """
+    if not product_ids:
+        return {}
+    fp = ProductionOrderFinishedProduct
+    produced = (
+        select(fp.production_order_id.label('order_id'), fp.finished_product_id.label('product_id'),
+               func.sum(fp.produced_quantity).label('quantity'))
+        .where(fp.produced_quantity > 0)
+        .group_by(fp.production_order_id, fp.finished_product_id)
+        .subquery()
+    )
+    order_totals = (
+        select(produced.c.order_id, func.sum(produced.c.quantity).label('quantity'))
+        .group_by(produced.c.order_id)
+        .subquery()
+    )
+    latest = (
+        select(produced.c.product_id, func.max(produced.c.order_id).label('order_id'))
+        .join(ProductionOrder, ProductionOrder.id == produced.c.order_id)
+        .where(ProductionOrder.status == ProductionOrderStatus.CLOSED, produced.c.product_id.in_(product_ids))
+        .group_by(produced.c.product_id)
+        .subquery()
+    )
+    linked = aliased(fp)
+    per_unit = func.sum(case(
+        (ProductionOrderMaterial.related_finished_product_id.is_(None),
+         ProductionOrderMaterial.quantity_consumed / order_totals.c.quantity),
+        (linked.finished_product_id == latest.c.product_id,
+         ProductionOrderMaterial.quantity_consumed / produced.c.quantity),
+        else_=0.0,
+    ))
+    statement = (
+        select(latest.c.product_id, ProductionOrder.order_number, Lot.product_id, per_unit)
+        .select_from(latest)
+        .join(ProductionOrder, ProductionOrder.id == latest.c.order_id)
+        .join(produced, and_(produced.c.order_id == latest.c.order_id, produced.c.product_id == latest.c.product_id))
+        .join(order_totals, order_totals.c.order_id == latest.c.order_id)
+        .join(ProductionOrderMaterial, ProductionOrderMaterial.production_order_id == latest.c.order_id)
+        .outerjoin(linked, linked.id == ProductionOrderMaterial.related_finished_product_id)
+        .join(Lot, Lot.id == ProductionOrderMaterial.lot_id)
+        .group_by(latest.c.product_id, ProductionOrder.order_number, Lot.product_id)
+    )
+    recipes = {}
+    for product_id, order_number, material_id, quantity in db.session.execute(statement):
+        if quantity > EPSILON:
+            recipes.setdefault(product_id, (order_number, {}))[1][material_id] = quantity
+    return recipes
+
+
+def material_availability(material_ids, production_date):
+    """{material product id: (usable stock, unusable stock, reserved, available)} in LIB
+
+    Usable lots are not blocked and do not expire before `production_date`;
+    available is their stock minus what open orders reserved from each lot.
+    """
+    reserved = (
+        select(ProductionOrderMaterial.lot_id, func.sum(ProductionOrderMaterial.quantity_consumed).label('quantity'))
+        .join(ProductionOrder, ProductionOrder.id == ProductionOrderMaterial.production_order_id)
+        .where(ProductionOrder.status.in_(OPEN_STATUSES))
+        .group_by(ProductionOrderMaterial.lot_id)
+        .subquery()
+    )
+    usable = and_(Lot.blocked.is_(False),
+                  or_(Lot.expiration_date.is_(None), Lot.expiration_date >= production_date))
+    lot_reserved = func.coalesce(reserved.c.quantity, 0.0)
+    statement = (
+        select(Lot.product_id,
+               func.sum(case((usable, LotLocation.quantity), else_=0.0)),
+               func.sum(case((usable, 0.0), else_=LotLocation.quantity)),
+               func.sum(lot_reserved),
+               func.sum(case((and_(usable, LotLocation.quantity > lot_reserved), LotLocation.quantity - lot_reserved),
+                             else_=0.0)))
+        .join(LotLocation, LotLocation.lot_id == Lot.id)
+        .join(Location, and_(Location.id == LotLocation.location_id, Location.code == 'LIB'))
+        .outerjoin(reserved, reserved.c.lot_id == Lot.id)
+        .where(Lot.product_id.in_(material_ids), LotLocation.quantity > EPSILON)
+        .group_by(Lot.product_id)
+    )
+    return {product_id: values for product_id, *values in db.session.execute(statement)}
+
+
+def requirements(production_date, plan):
+    """Requirement, availability and shortage of every material of the plan
+
+    Returns {'orders': [...], 'materials': [...], 'shortages': n,
+    'missing_recipes': [product ids]}; raises ValueError for unknown
+    products or materials that are not raw materials or packaging.
+    """
+    historic = historic_recipes(sorted({order['product_id'] for order in plan if order['recipe'] is None}))
+    material_ids = {line['product_id'] for order in plan for line in order['recipe'] or []}
+    material_ids.update(m for _, recipe in historic.values() for m in recipe)
+    product_ids = material_ids | {order['product_id'] for order in plan}
+    products = {product.id: product for product in Product.query.filter(Product.id.in_(product_ids))}
+
+    missing = sorted(product_ids - set(products))
+    if missing:
+        raise ValueError(f'Productos no encontrados: {", ".join(map(str, missing))}')
+    not_materials = sorted(products[m].code for m in material_ids if products[m].type not in MATERIAL_TYPES)
+    if not_materials:
+        raise ValueError(f'Solo se pueden planificar materias primas o envases: {", ".join(not_materials)}')
+
+    required, orders, missing_recipes = {}, [], []
+    for order in plan:
+        if order['recipe'] is not None:
+            source, recipe = 'request', {}
+            for line in order['recipe']:
+                material = products[line['product_id']]
+                quantity = material.convert_to_storage_unit(line['quantity'], line['unit']) if line['unit'] \
+                    else line['quantity']
+                recipe[material.id] = recipe.get(material.id, 0.0) + quantity
+        elif order['product_id'] in historic:
+            source, recipe = historic[order['product_id']]
+        else:
+            source, recipe = None, {}
+            missing_recipes.append(order['product_id'])
+        for material_id, per_unit in recipe.items():
+            required[material_id] = required.get(material_id, 0.0) + per_unit * order['quantity']
+        product = products[order['product_id']]
+        orders.append({'product_id': product.id, 'product_code': product.code, 'product_name': product.name,
+                       'quantity': order['quantity'], 'recipe_source': source,
+                       'recipe': [{'product_id': material_id, 'quantity': round(quantity, 6)}
+                                  for material_id, quantity in recipe.items()]})
+
+    availability = material_availability(sorted(required), production_date) if required else {}
+    materials = []
+    for material_id, quantity in required.items():
+        stock, unusable, reserved, available = availability.get(material_id, (0.0, 0.0, 0.0, 0.0))
+        material = products[material_id]
+        materials.append({
+            'product': {'id': material.id, 'code': material.code, 'name': material.name,
+                        'type': material.type.value, 'unit': material.storage_unit},
+            'required': round(quantity, 3),
+            'stock': round(stock, 3),
+            'unusable_stock': round(unusable, 3),
+            'reserved': round(reserved, 3),
+            'available': round(available, 3),
+            'shortage': round(max(quantity - available, 0.0), 3),
+        })
+    materials.sort(key=lambda item: (-item['shortage'], item['product']['code']))
+    return {
+        'orders': orders,
+        'materials': materials,
+        'shortages': sum(1 for item in materials if item['shortage'] > 0),
+        'missing_recipes': missing_recipes,
+    }
@@ -0,0 +1,335 @@
+"""
+Background jobs: cron schedules, a single leader and persisted run history
+
+Every worker creates a Scheduler in create_app, and its daemon thread wakes
+up every SCHEDULER_INTERVAL seconds. Only the worker holding the
+'scheduler' row of scheduler_locks runs jobs, so each job runs once however
+many gunicorn workers there are. The lease lasts SCHEDULER_LEASE_SECONDS,
+is renewed before every job and, while a job runs, by a heartbeat thread
+every third of the lease, so jobs longer than the lease keep it. It is
+taken over by another worker when its owner stops renewing it (runs the
+old leader left 'running' are then marked as interrupted).
+
+A job is due when a time of its cron schedule has passed since the
+scheduler last found it due, so a worker restart or leader change neither
+skips nor repeats a run (missed times run once). Manual runs
+(POST /api/jobs/<name>/run) are queued in job_runs and taken by the leader
+on its next tick. Every run records its worker, duration and result or
+error in job_runs.
+"""
+import atexit
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from flask import json
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, JobRun, SchedulerLock
+
+LOCK_NAME = 'scheduler'
+INTERRUPTED = 'Interrumpida: el worker que la ejecutaba dejó de renovar la concesión'
+
+# field -> (minimum, maximum)
+CRON_FIELDS = [('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 6)]
+
+
+def _parse_field(text, minimum, maximum):
+    values = set()
+    for part in text.split(','):
+        base, _, step = part.partition('/')
+        if base == '*':
+            start, end = minimum, maximum
+        elif '-' in base:
+            start, end = (int(value) for value in base.split('-', 1))
+        else:
+            start = end = int(base)
+            if step:
+                end = maximum
+        step = int(step) if step else 1
+        if not (minimum <= start <= end <= maximum) or step < 1:
+            raise ValueError(part)
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A crontab expression: minute hour day-of-month month day-of-week
+
+    Each field is *, a value, a range a-b, a step */n or a-b/n, or a comma
+    list of them; day of week 0 is Sunday (7 is accepted too). As in cron,
+    when both day fields are restricted a day matching either of them runs.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Expresión cron inválida: {expression!r} (se esperan 5 campos)')
+        self.expression = expression
+        try:
+            if fields[4] != '*':
+                # Sunday is both 0 and 7
+                fields[4] = ','.join('0' if part == '7' else part for part in fields[4].split(','))
+            parsed = [_parse_field(text, minimum, 7 if name == 'weekday' else maximum)
+                      for text, (name, minimum, maximum) in zip(fields, CRON_FIELDS)]
+        except ValueError:
+            raise ValueError(f'Expresión cron inválida: {expression!r}') from None
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __repr__(self):
+        return f'<CronSchedule {self.expression}>'
+
+    def matches_day(self, moment):
+        in_month = moment.day in self.days
+        in_week = (moment.isoweekday() % 7) in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """First time of the schedule strictly after `moment`"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self.matches_day(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f'La expresión cron {self.expression!r} nunca se cumple')
+
+
+class Job:
+    """A named function run by the scheduler; it commits its own work and returns a JSON-able result"""
+
+    def __init__(self, name, schedule, function, description):
+        self.name = name
+        self.schedule = CronSchedule(schedule) if schedule else None  # None: only run on demand
+        self.function = function
+        self.description = description
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'schedule': self.schedule.expression if self.schedule else None,
+            'description': self.description,
+        }
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Scheduler:
+    """Runs the jobs of this app when this worker holds the scheduler lease"""
+
+    def __init__(self, app, jobs):
+        self.app = app
+        self.jobs = {job.name: job for job in jobs}
+        self.interval = app.config.get('SCHEDULER_INTERVAL', 30)
+        self.lease = timedelta(seconds=app.config.get('SCHEDULER_LEASE_SECONDS', 300))
+        self.started_at = datetime.utcnow()
+        self.owner = worker_id()
+        self.leader = False
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.run, name='scheduler', daemon=True)
+        self.thread.start()
+
+    def _forked(self):
+        # Threads do not survive fork (gunicorn --preload): each worker starts its own
+        self.owner = worker_id()
+        self.leader = False
+        self.thread = None
+        self.start()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def run(self):
+        # The first tick waits a full interval, so short-lived scripts that
+        # build the app never take the lease
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.tick()
+            except Exception:
+                self.app.logger.exception('Error en el planificador de tareas')
+
+    # --- Leader lease ---
+
+    def acquire(self, now=None):
+        """Take or renew the lease; True while this worker is the leader"""
+        now = now or datetime.utcnow()
+        lock = SchedulerLock.__table__
+        with db.engine.begin() as conn:
+            renewed = conn.execute(
+                update(lock)
+                .where(lock.c.name == LOCK_NAME, (lock.c.owner == self.owner) | (lock.c.expires_at < now))
+                .values(owner=self.owner, expires_at=now + self.lease)
+            ).rowcount
+        if not renewed:
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(insert(lock).values(name=LOCK_NAME, owner=self.owner, expires_at=now + self.lease))
+            except IntegrityError:
+                self.leader = False
+                return False  # Held by another worker
+
+        if not self.leader:
+            self.leader = True
+            self.app.logger.info('Planificador de tareas activo en %s', self.owner)
+            # The previous leader will not finish what it was running
+            db.session.execute(
+                update(JobRun)
+                .where(JobRun.status == 'running', JobRun.worker != self.owner)
+                .values(status='error', error=INTERRUPTED, finished_at=now)
+            )
+            db.session.commit()
+        return True
+
+    def renew(self):
+        """Extend the lease while this worker still holds it; False if another worker took it"""
+        lock = SchedulerLock.__table__
+        with db.engine.begin() as conn:
+            return conn.execute(
+                update(lock)
+                .where(lock.c.name == LOCK_NAME, lock.c.owner == self.owner)
+                .values(expires_at=datetime.utcnow() + self.lease)
+            ).rowcount > 0
+
+    def heartbeat(self, stop):
+        """Renew the lease every third of it until `stop` is set (while a job runs)"""
+        with self.app.app_context():
+            while not stop.wait(self.lease.total_seconds() / 3):
+                try:
+                    if not self.renew():
+                        self.app.logger.warning('El worker %s perdió la concesión del planificador', self.owner)
+                        return
+                except Exception:
+                    self.app.logger.exception('Error al renovar la concesión del planificador')
+
+    def release(self):
+        if not self.leader:
+            return
+        self.leader = False
+        lock = SchedulerLock.__table__
+        try:
+            with self.app.app_context(), db.engine.begin() as conn:
+                conn.execute(update(lock).where(lock.c.name == LOCK_NAME, lock.c.owner == self.owner)
+                             .values(expires_at=datetime.utcnow()))
+        except Exception:
+            pass  # Interpreter shutting down: the lease expires by itself
+
+    # --- Runs ---
+
+    def last_scheduled(self, name):
+        """When the scheduler last found the job due"""
+        return db.session.query(func.max(JobRun.queued_at)).filter(
+            JobRun.job == name, JobRun.trigger == 'schedule').scalar()
+
+    def next_run(self, job, last_scheduled=None):
+        """When the job is due next (None for jobs without a schedule)"""
+        if job.schedule is None:
+            return None
+        return job.schedule.next_after(last_scheduled or self.started_at)
+
+    def tick(self, now=None):
+        """Run the queued runs and the due jobs if this worker is the leader; returns the runs"""
+        now = now or datetime.utcnow()
+        if not self.acquire(now):
+            return []
+        pending = JobRun.query.filter_by(status='queued').order_by(JobRun.id).all()
+        for job in self.jobs.values():
+            next_run = self.next_run(job, self.last_scheduled(job.name))
+            if next_run is not None and next_run <= now:
+                pending.append(JobRun(job=job.name, trigger='schedule', status='queued', queued_at=now))
+
+        runs = []
+        for run in pending:
+            # Renewed before every job: a long job must not lose the lease
+            if runs and not self.acquire():
+                break
+            runs.append(self.execute(run))
+        return runs
+
+    def trigger(self, name):
+        """Queue a manual run for the leader, whichever worker it is"""
+        run = JobRun(job=name, trigger='manual', status='queued')
+        db.session.add(run)
+        db.session.commit()
+        self.wake()
+        return run
+
+    def execute(self, run):
+        """Run a job and record how it went; a failing job is recorded, not raised"""
+        job = self.jobs.get(run.job)
+        if job is None:
+            run.status, run.error = 'error', 'Tarea desconocida'
+            db.session.add(run)
+            db.session.commit()
+            return run
+        run.status = 'running'
+        run.worker = self.owner
+        run.started_at = datetime.utcnow()
+        db.session.add(run)
+        db.session.commit()
+
+        started = time.perf_counter()
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(stop,), name='scheduler-heartbeat', daemon=True)
+        heartbeat.start()
+        try:
+            result = job.function()
+        except Exception as e:
+            db.session.rollback()
+            run.status = 'error'
+            run.error = f'{type(e).__name__}: {e}'
+            self.app.logger.error('Tarea %s fallida:\n%s', job.name, traceback.format_exc())
+        else:
+            run.status = 'success'
+            run.result = json.dumps(result)
+        finally:
+            stop.set()
+            heartbeat.join()
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = round((time.perf_counter() - started) * 1000)
+        db.session.add(run)
+        db.session.commit()
+        return run
+
+
+def configure_scheduler(app):
+    """Create the scheduler of this app and start its thread when SCHEDULER is on"""
+    from utils.jobs import JOBS
+
+    schedules = app.config.get('SCHEDULER_SCHEDULES', {})
+    jobs = []
+    for job in JOBS:
+        schedule = schedules.get(job.name, job.schedule.expression if job.schedule else None)
+        jobs.append(Job(job.name, schedule, job.function, job.description))
+    scheduler = Scheduler(app, jobs)
+    app.extensions['scheduler'] = scheduler
+
+    if app.config.get('SCHEDULER', True):
+        scheduler.start()
+        os.register_at_fork(after_in_child=scheduler._forked)
+        atexit.register(lambda: scheduler.release())
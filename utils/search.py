@@ -0,0 +1,205 @@
+"""
+Search index for lots, products, customers and production orders
+
+On SQLite the index is an FTS5 table with the trigram tokenizer, so any
+substring of three or more characters is found through the index. Triggers
+keep it up to date on insert, update and delete, including bulk inserts made
+outside the ORM. Each row's rowid encodes the entity: id * 4 + kind.
+
+On PostgreSQL the same searches use the pg_trgm GIN indexes created with the
+tables (see POSTGRESQL_INDEXES in models.py) and rank by similarity().
+"""
+import sqlite3
+import weakref
+
+from sqlalchemy import DDL, column, event, func, or_, text
+from sqlalchemy.orm import joinedload
+
+from models import db, Lot, Product, Customer, ProductionOrder
+
+# Shortest term the trigram index can answer; shorter terms fall back to LIKE
+MIN_INDEXED_LENGTH = 3
+
+# kind -> (rowid offset, table, code expression, name expression, columns watched by the update trigger)
+SEARCH_KINDS = {
+    'product': (0, 'products', 'new.code', 'new.name', 'code, name'),
+    'customer': (1, 'customers', 'new.code', 'new.name', 'code, name'),
+    'lot': (2, 'lots', 'new.lot_number', "''", 'lot_number'),
+    'order': (3, 'production_orders', 'new.order_number',
+              "COALESCE(new.base_product_name, '') || ' ' || COALESCE(new.base_lot_number, '')",
+              'order_number, base_product_name, base_lot_number'),
+}
+
+
+def search_index_ddl():
+    """Statements creating the SQLite search index and its triggers (idempotent)"""
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(code, name, tokenize='trigram')"
+    ]
+    for offset, table, code, name, watched in SEARCH_KINDS.values():
+        row = f'new.id * 4 + {offset}, {code}, {name}'
+        statements += [
+            f'CREATE TRIGGER IF NOT EXISTS search_index_{table}_insert AFTER INSERT ON {table} BEGIN '
+            f'INSERT INTO search_index (rowid, code, name) VALUES ({row}); END',
+            f'CREATE TRIGGER IF NOT EXISTS search_index_{table}_update AFTER UPDATE OF {watched} ON {table} BEGIN '
+            f'DELETE FROM search_index WHERE rowid = old.id * 4 + {offset}; '
+            f'INSERT INTO search_index (rowid, code, name) VALUES ({row}); END',
+            f'CREATE TRIGGER IF NOT EXISTS search_index_{table}_delete AFTER DELETE ON {table} BEGIN '
+            f'DELETE FROM search_index WHERE rowid = old.id * 4 + {offset}; END',
+        ]
+    return statements
+
+
+def backfill_statement(kind):
+    """INSERT ... SELECT indexing the rows of one kind in the id range [:start, :end)"""
+    offset, table, code, name, _ = SEARCH_KINDS[kind]
+    code, name = code.replace('new.', f'{table}.'), name.replace('new.', f'{table}.')
+    return (f'INSERT INTO search_index (rowid, code, name) '
+            f'SELECT {table}.id * 4 + {offset}, {code}, {name} FROM {table} '
+            f'WHERE {table}.id >= :start AND {table}.id < :end '
+            f'AND NOT EXISTS (SELECT 1 FROM search_index WHERE rowid = {table}.id * 4 + {offset})')
+
+
+def fts5_trigram_supported(bind=None, **kw):
+    # The trigram tokenizer needs SQLite 3.34
+    return sqlite3.sqlite_version_info >= (3, 34, 0) and (bind is None or bind.dialect.name == 'sqlite')
+
+
+for statement in search_index_ddl():
+    event.listen(db.metadata, 'after_create',
+                 DDL(statement).execute_if(callable_=lambda ddl, target, bind, **kw: fts5_trigram_supported(bind)))
+# Dropping the tables drops their triggers; the index itself is not part of the metadata
+event.listen(db.metadata, 'after_drop', DDL('DROP TABLE IF EXISTS search_index').execute_if(dialect='sqlite'))
+
+
+_index_available = weakref.WeakKeyDictionary()
+
+
+def has_search_index():
+    """Whether the current database has the SQLite search index (checked once per engine)"""
+    engine = db.engine
+    if engine not in _index_available:
+        _index_available[engine] = engine.dialect.name == 'sqlite' and db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+        )).first() is not None
+    return _index_available[engine]
+
+
+def quote_match(term):
+    """FTS5 phrase query for a literal substring"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def search_condition(kind, id_column, columns, term):
+    """Filter matching `term` as a substring of any of `columns`
+
+    Uses the search index when it can answer the term, otherwise ILIKE
+    (which the PostgreSQL trigram indexes also serve).
+    """
+    if len(term) >= MIN_INDEXED_LENGTH and has_search_index():
+        offset = SEARCH_KINDS[kind][0]
+        matches = text(
+            f'SELECT rowid / 4 AS id FROM search_index WHERE search_index MATCH :search_term AND rowid % 4 = {offset}'
+        ).bindparams(search_term=quote_match(term)).columns(column('id'))
+        return id_column.in_(matches)
+    return or_(*[col.ilike(f'%{term}%') for col in columns])
+
+
+# Kinds whose inactive rows are left out of the results, before the limit
+ACTIVE_KINDS = ('product', 'customer')
+
+# kind -> (model, code column, name column) for the per-table search path
+SEARCH_MODELS = {
+    'product': (Product, Product.code, Product.name),
+    'customer': (Customer, Customer.code, Customer.name),
+    'lot': (Lot, Lot.lot_number, None),
+    'order': (ProductionOrder, ProductionOrder.order_number, ProductionOrder.base_product_name),
+}
+
+
+def search(term, kinds=None, limit=20):
+    """Ranked matches for `term` as a list of (kind, id, score), best first"""
+    kinds = [kind for kind in SEARCH_KINDS if not kinds or kind in kinds]
+    if has_search_index():
+        return _search_index(term, kinds, limit)
+    return _search_tables(term, kinds, limit)
+
+
+def _search_index(term, kinds, limit):
+    offsets = ', '.join(str(SEARCH_KINDS[kind][0]) for kind in kinds)
+    offset_to_kind = {SEARCH_KINDS[kind][0]: kind for kind in kinds}
+    # Exact code first, then code prefix, then bm25 rank (or shortest code for short terms)
+    if len(term) >= MIN_INDEXED_LENGTH:
+        where, score = 'search_index MATCH :match', 'rank'
+    else:
+        where, score = '(code LIKE :contains OR name LIKE :contains)', 'length(code)'
+    for kind in ACTIVE_KINDS:
+        if kind in kinds:
+            offset, table = SEARCH_KINDS[kind][:2]
+            where += (f' AND (search_index.rowid % 4 != {offset} OR EXISTS (SELECT 1 FROM {table} '
+                      f'WHERE {table}.id = search_index.rowid / 4 AND {table}.active))')
+    rows = db.session.execute(text(
+        f'SELECT rowid, {score} AS score FROM search_index WHERE {where} AND rowid % 4 IN ({offsets}) '
+        f'ORDER BY lower(code) = lower(:term) DESC, code LIKE :prefix DESC, score LIMIT :limit'
+    ), {
+        'match': quote_match(term), 'contains': f'%{term}%', 'prefix': f'{term}%', 'term': term, 'limit': limit
+    }).all()
+    return [(offset_to_kind[rowid % 4], rowid // 4, score) for rowid, score in rows]
+
+
+def _search_tables(term, kinds, limit):
+    results = []
+    for kind in kinds:
+        model, code, name = SEARCH_MODELS[kind]
+        columns = [code] + ([name] if name is not None else [])
+        if db.engine.dialect.name == 'postgresql':
+            # Negated so that, as with bm25, lower scores are better
+            score = -func.greatest(*[func.similarity(col, term) for col in columns]) \
+                if len(columns) > 1 else -func.similarity(code, term)
+        else:
+            score = func.length(code)
+        query = db.session.query(model.id, score).filter(or_(*[col.ilike(f'%{term}%') for col in columns]))
+        if kind in ACTIVE_KINDS:
+            query = query.filter(model.active.is_(True))
+        rows = query.order_by((func.lower(code) == term.lower()).desc(), score).limit(limit).all()
+        results += [(kind, row_id, row_score) for row_id, row_score in rows]
+    return sorted(results, key=lambda result: result[2])[:limit]
+
+
+def load_results(matches):
+    """Serialize search matches keeping their order (one query per kind)"""
+    ids = {}
+    for kind, row_id, _ in matches:
+        ids.setdefault(kind, []).append(row_id)
+
+    entities = {}
+    if 'product' in ids:
+        entities.update({('product', p.id): p for p in Product.query.filter(Product.id.in_(ids['product']))})
+    if 'customer' in ids:
+        entities.update({('customer', c.id): c for c in Customer.query.filter(Customer.id.in_(ids['customer']))})
+    if 'lot' in ids:
+        entities.update({('lot', lot.id): lot for lot in Lot.query.options(joinedload(Lot.product))
+                         .filter(Lot.id.in_(ids['lot']))})
+    if 'order' in ids:
+        entities.update({('order', o.id): o for o in ProductionOrder.query.filter(ProductionOrder.id.in_(ids['order']))})
+
+    results = []
+    for kind, row_id, score in matches:
+        entity = entities.get((kind, row_id))
+        if entity is None:
+            continue
+        results.append(dict(describe(kind, entity), type=kind, id=row_id,
+                            score=round(score, 4) if score is not None else None))
+    return results
+
+
+def describe(kind, entity):
+    if kind == 'product':
+        return {'code': entity.code, 'name': entity.name, 'detail': entity.type.value}
+    if kind == 'customer':
+        return {'code': entity.code, 'name': entity.name, 'detail': entity.email}
+    if kind == 'lot':
+        return {'code': entity.lot_number, 'name': entity.product.name if entity.product else None,
+                'detail': entity.status.value, 'product_id': entity.product_id,
+                'expiration_date': entity.expiration_date.isoformat() if entity.expiration_date else None}
+    return {'code': entity.order_number, 'name': entity.base_product_name, 'detail': entity.status.value}
@@ -0,0 +1,156 @@
+"""
+Stock as of a date, from the movement ledger and periodic snapshots
+
+Lot.current_quantity and LotLocation.quantity only hold the present. The
+stock of a lot in a location at any instant is the sum of the movements
+dated before it: transfers move their quantity from from_location to
+to_location, and every other movement changes the one location it names
+(to_location_id for entries, from_location_id for exits). Manual lot
+entries and adjustments carry no location and add up under location NULL.
+
+Replaying millions of movements for every question is too slow, so a
+snapshot stores the balance of every lot and location at a cutoff, and a
+query starts from the snapshot nearest to the requested instant, applying
+only the movements in between (backwards when the snapshot is later):
+
+    stock(T) = snapshot(C) + movements dated in [C, T)      when C <= T
+             = snapshot(C) - movements dated in [T, C)      when C > T
+
+A snapshot holds the movements dated before its cutoff that existed when it
+was taken (id <= last_movement_id). Movements recorded later with an older
+date (a back-dated return, for example) are added on top, so snapshots never
+need to be rebuilt. Snapshots are taken at the start of each month (stock at
+month end), by the scheduler (utils/jobs.py) or `python stock_snapshots.py`.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func, insert, literal, select, union_all
+
+from models import db, MovementType, StockMovement, StockSnapshot, StockSnapshotBalance
+
+# Balances smaller than this are float residue of movements that cancel out
+EPSILON = 1e-6
+
+
+def parse_as_of(value):
+    """Instant of an as_of= parameter: a date means the end of that day"""
+    try:
+        if len(value) == 10:
+            return datetime.combine(date.fromisoformat(value) + timedelta(days=1), datetime.min.time())
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError('as_of debe ser una fecha YYYY-MM-DD o YYYY-MM-DDTHH:MM:SS')
+
+
+def movement_deltas(*conditions, sign=1):
+    """Selects of (lot_id, location_id, quantity) changed by the movements matching `conditions`"""
+    located = case(
+        (StockMovement.movement_type == MovementType.TRANSFER, StockMovement.to_location_id),
+        else_=func.coalesce(StockMovement.to_location_id, StockMovement.from_location_id),
+    )
+    return [
+        select(StockMovement.lot_id, located.label('location_id'),
+               (StockMovement.quantity * sign).label('quantity')).where(*conditions),
+        # The other half of a transfer
+        select(StockMovement.lot_id, StockMovement.from_location_id,
+               (StockMovement.quantity * -sign)).where(
+            StockMovement.movement_type == MovementType.TRANSFER, *conditions),
+    ]
+
+
+def nearest_snapshot(as_of):
+    """Snapshot with the cutoff closest to `as_of`, before or after it (None if there are none)"""
+    before = StockSnapshot.query.filter(StockSnapshot.cutoff <= as_of).order_by(StockSnapshot.cutoff.desc()).first()
+    after = StockSnapshot.query.filter(StockSnapshot.cutoff > as_of).order_by(StockSnapshot.cutoff.asc()).first()
+    if before is None or after is None:
+        return before or after
+    return before if as_of - before.cutoff <= after.cutoff - as_of else after
+
+
+def ledger_balances(as_of, lot_ids=None, up_to=None):
+    """Select of (lot_id, location_id, quantity) at `as_of`, non-zero balances only
+
+    lot_ids restricts it to some lots; up_to ignores the movements recorded
+    after that id (to take a snapshot of a consistent set).
+    """
+    movement_filter = [StockMovement.lot_id.in_(lot_ids)] if lot_ids is not None else []
+    if up_to is not None:
+        movement_filter.append(StockMovement.id <= up_to)
+
+    snapshot = nearest_snapshot(as_of)
+    if snapshot is None:
+        parts = movement_deltas(StockMovement.movement_date < as_of, *movement_filter)
+    else:
+        balance = StockSnapshotBalance
+        parts = [select(balance.lot_id, balance.location_id, balance.quantity).where(
+            balance.snapshot_id == snapshot.id,
+            *([balance.lot_id.in_(lot_ids)] if lot_ids is not None else []))]
+        included = StockMovement.id <= snapshot.last_movement_id
+        if snapshot.cutoff <= as_of:
+            parts += movement_deltas(included, StockMovement.movement_date >= snapshot.cutoff,
+                                     StockMovement.movement_date < as_of, *movement_filter)
+        else:
+            parts += movement_deltas(included, StockMovement.movement_date >= as_of,
+                                     StockMovement.movement_date < snapshot.cutoff, *movement_filter, sign=-1)
+        # Recorded after the snapshot, whatever their date
+        parts += movement_deltas(StockMovement.id > snapshot.last_movement_id,
+                                 StockMovement.movement_date < as_of, *movement_filter)
+
+    deltas = union_all(*parts).subquery()
+    total = func.sum(deltas.c.quantity)
+    return (
+        select(deltas.c.lot_id, deltas.c.location_id, total.label('quantity'))
+        .group_by(deltas.c.lot_id, deltas.c.location_id)
+        .having(func.abs(total) > EPSILON)
+    )
+
+
+def take_snapshot(cutoff):
+    """Store the balances at `cutoff` (one INSERT ... SELECT); returns the snapshot
+
+    Does nothing if there is already one at that cutoff. The caller commits.
+    """
+    existing = StockSnapshot.query.filter_by(cutoff=cutoff).first()
+    if existing is not None:
+        return existing
+
+    last_movement_id = db.session.query(func.coalesce(func.max(StockMovement.id), 0)).scalar()
+    balances = ledger_balances(cutoff, up_to=last_movement_id).subquery()
+    snapshot = StockSnapshot(cutoff=cutoff, last_movement_id=last_movement_id)
+    db.session.add(snapshot)
+    db.session.flush()
+    db.session.execute(insert(StockSnapshotBalance).from_select(
+        ['snapshot_id', 'lot_id', 'location_id', 'quantity'],
+        select(literal(snapshot.id), balances.c.lot_id, balances.c.location_id, balances.c.quantity),
+    ))
+    return snapshot
+
+
+def month_start(day):
+    return datetime(day.year, day.month, 1)
+
+
+def next_month(instant):
+    return datetime(instant.year + instant.month // 12, instant.month % 12 + 1, 1)
+
+
+def take_monthly_snapshots(now=None):
+    """Take the missing month-start snapshots, from the first movement's month to `now`
+
+    Oldest first, so each one replays a single month from the previous.
+    Commits after each snapshot; returns the ones taken.
+    """
+    now = now or datetime.utcnow()
+    first = db.session.query(func.min(StockMovement.movement_date)).scalar()
+    if first is None:
+        return []
+    existing = {cutoff for cutoff, in db.session.query(StockSnapshot.cutoff)}
+    taken = []
+    cutoff = next_month(month_start(first))
+    while cutoff <= now:
+        if cutoff not in existing:
+            taken.append(take_snapshot(cutoff))
+            db.session.commit()
+        cutoff = next_month(cutoff)
+    return taken
+
@@ -0,0 +1,153 @@
+"""
+Delta sync: rows changed since a cursor, for client-side replicas
+
+    GET /api/sync/lots?since=0          every row, in pages
+    GET /api/sync/lots?since=<cursor>   rows inserted or updated and ids
+                                        deleted after the cursor
+
+Rows carry an updated_at column (set on insert and on every UPDATE) and
+deletes leave a row in sync_tombstones, written in the same transaction.
+The response holds 'changes', 'deleted' and the 'cursor' for the next
+request; with 'has_more' the client asks again right away.
+
+Cursors are opaque to clients:
+
+    w_<time>                            everything up to this time was sent
+    p_<updated_at>_<id>_<time>_<floor>  next page: rows after this one; the
+                                        sequence started at <time> and its
+                                        last page reports deletions after <floor>
+
+A transaction stamps updated_at before it commits, so a row may become
+visible with an updated_at a little older than a watermark already handed
+out. Watermark requests look back SYNC_LOOKBACK_SECONDS to pick those up:
+a row or deletion may be sent more than once, never missed. The ids deleted
+go in the last page of a sequence; replicas apply 'deleted' first, then
+upsert 'changes' by id.
+
+Only deletes made through the session leave tombstones; bulk
+Query.delete() on a synced table would not reach replicas.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import joinedload
+
+from models import (db, Customer, Lot, LotLocation, Product, ProductionOrder, ProductionOrderMaterial,
+                    StockMovement, SyncTombstone)
+
+DELETED_ROWS_KEY = 'sync_deleted_rows'
+
+# collection -> (model, serializer, query options)
+SYNC_COLLECTIONS = {
+    'products': (Product, lambda p: p.to_dict(), ()),
+    'customers': (Customer, lambda c: c.to_dict(), ()),
+    'lots': (Lot, lambda lot: lot.to_dict(), ()),
+    'lot_locations': (LotLocation, lambda ll: ll.to_dict(include_location=False), ()),
+    'movements': (StockMovement, lambda m: m.to_dict(include_locations=False), ()),
+    'orders': (ProductionOrder, lambda o: o.to_dict(), (joinedload(ProductionOrder.finished_product),)),
+    'order_materials': (ProductionOrderMaterial, lambda m: {
+        'id': m.id,
+        'production_order_id': m.production_order_id,
+        'lot_id': m.lot_id,
+        'quantity_consumed': m.quantity_consumed,
+        'unit': m.unit,
+        'original_quantity': m.original_quantity,
+        'original_unit': m.original_unit,
+        'related_finished_product_id': m.related_finished_product_id,
+    }, ()),
+}
+SYNCED_TABLES = {model.__tablename__ for model, _, _ in SYNC_COLLECTIONS.values()}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Cursor:
+    """Position of a sync sequence: rows after (after, after_id), deletions after floor"""
+
+    def __init__(self, after, after_id, started, floor):
+        self.after = after
+        self.after_id = after_id
+        self.started = started
+        self.floor = floor
+
+    @classmethod
+    def parse(cls, value, lookback):
+        now = datetime.utcnow()
+        if value == '0':
+            # Full download: deletions during the download are reported at the end
+            return cls(datetime.min, 0, now, now)
+        try:
+            kind, *parts = value.split('_')
+            if kind == 'w' and len(parts) == 1:
+                since = datetime.fromisoformat(parts[0]) - lookback
+                return cls(since, 0, now, since)
+            if kind == 'p' and len(parts) == 4:
+                return cls(datetime.fromisoformat(parts[0]), int(parts[1]),
+                           datetime.fromisoformat(parts[2]), datetime.fromisoformat(parts[3]))
+        except ValueError:
+            pass
+        raise InvalidCursor(f'Cursor inválido: {value}')
+
+    def next_page(self, row):
+        return f'p_{row.updated_at.isoformat()}_{row.id}_{self.started.isoformat()}_{self.floor.isoformat()}'
+
+    def watermark(self):
+        return f'w_{self.started.isoformat()}'
+
+
+def changes_since(collection, since, limit, lookback):
+    """Changes of a collection after the cursor `since`, as the response dict"""
+    model, serialize, options = SYNC_COLLECTIONS[collection]
+    cursor = Cursor.parse(since, lookback)
+
+    updated_at = model.__table__.c.updated_at
+    rows = model.query.options(*options).filter(or_(
+        updated_at > cursor.after, and_(updated_at == cursor.after, model.id > cursor.after_id)
+    )).order_by(updated_at, model.id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    deleted = []
+    if not has_more:
+        deleted = sorted({row_id for row_id, in db.session.query(SyncTombstone.row_id).filter(
+            SyncTombstone.table_name == model.__tablename__, SyncTombstone.deleted_at > cursor.floor)})
+
+    return {
+        'collection': collection,
+        'changes': [serialize(row) for row in rows],
+        'deleted': deleted,
+        'cursor': cursor.next_page(rows[-1]) if has_more else cursor.watermark(),
+        'has_more': has_more,
+    }
+
+
+def _after_flush(session, flush_context):
+    deleted = [(instance.__tablename__, instance.id) for instance in session.deleted
+               if instance.__tablename__ in SYNCED_TABLES]
+    if deleted:
+        session.info.setdefault(DELETED_ROWS_KEY, []).extend(deleted)
+
+
+def _before_commit(session):
+    session.flush()
+    deleted = session.info.pop(DELETED_ROWS_KEY, None)
+    if deleted:
+        now = datetime.utcnow()
+        session.connection().execute(SyncTombstone.__table__.insert(), [
+            {'table_name': table_name, 'row_id': row_id, 'deleted_at': now} for table_name, row_id in deleted
+        ])
+
+
+def _after_rollback(session):
+    session.info.pop(DELETED_ROWS_KEY, None)
+
+
+def configure_sync(app):
+    """Record tombstones for rows deleted from the synced collections"""
+    if event.contains(db.session, 'before_commit', _before_commit):
+        return  # Listeners are per session class, shared by every app
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'before_commit', _before_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
@@ -0,0 +1,147 @@
+"""
+Per-table change counters and conditional GET
+
+Every commit that writes to a table increments its row in table_versions,
+in the same transaction. Writes are collected from the session: flushed ORM
+objects and the insert/update/delete statements run with session.execute
+(bulk deletes, generate_dataset.py). Statements run on the engine directly,
+such as migrations, do not count.
+
+GET views decorated with @conditional('products', ...) answer with a strong
+ETag built from the versions of the tables they read. When the client sends
+it back in If-None-Match and nothing changed, the view is not run and the
+response is a 304 with no body. Views that are expensive for every client
+(reports) can also keep their last responses in memory by ETag: they then
+run once per worker, day and change of their tables.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import event, text
+
+from models import db, TableVersion
+
+VERSIONED_TABLES_KEY = 'versioned_tables'
+
+BUMP_STATEMENT = text(
+    'INSERT INTO table_versions (table_name, version) VALUES (:table_name, 1) '
+    'ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1'
+)
+
+
+def _written_tables(session):
+    return session.info.setdefault(VERSIONED_TABLES_KEY, set())
+
+
+def _after_flush(session, flush_context):
+    tables = _written_tables(session)
+    tables.update(instance.__table__.name for instance in session.new)
+    tables.update(instance.__table__.name for instance in session.deleted)
+    tables.update(instance.__table__.name for instance in session.dirty
+                  if session.is_modified(instance, include_collections=False))
+
+
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _written_tables(orm_execute_state.session).add(table.name)
+
+
+def _before_commit(session):
+    # Flush first so the last pending changes are counted, then bump once per
+    # table in name order: concurrent writers on PostgreSQL lock the counter
+    # rows in the same order and cannot deadlock
+    session.flush()
+    tables = session.info.pop(VERSIONED_TABLES_KEY, set())
+    tables.discard(TableVersion.__tablename__)
+    for table_name in sorted(tables):
+        session.execute(BUMP_STATEMENT, {'table_name': table_name})
+
+
+def _after_rollback(session):
+    session.info.pop(VERSIONED_TABLES_KEY, None)
+
+
+def configure_versions(app):
+    """Count changes per table on every commit of the application session"""
+    if not app.config.get('TABLE_VERSIONS', True):
+        return
+    if event.contains(db.session, 'before_commit', _before_commit):
+        return  # Listeners are per session class, shared by every app
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+    event.listen(db.session, 'before_commit', _before_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
+
+
+def table_versions(tables):
+    """Current version of each table (0 if never written)"""
+    rows = db.session.query(TableVersion.table_name, TableVersion.version).filter(
+        TableVersion.table_name.in_(tables)).all()
+    versions = dict(rows)
+    return {table: versions.get(table, 0) for table in tables}
+
+
+def compute_etag(tables):
+    """Strong ETag for the current request from the versions of `tables`
+
+    The date is part of the tag because lot serializations depend on it
+    (days to expiration, expired status).
+    """
+    versions = table_versions(sorted(tables))
+    key = f'{request.full_path}|{date.today().isoformat()}|' + ','.join(
+        f'{table}={version}' for table, version in versions.items())
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def etag_matches(etag):
+    # Compressed responses carry the tag with the content coding appended (utils/responses.py)
+    if_none_match = request.if_none_match
+    return any(if_none_match.contains(candidate) for candidate in (etag, f'{etag}-gzip', f'{etag}-br'))
+
+
+def conditional(*tables, cache_size=0):
+    """Decorator for GET views whose response only depends on `tables`
+
+    With cache_size, the bodies of the last `cache_size` responses are kept
+    by ETag and served to any client without running the view.
+    """
+    def decorator(view):
+        lock = threading.Lock()
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('TABLE_VERSIONS', True):
+                return view(*args, **kwargs)
+
+            etag = compute_etag(tables)
+            with lock:
+                # Per application: the versions are those of its database
+                cache = current_app.extensions.setdefault('response_cache', {}).setdefault(wrapper, OrderedDict())
+                cached = cache.get(etag)
+                if cached is not None:
+                    cache.move_to_end(etag)
+            if etag_matches(etag):
+                response = current_app.response_class(status=304)
+            elif cached is not None:
+                response = current_app.response_class(cached[0], mimetype=cached[1])
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if cache_size:
+                    with lock:
+                        cache[etag] = (response.get_data(), response.mimetype)
+                        while len(cache) > cache_size:
+                            cache.popitem(last=False)
+            response.set_etag(etag)
+            # Cached copies must be revalidated on every use
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator